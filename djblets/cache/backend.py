@@ -9,26 +9,81 @@ iterators and large data normally too big for the cache).
 
 from hashlib import md5
 import logging
+import math
+import random
+import time
 import zlib
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
 from django.core.cache import cache
+
+try:
+    # Django >= 1.7
+    from django.core.cache import (DEFAULT_CACHE_ALIAS, DefaultCacheProxy,
+                                   caches)
+except ImportError:
+    # Django < 1.7
+    DefaultCacheProxy = None
 from django.contrib.sites.models import Site
+from django.db.models.signals import post_delete, post_save
+from django.test.signals import setting_changed
+from django.utils import six
 from django.utils.six.moves import (range,
                                     cPickle as pickle,
                                     cStringIO as StringIO)
 
+from djblets.cache.background import get_background_completion_pool
+from djblets.cache.codecs import (NoCompressionCodec, build_codec_header,
+                                  get_cache_codec_registry,
+                                  get_large_data_codec, get_pickle_protocol,
+                                  parse_codec_header)
 from djblets.cache.errors import MissingChunkError
+from djblets.cache.forwarding_backend import ForwardingCacheBackend
+from djblets.cache.local_cache import (DEFAULT_LOCAL_CACHE_EXPIRATION_TIME,
+                                       get_value_size, local_cache)
+from djblets.cache.stats import (get_key_family, is_cache_stats_enabled,
+                                 record_cache_stat)
 import collections
 
 
 DEFAULT_EXPIRATION_TIME = 60 * 60 * 24 * 30  # 1 month
+DEFAULT_NEGATIVE_EXPIRATION_TIME = 60 * 5  # 5 minutes
 CACHE_CHUNK_SIZE = 2 ** 20 - 1024  # almost 1M (memcached's slab limit)
 
+# The maximum value sizes for known cache backends. None means no limit.
+CACHE_BACKEND_MAX_VALUE_SIZES = {
+    'django.core.cache.backends.db.DatabaseCache': None,
+    'django.core.cache.backends.filebased.FileBasedCache': None,
+    'django.core.cache.backends.locmem.LocMemCache': None,
+    'django.core.cache.backends.memcached.BaseMemcachedCache':
+        CACHE_CHUNK_SIZE,
+
+    # Redis has a hard limit of 512MB per value.
+    'django_redis.cache.RedisCache': 2 ** 29 - 1024,
+    'redis_cache.cache.RedisCache': 2 ** 29 - 1024,
+}
+
+# The number of chunks fetched per request when reading large data.
+CACHE_FETCH_WINDOW_SIZE = 4
+
+# The default number of seconds a process may hold a recomputation lease.
+DEFAULT_LEASE_TIMEOUT = 30
+
+# The default number of seconds to wait for another process holding a lease.
+DEFAULT_LEASE_WAIT_TIME = 2
+
+# The number of seconds between checks while waiting on a lease.
+LEASE_POLL_INTERVAL = 0.05
+
 # memcached key size constraint (typically 250, but leave a few bytes for the
 # large data handling)
 MAX_KEY_SIZE = 240
 
+# Characters that memcached doesn't like in keys.
+_KEY_STRIP_CHARS = ' \t\n\r'
+_KEY_STRIP_TABLE = dict((ord(ch), None) for ch in _KEY_STRIP_CHARS)
+
 
 logger = logging.getLogger(__name__)
 
@@ -36,45 +91,384 @@ logger = logging.getLogger(__name__)
 _default_expiration = getattr(settings, 'CACHE_EXPIRATION_TIME',
                               DEFAULT_EXPIRATION_TIME)
 
+_default_local_expiration = getattr(settings, 'CACHE_LOCAL_EXPIRATION_TIME',
+                                    DEFAULT_LOCAL_CACHE_EXPIRATION_TIME)
 
-def _cache_fetch_large_data(cache, key, compress_large_data):
-    """Fetch large data from the cache.
+_default_negative_expiration = getattr(settings,
+                                       'CACHE_NEGATIVE_EXPIRATION_TIME',
+                                       DEFAULT_NEGATIVE_EXPIRATION_TIME)
+
+_NO_VALUE = object()
+
+# The prefix for all cache keys, computed by _get_cache_key_prefix().
+_cache_key_prefix = None
 
-    The main cache key indicating the number of chunks will be read, followed
-    by each of the chunks. If any chunks are missing, a MissingChunkError
-    will be immediately returned.
 
-    The data is then combined and optionally uncompressed, and returned to
-    the caller. The caller should iterate through the results using
-    _cache_iter_large_data.
+class _NegativeResult(object):
+    """A marker stored in the cache for a negative result.
+
+    See the ``cache_negative_results`` argument to :py:func:`cache_memoize`.
+    Instances are compared by type, since a new instance is created each time
+    one is read from the cache.
     """
-    chunk_count = int(cache.get(make_cache_key(key)))
 
-    chunk_keys = [
-        make_cache_key('%s-%d' % (key, i))
-        for i in range(chunk_count)
-    ]
+
+class _NamespacedValue(object):
+    """A value stored in the cache along with its namespace generations.
+
+    See the ``namespaces`` argument to :py:func:`cache_memoize`.
+    """
+
+    def __init__(self, generations, data):
+        """Initialize the value.
+
+        Args:
+            generations (tuple):
+                The namespace generations the value was computed under.
+
+            data (object):
+                The value.
+        """
+        self.generations = generations
+        self.data = data
+
+
+class _StreamReader(object):
+    """A file-like object reading from an iterator of data blocks.
+
+    This provides just enough of a file interface for :py:func:`pickle.load`,
+    pulling in new blocks only as they're needed. This allows items to be
+    unpickled as the data is decompressed, without holding the entire
+    decompressed payload in memory.
+    """
+
+    def __init__(self, blocks):
+        """Initialize the reader.
+
+        Args:
+            blocks (iterator of bytes):
+                The blocks of data to read.
+        """
+        self._blocks = iter(blocks)
+        self._buffer = b''
+        self._pos = 0
+
+    def read(self, size=-1):
+        """Read data from the stream.
+
+        Args:
+            size (int, optional):
+                The number of bytes to read. If negative, all remaining data
+                will be read.
+
+        Returns:
+            bytes:
+            The data read. This will be shorter than ``size`` only at the end
+            of the stream.
+        """
+        if size < 0:
+            data = self._buffer[self._pos:] + b''.join(self._blocks)
+            self._buffer = b''
+            self._pos = 0
+
+            return data
+
+        if len(self._buffer) - self._pos < size:
+            self._fill(size)
+
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+
+        return data
+
+    def readline(self):
+        """Read a line from the stream.
+
+        Returns:
+            bytes:
+            The line read, including the trailing newline (unless at the end
+            of the stream).
+        """
+        while True:
+            i = self._buffer.find(b'\n', self._pos)
+
+            if i != -1:
+                return self.read(i + 1 - self._pos)
+
+            if not self._fill(len(self._buffer) - self._pos + 1):
+                return self.read()
+
+    def _fill(self, size):
+        """Fill the buffer with at least the given number of bytes.
+
+        Args:
+            size (int):
+                The number of unread bytes needed in the buffer.
+
+        Returns:
+            bool:
+            ``True`` if any new data was added to the buffer.
+        """
+        pieces = [self._buffer[self._pos:]]
+        available = len(pieces[0])
+
+        while available < size:
+            try:
+                block = next(self._blocks)
+            except StopIteration:
+                break
+
+            pieces.append(block)
+            available += len(block)
+
+        self._buffer = b''.join(pieces)
+        self._pos = 0
+
+        return len(pieces) > 1
+
+
+def get_cache_max_value_size(cache_backend=None):
+    """Return the maximum size of a value that can be stored in the cache.
+
+    This is used as the chunk size for large data. It can be set explicitly
+    through :setting:`CACHE_MAX_VALUE_SIZE` (which may be ``None`` for no
+    limit), for instance if memcached is configured with a larger item size.
+    Otherwise, backends can report their own limit through a
+    ``max_value_size`` attribute, or it's determined by the type of cache
+    backend (see :py:data:`CACHE_BACKEND_MAX_VALUE_SIZES`), defaulting to
+    :py:data:`CACHE_CHUNK_SIZE` for unknown backends.
+
+    Args:
+        cache_backend (django.core.cache.backends.base.BaseCache, optional):
+            The cache backend. Defaults to the default cache.
+
+    Returns:
+        int:
+        The maximum size of a value in bytes, or ``None`` if there's no
+        practical limit.
+    """
+    try:
+        return settings.CACHE_MAX_VALUE_SIZE or None
+    except AttributeError:
+        pass
+
+    if cache_backend is None:
+        cache_backend = cache
+
+    if (DefaultCacheProxy is not None and
+        isinstance(cache_backend, DefaultCacheProxy)):
+        # On Django >= 1.7, the default cache is a proxy for the real
+        # backend, which is needed to check the backend's type.
+        cache_backend = caches[DEFAULT_CACHE_ALIAS]
+
+    if isinstance(cache_backend, ForwardingCacheBackend):
+        cache_backend = cache_backend.backend
+
+    try:
+        return cache_backend.max_value_size
+    except AttributeError:
+        pass
+
+    for cls in type(cache_backend).__mro__:
+        class_path = '%s.%s' % (cls.__module__, cls.__name__)
+
+        if class_path in CACHE_BACKEND_MAX_VALUE_SIZES:
+            return CACHE_BACKEND_MAX_VALUE_SIZES[class_path]
+
+    return CACHE_CHUNK_SIZE
+
+
+def _cache_fetch_chunk_window(cache, chunk_keys):
+    """Fetch a window of chunks from the cache in a single request.
+
+    Args:
+        cache (django.core.cache.backends.base.BaseCache):
+            The cache backend.
+
+        chunk_keys (list of bytes):
+            The normalized keys of the chunks to fetch.
+
+    Returns:
+        list of bytes:
+        The chunk data, in the order of ``chunk_keys``.
+
+    Raises:
+        djblets.cache.errors.MissingChunkError:
+            One or more of the chunks were missing from the cache.
+    """
     chunks = cache.get_many(chunk_keys)
 
-    # Check that we have all the keys we expect, before we begin generating
-    # values. We don't want to waste effort loading anything, and we want to
-    # pass an error about missing keys to the caller up-front before we
-    # generate anything.
-    if len(chunks) != chunk_count:
+    if len(chunks) != len(chunk_keys):
         missing_keys = sorted(set(chunk_keys) - set(chunks.keys()))
         logger.debug('Cache miss for key(s): %s.' % ', '.join(missing_keys))
 
         raise MissingChunkError
 
+    return [
+        chunks[chunk_key][0]
+        for chunk_key in chunk_keys
+    ]
+
+
+def _cache_stream_large_data(cache, first_chunks, windows,
+                             compress_large_data):
+    """Stream decoded large data from the cache.
+
+    Each chunk is passed through the codec's decompressor in order, and the
+    decoded data is yielded as it becomes available. Each remaining window of
+    chunks is fetched only once the previous window has been decoded.
+
+    Args:
+        cache (django.core.cache.backends.base.BaseCache):
+            The cache backend.
+
+        first_chunks (list of bytes):
+            The chunk data for the first window, which has already been
+            fetched.
+
+        windows (list of list of bytes):
+            The normalized chunk keys for each remaining window.
+
+        compress_large_data (bool):
+            Whether data stored without a codec header is zlib-compressed.
+
+    Yields:
+        bytes:
+        Each block of decoded data.
+
+    Raises:
+        djblets.cache.errors.MissingChunkError:
+            One or more of the chunks were missing from the cache.
+    """
+    decompressor = None
+    chunks = first_chunks
+    remaining_windows = iter(windows)
+
+    while True:
+        for chunk in chunks:
+            if decompressor is None:
+                codec, header_len = parse_codec_header(chunk)
+
+                if codec is not None:
+                    chunk = chunk[header_len:]
+                elif compress_large_data:
+                    # This data was stored before codecs were introduced,
+                    # and is a raw zlib stream.
+                    codec = get_cache_codec_registry().get_codec('zlib')
+                else:
+                    codec = NoCompressionCodec()
+
+                decompressor = codec.get_decompressor()
+
+            data = decompressor.decompress(chunk)
+
+            if data:
+                yield data
+
+        try:
+            window = next(remaining_windows)
+        except StopIteration:
+            break
+
+        # Drop the reference to the previous window before fetching the next.
+        chunks = None
+        chunks = _cache_fetch_chunk_window(cache, window)
+
+    if decompressor is not None:
+        data = decompressor.flush()
+
+        if data:
+            yield data
+
+
+def _cache_fetch_large_data(cache, key, compress_large_data,
+                            stats_family=None):
+    """Fetch large data from the cache.
+
+    The main cache key will be read. If it contains the data itself, that
+    will be decoded and returned. Otherwise, it indicates the number of
+    chunks, which will be read in windows of
+    :py:data:`CACHE_FETCH_WINDOW_SIZE` chunks per request. If any chunks in
+    the first window are missing, a MissingChunkError will be immediately
+    raised.
+
+    If all the chunks fit in the first window, the data is combined and
+    decoded at once, which is fastest for reasonably-sized data. Otherwise,
+    an iterator is returned that decodes each chunk in turn, fetching the
+    remaining windows as needed, which keeps memory usage down for very large
+    data. This iterator may raise MissingChunkError while iterating.
+
+    Data is decoded using the codec named in its header. Data stored without
+    a header is decompressed with zlib if ``compress_large_data`` is set. The
+    caller should iterate through the results using _cache_iter_large_data.
+
+    If ``stats_family`` is provided, the number of chunks read will be
+    recorded for that key family.
+    """
+    main_value = cache.get(make_cache_key(key))
+
+    if isinstance(main_value, list):
+        # The data fit in a single chunk, and was stored in the main key.
+        if stats_family is not None:
+            record_cache_stat(stats_family, 'chunks_read')
+
+        return _cache_decode_large_data(main_value[0], compress_large_data)
+
+    chunk_count = int(main_value)
+
+    if stats_family is not None:
+        record_cache_stat(stats_family, 'chunks_read', chunk_count)
+
+    chunk_keys = make_cache_keys([
+        '%s-%d' % (key, i)
+        for i in range(chunk_count)
+    ])
+    windows = [
+        chunk_keys[i:i + CACHE_FETCH_WINDOW_SIZE]
+        for i in range(0, chunk_count, CACHE_FETCH_WINDOW_SIZE)
+    ]
+
+    if not windows:
+        return b''
+
+    # Check that we have all the keys we expect in the first window, before
+    # we begin generating values. We don't want to waste effort loading
+    # anything, and we want to pass an error about missing keys to the caller
+    # up-front before we generate anything.
+    first_chunks = _cache_fetch_chunk_window(cache, windows[0])
+
+    if len(windows) > 1:
+        return _cache_stream_large_data(cache, first_chunks, windows[1:],
+                                        compress_large_data)
+
     # Process all the chunks and decompress them at once, instead of streaming
     # the results. It's faster for any reasonably-sized data in cache. We'll
     # stream depickles instead.
-    data = b''.join(
-        chunks[chunk_key][0]
-        for chunk_key in chunk_keys
-    )
+    return _cache_decode_large_data(b''.join(first_chunks),
+                                    compress_large_data)
+
+
+def _cache_decode_large_data(data, compress_large_data):
+    """Decode large data fetched from the cache all at once.
+
+    Args:
+        data (bytes):
+            The complete encoded data.
+
+        compress_large_data (bool):
+            Whether data stored without a codec header is zlib-compressed.
 
-    if compress_large_data:
+    Returns:
+        bytes:
+        The decoded data.
+    """
+    codec, header_len = parse_codec_header(data)
+
+    if codec is not None:
+        data = codec.decompress(data[header_len:])
+    elif compress_large_data:
+        # This data was stored before codecs were introduced, and is a raw
+        # zlib stream.
         data = zlib.decompress(data)
 
     return data
@@ -84,9 +478,14 @@ def _cache_iter_large_data(data, key):
     """Iterate through large data that was fetched from the cache.
 
     This will unpickle the large data previously fetched through
-    _cache_fetch_large_data, and yield each object to the caller.
+    _cache_fetch_large_data, and yield each object to the caller. The data
+    may either be the complete decoded data, or an iterator of decoded
+    blocks, in which case items will be unpickled as the blocks are read.
     """
-    fp = StringIO(data)
+    if isinstance(data, bytes):
+        fp = StringIO(data)
+    else:
+        fp = _StreamReader(data)
 
     try:
         # Unpickle all the items we're expecting from the cached data.
@@ -102,14 +501,16 @@ def _cache_iter_large_data(data, key):
         raise
 
 
-def _cache_compress_pickled_data(items):
-    """Compress lists of items for storage in the cache.
+def _cache_encode_pickled_data(items, codec):
+    """Encode lists of items for storage in the cache.
 
     This works with generators, and will take each item in the list or
-    generator of items, zlib-compress the data, and store it in a buffer.The
-    item and a blob of compressed data will be yielded to the caller.
+    generator of items and encode the data with the codec. The codec's header
+    is yielded first, followed by each item and its blob of encoded data.
     """
-    compressor = zlib.compressobj()
+    compressor = codec.get_compressor()
+
+    yield build_codec_header(codec), False, None
 
     for data, has_item, item in items:
         yield compressor.compress(data), has_item, item
@@ -120,16 +521,25 @@ def _cache_compress_pickled_data(items):
         yield remaining, False, None
 
 
-def _cache_store_chunks(items, key, expiration):
+def _cache_store_chunks(items, key, expiration, stats_family=None):
     """Store a list of items as chunks in the cache.
 
     The list of items will be combined into chunks and stored in the
     cache as efficiently as possible. Each item in the list will be
     yielded to the caller as it's fetched from the list or generator.
+
+    The size of each chunk is the maximum value size for the cache backend
+    (see :py:func:`get_cache_max_value_size`). If all the data fits in a
+    single chunk, it will be stored directly in the main cache key.
+    Otherwise, the main cache key will contain the number of chunks.
+
+    If ``stats_family`` is provided, the number of bytes and chunks stored
+    will be recorded for that key family.
     """
+    chunk_size = get_cache_max_value_size()
     chunks_data = StringIO()
     chunks_data_len = 0
-    read_start = 0
+    total_len = 0
     item_count = 0
     i = 0
 
@@ -140,19 +550,18 @@ def _cache_store_chunks(items, key, expiration):
 
         chunks_data.write(data)
         chunks_data_len += len(data)
+        total_len += len(data)
 
-        if chunks_data_len > CACHE_CHUNK_SIZE:
+        if chunk_size is not None and chunks_data_len > chunk_size:
             # We have enough data to fill a chunk now. Start processing
             # what we've stored and create cache keys for each chunk.
             # Anything remaining will be stored for the next round.
-            chunks_data.seek(read_start)
+            chunks_data.seek(0)
             cached_data = {}
 
-            while chunks_data_len > CACHE_CHUNK_SIZE:
-                chunk = chunks_data.read(CACHE_CHUNK_SIZE)
-                chunk_len = len(chunk)
-                chunks_data_len -= chunk_len
-                read_start += chunk_len
+            while chunks_data_len > chunk_size:
+                chunk = chunks_data.read(chunk_size)
+                chunks_data_len -= len(chunk)
 
                 # Note that we wrap the chunk in a list so that the cache
                 # backend won't try to perform any conversion on the string.
@@ -162,47 +571,434 @@ def _cache_store_chunks(items, key, expiration):
             # Store the keys in the cache in a single request.
             cache.set_many(cached_data, expiration)
 
-            # Reposition back at the end of the stream.
-            chunks_data.seek(0, 2)
+            # Start a new buffer with the remaining data, so we don't hold
+            # on to the data we've already stored.
+            remaining = chunks_data.read()
+            chunks_data = StringIO()
+            chunks_data.write(remaining)
+
+    chunks_data.seek(0)
+    chunk = chunks_data.read()
+
+    if i == 0:
+        # All the data fits in a single chunk, so store it directly in the
+        # main key. As above, this is wrapped in a list so that it won't be
+        # converted, and so that it can be told apart from a chunk count.
+        cache.set(make_cache_key(key), [chunk], expiration)
+        i = 1
+    else:
+        if chunks_data_len > 0:
+            # There's one last bit of data to store. Note that this should be
+            # less than the size of a chunk,
+            assert chunks_data_len <= chunk_size
 
-    if chunks_data_len > 0:
-        # There's one last bit of data to store. Note that this should be
-        # less than the size of a chunk,
-        assert chunks_data_len <= CACHE_CHUNK_SIZE
+            cache.set(make_cache_key('%s-%d' % (key, i)), [chunk],
+                      expiration)
+            i += 1
 
-        chunks_data.seek(read_start)
-        chunk = chunks_data.read()
-        cache.set(make_cache_key('%s-%d' % (key, i)), [chunk], expiration)
-        i += 1
+        cache.set(make_cache_key(key), '%d' % i, expiration)
 
-    cache.set(make_cache_key(key), '%d' % i, expiration)
+    if stats_family is not None:
+        record_cache_stat(stats_family, 'bytes_stored', total_len)
+        record_cache_stat(stats_family, 'chunks_stored', i)
 
 
-def _cache_store_items(cache, key, items, expiration, compress_large_data):
+def _cache_store_items(cache, key, items, expiration, compress_large_data,
+                       stats_family=None):
     """Store items in the cache.
 
     The items will be individually pickled and combined into a binary blob,
-    which can then optionally be compressed. The resulting data is then
-    cached over one or more keys, each representing a chunk about 1MB in size.
+    which is then encoded by the configured codec (optionally compressing
+    it). The resulting data is then cached over one or more keys, each
+    representing a chunk about 1MB in size.
 
     A main cache key will be set that contains information on the other keys.
     """
+    pickle_protocol = get_pickle_protocol()
     results = (
-        (pickle.dumps(item), True, item)
+        (pickle.dumps(item, pickle_protocol), True, item)
         for item in items
     )
+    results = _cache_encode_pickled_data(
+        results,
+        get_large_data_codec(compress_large_data))
 
-    if compress_large_data:
-        results = _cache_compress_pickled_data(results)
-
-    for item in _cache_store_chunks(results, key, expiration):
+    for item in _cache_store_chunks(results, key, expiration, stats_family):
         yield item
 
 
+def _make_lease_key(key):
+    """Return the cache key used for a recomputation lease.
+
+    Args:
+        key (unicode):
+            The base cache key being memoized.
+
+    Returns:
+        bytes:
+        The normalized lease cache key.
+    """
+    return make_cache_key('%s:lease' % key)
+
+
+def _make_meta_key(key):
+    """Return the cache key used for refresh metadata.
+
+    The metadata is stored alongside the payload, and is a tuple of the
+    timestamp at which the payload should be refreshed and the number of
+    seconds it took to compute.
+
+    Args:
+        key (unicode):
+            The base cache key being memoized.
+
+    Returns:
+        bytes:
+        The normalized metadata cache key.
+    """
+    return make_cache_key('%s:meta' % key)
+
+
+def _acquire_lease(key, lease_timeout):
+    """Attempt to acquire the lease for recomputing a cached value.
+
+    The lease is acquired through an atomic ``cache.add``, so only one
+    process can hold it at a time. It will expire on its own after
+    ``lease_timeout`` seconds, in case the holder fails to release it.
+
+    Args:
+        key (unicode):
+            The base cache key being memoized.
+
+        lease_timeout (int):
+            The number of seconds until the lease expires.
+
+    Returns:
+        bool:
+        ``True`` if the lease was acquired.
+    """
+    try:
+        return cache.add(_make_lease_key(key), 1, lease_timeout)
+    except Exception as e:
+        logger.warning('Unable to acquire cache lease for key %s: %s',
+                       key, e)
+
+        # Fall back to recomputing without a lease.
+        return True
+
+
+def _release_lease(key):
+    """Release the lease for recomputing a cached value.
+
+    Args:
+        key (unicode):
+            The base cache key being memoized.
+    """
+    try:
+        cache.delete(_make_lease_key(key))
+    except Exception as e:
+        logger.warning('Unable to release cache lease for key %s: %s',
+                       key, e)
+
+
+def _wait_for_cache_key(cache_key, wait_time, generations=None):
+    """Wait for another process to store a value in the cache.
+
+    This is used when another process holds the lease for recomputing a
+    value. The cache will be polled until the value appears or
+    ``wait_time`` seconds have passed.
+
+    Args:
+        cache_key (bytes):
+            The normalized cache key to wait for.
+
+        wait_time (float):
+            The maximum number of seconds to wait.
+
+        generations (tuple, optional):
+            The current namespace generations, if the value is namespaced.
+            Values stored under other generations will be ignored.
+
+    Returns:
+        object:
+        The value stored in the cache, or ``_NO_VALUE`` if it didn't appear
+        in time.
+    """
+    deadline = time.time() + wait_time
+
+    while time.time() < deadline:
+        time.sleep(LEASE_POLL_INTERVAL)
+        value = cache.get(cache_key, _NO_VALUE)
+
+        if generations is not None:
+            value = _unwrap_namespaced_value(value, generations)
+
+        if value is not _NO_VALUE:
+            return value
+
+    return _NO_VALUE
+
+
+def _needs_refresh(meta, early_refresh_beta):
+    """Return whether a cached value should be refreshed.
+
+    If ``early_refresh_beta`` is set, the value may be refreshed before its
+    refresh time, with a probability that increases as the refresh time
+    approaches and with the time it took to compute the value. This spreads
+    out recomputation of popular keys.
+
+    Args:
+        meta (tuple):
+            The metadata stored alongside the value, or ``None`` if missing.
+
+        early_refresh_beta (float):
+            The factor used for probabilistic early refresh, or ``None``
+            to refresh only once the refresh time has passed.
+
+    Returns:
+        bool:
+        ``True`` if the value should be refreshed.
+    """
+    try:
+        refresh_at, delta = meta
+    except (TypeError, ValueError):
+        # There's no valid metadata for this key, which means it was stored
+        # without refresh information. Refresh it so the metadata is stored.
+        return True
+
+    now = time.time()
+
+    if early_refresh_beta:
+        now -= delta * early_refresh_beta * math.log(1.0 - random.random())
+
+    return now >= refresh_at
+
+
+def _build_meta(expiration, soft_expiration, delta):
+    """Return the refresh metadata to store alongside a value.
+
+    Args:
+        expiration (int):
+            The expiration time for the value, in seconds.
+
+        soft_expiration (int):
+            The time after which the value should be refreshed, in seconds,
+            or ``None`` to use ``expiration``.
+
+        delta (float):
+            The number of seconds it took to compute the value.
+
+    Returns:
+        tuple:
+        The metadata to store.
+    """
+    if soft_expiration is None:
+        soft_expiration = expiration
+
+    return (time.time() + soft_expiration, delta)
+
+
+def invalidate_cache_namespace(namespace):
+    """Invalidate all memoized values in a namespace.
+
+    This bumps the namespace's generation number, which is a single write to
+    the cache regardless of how many values are in the namespace. Values
+    memoized with this namespace (through the ``namespaces`` argument to
+    :py:func:`cache_memoize` or :py:func:`cache_memoize_iter`) will be
+    recomputed on next access.
+
+    Values in the process-local cache (see ``use_local_cache``) are not
+    affected, and may still be returned until they expire.
+
+    Args:
+        namespace (unicode):
+            The namespace to invalidate.
+    """
+    try:
+        cache.incr(_make_namespace_key(namespace))
+    except ValueError:
+        # There's no generation for this namespace, which means nothing
+        # stored under an older generation can match a new one.
+        pass
+
+
+def _make_namespace_key(namespace):
+    """Return the cache key used for a namespace's generation number.
+
+    Args:
+        namespace (unicode):
+            The name of the namespace.
+
+    Returns:
+        bytes:
+        The normalized generation cache key.
+    """
+    return make_cache_key('cache-namespace:%s' % namespace)
+
+
+def _get_namespace_generations(namespace_keys, values):
+    """Return the generation numbers for namespaces.
+
+    Any generations missing from ``values`` will be created in the cache.
+
+    Args:
+        namespace_keys (list of bytes):
+            The normalized generation cache keys for the namespaces.
+
+        values (dict):
+            The values fetched from the cache, which may contain the
+            generations.
+
+    Returns:
+        tuple:
+        The generation numbers, in the same order as ``namespace_keys``.
+    """
+    generations = []
+
+    for namespace_key in namespace_keys:
+        generation = values.get(namespace_key)
+
+        if generation is None:
+            # Start at a random generation, so that values stored before the
+            # generation was evicted from the cache won't match.
+            generation = random.randint(1, 2 ** 32)
+
+            if not cache.add(namespace_key, generation, _default_expiration):
+                generation = cache.get(namespace_key, generation)
+
+        generations.append(generation)
+
+    return tuple(generations)
+
+
+def _unwrap_namespaced_value(value, generations):
+    """Return a namespaced value from the cache, if still valid.
+
+    Args:
+        value (object):
+            The value fetched from the cache, or ``_NO_VALUE``.
+
+        generations (tuple):
+            The current namespace generations.
+
+    Returns:
+        object:
+        The value, or ``_NO_VALUE`` if it wasn't stored under the current
+        generations.
+    """
+    if (isinstance(value, _NamespacedValue) and
+        value.generations == generations):
+        return value.data
+
+    return _NO_VALUE
+
+
+def _make_namespaced_key(key, namespaces):
+    """Return a cache key that includes the namespace generations.
+
+    This requires fetching the generations before the value can be fetched.
+    It's used for large data, which can't store the generations in the
+    value.
+
+    Args:
+        key (unicode):
+            The base cache key.
+
+        namespaces (list of unicode):
+            The namespaces for the key.
+
+    Returns:
+        unicode:
+        The base cache key, including the namespace generations.
+    """
+    namespace_keys = [
+        _make_namespace_key(namespace)
+        for namespace in namespaces
+    ]
+    generations = _get_namespace_generations(namespace_keys,
+                                             cache.get_many(namespace_keys))
+
+    return '%s:ns-%s' % (key, '-'.join(
+        '%s' % generation
+        for generation in generations
+    ))
+
+
+def _complete_in_background(key, stored_items, finish_storing, has_lease,
+                            stats_family):
+    """Finish storing items for an abandoned cache_memoize_iter generator.
+
+    Args:
+        key (unicode):
+            The base cache key being memoized.
+
+        stored_items (generator):
+            The generator storing the items, which will be run to
+            completion.
+
+        finish_storing (callable):
+            A function to call once all items are stored.
+
+        has_lease (bool):
+            Whether the lease for computing the items is held. It will be
+            released once the items are stored.
+
+        stats_family (unicode):
+            The key family to record statistics under, or ``None``.
+
+    Returns:
+        bool:
+        ``True`` if the work was handed off, or ``False`` if the pool is
+        full.
+    """
+    def _complete():
+        try:
+            for item in stored_items:
+                pass
+
+            finish_storing()
+
+            if stats_family is not None:
+                record_cache_stat(stats_family, 'background_completions')
+        except Exception as e:
+            logger.warning('Failed to store items for key %s in the '
+                           'background: %s',
+                           key, e)
+
+            if stats_family is not None:
+                record_cache_stat(stats_family, 'background_failures')
+        finally:
+            if has_lease:
+                _release_lease(key)
+
+    if get_background_completion_pool().submit(_complete):
+        logger.debug('Storing the remaining items for key %s in the '
+                     'background.',
+                     key)
+        return True
+    else:
+        logger.debug('Too many items are being stored in the background. '
+                     'Discarding the remaining items for key %s.',
+                     key)
+
+        if stats_family is not None:
+            record_cache_stat(stats_family, 'background_rejections')
+
+        return False
+
+
 def cache_memoize_iter(key, items_or_callable,
                        expiration=_default_expiration,
                        force_overwrite=False,
-                       compress_large_data=True):
+                       compress_large_data=True,
+                       stampede_protection=False,
+                       lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                       lease_wait_time=DEFAULT_LEASE_WAIT_TIME,
+                       soft_expiration=None,
+                       early_refresh_beta=None,
+                       namespaces=None,
+                       stats_family=None,
+                       complete_in_background=False):
     """Memoize an iterable list of items inside the configured cache.
 
     If the provided list of items is a function, the function must return a
@@ -217,7 +1013,9 @@ def cache_memoize_iter(key, items_or_callable,
 
     The result from this function is always a generator. Note that it's
     important that the generator be allowed to continue until completion, or
-    the data won't be retrievable from the cache.
+    the data won't be retrievable from the cache. Alternatively, with
+    ``complete_in_background``, the rest of the items can be computed and
+    stored on a background thread if the caller stops early.
 
     Args:
         expiration (int):
@@ -228,37 +1026,194 @@ def cache_memoize_iter(key, items_or_callable,
             regardless of whether it exists in the cache already.
 
         compress_large_data (bool):
-            If ``True``, the data will be zlib-compressed.
+            If ``True``, the data will be compressed using the codec set in
+            :setting:`CACHE_LARGE_DATA_CODEC` (zlib, by default). See
+            :py:mod:`djblets.cache.codecs`.
+
+        stampede_protection (bool):
+            If ``True``, only one process will compute the items when the
+            key is missing from the cache. Other processes will wait up to
+            ``lease_wait_time`` seconds for the result to be stored, and
+            then compute the items themselves if it still isn't available.
+
+        lease_timeout (int):
+            The maximum number of seconds a process may hold the lease for
+            computing the items.
+
+        lease_wait_time (float):
+            The maximum number of seconds to wait for another process
+            holding the lease.
+
+        soft_expiration (int):
+            The number of seconds after which cached items are considered
+            stale. One process will recompute the items, while others
+            continue to receive the stale items. This should be less than
+            ``expiration``.
+
+        early_refresh_beta (float):
+            If set, cached items may be recomputed before they become
+            stale, with a probability that grows as the refresh time
+            approaches. Larger values refresh earlier. ``1.0`` is a good
+            default.
+
+        namespaces (list of unicode):
+            Namespaces the items belong to. Calling
+            :py:func:`invalidate_cache_namespace` for any of these will
+            cause the items to be recomputed. The namespace generations are
+            fetched in an additional request.
+
+        stats_family (unicode):
+            The key family to record statistics under, if
+            :setting:`CACHE_STATS_ENABLED` is ``True``. This defaults to
+            the family computed from ``key``. See
+            :py:mod:`djblets.cache.stats`.
+
+        complete_in_background (bool):
+            If ``True`` and the generator is closed before all computed
+            items have been yielded (for instance, when a client disconnects
+            from a streaming response), the remaining items will be computed
+            and stored by a bounded pool of background threads. The items
+            must be safe to compute on another thread. If the pool is full,
+            the items are discarded. See :py:mod:`djblets.cache.background`.
 
     Yields:
         The list of items from the cache or from ``items_or_callable`` if
         uncached.
     """
-    results = None
-
-    if not force_overwrite and make_cache_key(key) in cache:
-        try:
-            results = _cache_iter_large_data(
-                _cache_fetch_large_data(cache, key, compress_large_data),
-                key)
-        except Exception as e:
-            logger.warning('Failed to fetch large data from cache for '
-                           'key %s: %s.' % (key, e))
-            results = None
+    if is_cache_stats_enabled():
+        stats_family = stats_family or get_key_family(key)
     else:
-        logger.debug('Cache miss for key %s.' % key)
+        stats_family = None
+
+    if namespaces:
+        key = _make_namespaced_key(key, namespaces)
 
-    if results is None:
-        if isinstance(items_or_callable, collections.Callable):
-            items = items_or_callable()
+    results = None
+    has_lease = False
+    track_meta = soft_expiration is not None or bool(early_refresh_beta)
+    main_key = make_cache_key(key)
+
+    if not force_overwrite:
+        if track_meta:
+            meta_key = _make_meta_key(key)
+            values = cache.get_many([main_key, meta_key])
+            in_cache = main_key in values
+
+            if (in_cache and
+                _needs_refresh(values.get(meta_key), early_refresh_beta) and
+                _acquire_lease(key, lease_timeout)):
+                # This process is responsible for refreshing the stale
+                # items. Everyone else will use the stale items until then.
+                logger.debug('Refreshing stale cache data for key %s.', key)
+                has_lease = True
+                in_cache = False
         else:
-            items = items_or_callable
+            in_cache = main_key in cache
 
-        results = _cache_store_items(cache, key, items, expiration,
-                                     compress_large_data)
+        if not in_cache and not has_lease and stampede_protection:
+            if _acquire_lease(key, lease_timeout):
+                has_lease = True
+            else:
+                in_cache = (_wait_for_cache_key(main_key, lease_wait_time)
+                            is not _NO_VALUE)
 
-    for item in results:
-        yield item
+        if in_cache:
+            try:
+                results = _cache_iter_large_data(
+                    _cache_fetch_large_data(cache, key, compress_large_data,
+                                            stats_family),
+                    key)
+
+                if stats_family is not None:
+                    record_cache_stat(stats_family, 'hits')
+            except Exception as e:
+                logger.warning('Failed to fetch large data from cache for '
+                               'key %s: %s.' % (key, e))
+                results = None
+
+                if (stats_family is not None and
+                    isinstance(e, MissingChunkError)):
+                    record_cache_stat(stats_family, 'missing_chunks')
+        elif not has_lease:
+            logger.debug('Cache miss for key %s.' % key)
+
+    handed_off = False
+
+    try:
+        num_yielded = 0
+
+        if results is not None:
+            while True:
+                try:
+                    item = next(results)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    # Part of the data went missing or couldn't be read while
+                    # streaming it. Recompute it, skipping the items we've
+                    # already yielded.
+                    logger.warning('Failed to read large data from cache '
+                                   'for key %s after %d item(s): %s.',
+                                   key, num_yielded, e)
+                    results = None
+
+                    if (stats_family is not None and
+                        isinstance(e, MissingChunkError)):
+                        record_cache_stat(stats_family, 'missing_chunks')
+
+                    break
+
+                yield item
+                num_yielded += 1
+
+        if results is None:
+            start_time = time.time()
+
+            if stats_family is not None:
+                record_cache_stat(stats_family, 'misses')
+
+            if isinstance(items_or_callable, collections.Callable):
+                items = items_or_callable()
+            else:
+                items = items_or_callable
+
+            stored_items = _cache_store_items(cache, key, items, expiration,
+                                              compress_large_data,
+                                              stats_family)
+
+            def _finish_storing():
+                if stats_family is not None:
+                    record_cache_stat(stats_family, 'recompute_time',
+                                      time.time() - start_time)
+
+                if track_meta:
+                    cache.set(_make_meta_key(key),
+                              _build_meta(expiration, soft_expiration,
+                                          time.time() - start_time),
+                              expiration)
+
+            for i, item in enumerate(stored_items):
+                if i >= num_yielded:
+                    try:
+                        yield item
+                    except GeneratorExit:
+                        # The consumer stopped iterating before the end, so
+                        # the items won't be stored unless something else
+                        # finishes the job.
+                        if stats_family is not None:
+                            record_cache_stat(stats_family, 'abandoned')
+
+                        if complete_in_background:
+                            handed_off = _complete_in_background(
+                                key, stored_items, _finish_storing,
+                                has_lease, stats_family)
+
+                        raise
+
+            _finish_storing()
+    finally:
+        if has_lease and not handed_off:
+            _release_lease(key)
 
 
 def cache_memoize(key, lookup_callable,
@@ -266,7 +1221,19 @@ def cache_memoize(key, lookup_callable,
                   force_overwrite=False,
                   large_data=False,
                   compress_large_data=True,
-                  use_generator=False):
+                  use_generator=False,
+                  use_local_cache=False,
+                  local_expiration=_default_local_expiration,
+                  stampede_protection=False,
+                  lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                  lease_wait_time=DEFAULT_LEASE_WAIT_TIME,
+                  soft_expiration=None,
+                  early_refresh_beta=None,
+                  cache_negative_results=False,
+                  negative_expiration=_default_negative_expiration,
+                  negative_exceptions=(),
+                  namespaces=None,
+                  stats_family=None):
     """Memoize the results of a callable inside the configured cache.
 
     Args:
@@ -275,7 +1242,10 @@ def cache_memoize(key, lookup_callable,
 
         force_overwrite (bool):
             If ``True``, the value will always be computed and stored
-            regardless of whether it exists in the cache already.
+            regardless of whether it exists in the cache already. With
+            ``use_local_cache``, this also invalidates the process-local
+            caches in all processes, so that none of them keep returning
+            the old value.
 
         large_data (bool):
             If ``True``, the resulting data will be pickled, gzipped, and
@@ -285,28 +1255,330 @@ def cache_memoize(key, lookup_callable,
             accessed.
 
         compress_large_data (bool):
-            Compresses the data with zlib compression when ``large_data``
-            is ``True``.
+            Compresses the data when ``large_data`` is ``True``, using the
+            codec set in :setting:`CACHE_LARGE_DATA_CODEC` (zlib, by
+            default). See :py:mod:`djblets.cache.codecs`.
+
+        use_local_cache (bool):
+            If ``True``, the result will also be stored in the process-local
+            cache (:py:data:`djblets.cache.local_cache.local_cache`), which
+            is checked before the shared cache. This is useful for small
+            values that are read frequently. The returned value is shared
+            between callers, and must not be modified.
+
+        local_expiration (int):
+            The expiration time for the entry in the process-local cache, in
+            seconds. This will never be longer than ``expiration``.
+
+        stampede_protection (bool):
+            If ``True``, only one process will call ``lookup_callable`` when
+            the key is missing from the cache. Other processes will wait up
+            to ``lease_wait_time`` seconds for the result to be stored, and
+            then compute it themselves if it still isn't available.
+
+        lease_timeout (int):
+            The maximum number of seconds a process may hold the lease for
+            computing the value.
+
+        lease_wait_time (float):
+            The maximum number of seconds to wait for another process
+            holding the lease.
+
+        soft_expiration (int):
+            The number of seconds after which the cached value is considered
+            stale. One process will recompute the value, while others
+            continue to receive the stale value. This should be less than
+            ``expiration``.
+
+        early_refresh_beta (float):
+            If set, the cached value may be recomputed before it becomes
+            stale, with a probability that grows as the refresh time
+            approaches. Larger values refresh earlier. ``1.0`` is a good
+            default.
+
+        cache_negative_results (bool):
+            If ``True``, a result of ``None`` from ``lookup_callable`` (or
+            any exception in ``negative_exceptions``) will be cached as a
+            negative result for ``negative_expiration`` seconds. Until then,
+            callers will receive ``None`` without calling
+            ``lookup_callable``. This can't be used with ``large_data``.
+
+        negative_expiration (int):
+            The expiration time for a negative result, in seconds. This will
+            never be longer than ``expiration``.
+
+        negative_exceptions (tuple):
+            Exception types raised by ``lookup_callable`` that indicate a
+            negative result when ``cache_negative_results`` is ``True``.
+            These exceptions will not be raised to the caller. ``None`` will
+            be returned instead.
+
+        namespaces (list of unicode):
+            Namespaces the value belongs to, such as ``user-1-profile``.
+            Calling :py:func:`invalidate_cache_namespace` for any of these
+            will cause the value to be recomputed. The namespace generations
+            are fetched in the same request as the value, except when using
+            ``large_data``.
+
+        stats_family (unicode):
+            The key family to record statistics under, if
+            :setting:`CACHE_STATS_ENABLED` is ``True``. This defaults to
+            the family computed from ``key``. See
+            :py:mod:`djblets.cache.stats`.
 
     Returns:
         The cached data, or the result of ``lookup_callable`` if uncached.
+
+    Raises:
+        ValueError:
+            ``cache_negative_results`` and ``large_data`` were both set.
+    """
+    stats_lookup = None
+
+    if is_cache_stats_enabled():
+        stats_family = stats_family or get_key_family(key)
+
+        if not large_data:
+            # Large data records its own statistics in cache_memoize_iter.
+            lookup_callable = stats_lookup = \
+                _make_stats_lookup(lookup_callable, stats_family)
+    else:
+        stats_family = None
+
+    if cache_negative_results:
+        if large_data:
+            raise ValueError('cache_negative_results cannot be used with '
+                             'large_data')
+
+        if expiration and expiration > 0:
+            negative_expiration = min(negative_expiration, expiration)
+
+        lookup_callable = _make_negative_lookup(lookup_callable,
+                                                negative_exceptions)
+    else:
+        negative_expiration = None
+
+    shared_kwargs = {
+        'expiration': expiration,
+        'force_overwrite': force_overwrite,
+        'large_data': large_data,
+        'compress_large_data': compress_large_data,
+        'stampede_protection': stampede_protection,
+        'lease_timeout': lease_timeout,
+        'lease_wait_time': lease_wait_time,
+        'soft_expiration': soft_expiration,
+        'early_refresh_beta': early_refresh_beta,
+        'negative_expiration': negative_expiration,
+        'namespaces': namespaces,
+        'stats_family': stats_family,
+    }
+
+    if use_local_cache:
+        local_key = make_cache_key(key)
+
+        if not force_overwrite:
+            data = local_cache.get(local_key, _NO_VALUE)
+
+            if data is not _NO_VALUE:
+                if stats_family is not None:
+                    record_cache_stat(stats_family, 'hits')
+                    record_cache_stat(stats_family, 'local_hits')
+
+                return data
+
+    data = _cache_memoize_shared(key, lookup_callable, **shared_kwargs)
+
+    if stats_lookup is not None and not stats_lookup.called:
+        record_cache_stat(stats_family, 'hits')
+
+    if isinstance(data, _NegativeResult):
+        data = None
+        local_expiration = min(local_expiration, negative_expiration)
+    elif expiration and expiration > 0:
+        local_expiration = min(local_expiration, expiration)
+
+    if use_local_cache:
+        if force_overwrite:
+            # Other processes may have the old value in their local caches.
+            # Those can't be invalidated per-key, so they're all cleared.
+            local_cache.invalidate()
+
+        if stats_lookup is not None and stats_lookup.called:
+            # The size was already measured for the statistics, so don't
+            # pickle the value again.
+            size = stats_lookup.size
+        else:
+            size = None
+
+        local_cache.set(local_key, data, local_expiration, size=size)
+
+    return data
+
+
+def _make_stats_lookup(lookup_callable, stats_family):
+    """Wrap a lookup callable to record statistics.
+
+    The returned callable has a ``called`` attribute, which will be ``True``
+    once it's been called, and a ``size`` attribute, which will be the size
+    of the computed value (or ``None`` if it couldn't be measured).
+
+    Args:
+        lookup_callable (callable):
+            The callable computing the value.
+
+        stats_family (unicode):
+            The key family to record statistics under.
+
+    Returns:
+        callable:
+        A callable recording misses, recompute time and value sizes.
+    """
+    def _lookup():
+        _lookup.called = True
+        record_cache_stat(stats_family, 'misses')
+        start_time = time.time()
+
+        try:
+            data = lookup_callable()
+        finally:
+            record_cache_stat(stats_family, 'recompute_time',
+                              time.time() - start_time)
+
+        size = _lookup.size = get_value_size(data)
+
+        if size is not None:
+            record_cache_stat(stats_family, 'bytes_stored', size)
+
+        return data
+
+    _lookup.called = False
+    _lookup.size = None
+
+    return _lookup
+
+
+def _make_negative_lookup(lookup_callable, negative_exceptions):
+    """Wrap a lookup callable to return a marker for negative results.
+
+    Args:
+        lookup_callable (callable):
+            The callable computing the value.
+
+        negative_exceptions (tuple):
+            Exception types that indicate a negative result.
+
+    Returns:
+        callable:
+        A callable returning the computed value, or a
+        :py:class:`_NegativeResult` if ``lookup_callable`` returned ``None``
+        or raised one of ``negative_exceptions``.
+    """
+    def _lookup():
+        try:
+            data = lookup_callable()
+        except tuple(negative_exceptions):
+            data = None
+
+        if data is None:
+            return _NegativeResult()
+
+        return data
+
+    return _lookup
+
+
+def _cache_memoize_shared(key, lookup_callable, expiration, force_overwrite,
+                          large_data, compress_large_data,
+                          stampede_protection, lease_timeout,
+                          lease_wait_time, soft_expiration,
+                          early_refresh_beta, negative_expiration,
+                          namespaces, stats_family):
+    """Memoize the results of a callable inside the shared cache.
+
+    This implements the shared cache portion of :py:func:`cache_memoize`.
+    See that function for a description of the arguments.
     """
     if large_data:
-        results = list(cache_memoize_iter(key,
-                                          lambda: [lookup_callable()],
-                                          expiration,
-                                          force_overwrite,
-                                          compress_large_data))
+        results = list(cache_memoize_iter(
+            key,
+            lambda: [lookup_callable()],
+            expiration,
+            force_overwrite,
+            compress_large_data,
+            stampede_protection=stampede_protection,
+            lease_timeout=lease_timeout,
+            lease_wait_time=lease_wait_time,
+            soft_expiration=soft_expiration,
+            early_refresh_beta=early_refresh_beta,
+            namespaces=namespaces,
+            stats_family=stats_family))
 
         assert len(results) == 1
 
         return results[0]
-    else:
-        key = make_cache_key(key)
 
-        if not force_overwrite and key in cache:
+    key_base = key
+    key = make_cache_key(key)
+    has_lease = False
+    track_meta = soft_expiration is not None or bool(early_refresh_beta)
+    generations = None
+
+    if namespaces:
+        namespace_keys = [
+            _make_namespace_key(namespace)
+            for namespace in namespaces
+        ]
+
+    if force_overwrite:
+        if namespaces:
+            generations = _get_namespace_generations(
+                namespace_keys, cache.get_many(namespace_keys))
+    else:
+        if track_meta or namespaces:
+            # Fetch the value along with its metadata and namespace
+            # generations in a single request.
+            fetch_keys = [key]
+
+            if track_meta:
+                meta_key = _make_meta_key(key_base)
+                fetch_keys.append(meta_key)
+
+            if namespaces:
+                fetch_keys += namespace_keys
+
+            values = cache.get_many(fetch_keys)
+            data = values.get(key, _NO_VALUE)
+
+            if namespaces:
+                generations = _get_namespace_generations(namespace_keys,
+                                                         values)
+                data = _unwrap_namespaced_value(data, generations)
+
+            if data is not _NO_VALUE:
+                if (not track_meta or
+                    not _needs_refresh(values.get(meta_key),
+                                       early_refresh_beta) or
+                    not _acquire_lease(key_base, lease_timeout)):
+                    return data
+
+                # This process is responsible for refreshing the stale value.
+                # Everyone else will use the stale value until then.
+                logger.debug('Refreshing stale cache data for key %s.', key)
+                has_lease = True
+        elif key in cache:
             return cache.get(key)
 
+        if not has_lease and stampede_protection:
+            if _acquire_lease(key_base, lease_timeout):
+                has_lease = True
+            else:
+                data = _wait_for_cache_key(key, lease_wait_time, generations)
+
+                if data is not _NO_VALUE:
+                    return data
+
+    try:
+        start_time = time.time()
         data = lookup_callable()
 
         # Most people will be using memcached, and memcached has a limit of
@@ -320,16 +1592,130 @@ def cache_memoize(key, lookup_callable,
         #       be an exception, but while python-memcached defines an
         #       exception type for this, it never uses it, choosing instead to
         #       fail silently. WTF.
-        if len(data) >= CACHE_CHUNK_SIZE:
-            logger.warning('Cache data for key "%s" (length %s) may be too '
-                           'big for the cache.' % (key, len(data)))
+        if isinstance(data, _NegativeResult):
+            logger.debug('Caching negative result for key %s for %s '
+                         'seconds.',
+                         key, negative_expiration)
+            expiration = negative_expiration
+        else:
+            max_value_size = get_cache_max_value_size()
+
+            if max_value_size is not None and len(data) >= max_value_size:
+                logger.warning('Cache data for key "%s" (length %s) may be '
+                               'too big for the cache.' % (key, len(data)))
+
+        if generations is None:
+            stored_data = data
+        else:
+            stored_data = _NamespacedValue(generations, data)
 
         try:
-            cache.set(key, data, expiration)
+            if track_meta:
+                cache.set_many(
+                    {
+                        key: stored_data,
+                        _make_meta_key(key_base): _build_meta(
+                            expiration, soft_expiration,
+                            time.time() - start_time),
+                    },
+                    expiration)
+            else:
+                cache.set(key, stored_data, expiration)
         except:
             pass
+    finally:
+        if has_lease:
+            _release_lease(key_base)
 
-        return data
+    return data
+
+
+def cache_memoize_many(keys_to_callables,
+                       expiration=_default_expiration,
+                       force_overwrite=False,
+                       max_workers=None):
+    """Memoize the results of several callables inside the configured cache.
+
+    This is a batched version of :py:func:`cache_memoize`. All keys are
+    fetched from the cache in a single request, only the callables for
+    missing keys are called, and the results are stored back in the cache
+    in a single request.
+
+    Keys are normalized through :py:func:`make_cache_key`, so values are
+    shared with :py:func:`cache_memoize` calls using the same keys.
+
+    Args:
+        keys_to_callables (dict):
+            A dictionary mapping base cache keys to callables that compute
+            the values for those keys.
+
+        expiration (int):
+            The expiration time for the keys, in seconds.
+
+        force_overwrite (bool):
+            If ``True``, the values will always be computed and stored
+            regardless of whether they exist in the cache already.
+
+        max_workers (int):
+            If set, missing values will be computed in a pool of up to this
+            many threads. The callables must then be thread-safe. Any
+            database connections opened in the threads should be closed
+            by the callables.
+
+    Returns:
+        dict:
+        A dictionary mapping each base cache key to its cached or computed
+        value.
+    """
+    base_keys = list(keys_to_callables)
+    cache_keys = dict(zip(base_keys, make_cache_keys(base_keys)))
+
+    if force_overwrite:
+        cached = {}
+    else:
+        cached = cache.get_many(list(six.itervalues(cache_keys)))
+
+    results = {}
+    missing_keys = []
+
+    for key, cache_key in six.iteritems(cache_keys):
+        if cache_key in cached:
+            results[key] = cached[cache_key]
+        else:
+            missing_keys.append(key)
+
+    if missing_keys:
+        logger.debug('Cache miss for key(s): %s.',
+                     ', '.join(missing_keys))
+
+        if max_workers and len(missing_keys) > 1:
+            pool = ThreadPool(min(max_workers, len(missing_keys)))
+
+            try:
+                values = pool.map(lambda key: keys_to_callables[key](),
+                                  missing_keys)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            values = [
+                keys_to_callables[key]()
+                for key in missing_keys
+            ]
+
+        cached_data = {}
+
+        for key, value in zip(missing_keys, values):
+            results[key] = value
+            cached_data[cache_keys[key]] = value
+
+        try:
+            cache.set_many(cached_data, expiration)
+        except Exception as e:
+            logger.warning('Failed to store cache data for key(s) %s: %s',
+                           ', '.join(missing_keys), e)
+
+    return results
 
 
 def make_cache_key(key):
@@ -338,30 +1724,56 @@ def make_cache_key(key):
     The cache key will be prefixed by the site's domain, and will be
     changed to an MD5SUM if it's larger than the maximum key size.
 
+    The prefix is computed once and remembered until the
+    :py:class:`~django.contrib.sites.models.Site` is saved or deleted, or the
+    ``SITE_ID`` or ``SITE_ROOT`` settings change.
+
     Args:
         key (str): The base key to generate a cache key from.
 
     Returns:
         str: A cache key suitable for use with the cache backend.
     """
-    try:
-        site = Site.objects.get_current()
+    return _make_cache_key(_get_cache_key_prefix(), key)
 
-        # The install has a Site app, so prefix the domain to the key.
-        # If a SITE_ROOT is defined, also include that, to allow for multiple
-        # instances on the same host.
-        site_root = getattr(settings, 'SITE_ROOT', None)
 
-        if site_root:
-            key = '%s:%s:%s' % (site.domain, site_root, key)
-        else:
-            key = '%s:%s' % (site.domain, key)
-    except:
-        # The install doesn't have a Site app, so use the key as-is.
-        pass
+def make_cache_keys(keys):
+    """Create cache keys for several base keys at once.
 
-    # Strip out any characters that memcached doesn't like in keys
-    key = ''.join(ch for ch in key if ch not in ' \t\n\r')
+    This is equivalent to calling :py:func:`make_cache_key` on each key, but
+    only looks up the key prefix once.
+
+    Args:
+        keys (list of str):
+            The base keys to generate cache keys from.
+
+    Returns:
+        list of str:
+        The cache keys, in the same order as ``keys``.
+    """
+    prefix = _get_cache_key_prefix()
+
+    return [
+        _make_cache_key(prefix, key)
+        for key in keys
+    ]
+
+
+def _make_cache_key(prefix, key):
+    """Create a cache key from a precomputed prefix.
+
+    Args:
+        prefix (unicode):
+            The prefix returned by :py:func:`_get_cache_key_prefix`.
+
+        key (str):
+            The base key to generate a cache key from.
+
+    Returns:
+        str:
+        A cache key suitable for use with the cache backend.
+    """
+    key = prefix + _strip_key_chars(key)
 
     # Adhere to memcached key size limit
     if len(key) > MAX_KEY_SIZE:
@@ -375,3 +1787,96 @@ def make_cache_key(key):
     key = key.encode('utf-8')
 
     return key
+
+
+def _strip_key_chars(key):
+    """Strip out any characters that memcached doesn't like in keys.
+
+    Args:
+        key (str):
+            The key to strip.
+
+    Returns:
+        str:
+        The key without any whitespace or newline characters.
+    """
+    if isinstance(key, six.text_type):
+        return key.translate(_KEY_STRIP_TABLE)
+    else:
+        return key.translate(None, _KEY_STRIP_CHARS)
+
+
+def _get_cache_key_prefix():
+    """Return the prefix for all cache keys.
+
+    The prefix contains the site's domain, and the ``SITE_ROOT`` if one is
+    defined (to allow for multiple instances on the same host). It's
+    computed on first use and remembered until cleared by
+    :py:func:`_clear_cache_key_prefix`.
+
+    Returns:
+        unicode:
+        The prefix, or an empty string if the install doesn't have a Site
+        app.
+    """
+    global _cache_key_prefix
+
+    prefix = _cache_key_prefix
+
+    if prefix is None:
+        try:
+            site = Site.objects.get_current()
+        except Exception:
+            # The install doesn't have a Site app (or it isn't set up yet),
+            # so use the key as-is. This isn't remembered, so that the Site
+            # will be picked up once it's available.
+            return ''
+
+        site_root = getattr(settings, 'SITE_ROOT', None)
+
+        if site_root:
+            prefix = '%s:%s:' % (site.domain, site_root)
+        else:
+            prefix = '%s:' % site.domain
+
+        prefix = _strip_key_chars(prefix)
+        _cache_key_prefix = prefix
+
+    return prefix
+
+
+def _clear_cache_key_prefix(**kwargs):
+    """Clear the remembered cache key prefix.
+
+    The prefix will be recomputed the next time a cache key is made.
+
+    Args:
+        **kwargs (dict):
+            Keyword arguments passed by the signal, if called as a signal
+            handler.
+    """
+    global _cache_key_prefix
+
+    _cache_key_prefix = None
+
+
+def _on_setting_changed(setting, **kwargs):
+    """Clear the cache key prefix when a setting it depends on changes.
+
+    Args:
+        setting (unicode):
+            The name of the setting that changed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    if setting in ('SITE_ID', 'SITE_ROOT'):
+        _clear_cache_key_prefix()
+
+
+post_save.connect(_clear_cache_key_prefix, sender=Site,
+                  dispatch_uid='djblets-cache-key-prefix-save')
+post_delete.connect(_clear_cache_key_prefix, sender=Site,
+                    dispatch_uid='djblets-cache-key-prefix-delete')
+setting_changed.connect(_on_setting_changed,
+                        dispatch_uid='djblets-cache-key-prefix-setting')
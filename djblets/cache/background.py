@@ -0,0 +1,191 @@
+"""A bounded pool of threads for finishing cache work in the background.
+
+:py:func:`~djblets.cache.backend.cache_memoize_iter` can hand off the rest of
+a generator to this pool when the consumer stops iterating before the end
+(for instance, when a client disconnects from a streaming response), so that
+the computed items can still be stored in the cache. See the
+``complete_in_background`` argument.
+
+The amount of outstanding work is bounded. At most
+:setting:`CACHE_BACKGROUND_COMPLETION_MAX_WORKERS` threads (2, by default)
+run tasks, and at most :setting:`CACHE_BACKGROUND_COMPLETION_MAX_PENDING`
+tasks (10, by default) may be running or queued at once. Tasks submitted
+beyond that are rejected, and the work is discarded as it would be without
+background completion.
+"""
+
+
+import logging
+import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The default maximum number of background threads.
+DEFAULT_BACKGROUND_COMPLETION_MAX_WORKERS = 2
+
+#: The default maximum number of running or queued tasks.
+DEFAULT_BACKGROUND_COMPLETION_MAX_PENDING = 10
+
+
+class BackgroundCompletionPool(object):
+    """A bounded pool of threads for running background tasks.
+
+    The threads are started the first time a task is submitted in a process.
+
+    Attributes:
+        max_workers (int):
+            The maximum number of threads running tasks.
+
+        max_pending (int):
+            The maximum number of tasks that can be running or queued.
+    """
+
+    def __init__(self, max_workers=DEFAULT_BACKGROUND_COMPLETION_MAX_WORKERS,
+                 max_pending=DEFAULT_BACKGROUND_COMPLETION_MAX_PENDING):
+        """Initialize the pool.
+
+        Args:
+            max_workers (int, optional):
+                The maximum number of threads running tasks.
+
+            max_pending (int, optional):
+                The maximum number of tasks that can be running or queued.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._pool = None
+        self._pid = None
+        self._num_pending = 0
+        self._idle = threading.Condition(threading.Lock())
+
+    @property
+    def num_pending(self):
+        """The number of tasks running or queued."""
+        return self._num_pending
+
+    def submit(self, func):
+        """Submit a task to run in the background.
+
+        Args:
+            func (callable):
+                The function to run. It takes no arguments. Any exceptions
+                it raises will be logged.
+
+        Returns:
+            bool:
+            ``True`` if the task was accepted, or ``False`` if the pool
+            already has :py:attr:`max_pending` tasks.
+        """
+        with self._idle:
+            pid = os.getpid()
+
+            if self._pid != pid:
+                # Threads don't survive a fork, so each process needs its own
+                # pool.
+                self._pool = ThreadPool(self.max_workers)
+                self._pid = pid
+                self._num_pending = 0
+
+            if self._num_pending >= self.max_pending:
+                return False
+
+            self._num_pending += 1
+
+        self._pool.apply_async(self._run_task, (func,))
+
+        return True
+
+    def wait(self, timeout=None):
+        """Wait for all running and queued tasks to finish.
+
+        Args:
+            timeout (float, optional):
+                The maximum number of seconds to wait.
+
+        Returns:
+            bool:
+            ``True`` if all tasks finished.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self._idle:
+            while self._num_pending:
+                if timeout is None:
+                    self._idle.wait()
+                else:
+                    remaining = deadline - time.time()
+
+                    if remaining <= 0:
+                        return False
+
+                    self._idle.wait(remaining)
+
+            return True
+
+    def _run_task(self, func):
+        """Run a task on a thread in the pool.
+
+        Args:
+            func (callable):
+                The function to run.
+        """
+        try:
+            func()
+        except Exception as e:
+            logger.exception('Unexpected error in background cache task '
+                             '%r: %s',
+                             func, e)
+        finally:
+            # The task may have opened database connections for this thread,
+            # which would otherwise be left open. Connections shared with
+            # other threads are left alone.
+            for connection in connections.all():
+                if not connection.allow_thread_sharing:
+                    connection.close()
+
+            with self._idle:
+                self._num_pending -= 1
+
+                if self._num_pending == 0:
+                    self._idle.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_background_completion_pool():
+    """Return the pool used for background completion.
+
+    The pool is created the first time it's needed, based on
+    :setting:`CACHE_BACKGROUND_COMPLETION_MAX_WORKERS` and
+    :setting:`CACHE_BACKGROUND_COMPLETION_MAX_PENDING`.
+
+    Returns:
+        BackgroundCompletionPool:
+        The pool.
+    """
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BackgroundCompletionPool(
+                    max_workers=getattr(
+                        settings, 'CACHE_BACKGROUND_COMPLETION_MAX_WORKERS',
+                        DEFAULT_BACKGROUND_COMPLETION_MAX_WORKERS),
+                    max_pending=getattr(
+                        settings, 'CACHE_BACKGROUND_COMPLETION_MAX_PENDING',
+                        DEFAULT_BACKGROUND_COMPLETION_MAX_PENDING))
+
+    return _pool
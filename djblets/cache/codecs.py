@@ -0,0 +1,600 @@
+"""Codecs for encoding large data stored in the cache.
+
+Large data stored through :py:func:`~djblets.cache.backend.cache_memoize`
+and :py:func:`~djblets.cache.backend.cache_memoize_iter` is pickled and then
+passed through a codec, which may compress the data. Each payload begins with
+a small header identifying the codec, so that data can always be decoded,
+even if the configured codec changes.
+
+Deployments can choose the codec and its settings through the following
+settings:
+
+:setting:`CACHE_LARGE_DATA_CODEC`:
+    The ID of the codec used when compressing large data. This defaults to
+    ``zlib``.
+
+:setting:`CACHE_ZLIB_LEVEL`:
+    The compression level (0-9) for the ``zlib`` codec. This defaults to
+    zlib's default compression level.
+
+:setting:`CACHE_LZ4_LEVEL`:
+    The compression level for the ``lz4`` codec.
+
+:setting:`CACHE_ZSTD_LEVEL`:
+    The compression level for the ``zstd`` codec.
+
+:setting:`CACHE_PICKLE_PROTOCOL`:
+    The pickle protocol used for large data. This defaults to pickle's
+    default protocol. Newer protocols are faster and more compact.
+
+The ``lz4`` and ``zstd`` codecs are only available if the :pypi:`lz4` or
+:pypi:`zstandard` packages are installed.
+"""
+
+
+import struct
+import zlib
+
+from django.conf import settings
+from django.utils import six
+from django.utils.six.moves import cPickle as pickle
+from django.utils.translation import ugettext_lazy as _
+
+from djblets.cache.errors import (CacheCodecConflictError,
+                                  CacheCodecNotFoundError)
+from djblets.registries.registry import (ALREADY_REGISTERED,
+                                         ATTRIBUTE_REGISTERED, DEFAULT_ERRORS,
+                                         NOT_REGISTERED, Registry)
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+#: The magic bytes at the start of every encoded payload.
+#:
+#: Neither a pickle nor a zlib stream can begin with a null byte, which
+#: allows payloads stored before codecs were introduced to be told apart.
+CODEC_HEADER_MAGIC = b'\x00djc'
+
+#: The ID of the default codec used when compressing large data.
+DEFAULT_COMPRESSION_CODEC_ID = 'zlib'
+
+#: The ID of the codec used when not compressing large data.
+NO_COMPRESSION_CODEC_ID = 'none'
+
+
+CACHE_CODEC_DEFAULT_ERRORS = DEFAULT_ERRORS.copy()
+CACHE_CODEC_DEFAULT_ERRORS.update({
+    ALREADY_REGISTERED: _(
+        'Could not register cache codec %(item)s: This codec is already '
+        'registered.'
+    ),
+    ATTRIBUTE_REGISTERED: _(
+        'Could not register cache codec %(item)s: Another codec '
+        '(%(duplicate)s) is already registered with the same ID.'
+    ),
+    NOT_REGISTERED: _(
+        'Unknown cache codec "%(attr_value)s": This codec is not registered.'
+    ),
+})
+
+
+# Python 2's cPickle doesn't define DEFAULT_PROTOCOL, but defaults to 0.
+_DEFAULT_PICKLE_PROTOCOL = getattr(pickle, 'DEFAULT_PROTOCOL', 0)
+
+_registry = None
+
+
+class _NullCompressor(object):
+    """A compressor that passes data through unchanged."""
+
+    def compress(self, data):
+        """Return the data unchanged.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+        Returns:
+            bytes:
+            The data.
+        """
+        return data
+
+    def flush(self):
+        """Return any remaining data.
+
+        Returns:
+            bytes:
+            An empty string.
+        """
+        return b''
+
+    def decompress(self, data):
+        """Return the data unchanged.
+
+        Args:
+            data (bytes):
+                The data to decompress.
+
+        Returns:
+            bytes:
+            The data.
+        """
+        return data
+
+
+class _LZ4Compressor(object):
+    """A streaming compressor for the LZ4 frame format."""
+
+    def __init__(self, level):
+        """Initialize the compressor.
+
+        Args:
+            level (int):
+                The compression level.
+        """
+        self._compressor = lz4_frame.LZ4FrameCompressor(
+            compression_level=level)
+        self._started = False
+
+    def compress(self, data):
+        """Compress a block of data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+        Returns:
+            bytes:
+            The compressed data available so far.
+        """
+        return self._begin() + self._compressor.compress(data)
+
+    def flush(self):
+        """Finish compression and return any remaining data.
+
+        Returns:
+            bytes:
+            The remaining compressed data.
+        """
+        return self._begin() + self._compressor.flush()
+
+    def _begin(self):
+        """Begin the frame, if not already begun.
+
+        Returns:
+            bytes:
+            The frame header, or an empty string if already begun.
+        """
+        if self._started:
+            return b''
+
+        self._started = True
+
+        return self._compressor.begin()
+
+
+class _FlushlessDecompressor(object):
+    """Wraps a decompressor that doesn't provide a usable ``flush`` method."""
+
+    def __init__(self, decompressor):
+        """Initialize the decompressor.
+
+        Args:
+            decompressor (object):
+                The decompressor to wrap.
+        """
+        self.decompress = decompressor.decompress
+
+    def flush(self):
+        """Return any remaining data.
+
+        Returns:
+            bytes:
+            An empty string.
+        """
+        return b''
+
+
+class BaseCacheCodec(object):
+    """Base class for a cache codec.
+
+    Codecs provide streaming compressors and decompressors, so that items can
+    be encoded as they're generated and decoded as chunks are read.
+    Compressors must provide ``compress(data)`` and ``flush()`` methods, and
+    decompressors must provide ``decompress(data)`` and ``flush()`` methods,
+    like :py:func:`zlib.compressobj` and :py:func:`zlib.decompressobj`.
+
+    Subclasses must set :py:attr:`codec_id` and implement
+    :py:meth:`get_compressor` and :py:meth:`get_decompressor`.
+    """
+
+    #: The unique ID of the codec, stored in each payload's header.
+    #:
+    #: This must be ASCII and no more than 255 characters.
+    codec_id = None
+
+    def __repr__(self):
+        """Return a string representation of the codec.
+
+        Returns:
+            unicode:
+            The string representation.
+        """
+        return '<%s: %s>' % (type(self).__name__, self.codec_id)
+
+    def is_available(self):
+        """Return whether the codec's dependencies are installed.
+
+        Returns:
+            bool:
+            ``True`` if the codec can be used.
+        """
+        return True
+
+    def get_compressor(self):
+        """Return a new streaming compressor.
+
+        Returns:
+            object:
+            The compressor.
+        """
+        raise NotImplementedError
+
+    def get_decompressor(self):
+        """Return a new streaming decompressor.
+
+        Returns:
+            object:
+            The decompressor.
+        """
+        raise NotImplementedError
+
+    def compress(self, data):
+        """Compress a complete payload.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        compressor = self.get_compressor()
+
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        """Decompress a complete payload.
+
+        Args:
+            data (bytes):
+                The data to decompress.
+
+        Returns:
+            bytes:
+            The decompressed data.
+        """
+        decompressor = self.get_decompressor()
+
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class NoCompressionCodec(BaseCacheCodec):
+    """A codec that stores data without compression."""
+
+    codec_id = NO_COMPRESSION_CODEC_ID
+
+    def get_compressor(self):
+        """Return a new streaming compressor.
+
+        Returns:
+            object:
+            A compressor that passes data through unchanged.
+        """
+        return _NullCompressor()
+
+    def get_decompressor(self):
+        """Return a new streaming decompressor.
+
+        Returns:
+            object:
+            A decompressor that passes data through unchanged.
+        """
+        return _NullCompressor()
+
+
+class ZlibCodec(BaseCacheCodec):
+    """A codec that compresses data with zlib."""
+
+    codec_id = 'zlib'
+
+    def __init__(self, level=None):
+        """Initialize the codec.
+
+        Args:
+            level (int, optional):
+                The compression level (0-9). This defaults to
+                :setting:`CACHE_ZLIB_LEVEL`, or zlib's default level.
+        """
+        if level is None:
+            level = getattr(settings, 'CACHE_ZLIB_LEVEL',
+                            zlib.Z_DEFAULT_COMPRESSION)
+
+        self.level = level
+
+    def get_compressor(self):
+        """Return a new streaming compressor.
+
+        Returns:
+            object:
+            The zlib compressor.
+        """
+        return zlib.compressobj(self.level)
+
+    def get_decompressor(self):
+        """Return a new streaming decompressor.
+
+        Returns:
+            object:
+            The zlib decompressor.
+        """
+        return zlib.decompressobj()
+
+
+class LZ4Codec(BaseCacheCodec):
+    """A codec that compresses data with LZ4.
+
+    LZ4 trades some compression ratio for much faster compression and
+    decompression than zlib. This requires the :pypi:`lz4` package.
+    """
+
+    codec_id = 'lz4'
+
+    def __init__(self, level=None):
+        """Initialize the codec.
+
+        Args:
+            level (int, optional):
+                The compression level. This defaults to
+                :setting:`CACHE_LZ4_LEVEL`, or LZ4's fastest level.
+        """
+        if level is None:
+            level = getattr(settings, 'CACHE_LZ4_LEVEL', 0)
+
+        self.level = level
+
+    def is_available(self):
+        """Return whether the lz4 package is installed.
+
+        Returns:
+            bool:
+            ``True`` if the codec can be used.
+        """
+        return lz4_frame is not None
+
+    def get_compressor(self):
+        """Return a new streaming compressor.
+
+        Returns:
+            object:
+            The LZ4 compressor.
+        """
+        return _LZ4Compressor(self.level)
+
+    def get_decompressor(self):
+        """Return a new streaming decompressor.
+
+        Returns:
+            object:
+            The LZ4 decompressor.
+        """
+        return _FlushlessDecompressor(lz4_frame.LZ4FrameDecompressor())
+
+
+class ZstdCodec(BaseCacheCodec):
+    """A codec that compresses data with Zstandard.
+
+    Zstandard generally compresses better than zlib at a similar or faster
+    speed. This requires the :pypi:`zstandard` package.
+    """
+
+    codec_id = 'zstd'
+
+    def __init__(self, level=None):
+        """Initialize the codec.
+
+        Args:
+            level (int, optional):
+                The compression level. This defaults to
+                :setting:`CACHE_ZSTD_LEVEL`, or level 3.
+        """
+        if level is None:
+            level = getattr(settings, 'CACHE_ZSTD_LEVEL', 3)
+
+        self.level = level
+
+    def is_available(self):
+        """Return whether the zstandard package is installed.
+
+        Returns:
+            bool:
+            ``True`` if the codec can be used.
+        """
+        return zstandard is not None
+
+    def get_compressor(self):
+        """Return a new streaming compressor.
+
+        Returns:
+            object:
+            The Zstandard compressor.
+        """
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def get_decompressor(self):
+        """Return a new streaming decompressor.
+
+        Returns:
+            object:
+            The Zstandard decompressor.
+        """
+        # Depending on the version, the decompressor may not have a flush()
+        # method, or it may return None.
+        return _FlushlessDecompressor(
+            zstandard.ZstdDecompressor().decompressobj())
+
+
+class CacheCodecRegistry(Registry):
+    """A registry for cache codecs.
+
+    By default, this contains :py:class:`NoCompressionCodec`,
+    :py:class:`ZlibCodec`, and (if their packages are installed)
+    :py:class:`LZ4Codec` and :py:class:`ZstdCodec`.
+    """
+
+    lookup_attrs = ('codec_id',)
+    default_errors = CACHE_CODEC_DEFAULT_ERRORS
+    already_registered_error_class = CacheCodecConflictError
+    lookup_error_class = CacheCodecNotFoundError
+
+    def get_codec(self, codec_id):
+        """Return the codec with the given ID.
+
+        Args:
+            codec_id (unicode):
+                The ID of the codec.
+
+        Returns:
+            BaseCacheCodec:
+            The codec.
+
+        Raises:
+            djblets.cache.errors.CacheCodecNotFoundError:
+                The codec was not registered.
+        """
+        return self.get('codec_id', codec_id)
+
+    def get_defaults(self):
+        """Return the default codecs for the registry.
+
+        Returns:
+            list of BaseCacheCodec:
+            The default codecs that are available.
+        """
+        codecs = [
+            NoCompressionCodec(),
+            ZlibCodec(),
+            LZ4Codec(),
+            ZstdCodec(),
+        ]
+
+        return [
+            codec
+            for codec in codecs
+            if codec.is_available()
+        ]
+
+
+def get_cache_codec_registry():
+    """Return the global cache codec registry.
+
+    The first time this is called, a :py:class:`CacheCodecRegistry` will be
+    instantiated and cached for future calls.
+
+    Returns:
+        CacheCodecRegistry:
+        The cache codec registry.
+    """
+    global _registry
+
+    if _registry is None:
+        _registry = CacheCodecRegistry()
+
+    return _registry
+
+
+def get_large_data_codec(compress):
+    """Return the codec to use for storing large data.
+
+    Args:
+        compress (bool):
+            Whether the data should be compressed.
+
+    Returns:
+        BaseCacheCodec:
+        The codec configured through :setting:`CACHE_LARGE_DATA_CODEC` if
+        compressing, or :py:class:`NoCompressionCodec` otherwise.
+    """
+    if compress:
+        codec_id = getattr(settings, 'CACHE_LARGE_DATA_CODEC',
+                           DEFAULT_COMPRESSION_CODEC_ID)
+    else:
+        codec_id = NO_COMPRESSION_CODEC_ID
+
+    return get_cache_codec_registry().get_codec(codec_id)
+
+
+def get_pickle_protocol():
+    """Return the pickle protocol to use for storing large data.
+
+    Returns:
+        int:
+        The value of :setting:`CACHE_PICKLE_PROTOCOL`, or pickle's default
+        protocol.
+    """
+    return getattr(settings, 'CACHE_PICKLE_PROTOCOL',
+                   _DEFAULT_PICKLE_PROTOCOL)
+
+
+def build_codec_header(codec):
+    """Return the header identifying a codec in a payload.
+
+    Args:
+        codec (BaseCacheCodec):
+            The codec used to encode the payload.
+
+    Returns:
+        bytes:
+        The header to place at the start of the payload.
+    """
+    codec_id = codec.codec_id.encode('ascii')
+
+    return CODEC_HEADER_MAGIC + struct.pack(b'B', len(codec_id)) + codec_id
+
+
+def parse_codec_header(data):
+    """Parse the codec header at the start of a payload.
+
+    Args:
+        data (bytes):
+            The start of the payload. This must include the full header.
+
+    Returns:
+        tuple:
+        A 2-tuple of the codec and the length of the header. If the payload
+        has no header (because it was stored before codecs were introduced),
+        this will be ``(None, 0)``.
+
+    Raises:
+        djblets.cache.errors.CacheCodecNotFoundError:
+            The payload was encoded with a codec that isn't registered.
+    """
+    if not data.startswith(CODEC_HEADER_MAGIC):
+        return None, 0
+
+    magic_len = len(CODEC_HEADER_MAGIC)
+    codec_id_len = six.indexbytes(data, magic_len)
+    header_len = magic_len + 1 + codec_id_len
+    codec_id = data[magic_len + 1:header_len].decode('ascii')
+
+    return get_cache_codec_registry().get_codec(codec_id), header_len
@@ -1,2 +1,21 @@
+from djblets.registries.errors import AlreadyRegisteredError, ItemLookupError
+
+
 class MissingChunkError(Exception):
     pass
+
+
+class CacheCodecConflictError(AlreadyRegisteredError):
+    """A cache codec with the same ID is already registered."""
+
+
+class CacheCodecNotFoundError(ItemLookupError):
+    """A cache codec was not found."""
+
+
+class CacheWarmerConflictError(AlreadyRegisteredError):
+    """A cache warmer with the same ID is already registered."""
+
+
+class CacheWarmerNotFoundError(ItemLookupError):
+    """A cache warmer was not found."""
@@ -23,10 +23,36 @@ class ForwardingCacheBackend(object):
     ``LOCATION`` setting for this cache backend. All requests and attribute
     lookups will be forwarded there.
 
+    The common cache methods (listed in :py:attr:`forwarded_methods`) are
+    bound directly from the forwarded backend onto this instance when it's
+    loaded, so calling them costs the same as calling the backend itself.
+    Any other attributes are looked up on the backend as needed.
+
     If a consumer switches the real cache backend, it can call
     :py:meth:`reset_backend`, and all future cache requests will go to the
     newly computed backend.
     """
+
+    #: The backend methods bound directly onto this instance.
+    forwarded_methods = (
+        'add',
+        'clear',
+        'decr',
+        'decr_version',
+        'delete',
+        'delete_many',
+        'get',
+        'get_many',
+        'has_key',
+        'incr',
+        'incr_version',
+        'make_key',
+        'set',
+        'set_many',
+        'touch',
+        'validate_key',
+    )
+
     def __init__(self, cache_name=DEFAULT_FORWARD_CACHE_ALIAS,
                  *args, **kwargs):
         self._cache_name = cache_name
@@ -37,10 +63,13 @@ class ForwardingCacheBackend(object):
     @property
     def backend(self):
         """Return the forwarded cache backend."""
-        if not self._backend:
+        backend = self._backend
+
+        if backend is None:
             self._load_backend()
+            backend = self._backend
 
-        return self._backend
+        return backend
 
     def reset_backend(self):
         """Reset the forwarded cache backend.
@@ -48,27 +77,36 @@ class ForwardingCacheBackend(object):
         This must be called after modifying
         ``settings.CACHES['forwarded_backend']`` in order for the new
         backend to be picked up.
+
+        The new backend's methods are bound before the old backend is
+        closed, so callers on other threads will always reach a usable
+        backend.
         """
-        if self._backend:
+        old_backend = self._backend
+
+        if old_backend is not None:
+            self._load_backend()
+
             try:
-                self._backend.close()
+                old_backend.close()
             except:
                 # We don't really care if this fails. We just want the new
                 # configuration.
                 pass
 
-            self._load_backend()
-
     def close(self, *args, **kwargs):
         """Close the cache backend."""
-        if self._backend:
-            self._backend.close(*args, **kwargs)
+        backend = self._backend
+
+        if backend is not None:
+            backend.close(*args, **kwargs)
 
     def _load_backend(self):
         """Load the caching backend.
 
         This will replace the current caching backend with a newly loaded
-        one, based on the stored cache name.
+        one, based on the stored cache name, and bind its methods to this
+        instance.
 
         Only one thread at a time can load the cache backend. A counter
         is kept that keeps the load generation number. If several threads
@@ -81,19 +119,42 @@ class ForwardingCacheBackend(object):
             if self._load_gen == cur_load_gen:
                 from django.core.cache import get_cache
 
-                self._backend = get_cache(self._cache_name)
+                backend = get_cache(self._cache_name)
 
                 # get_cache will attempt to connect to 'close', which we don't
                 # want. Instead, go and disconnect this.
-                request_finished.disconnect(self._backend.close)
+                request_finished.disconnect(backend.close)
+
+                methods = {}
 
+                for name in self.forwarded_methods:
+                    try:
+                        methods[name] = getattr(backend, name)
+                    except AttributeError:
+                        # This method isn't available on this version of
+                        # Django. It can still be looked up on demand.
+                        pass
+
+                # Updating the instance dictionary with string keys is a
+                # single operation under the GIL, so every method is switched
+                # over to the new backend at once. Methods the new backend
+                # lacks are removed, to fall back to __getattr__.
+                stale = set(self.forwarded_methods) - set(methods)
+                self.__dict__.update(methods)
+
+                for name in stale:
+                    self.__dict__.pop(name, None)
+
+                self._backend = backend
                 self._load_gen = cur_load_gen + 1
 
     def __contains__(self, key):
-        return key in self.backend
+        return self.has_key(key)
+
+    def __getattr__(self, name):
+        if name in ('_backend', '_cache_name', '_load_gen', '_load_lock'):
+            # This instance hasn't been initialized yet. Don't try to load
+            # the backend to look these up.
+            raise AttributeError(name)
 
-    def __getattribute__(self, name):
-        try:
-            return object.__getattribute__(self, name)
-        except AttributeError:
-            return self.backend.__getattribute__(name)
+        return getattr(self.backend, name)
@@ -0,0 +1,328 @@
+"""A process-local LRU cache used in front of the shared cache backend.
+
+This provides a small, bounded, in-memory cache that lives inside each
+process. It's used by :py:func:`~djblets.cache.backend.cache_memoize` (when
+passing ``use_local_cache=True``) to avoid network round-trips and
+unpickling for small, frequently-read values.
+
+Entries are bounded by both a maximum number of entries and a maximum number
+of bytes, and each entry has its own expiration time. All entries are
+invalidated across processes through a generation key stored in the shared
+cache, managed by a :py:class:`~djblets.cache.synchronizer.
+GenerationSynchronizer`. This happens when a locally cached value is
+memoized again with ``force_overwrite=True``.
+"""
+
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.six.moves import cPickle as pickle
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The default maximum number of entries stored in the local cache.
+DEFAULT_LOCAL_CACHE_MAX_ENTRIES = 1000
+
+#: The default maximum number of bytes stored in the local cache.
+DEFAULT_LOCAL_CACHE_MAX_BYTES = 10 * 1024 * 1024  # 10MB
+
+#: The default expiration time for entries in the local cache, in seconds.
+DEFAULT_LOCAL_CACHE_EXPIRATION_TIME = 60
+
+#: The default number of seconds between generation checks.
+DEFAULT_LOCAL_CACHE_SYNC_INTERVAL = 5
+
+#: The default cache key used to synchronize local cache generations.
+DEFAULT_LOCAL_CACHE_SYNC_KEY = 'djblets-local-cache-gen'
+
+
+def get_value_size(value):
+    """Return the approximate size of a value, in bytes.
+
+    This is the length of the pickled representation of the value, which is
+    what would be sent to the shared cache.
+
+    Args:
+        value (object):
+            The value to compute the size for.
+
+    Returns:
+        int:
+        The size of the value in bytes, or ``None`` if the value could not be
+        pickled.
+    """
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        logger.debug('Unable to compute size of value %r for the local '
+                     'cache: %s',
+                     value, e)
+        return None
+
+
+class LocalCache(object):
+    """A bounded, process-local LRU cache.
+
+    Entries are stored in least-recently-used order. When adding an entry
+    would exceed :py:attr:`max_entries` or :py:attr:`max_bytes`, the
+    least-recently-used entries will be evicted.
+
+    Every :py:attr:`sync_interval` seconds, the cache will check the
+    generation stored in the shared cache under :py:attr:`sync_key`. If
+    another process has called :py:meth:`invalidate`, all entries in this
+    process will be dropped.
+
+    Values are stored and returned as-is, without copying. Callers must not
+    modify values fetched from the local cache.
+
+    Attributes:
+        max_entries (int):
+            The maximum number of entries to store.
+
+        max_bytes (int):
+            The maximum number of bytes to store across all entries.
+
+        sync_interval (int):
+            The minimum number of seconds between generation checks.
+
+        sync_key (unicode):
+            The base cache key used to synchronize the generation.
+
+        total_bytes (int):
+            The number of bytes currently stored.
+    """
+
+    def __init__(self, max_entries=DEFAULT_LOCAL_CACHE_MAX_ENTRIES,
+                 max_bytes=DEFAULT_LOCAL_CACHE_MAX_BYTES,
+                 sync_interval=DEFAULT_LOCAL_CACHE_SYNC_INTERVAL,
+                 sync_key=DEFAULT_LOCAL_CACHE_SYNC_KEY):
+        """Initialize the cache.
+
+        Args:
+            max_entries (int, optional):
+                The maximum number of entries to store.
+
+            max_bytes (int, optional):
+                The maximum number of bytes to store across all entries.
+
+            sync_interval (int, optional):
+                The minimum number of seconds between generation checks.
+
+            sync_key (unicode, optional):
+                The base cache key used to synchronize the generation.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self.sync_key = sync_key
+        self.total_bytes = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._gen_sync = None
+        self._next_sync_check = 0
+
+    def __len__(self):
+        """Return the number of entries in the cache.
+
+        Returns:
+            int:
+            The number of entries in the cache.
+        """
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Return whether a non-expired entry exists in the cache.
+
+        Args:
+            key (bytes):
+                The normalized cache key.
+
+        Returns:
+            bool:
+            ``True`` if the entry exists and has not expired.
+        """
+        sentinel = object()
+
+        return self.get(key, sentinel) is not sentinel
+
+    def get(self, key, default=None):
+        """Return a value from the cache.
+
+        Fetching a value marks it as the most recently used.
+
+        Args:
+            key (bytes):
+                The normalized cache key.
+
+            default (object, optional):
+                The value to return if the entry is missing or expired.
+
+        Returns:
+            object:
+            The cached value, or ``default``.
+        """
+        self._check_expired()
+
+        with self._lock:
+            try:
+                value, size, expires = self._entries.pop(key)
+            except KeyError:
+                return default
+
+            if expires <= time.time():
+                self.total_bytes -= size
+                return default
+
+            # Re-insert the entry to mark it as the most recently used.
+            self._entries[key] = (value, size, expires)
+
+        return value
+
+    def set(self, key, value, expiration, size=None):
+        """Store a value in the cache.
+
+        Values larger than :py:attr:`max_bytes`, or that can't be measured,
+        will not be stored.
+
+        Args:
+            key (bytes):
+                The normalized cache key.
+
+            value (object):
+                The value to store.
+
+            expiration (int):
+                The number of seconds until the entry expires.
+
+            size (int, optional):
+                The size of the value in bytes, if already known. This
+                will be computed if not provided.
+
+        Returns:
+            bool:
+            ``True`` if the value was stored.
+        """
+        if size is None:
+            size = get_value_size(value)
+
+        with self._lock:
+            self._remove(key)
+
+            if size is None or size > self.max_bytes or expiration <= 0:
+                return False
+
+            self._entries[key] = (value, size, time.time() + expiration)
+            self.total_bytes += size
+
+            while (len(self._entries) > self.max_entries or
+                   self.total_bytes > self.max_bytes):
+                old_value, old_size, old_expires = \
+                    self._entries.popitem(last=False)[1]
+                self.total_bytes -= old_size
+
+        return True
+
+    def delete(self, key):
+        """Delete an entry from the cache.
+
+        This only affects the current process.
+
+        Args:
+            key (bytes):
+                The normalized cache key.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """Clear all entries from the cache.
+
+        This only affects the current process. To clear the local caches in
+        all processes, use :py:meth:`invalidate`.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def invalidate(self):
+        """Invalidate the local caches in all processes.
+
+        This clears the cache for the current process and bumps the shared
+        generation number. Other processes will clear their own entries the
+        next time they check the generation.
+
+        Entries can't be invalidated individually across processes, since
+        that would require checking the shared cache on every lookup.
+        """
+        self.clear()
+        self._get_gen_sync().mark_updated()
+
+    def _remove(self, key):
+        """Remove an entry from the cache, if it exists.
+
+        The caller must hold the lock.
+
+        Args:
+            key (bytes):
+                The normalized cache key.
+        """
+        try:
+            self.total_bytes -= self._entries.pop(key)[1]
+        except KeyError:
+            pass
+
+    def _get_gen_sync(self):
+        """Return the generation synchronizer for the cache.
+
+        The synchronizer is created the first time this is called.
+
+        Returns:
+            djblets.cache.synchronizer.GenerationSynchronizer:
+            The generation synchronizer.
+        """
+        if self._gen_sync is None:
+            # This is imported here to avoid a circular import with
+            # djblets.cache.backend.
+            from djblets.cache.synchronizer import GenerationSynchronizer
+
+            self._gen_sync = GenerationSynchronizer(self.sync_key)
+
+        return self._gen_sync
+
+    def _check_expired(self):
+        """Clear the cache if another process has invalidated it.
+
+        The generation will be checked at most once every
+        :py:attr:`sync_interval` seconds.
+        """
+        now = time.time()
+
+        if now < self._next_sync_check:
+            return
+
+        self._next_sync_check = now + self.sync_interval
+
+        if self._gen_sync is None:
+            # The first check just records the current generation. Anything
+            # cached before this was cached under the same generation.
+            self._get_gen_sync()
+        elif self._gen_sync.is_expired():
+            self.clear()
+            self._gen_sync.refresh()
+
+
+#: The local cache instance used by cache_memoize.
+local_cache = LocalCache(
+    max_entries=getattr(settings, 'CACHE_LOCAL_MAX_ENTRIES',
+                        DEFAULT_LOCAL_CACHE_MAX_ENTRIES),
+    max_bytes=getattr(settings, 'CACHE_LOCAL_MAX_BYTES',
+                      DEFAULT_LOCAL_CACHE_MAX_BYTES),
+    sync_interval=getattr(settings, 'CACHE_LOCAL_SYNC_INTERVAL',
+                          DEFAULT_LOCAL_CACHE_SYNC_INTERVAL))
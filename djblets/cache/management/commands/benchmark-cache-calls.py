@@ -0,0 +1,118 @@
+import time
+
+from django.core.management.base import CommandError
+from django.utils.six.moves import range
+from django.utils.translation import ugettext as _
+
+from djblets.cache.backend import make_cache_key, make_cache_keys
+from djblets.cache.forwarding_backend import ForwardingCacheBackend
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+try:
+    # Django >= 1.7
+    from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+except ImportError:
+    # Django < 1.7
+    caches = None
+
+
+class Command(BaseCommand):
+    """Time common cache calls.
+
+    This measures the overhead djblets adds around cache calls, such as
+    building cache keys with :py:func:`~djblets.cache.backend.make_cache_key`
+    and forwarding calls through
+    :py:class:`~djblets.cache.forwarding_backend.ForwardingCacheBackend`,
+    compared to calling the backend directly. The configured default cache
+    is used, and a test key is stored in it.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (object):
+                The argument parser to add to.
+        """
+        parser.add_argument(
+            '--iterations',
+            dest='iterations',
+            type=int,
+            default=20000,
+            help=_('The number of times to make each call.'))
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        if iterations < 1:
+            raise CommandError(_('--iterations must be at least 1.'))
+
+        self.iterations = iterations
+        self._benchmark_cache_keys()
+
+        if caches is None:
+            from django.core.cache import cache
+        else:
+            # The default cache is a proxy, so look up the real backend.
+            cache = caches[DEFAULT_CACHE_ALIAS]
+
+        if isinstance(cache, ForwardingCacheBackend):
+            self._benchmark_forwarding(cache)
+        else:
+            self.stdout.write(_('The default cache is not a '
+                                'ForwardingCacheBackend. Skipping '
+                                'forwarding benchmarks.'))
+
+    def _benchmark_cache_keys(self):
+        """Time building cache keys one at a time and in bulk."""
+        keys = ['diff-chunk-%d' % i for i in range(100)]
+
+        self._report(_('make_cache_key() x %d') % len(keys),
+                     lambda: [make_cache_key(key) for key in keys])
+        self._report(_('make_cache_keys() x %d') % len(keys),
+                     lambda: make_cache_keys(keys))
+
+    def _benchmark_forwarding(self, forwarding_backend):
+        """Compare calls through a forwarding backend to direct calls.
+
+        Args:
+            forwarding_backend (djblets.cache.forwarding_backend.
+                                ForwardingCacheBackend):
+                The forwarding backend.
+        """
+        backend = forwarding_backend.backend
+        key = 'djblets-benchmark-cache-calls'
+        backend.set(key, 'value')
+
+        try:
+            self._report(_('Direct get()'),
+                         lambda: backend.get(key))
+            self._report(_('Forwarded get()'),
+                         lambda: forwarding_backend.get(key))
+        finally:
+            backend.delete(key)
+
+    def _report(self, label, func):
+        """Time a call and write the results.
+
+        Args:
+            label (unicode):
+                The label for the results.
+
+            func (callable):
+                The function to call.
+        """
+        start = time.time()
+
+        for i in range(self.iterations):
+            func()
+
+        elapsed = time.time() - start
+
+        self.stdout.write(
+            _('%(label)s: %(total).3fs total, %(per_call).2fus per call')
+            % {
+                'label': label,
+                'total': elapsed,
+                'per_call': elapsed / self.iterations * 1000000,
+            })
@@ -0,0 +1,256 @@
+import random
+import time
+from io import BytesIO
+
+from django.core.management.base import CommandError
+from django.utils.six.moves import range, cPickle as pickle
+from django.utils.translation import ugettext as _
+
+from djblets.cache.codecs import (ZlibCodec, get_cache_codec_registry,
+                                  get_pickle_protocol)
+from djblets.cache.errors import CacheCodecNotFoundError
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Compare the cache codecs on sample payloads.
+
+    Each codec encodes and decodes the sample payload the same way large data
+    is stored in the cache, and the resulting size and timings are reported.
+    This can help choose a value for ``settings.CACHE_LARGE_DATA_CODEC``.
+
+    By default, a generated text payload is used. Real payloads can be
+    provided with ``--file``.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (object):
+                The argument parser to add to.
+        """
+        parser.add_argument(
+            '--codec',
+            dest='codecs',
+            action='append',
+            default=[],
+            help=_('A codec ID to benchmark. This can be specified multiple '
+                   'times. Defaults to all available codecs.'))
+
+        parser.add_argument(
+            '--zlib-level',
+            dest='zlib_levels',
+            action='append',
+            type=int,
+            default=[],
+            help=_('An additional zlib compression level to benchmark. This '
+                   'can be specified multiple times.'))
+
+        parser.add_argument(
+            '--pickle-protocol',
+            dest='pickle_protocol',
+            type=int,
+            default=None,
+            help=_('The pickle protocol to use. Defaults to '
+                   'settings.CACHE_PICKLE_PROTOCOL.'))
+
+        parser.add_argument(
+            '--file',
+            dest='files',
+            action='append',
+            default=[],
+            help=_('A file to use as a sample payload item. This can be '
+                   'specified multiple times.'))
+
+        parser.add_argument(
+            '--size',
+            dest='size',
+            type=int,
+            default=4 * 1024 * 1024,
+            help=_('The approximate size in bytes of the generated sample '
+                   'payload, if no files are provided.'))
+
+        parser.add_argument(
+            '--iterations',
+            dest='iterations',
+            type=int,
+            default=5,
+            help=_('The number of times to encode and decode the payload.'))
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        if iterations < 1:
+            raise CommandError(_('--iterations must be at least 1'))
+
+        pickle_protocol = options['pickle_protocol']
+
+        if pickle_protocol is None:
+            pickle_protocol = get_pickle_protocol()
+
+        registry = get_cache_codec_registry()
+
+        try:
+            if options['codecs']:
+                codecs = [
+                    registry.get_codec(codec_id)
+                    for codec_id in options['codecs']
+                ]
+            else:
+                codecs = sorted(registry, key=lambda codec: codec.codec_id)
+        except CacheCodecNotFoundError as e:
+            raise CommandError(e)
+
+        benchmarks = [
+            (codec.codec_id, codec)
+            for codec in codecs
+        ]
+        benchmarks += [
+            ('zlib (level %d)' % level, ZlibCodec(level=level))
+            for level in options['zlib_levels']
+        ]
+
+        items = self._load_items(options['files'], options['size'])
+        raw_size = sum(
+            len(pickle.dumps(item, pickle_protocol))
+            for item in items
+        )
+
+        self.stdout.write(
+            _('Pickled payload: %(items)d item(s), %(size)d bytes, '
+              'protocol %(protocol)d')
+            % {
+                'items': len(items),
+                'size': raw_size,
+                'protocol': pickle_protocol,
+            })
+        self.stdout.write('')
+        self.stdout.write('%-20s %12s %8s %12s %12s' % (
+            _('Codec'), _('Bytes'), _('Ratio'), _('Encode (ms)'),
+            _('Decode (ms)')))
+
+        for name, codec in benchmarks:
+            encode_time = 0
+            decode_time = 0
+
+            for i in range(iterations):
+                start = time.time()
+                data = self._encode(codec, items, pickle_protocol)
+                encode_time += time.time() - start
+
+                start = time.time()
+                decoded = self._decode(codec, data)
+                decode_time += time.time() - start
+
+            if decoded != items:
+                raise CommandError(
+                    _('Codec %s did not decode the payload correctly')
+                    % name)
+
+            self.stdout.write('%-20s %12d %8.3f %12.2f %12.2f' % (
+                name,
+                len(data),
+                float(len(data)) / raw_size,
+                encode_time * 1000 / iterations,
+                decode_time * 1000 / iterations))
+
+    def _load_items(self, filenames, size):
+        """Return the items making up the sample payload.
+
+        Args:
+            filenames (list of unicode):
+                The files to load as items. If empty, a text payload will be
+                generated.
+
+            size (int):
+                The approximate size of the generated payload.
+
+        Returns:
+            list:
+            The payload items.
+        """
+        if filenames:
+            items = []
+
+            for filename in filenames:
+                try:
+                    with open(filename, 'rb') as fp:
+                        items.append(fp.read())
+                except IOError as e:
+                    raise CommandError(
+                        _('Unable to read %(filename)s: %(error)s')
+                        % {
+                            'filename': filename,
+                            'error': e,
+                        })
+
+            return items
+
+        # Generate a reproducible, somewhat repetitive text payload, split
+        # into items like a list of lines.
+        rand = random.Random(0)
+        words = [
+            ''.join(rand.choice('abcdefghijklmnopqrstuvwxyz')
+                    for i in range(rand.randint(2, 10)))
+            for i in range(2000)
+        ]
+        items = []
+        total = 0
+
+        while total < size:
+            line = ' '.join(rand.choice(words)
+                            for i in range(rand.randint(1, 16)))
+            items.append(line)
+            total += len(line)
+
+        return items
+
+    def _encode(self, codec, items, pickle_protocol):
+        """Encode the payload the same way it's stored in the cache.
+
+        Args:
+            codec (djblets.cache.codecs.BaseCacheCodec):
+                The codec to encode with.
+
+            items (list):
+                The payload items.
+
+            pickle_protocol (int):
+                The pickle protocol to use.
+
+        Returns:
+            bytes:
+            The encoded payload.
+        """
+        compressor = codec.get_compressor()
+        data = [
+            compressor.compress(pickle.dumps(item, pickle_protocol))
+            for item in items
+        ]
+        data.append(compressor.flush())
+
+        return b''.join(data)
+
+    def _decode(self, codec, data):
+        """Decode the payload the same way it's read from the cache.
+
+        Args:
+            codec (djblets.cache.codecs.BaseCacheCodec):
+                The codec to decode with.
+
+            data (bytes):
+                The encoded payload.
+
+        Returns:
+            list:
+            The payload items.
+        """
+        fp = BytesIO(codec.decompress(data))
+        items = []
+
+        while True:
+            try:
+                items.append(pickle.load(fp))
+            except EOFError:
+                return items
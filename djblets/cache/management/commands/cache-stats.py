@@ -0,0 +1,109 @@
+import json
+
+from django.utils.translation import ugettext as _
+
+from djblets.cache.stats import (clear_published_cache_stats,
+                                 get_published_cache_stats)
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Show a snapshot of cache statistics.
+
+    This combines the statistics published to the cache by each process
+    when ``settings.CACHE_STATS_ENABLED`` is set. See
+    :py:mod:`djblets.cache.stats` for the available statistics.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (object):
+                The argument parser to add to.
+        """
+        parser.add_argument(
+            '--sort',
+            dest='sort',
+            default='misses',
+            help=_('The statistic to sort key families by, in descending '
+                   'order. Defaults to misses.'))
+
+        parser.add_argument(
+            '--limit',
+            dest='limit',
+            type=int,
+            default=None,
+            help=_('The maximum number of key families to show.'))
+
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            dest='json',
+            default=False,
+            help=_('Output all statistics as JSON.'))
+
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            dest='clear',
+            default=False,
+            help=_('Clear the published statistics after showing them.'))
+
+    def handle(self, *args, **options):
+        stats = get_published_cache_stats()
+        sort_stat = options['sort']
+
+        families = sorted(
+            stats,
+            key=lambda family: (-stats[family].get(sort_stat, 0), family))
+
+        if options['limit'] is not None:
+            families = families[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(
+                dict(
+                    (family, stats[family])
+                    for family in families
+                ),
+                indent=2,
+                sort_keys=True))
+        elif not families:
+            self.stdout.write(_('No cache statistics have been published.'))
+        else:
+            self.stdout.write('%-30s %10s %10s %7s %14s %14s %8s %8s' % (
+                _('Family'), _('Hits'), _('Misses'), _('Hit %'),
+                _('Recompute (ms)'), _('Bytes'), _('Chunks'), _('Missing')))
+
+            for family in families:
+                family_stats = stats[family]
+                hits = family_stats.get('hits', 0)
+                misses = family_stats.get('misses', 0)
+                lookups = hits + misses
+
+                if lookups:
+                    hit_rate = 100.0 * hits / lookups
+                else:
+                    hit_rate = 0.0
+
+                if misses:
+                    recompute_ms = (1000.0 *
+                                    family_stats.get('recompute_time', 0) /
+                                    misses)
+                else:
+                    recompute_ms = 0.0
+
+                self.stdout.write(
+                    '%-30s %10d %10d %7.1f %14.2f %14d %8d %8d' % (
+                        family,
+                        hits,
+                        misses,
+                        hit_rate,
+                        recompute_ms,
+                        family_stats.get('bytes_stored', 0),
+                        family_stats.get('chunks_stored', 0),
+                        family_stats.get('missing_chunks', 0)))
+
+        if options['clear']:
+            clear_published_cache_stats()
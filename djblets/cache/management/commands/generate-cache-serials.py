@@ -0,0 +1,97 @@
+import importlib
+import os
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils.translation import ugettext as _
+
+from djblets.cache.serials import write_serials_manifest
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Write the cache serials manifest.
+
+    This computes the media, AJAX and locale serial numbers and stores them
+    in the manifest at ``settings.CACHE_SERIALS_MANIFEST`` (or the path given
+    with ``--output``), so that processes don't need to walk the directory
+    trees when starting up. It should be run on every deploy, after
+    :command:`collectstatic` and :command:`compilemessages`.
+
+    See :py:mod:`djblets.cache.serials` for more information.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (object):
+                The argument parser to add to.
+        """
+        parser.add_argument(
+            '--output',
+            dest='output',
+            default=None,
+            help=_('The path to write the manifest to. Defaults to '
+                   'settings.CACHE_SERIALS_MANIFEST.'))
+
+        parser.add_argument(
+            '--locale-package',
+            dest='locale_packages',
+            action='append',
+            default=[],
+            help=_('A Python package to compute a locale serial for. This '
+                   'can be specified multiple times. Defaults to all '
+                   'installed apps with a locale directory.'))
+
+    def handle(self, *args, **options):
+        locale_packages = (options['locale_packages'] or
+                           self._get_default_locale_packages())
+
+        try:
+            manifest = write_serials_manifest(path=options['output'],
+                                              locale_packages=locale_packages)
+        except ValueError as e:
+            raise CommandError(e)
+        except (IOError, OSError) as e:
+            raise CommandError(_('Unable to write the serials manifest: %s')
+                               % e)
+
+        if options['verbosity'] > 0:
+            self.stdout.write(_('Media serial: %s')
+                              % manifest['media']['serial'])
+            self.stdout.write(_('AJAX serial: %s')
+                              % manifest['ajax']['serial'])
+
+            for package, entry in sorted(manifest['locales'].items()):
+                self.stdout.write(_('Locale serial for %(path)s: %(serial)s')
+                                  % {
+                                      'path': package,
+                                      'serial': entry['serial'],
+                                  })
+
+    def _get_default_locale_packages(self):
+        """Return the installed apps that contain locales.
+
+        Returns:
+            list of unicode:
+            The module paths of the installed apps with a :file:`locale`
+            directory.
+        """
+        packages = []
+
+        for app in settings.INSTALLED_APPS:
+            try:
+                module = importlib.import_module(app)
+            except ImportError:
+                # This may be a path to an AppConfig, which won't have
+                # locales of its own.
+                continue
+
+            locale_path = os.path.join(os.path.dirname(module.__file__),
+                                       'locale')
+
+            if os.path.isdir(locale_path):
+                packages.append(app)
+
+        return packages
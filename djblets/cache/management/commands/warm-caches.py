@@ -0,0 +1,135 @@
+import threading
+import time
+
+from django.core.management.base import CommandError
+from django.core.urlresolvers import get_resolver
+from django.utils.translation import ugettext as _
+
+from djblets.cache.errors import CacheWarmerNotFoundError
+from djblets.cache.warmup import (DEFAULT_WARM_CACHES_MAX_WORKERS,
+                                  get_cache_warmer_registry, warm_caches)
+from djblets.extensions.manager import get_extension_managers
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Run the registered cache warmers.
+
+    This is meant to be run after a deploy or a restart of the cache server,
+    before the server is put back into rotation. The time taken by each
+    warmer is shown, and the command fails if any warmer fails.
+
+    Enabled extensions are loaded first, so that warmers registered through
+    :py:class:`~djblets.extensions.hooks.CacheWarmerHook` are run as well.
+
+    See :py:mod:`djblets.cache.warmup` for registering warmers.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (object):
+                The argument parser to add to.
+        """
+        parser.add_argument(
+            '--warmer',
+            dest='warmer_ids',
+            action='append',
+            default=[],
+            help=_('The ID of a warmer to run. This can be specified '
+                   'multiple times. Defaults to all registered warmers.'))
+
+        parser.add_argument(
+            '--max-workers',
+            dest='max_workers',
+            type=int,
+            default=DEFAULT_WARM_CACHES_MAX_WORKERS,
+            help=(_('The maximum number of warmers to run at once. Defaults '
+                    'to %s.')
+                  % DEFAULT_WARM_CACHES_MAX_WORKERS))
+
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            dest='list',
+            default=False,
+            help=_('List the registered warmers without running them.'))
+
+    def handle(self, *args, **options):
+        self._load_extensions()
+
+        if options['list']:
+            for warmer in get_cache_warmer_registry():
+                if warmer.description:
+                    self.stdout.write('%s: %s' % (warmer.warmer_id,
+                                                  warmer.description))
+                else:
+                    self.stdout.write(warmer.warmer_id)
+
+            return
+
+        if options['max_workers'] < 1:
+            raise CommandError(_('--max-workers must be at least 1.'))
+
+        verbosity = options['verbosity']
+        output_lock = threading.Lock()
+
+        def _on_result(result):
+            if verbosity > 0:
+                if result.succeeded:
+                    line = _('%(warmer_id)s: done in %(elapsed).2fs')
+                else:
+                    line = _('%(warmer_id)s: failed after %(elapsed).2fs: '
+                             '%(error)s')
+
+                with output_lock:
+                    self.stdout.write(line % {
+                        'warmer_id': result.warmer.warmer_id,
+                        'elapsed': result.elapsed,
+                        'error': result.error,
+                    })
+
+        start_time = time.time()
+
+        try:
+            results = warm_caches(warmer_ids=options['warmer_ids'] or None,
+                                  max_workers=options['max_workers'],
+                                  on_result=_on_result)
+        except CacheWarmerNotFoundError as e:
+            raise CommandError(e)
+
+        failed = [
+            result.warmer.warmer_id
+            for result in results
+            if not result.succeeded
+        ]
+
+        if failed:
+            raise CommandError(
+                _('%(num_failed)d of %(num_warmers)d cache warmer(s) '
+                  'failed: %(warmer_ids)s')
+                % {
+                    'num_failed': len(failed),
+                    'num_warmers': len(results),
+                    'warmer_ids': ', '.join(failed),
+                })
+
+        if verbosity > 0:
+            self.stdout.write(
+                _('Ran %(num_warmers)d cache warmer(s) in %(elapsed).2fs.')
+                % {
+                    'num_warmers': len(results),
+                    'elapsed': time.time() - start_time,
+                })
+
+    def _load_extensions(self):
+        """Load the enabled extensions.
+
+        Extension managers are commonly constructed when the URL
+        configuration is loaded, so that's loaded first.
+        """
+        get_resolver(None).url_patterns
+
+        for manager in get_extension_managers():
+            manager.load()
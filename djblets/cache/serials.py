@@ -4,20 +4,403 @@ These functions generate stable serial numbers based on the content shipped
 with the product (static media files, templates, locales). These can be used
 in various cache keys, ETags, and URLs to help keep content in cache until
 it changes on disk.
+
+Finding these serial numbers requires walking the directory trees and
+checking the timestamps of every file, which can be slow on network
+filesystems. To avoid doing this each time a process starts, the serial
+numbers can be computed at deploy time (after running
+:command:`collectstatic` and :command:`compilemessages`) by running the
+:command:`generate-cache-serials` management command, which writes them to
+the manifest file at :setting:`CACHE_SERIALS_MANIFEST`.
+
+When the manifest is available, serial numbers are read from it instead of
+walking the trees, as long as they were computed from the same directories
+and the manifest isn't stale. The manifest is considered stale if any of
+those directories, or any directory directly within them, was modified
+after the manifest was generated (for instance, by adding or replacing
+files through :command:`collectstatic`). Stale or missing serial numbers
+are computed by walking the trees.
+
+Checking every file would require walking the trees, so changes to files
+deeper in a tree that don't touch those directories aren't noticed. The
+manifest should still be regenerated on every deploy, and should not be
+placed inside any of the directories it covers.
 """
 
 
 
 import importlib
+import json
 import logging
 import os
+import tempfile
+import threading
+import time
 
 from django.conf import settings
+from django.test.signals import setting_changed
 
 
 logger = logging.getLogger(__name__)
 
 
+#: The version of the serials manifest file format.
+SERIALS_MANIFEST_VERSION = 2
+
+
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+
+
+def get_serials_manifest_path():
+    """Return the path to the serials manifest file.
+
+    Returns:
+        unicode:
+        The value of :setting:`CACHE_SERIALS_MANIFEST`, or ``None`` if not
+        set.
+    """
+    return getattr(settings, 'CACHE_SERIALS_MANIFEST', None) or None
+
+
+def write_serials_manifest(path=None, locale_packages=None):
+    """Compute serial numbers and write them to a manifest file.
+
+    This is meant to be called at deploy time, after static media and
+    locales have been installed. It's normally run through the
+    :command:`generate-cache-serials` management command.
+
+    Args:
+        path (unicode, optional):
+            The path to write the manifest to. This defaults to
+            :setting:`CACHE_SERIALS_MANIFEST`.
+
+        locale_packages (list of unicode, optional):
+            The Python module paths of packages whose locale serials should
+            be included.
+
+    Returns:
+        dict:
+        The manifest that was written.
+
+    Raises:
+        ValueError:
+            A path was not provided, and :setting:`CACHE_SERIALS_MANIFEST`
+            is not set.
+
+        IOError:
+            The manifest could not be written.
+    """
+    path = path or get_serials_manifest_path()
+
+    if not path:
+        raise ValueError('A path for the serials manifest must be provided, '
+                         'or settings.CACHE_SERIALS_MANIFEST must be set.')
+
+    media_paths = _get_media_paths()
+    ajax_paths = _get_ajax_paths()
+    locales = {}
+
+    for package in locale_packages or []:
+        locale_path = _get_locale_path(package)
+
+        if locale_path is not None:
+            locales[package] = _build_manifest_entry(
+                [locale_path], _walk_serial([locale_path], '.mo'))
+
+    manifest = {
+        'version': SERIALS_MANIFEST_VERSION,
+        'generated': time.time(),
+        'media': _build_manifest_entry(media_paths,
+                                       _walk_serial(media_paths)),
+        'ajax': _build_manifest_entry(ajax_paths, _walk_serial(ajax_paths)),
+        'locales': locales,
+    }
+
+    # Write to a temporary file first, so that processes starting up during
+    # a deploy never see a partially-written manifest.
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.serials-manifest.',
+                                     dir=manifest_dir)
+
+    try:
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(manifest, fp, indent=2, sort_keys=True)
+
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+    _clear_manifest_cache()
+
+    return manifest
+
+
+def _load_manifest():
+    """Return the contents of the serials manifest.
+
+    The manifest is only read once per process.
+
+    Returns:
+        dict:
+        The manifest, or ``None`` if there's no usable manifest.
+    """
+    path = get_serials_manifest_path()
+
+    if not path:
+        return None
+
+    try:
+        return _manifest_cache[path]
+    except KeyError:
+        pass
+
+    with _manifest_lock:
+        if path not in _manifest_cache:
+            manifest = None
+
+            try:
+                with open(path, 'r') as fp:
+                    manifest = json.load(fp)
+            except (IOError, OSError) as e:
+                logger.debug('Serials manifest %s could not be read. '
+                             'Serials will be computed from the files on '
+                             'disk: %s',
+                             path, e)
+            except ValueError as e:
+                logger.warning('Serials manifest %s is not valid JSON. '
+                               'Serials will be computed from the files on '
+                               'disk: %s',
+                               path, e)
+
+            if (not isinstance(manifest, dict) or
+                manifest.get('version') != SERIALS_MANIFEST_VERSION):
+                manifest = None
+
+            _manifest_cache[path] = manifest
+
+        return _manifest_cache[path]
+
+
+def _clear_manifest_cache(**kwargs):
+    """Clear the loaded serials manifest.
+
+    The manifest will be read again the next time it's needed.
+
+    Args:
+        **kwargs (dict):
+            Keyword arguments passed by the signal, if called as a signal
+            handler.
+    """
+    _manifest_cache.clear()
+
+
+def _normalize_paths(paths):
+    """Return the given directories in a form stored in the manifest.
+
+    Args:
+        paths (list of unicode):
+            The paths to the directories.
+
+    Returns:
+        list of unicode:
+        The sorted absolute paths.
+    """
+    return sorted(
+        os.path.abspath(path)
+        for path in paths
+    )
+
+
+def _build_manifest_entry(paths, serial):
+    """Return a manifest entry for a serial number.
+
+    Args:
+        paths (list of unicode):
+            The directories the serial number was computed from.
+
+        serial (int):
+            The serial number.
+
+    Returns:
+        dict:
+        The manifest entry.
+    """
+    return {
+        'paths': _normalize_paths(paths),
+        'serial': serial,
+    }
+
+
+def _get_manifest_serial(paths, section, name=None):
+    """Return a serial number from the manifest.
+
+    Args:
+        paths (list of unicode):
+            The directories the serial number should be computed from.
+
+        section (unicode):
+            The section of the manifest containing the serial number.
+
+        name (unicode, optional):
+            The name of the serial number within the section, for sections
+            containing more than one.
+
+    Returns:
+        int:
+        The serial number, or ``None`` if there's no manifest, or the serial
+        number is missing, stale, or was computed from different
+        directories.
+    """
+    manifest = _load_manifest()
+
+    if manifest is None:
+        return None
+
+    entry = manifest.get(section)
+
+    if name is not None and isinstance(entry, dict):
+        entry = entry.get(name)
+
+    if (isinstance(entry, dict) and
+        entry.get('paths') == _normalize_paths(paths) and
+        not _is_modified_since(paths, manifest.get('generated', 0))):
+        return entry.get('serial')
+
+    return None
+
+
+def _is_modified_since(paths, timestamp):
+    """Return whether directories were modified after a given time.
+
+    This checks the directories and the directories directly within them.
+    It's a cheap check for files being added, removed or replaced, without
+    walking the trees.
+
+    Args:
+        paths (list of unicode):
+            The directories to check.
+
+        timestamp (float):
+            The time to compare against.
+
+    Returns:
+        bool:
+        ``True`` if any of the directories was modified after ``timestamp``.
+    """
+    for path in paths:
+        try:
+            if os.stat(path).st_mtime > timestamp:
+                return True
+
+            names = os.listdir(path)
+        except OSError:
+            # The directory doesn't exist, so it can't have changed.
+            continue
+
+        for name in names:
+            child_path = os.path.join(path, name)
+
+            if (os.path.isdir(child_path) and
+                os.stat(child_path).st_mtime > timestamp):
+                return True
+
+    return False
+
+
+def _walk_serial(paths, extension=None):
+    """Return the latest timestamp of all files in the given directories.
+
+    The serials manifest file is ignored, if it's in one of the
+    directories.
+
+    Args:
+        paths (list of unicode):
+            The directories to walk.
+
+        extension (unicode, optional):
+            The file extension to limit the search to.
+
+    Returns:
+        int:
+        The latest timestamp, or 0 if there are no files.
+    """
+    manifest_path = get_serials_manifest_path()
+
+    if manifest_path:
+        manifest_path = os.path.abspath(manifest_path)
+
+    serial = 0
+
+    for path in paths:
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                if extension and not name.endswith(extension):
+                    continue
+
+                file_path = os.path.join(root, name)
+
+                if (manifest_path and
+                    os.path.abspath(file_path) == manifest_path):
+                    continue
+
+                mtime = int(os.stat(file_path).st_mtime)
+
+                if mtime > serial:
+                    serial = mtime
+
+    return serial
+
+
+def _get_media_paths():
+    """Return the directories used for the media serial.
+
+    Returns:
+        list of unicode:
+        The directories within :django:setting:`STATIC_ROOT`.
+    """
+    media_dirs = getattr(settings, "MEDIA_SERIAL_DIRS", ["."])
+
+    return [
+        os.path.join(settings.STATIC_ROOT, media_dir)
+        for media_dir in media_dirs
+    ]
+
+
+def _get_ajax_paths():
+    """Return the directories used for the AJAX serial.
+
+    Returns:
+        list of unicode:
+        The template directories.
+    """
+    return list(getattr(settings, "TEMPLATE_DIRS", ["."]))
+
+
+def _get_locale_path(package):
+    """Return the locale directory for a package.
+
+    Args:
+        package (unicode):
+            The Python module path of the package.
+
+    Returns:
+        unicode:
+        The path to the package's :file:`locale` directory, or ``None`` if
+        the package could not be imported.
+    """
+    try:
+        p = importlib.import_module(package)
+        return os.path.join(os.path.dirname(p.__file__), 'locale')
+    except Exception as e:
+        logger.exception(
+            'Failed to import package %s to compute locale serial: %s',
+            package, e)
+        return None
+
+
 def generate_media_serial():
     """Generate a media serial number for static media files.
 
@@ -30,21 +413,18 @@ def generate_media_serial():
     :setting:`MEDIA_SERIAL_DIRS` if specified, or all of
     :django:setting:`STATIC_ROOT` otherwise), figuring out the latest
     timestamp, and return that value.
+
+    If a serial number is available in the serials manifest, it will be
+    used instead of crawling the files.
     """
     MEDIA_SERIAL = getattr(settings, "MEDIA_SERIAL", 0)
 
     if not MEDIA_SERIAL:
-        media_dirs = getattr(settings, "MEDIA_SERIAL_DIRS", ["."])
-
-        for media_dir in media_dirs:
-            media_path = os.path.join(settings.STATIC_ROOT, media_dir)
+        media_paths = _get_media_paths()
+        MEDIA_SERIAL = _get_manifest_serial(media_paths, 'media')
 
-            for root, dirs, files in os.walk(media_path):
-                for name in files:
-                    mtime = int(os.stat(os.path.join(root, name)).st_mtime)
-
-                    if mtime > MEDIA_SERIAL:
-                        MEDIA_SERIAL = mtime
+        if MEDIA_SERIAL is None:
+            MEDIA_SERIAL = _walk_serial(media_paths)
 
         setattr(settings, "MEDIA_SERIAL", MEDIA_SERIAL)
 
@@ -59,19 +439,18 @@ def generate_ajax_serial():
     This will crawl the template files (using directories in
     :django:setting:`TEMPLATE_DIRS`), figuring out the latest timestamp, and
     return that value.
+
+    If a serial number is available in the serials manifest, it will be
+    used instead of crawling the files.
     """
     AJAX_SERIAL = getattr(settings, "AJAX_SERIAL", 0)
 
     if not AJAX_SERIAL:
-        template_dirs = getattr(settings, "TEMPLATE_DIRS", ["."])
-
-        for template_path in template_dirs:
-            for root, dirs, files in os.walk(template_path):
-                for name in files:
-                    mtime = int(os.stat(os.path.join(root, name)).st_mtime)
+        template_paths = _get_ajax_paths()
+        AJAX_SERIAL = _get_manifest_serial(template_paths, 'ajax')
 
-                    if mtime > AJAX_SERIAL:
-                        AJAX_SERIAL = mtime
+        if AJAX_SERIAL is None:
+            AJAX_SERIAL = _walk_serial(template_paths)
 
         setattr(settings, "AJAX_SERIAL", AJAX_SERIAL)
 
@@ -85,6 +464,9 @@ def generate_locale_serial(packages):
     Unlike the other serial-generation functions, this will return the
     value, rather than setting it on ``settings``.
 
+    Serial numbers for packages found in the serials manifest will be used
+    instead of crawling their files.
+
     Args:
         packages (list of unicode):
             A list of Python module paths containing :file:`locale`
@@ -95,24 +477,19 @@ def generate_locale_serial(packages):
     """
     serial = 0
 
-    paths = []
     for package in packages:
-        try:
-            p = importlib.import_module(package)
-            path = os.path.join(os.path.dirname(p.__file__), 'locale')
-            paths.append(path)
-        except Exception as e:
-            logger.exception(
-                'Failed to import package %s to compute locale serial: %s',
-                package, e)
-
-    for locale_path in paths:
-        for root, dirs, files in os.walk(locale_path):
-            for name in files:
-                if name.endswith('.mo'):
-                    mtime = int(os.stat(os.path.join(root, name)).st_mtime)
-                    if mtime > serial:
-                        serial = mtime
+        locale_path = _get_locale_path(package)
+
+        if locale_path is None:
+            continue
+
+        package_serial = _get_manifest_serial([locale_path], 'locales',
+                                              package)
+
+        if package_serial is None:
+            package_serial = _walk_serial([locale_path], '.mo')
+
+        serial = max(serial, package_serial)
 
     return serial
 
@@ -129,3 +506,21 @@ def generate_cache_serials():
     """
     generate_media_serial()
     generate_ajax_serial()
+
+
+def _on_setting_changed(setting, **kwargs):
+    """Clear the loaded serials manifest when its path changes.
+
+    Args:
+        setting (unicode):
+            The name of the setting that changed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    if setting == 'CACHE_SERIALS_MANIFEST':
+        _clear_manifest_cache()
+
+
+setting_changed.connect(_on_setting_changed,
+                        dispatch_uid='djblets-serials-manifest-setting')
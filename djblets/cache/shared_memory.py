@@ -0,0 +1,444 @@
+"""Generation numbers shared between processes on the same host.
+
+When :setting:`CACHE_SYNC_SHARED_MEMORY_PATH` is set,
+:py:class:`~djblets.cache.synchronizer.GenerationSynchronizer` mirrors
+generation numbers into a small memory-mapped file at that path. All worker
+processes on the host map the same file, so a generation bumped by any of
+them is seen by the others through a memory read, without a cache request.
+
+Changes made on other hosts still travel through the shared cache. On each
+host, the generation for a key is re-read from the cache at most once every
+:setting:`CACHE_SYNC_SHARED_MEMORY_CHECK_INTERVAL` seconds (1, by default),
+by whichever process first notices it's due.
+
+This requires :py:mod:`fcntl`, and is not available on Windows.
+"""
+
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from hashlib import md5
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The default number of generation slots in the file.
+DEFAULT_SHARED_MEMORY_NUM_SLOTS = 1024
+
+#: The default number of seconds between checks of the shared cache.
+DEFAULT_SHARED_MEMORY_CHECK_INTERVAL = 1
+
+
+_HEADER = struct.Struct(b'<4sII')
+_HEADER_MAGIC = b'DJGS'
+_HEADER_VERSION = 1
+
+# Each slot contains a sequence number (odd while being written), the hash
+# of the cache key, the generation, and when the generation was last read
+# from the shared cache.
+_SLOT = struct.Struct(b'<QQqd')
+_SEQ = struct.Struct(b'<Q')
+
+# The number of times to retry reading a slot that's being written.
+_MAX_READ_ATTEMPTS = 100
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def _hash_key(cache_key):
+    """Return the hash identifying a cache key in the file.
+
+    Args:
+        cache_key (bytes or unicode):
+            The normalized cache key.
+
+    Returns:
+        int:
+        A non-zero 64-bit hash of the key.
+    """
+    if not isinstance(cache_key, bytes):
+        cache_key = cache_key.encode('utf-8')
+
+    key_hash = struct.unpack(b'<Q', md5(cache_key).digest()[:8])[0]
+
+    # 0 marks an empty slot.
+    return key_hash or 1
+
+
+class SharedMemoryGenerations(object):
+    """Generation numbers stored in a memory-mapped file.
+
+    Reads don't take any locks. Writers take an exclusive lock on the file,
+    and mark each slot with a sequence number while writing, so readers can
+    detect and retry partial reads.
+
+    Attributes:
+        path (unicode):
+            The path to the file.
+
+        num_slots (int):
+            The number of generation slots in the file. If all slots are in
+            use, new keys will be read directly from the shared cache.
+
+        check_interval (float):
+            The minimum number of seconds between reading a generation from
+            the shared cache.
+    """
+
+    def __init__(self, path, num_slots=DEFAULT_SHARED_MEMORY_NUM_SLOTS,
+                 check_interval=DEFAULT_SHARED_MEMORY_CHECK_INTERVAL):
+        """Initialize the generations.
+
+        The file is opened the first time it's needed.
+
+        Args:
+            path (unicode):
+                The path to the file. It will be created if needed.
+
+            num_slots (int, optional):
+                The number of generation slots in the file.
+
+            check_interval (float, optional):
+                The minimum number of seconds between reading a generation
+                from the shared cache.
+        """
+        self.path = path
+        self.num_slots = num_slots
+        self.check_interval = check_interval
+
+        self._fd = None
+        self._mmap = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def get_sync_gen(self, cache_key, fetch_sync_gen):
+        """Return the generation for a cache key.
+
+        If the generation was read from the shared cache within
+        :py:attr:`check_interval` seconds (by any process on the host), it's
+        returned from the file. Otherwise, it will be fetched using
+        ``fetch_sync_gen`` and stored in the file.
+
+        Args:
+            cache_key (bytes):
+                The normalized cache key for the generation.
+
+            fetch_sync_gen (callable):
+                A function returning the generation from the shared cache,
+                or ``None`` if it's not in the cache.
+
+        Returns:
+            int:
+            The generation, or ``None`` if it's not in the cache.
+        """
+        if not self._open():
+            return fetch_sync_gen()
+
+        key_hash = _hash_key(cache_key)
+        now = time.time()
+        index, sync_gen, checked_at = self._find_slot(key_hash)
+
+        if index is None or now - checked_at >= self.check_interval:
+            with self._locked():
+                index, sync_gen, checked_at = self._find_slot(key_hash)
+
+                if index is None:
+                    # There's no generation to keep using yet. Other
+                    # processes would read a placeholder as a missing
+                    # generation and expire their state, so they'll fetch
+                    # the generation themselves until it's stored.
+                    claimed = True
+                elif now - checked_at >= self.check_interval:
+                    # Claim the check, so that other processes keep using
+                    # the current generation while this one fetches it.
+                    self._write_slot(key_hash, sync_gen, now, index)
+                    claimed = True
+                else:
+                    claimed = False
+
+            if claimed:
+                sync_gen = fetch_sync_gen()
+                self.set_sync_gen(cache_key, sync_gen, now)
+
+                return sync_gen
+
+        return sync_gen or None
+
+    def set_sync_gen(self, cache_key, sync_gen, checked_at=None):
+        """Store the generation for a cache key.
+
+        Args:
+            cache_key (bytes):
+                The normalized cache key for the generation.
+
+            sync_gen (int):
+                The generation, or ``None`` if it's not in the cache.
+
+            checked_at (float, optional):
+                When the generation was read from the shared cache. This
+                defaults to now.
+        """
+        if not self._open():
+            return
+
+        if checked_at is None:
+            checked_at = time.time()
+
+        key_hash = _hash_key(cache_key)
+
+        with self._locked():
+            index = self._find_slot(key_hash)[0]
+            self._write_slot(key_hash, sync_gen or 0, checked_at, index)
+
+    def clear(self, cache_key):
+        """Clear the generation for a cache key.
+
+        The next check will read the generation from the shared cache.
+
+        Args:
+            cache_key (bytes):
+                The normalized cache key for the generation.
+        """
+        self.set_sync_gen(cache_key, None, 0)
+
+    def _open(self):
+        """Open and map the file, if not already open in this process.
+
+        Returns:
+            bool:
+            ``True`` if the file is available.
+        """
+        pid = os.getpid()
+
+        if self._pid == pid:
+            return self._mmap is not None
+
+        with self._lock:
+            if self._pid == pid:
+                return self._mmap is not None
+
+            # File locks are shared with the parent process after a fork, so
+            # each process needs to open the file itself.
+            if self._mmap is not None:
+                self._mmap.close()
+                os.close(self._fd)
+
+            self._fd = None
+            self._mmap = None
+
+            if fcntl is None:
+                logger.warning('Shared memory generations require fcntl, '
+                               'which is not available on this platform.')
+                self._pid = pid
+                return False
+
+            size = _HEADER.size + self.num_slots * _SLOT.size
+
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+
+                    try:
+                        if os.fstat(fd).st_size != size:
+                            os.ftruncate(fd, 0)
+                            os.ftruncate(fd, size)
+
+                        mm = mmap.mmap(fd, size)
+
+                        if _HEADER.unpack_from(mm, 0) != (
+                                _HEADER_MAGIC, _HEADER_VERSION,
+                                self.num_slots):
+                            mm[:] = b'\x00' * size
+                            _HEADER.pack_into(mm, 0, _HEADER_MAGIC,
+                                              _HEADER_VERSION, self.num_slots)
+                    finally:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                except Exception:
+                    os.close(fd)
+                    raise
+            except (IOError, OSError, ValueError) as e:
+                logger.error('Unable to open shared memory generations '
+                             'file %s: %s',
+                             self.path, e)
+                self._pid = pid
+                return False
+
+            self._fd = fd
+            self._mmap = mm
+            self._pid = pid
+
+        return True
+
+    @contextmanager
+    def _locked(self):
+        """Hold an exclusive lock on the file.
+
+        Context:
+            The lock is held.
+        """
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _get_slot_offset(self, index):
+        """Return the offset of a slot in the file.
+
+        Args:
+            index (int):
+                The index of the slot.
+
+        Returns:
+            int:
+            The offset of the slot.
+        """
+        return _HEADER.size + index * _SLOT.size
+
+    def _read_slot(self, index):
+        """Read a slot from the file.
+
+        Args:
+            index (int):
+                The index of the slot.
+
+        Returns:
+            tuple:
+            A 3-tuple of the key hash, generation and check timestamp.
+        """
+        mm = self._mmap
+        offset = self._get_slot_offset(index)
+
+        for i in range(_MAX_READ_ATTEMPTS):
+            seq, key_hash, sync_gen, checked_at = _SLOT.unpack_from(mm,
+                                                                   offset)
+
+            if not (seq & 1) and _SEQ.unpack_from(mm, offset)[0] == seq:
+                break
+
+        # If the slot never became consistent, a process must have stopped
+        # part-way through writing it. Use what's there.
+        return key_hash, sync_gen, checked_at
+
+    def _find_slot(self, key_hash):
+        """Find the slot for a key.
+
+        Args:
+            key_hash (int):
+                The hash of the cache key.
+
+        Returns:
+            tuple:
+            A 3-tuple of the index of the slot, the generation and the check
+            timestamp. If the key isn't in the file, this will be
+            ``(None, 0, 0)``.
+        """
+        start = key_hash % self.num_slots
+
+        for i in range(self.num_slots):
+            index = (start + i) % self.num_slots
+            slot_hash, sync_gen, checked_at = self._read_slot(index)
+
+            if slot_hash == key_hash:
+                return index, sync_gen, checked_at
+            elif slot_hash == 0:
+                break
+
+        return None, 0, 0
+
+    def _write_slot(self, key_hash, sync_gen, checked_at, index=None):
+        """Write a slot to the file.
+
+        The caller must hold the lock.
+
+        Args:
+            key_hash (int):
+                The hash of the cache key.
+
+            sync_gen (int):
+                The generation.
+
+            checked_at (float):
+                When the generation was read from the shared cache.
+
+            index (int, optional):
+                The index of the slot. If not provided, a free slot will be
+                claimed.
+
+        Returns:
+            int:
+            The index of the slot, or ``None`` if there are no free slots.
+        """
+        if index is None:
+            start = key_hash % self.num_slots
+
+            for i in range(self.num_slots):
+                candidate = (start + i) % self.num_slots
+
+                if self._read_slot(candidate)[0] == 0:
+                    index = candidate
+                    break
+            else:
+                return None
+
+        mm = self._mmap
+        offset = self._get_slot_offset(index)
+        seq = _SEQ.unpack_from(mm, offset)[0]
+
+        # Mark the slot as being written. The sequence number may already be
+        # odd, if a process stopped part-way through writing it.
+        seq |= 1
+        _SEQ.pack_into(mm, offset, seq)
+        _SLOT.pack_into(mm, offset, seq, key_hash, sync_gen, checked_at)
+        _SEQ.pack_into(mm, offset, seq + 1)
+
+        return index
+
+
+def get_shared_memory_generations():
+    """Return the shared memory generations, if enabled.
+
+    Returns:
+        SharedMemoryGenerations:
+        The generations for the file at
+        :setting:`CACHE_SYNC_SHARED_MEMORY_PATH`, or ``None`` if the setting
+        is not set.
+    """
+    path = getattr(settings, 'CACHE_SYNC_SHARED_MEMORY_PATH', None)
+
+    if not path:
+        return None
+
+    try:
+        return _instances[path]
+    except KeyError:
+        with _instances_lock:
+            if path not in _instances:
+                _instances[path] = SharedMemoryGenerations(
+                    path,
+                    num_slots=getattr(
+                        settings, 'CACHE_SYNC_SHARED_MEMORY_NUM_SLOTS',
+                        DEFAULT_SHARED_MEMORY_NUM_SLOTS),
+                    check_interval=getattr(
+                        settings, 'CACHE_SYNC_SHARED_MEMORY_CHECK_INTERVAL',
+                        DEFAULT_SHARED_MEMORY_CHECK_INTERVAL))
+
+            return _instances[path]
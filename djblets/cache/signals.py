@@ -0,0 +1,22 @@
+"""Cache-related signals."""
+
+
+from django.dispatch import Signal
+
+
+#: A cache statistic has been recorded.
+#:
+#: This is emitted for every statistic recorded through
+#: :py:mod:`djblets.cache.stats`, when :setting:`CACHE_STATS_ENABLED` is
+#: ``True``.
+#:
+#: Args:
+#:     family (unicode):
+#:         The key family the statistic belongs to.
+#:
+#:     stat (unicode):
+#:         The name of the statistic.
+#:
+#:     value (int or float):
+#:         The amount recorded.
+cache_stat_recorded = Signal(providing_args=['family', 'stat', 'value'])
@@ -0,0 +1,376 @@
+"""Statistics on cache usage.
+
+When :setting:`CACHE_STATS_ENABLED` is ``True``,
+:py:func:`~djblets.cache.backend.cache_memoize`,
+:py:func:`~djblets.cache.backend.cache_memoize_iter` and
+:py:class:`~djblets.cache.synchronizer.GenerationSynchronizer` record
+counters and timers, grouped by a key family. By default, the key family is
+the part of the cache key before the first ``:`` or digit (see
+:py:func:`get_key_family`), but callers can provide their own.
+
+The following statistics are recorded:
+
+``hits``:
+    The number of times a value was found in the cache.
+
+``local_hits``:
+    The number of hits served by the process-local cache. These are also
+    counted in ``hits``.
+
+``misses``:
+    The number of times a value had to be computed.
+
+``recompute_time``:
+    The total number of seconds spent computing values. For
+    :py:func:`~djblets.cache.backend.cache_memoize_iter`, this includes time
+    spent by the caller between items.
+
+``bytes_stored``:
+    The total number of serialized bytes stored in the cache.
+
+``chunks_stored`` and ``chunks_read``:
+    The number of large data chunks stored and read.
+
+``missing_chunks``:
+    The number of times large data couldn't be read because a chunk was
+    missing.
+
+``abandoned``:
+    The number of times a consumer stopped iterating over a
+    :py:func:`~djblets.cache.backend.cache_memoize_iter` generator before
+    all computed items were yielded.
+
+``background_completions``:
+    The number of abandoned generators whose remaining items were stored in
+    the background. See :py:mod:`djblets.cache.background`.
+
+``background_failures``:
+    The number of abandoned generators that failed while being stored in
+    the background.
+
+``background_rejections``:
+    The number of abandoned generators that were discarded, because too many
+    were already being stored in the background.
+
+``sync_checks``, ``sync_expirations`` and ``sync_updates``:
+    The number of generation checks, expired generations and generation
+    updates for a :py:class:`~djblets.cache.synchronizer.
+    GenerationSynchronizer`.
+
+Statistics are kept per-process, and are available through
+:py:func:`get_cache_stats`. Each recorded statistic also emits the
+:py:data:`~djblets.cache.signals.cache_stat_recorded` signal. Every
+:setting:`CACHE_STATS_PUBLISH_INTERVAL` seconds (60, by default), each
+process publishes its statistics to the shared cache, where
+:py:func:`get_published_cache_stats` and the ``cache-stats`` management
+command can combine them.
+"""
+
+
+import logging
+import os
+import re
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from djblets.cache.signals import cache_stat_recorded
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The default number of seconds between publishing statistics.
+DEFAULT_CACHE_STATS_PUBLISH_INTERVAL = 60
+
+#: The base cache key used for published statistics.
+CACHE_STATS_KEY = 'djblets-cache-stats'
+
+#: The number of seconds published statistics are kept in the cache.
+CACHE_STATS_EXPIRATION = 60 * 60 * 24  # 1 day
+
+
+_KEY_FAMILY_RE = re.compile(r'^[^:0-9]*')
+
+
+def get_key_family(key):
+    """Return the default key family for a cache key.
+
+    This is the part of the key before the first ``:`` or digit, with any
+    trailing separators removed. For example, ``diff-file-123:abc`` will be
+    in the ``diff-file`` family.
+
+    Args:
+        key (unicode):
+            The base cache key.
+
+    Returns:
+        unicode:
+        The key family.
+    """
+    if isinstance(key, bytes):
+        key = key.decode('utf-8', 'replace')
+
+    return _KEY_FAMILY_RE.match(key).group(0).rstrip('-_./') or 'other'
+
+
+def is_cache_stats_enabled():
+    """Return whether cache statistics are being recorded.
+
+    Returns:
+        bool:
+        The value of :setting:`CACHE_STATS_ENABLED`.
+    """
+    return getattr(settings, 'CACHE_STATS_ENABLED', False)
+
+
+def merge_cache_stats(snapshots):
+    """Combine several snapshots of statistics.
+
+    Args:
+        snapshots (list of dict):
+            The snapshots to combine, each mapping key families to
+            dictionaries of statistics.
+
+    Returns:
+        dict:
+        A dictionary mapping key families to the summed statistics.
+    """
+    result = {}
+
+    for snapshot in snapshots:
+        for family, stats in snapshot.items():
+            family_stats = result.setdefault(family, {})
+
+            for stat, value in stats.items():
+                family_stats[stat] = family_stats.get(stat, 0) + value
+
+    return result
+
+
+class CacheStats(object):
+    """Statistics on cache usage for a process.
+
+    Attributes:
+        instance_id (unicode):
+            The ID identifying this process's statistics in the shared cache.
+
+        publish_interval (int):
+            The number of seconds between publishing statistics to the shared
+            cache. If 0, statistics are only published when calling
+            :py:meth:`publish`.
+    """
+
+    def __init__(self, publish_interval=DEFAULT_CACHE_STATS_PUBLISH_INTERVAL,
+                 instance_id=None):
+        """Initialize the statistics.
+
+        Args:
+            publish_interval (int, optional):
+                The number of seconds between publishing statistics to the
+                shared cache.
+
+            instance_id (unicode, optional):
+                The ID identifying this process's statistics in the shared
+                cache. This defaults to the hostname and process ID.
+        """
+        self.publish_interval = publish_interval
+        self.instance_id = (instance_id or
+                            '%s:%s' % (socket.gethostname(), os.getpid()))
+
+        self._families = {}
+        self._lock = threading.Lock()
+        self._next_publish = time.time() + publish_interval
+
+    def record(self, family, stat, value=1):
+        """Record a statistic.
+
+        Args:
+            family (unicode):
+                The key family the statistic belongs to.
+
+            stat (unicode):
+                The name of the statistic.
+
+            value (int or float, optional):
+                The amount to add to the statistic.
+        """
+        with self._lock:
+            try:
+                stats = self._families[family]
+            except KeyError:
+                stats = self._families[family] = {}
+
+            stats[stat] = stats.get(stat, 0) + value
+
+        cache_stat_recorded.send(sender=self, family=family, stat=stat,
+                                 value=value)
+
+        if self.publish_interval and time.time() >= self._next_publish:
+            self.publish()
+
+    def get_family_stats(self, family):
+        """Return the statistics for a key family.
+
+        Args:
+            family (unicode):
+                The key family.
+
+        Returns:
+            dict:
+            A copy of the statistics for the key family.
+        """
+        with self._lock:
+            return dict(self._families.get(family, {}))
+
+    def snapshot(self):
+        """Return a snapshot of all statistics.
+
+        Returns:
+            dict:
+            A dictionary mapping key families to copies of their statistics.
+        """
+        with self._lock:
+            return dict(
+                (family, dict(stats))
+                for family, stats in self._families.items()
+            )
+
+    def reset(self):
+        """Reset all statistics for this process."""
+        with self._lock:
+            self._families = {}
+
+    def publish(self):
+        """Publish this process's statistics to the shared cache.
+
+        Failures are logged and otherwise ignored.
+        """
+        # This is imported here to avoid a circular import with
+        # djblets.cache.backend.
+        from djblets.cache.backend import make_cache_key
+
+        self._next_publish = time.time() + self.publish_interval
+
+        try:
+            cache.set(_get_instance_key(self.instance_id),
+                      self.snapshot(),
+                      CACHE_STATS_EXPIRATION)
+
+            # The index isn't updated atomically, so another process adding
+            # itself at the same time may drop this process from it. That's
+            # repaired the next time this process publishes, since the index
+            # is checked every time.
+            index_key = make_cache_key(CACHE_STATS_KEY)
+            instance_ids = cache.get(index_key) or []
+
+            if self.instance_id not in instance_ids:
+                # Prune processes whose statistics have expired, so the
+                # index doesn't grow as processes come and go.
+                published = cache.get_many([
+                    _get_instance_key(instance_id)
+                    for instance_id in instance_ids
+                ])
+                instance_ids = [
+                    instance_id
+                    for instance_id in instance_ids
+                    if _get_instance_key(instance_id) in published
+                ]
+
+                cache.set(index_key, instance_ids + [self.instance_id],
+                          CACHE_STATS_EXPIRATION)
+        except Exception as e:
+            logger.warning('Unable to publish cache statistics: %s', e)
+
+
+def record_cache_stat(family, stat, value=1):
+    """Record a statistic, if statistics are enabled.
+
+    Args:
+        family (unicode):
+            The key family the statistic belongs to.
+
+        stat (unicode):
+            The name of the statistic.
+
+        value (int or float, optional):
+            The amount to add to the statistic.
+    """
+    if is_cache_stats_enabled():
+        cache_stats.record(family, stat, value)
+
+
+def get_cache_stats():
+    """Return the statistics for this process.
+
+    Returns:
+        dict:
+        A dictionary mapping key families to dictionaries of statistics.
+    """
+    return cache_stats.snapshot()
+
+
+def get_published_cache_stats():
+    """Return the statistics published by all processes.
+
+    Returns:
+        dict:
+        A dictionary mapping key families to dictionaries of statistics,
+        summed across all processes.
+    """
+    from djblets.cache.backend import make_cache_key
+
+    instance_ids = cache.get(make_cache_key(CACHE_STATS_KEY)) or []
+
+    if not instance_ids:
+        return {}
+
+    # Processes whose statistics have expired are skipped.
+    snapshots = cache.get_many([
+        _get_instance_key(instance_id)
+        for instance_id in instance_ids
+    ])
+
+    return merge_cache_stats(snapshots.values())
+
+
+def clear_published_cache_stats():
+    """Clear the statistics published by all processes.
+
+    Processes will continue to publish their own statistics, so this is
+    mostly useful along with resetting each process's statistics.
+    """
+    from djblets.cache.backend import make_cache_key
+
+    index_key = make_cache_key(CACHE_STATS_KEY)
+    instance_ids = cache.get(index_key) or []
+
+    cache.delete_many([index_key] + [
+        _get_instance_key(instance_id)
+        for instance_id in instance_ids
+    ])
+
+
+def _get_instance_key(instance_id):
+    """Return the cache key for a process's published statistics.
+
+    Args:
+        instance_id (unicode):
+            The ID identifying the process's statistics.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    from djblets.cache.backend import make_cache_key
+
+    return make_cache_key('%s:%s' % (CACHE_STATS_KEY, instance_id))
+
+
+#: The statistics for this process.
+cache_stats = CacheStats(
+    publish_interval=getattr(settings, 'CACHE_STATS_PUBLISH_INTERVAL',
+                             DEFAULT_CACHE_STATS_PUBLISH_INTERVAL))
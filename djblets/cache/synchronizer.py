@@ -1,10 +1,196 @@
 
 
+import threading
 import time
+import weakref
 from datetime import datetime
 
+from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+
 from djblets.cache.backend import make_cache_key
+from djblets.cache.shared_memory import get_shared_memory_generations
+from djblets.cache.stats import get_key_family, record_cache_stat
+
+
+class GenerationSynchronizerRegistry(object):
+    """Batches generation checks across all synchronizers.
+
+    Every :py:class:`GenerationSynchronizer` registers itself here. During
+    an HTTP request, the first call to
+    :py:meth:`GenerationSynchronizer.is_expired` fetches the generations for
+    all registered synchronizers in a single ``get_many``, and other checks
+    in the same request use those results. This keeps synchronization to one
+    cache round-trip per request, no matter how many synchronizers exist.
+
+    If :py:attr:`min_check_interval` is set, fetched generations are reused
+    for that many seconds, across requests and outside of requests. This
+    trades how quickly changes from other processes are noticed for fewer
+    cache requests.
+
+    Fetched generations are never used for a synchronizer that has fetched
+    or updated its own generation since, so a synchronizer always sees its
+    own updates.
+
+    Attributes:
+        min_check_interval (float):
+            The minimum number of seconds between fetching generations. If
+            0, generations are fetched once per request, and fetched
+            directly outside of requests.
+    """
+
+    def __init__(self, min_check_interval=0):
+        """Initialize the registry.
+
+        Args:
+            min_check_interval (float, optional):
+                The minimum number of seconds between fetching generations.
+        """
+        self.min_check_interval = min_check_interval
+
+        self._synchronizers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __len__(self):
+        """Return the number of registered synchronizers.
+
+        Returns:
+            int:
+            The number of registered synchronizers.
+        """
+        return len(self._synchronizers)
+
+    def register(self, gen_sync):
+        """Register a synchronizer.
+
+        Synchronizers are held weakly, and are unregistered once they're no
+        longer used.
+
+        Args:
+            gen_sync (GenerationSynchronizer):
+                The synchronizer to register.
+        """
+        with self._lock:
+            self._synchronizers.add(gen_sync)
+
+    def unregister(self, gen_sync):
+        """Unregister a synchronizer.
+
+        Args:
+            gen_sync (GenerationSynchronizer):
+                The synchronizer to unregister.
+        """
+        with self._lock:
+            self._synchronizers.discard(gen_sync)
+
+    def get_latest_sync_gen(self, gen_sync):
+        """Return the latest generation for a synchronizer.
+
+        This will use the batched generations if possible, fetching them for
+        all registered synchronizers if needed. Otherwise, the generation is
+        fetched directly.
+
+        Args:
+            gen_sync (GenerationSynchronizer):
+                The synchronizer to return the generation for.
+
+        Returns:
+            int:
+            The latest generation ID from cache, or ``None`` if it's not in
+            the cache.
+        """
+        local = self._local
+        now = time.time()
+        sync_gens = getattr(local, 'sync_gens', None)
+        fetched_at = getattr(local, 'fetched_at', 0)
+
+        if (sync_gens is None or
+            (not getattr(local, 'in_request', False) and
+             now - fetched_at >= self.min_check_interval)):
+            if (not getattr(local, 'in_request', False) and
+                not self.min_check_interval):
+                return gen_sync._get_latest_sync_gen()
+
+            sync_gens, fetched_at = self._fetch_sync_gens(now)
+
+        if (fetched_at < gen_sync._synced_at or
+            gen_sync.cache_key not in sync_gens):
+            # The synchronizer has newer information than the batch, or
+            # was created after it was fetched.
+            return gen_sync._get_latest_sync_gen()
+
+        return sync_gens[gen_sync.cache_key]
+
+    def reset(self):
+        """Discard the batched generations for the current thread.
+
+        The next check will fetch the generations again.
+        """
+        self._local.sync_gens = None
+
+    def _fetch_sync_gens(self, now):
+        """Fetch the generations for all registered synchronizers.
+
+        Args:
+            now (float):
+                The current timestamp.
+
+        Returns:
+            tuple:
+            A 2-tuple of a dictionary mapping each cache key to its
+            generation (or ``None``), and the timestamp of the fetch.
+        """
+        with self._lock:
+            cache_keys = set(
+                gen_sync.cache_key
+                for gen_sync in self._synchronizers
+            )
+
+        sync_gens = dict.fromkeys(cache_keys)
+        sync_gens.update(cache.get_many(list(cache_keys)))
+
+        self._local.sync_gens = sync_gens
+        self._local.fetched_at = now
+
+        return sync_gens, now
+
+    def _on_request_started(self, **kwargs):
+        """Handle the start of an HTTP request.
+
+        Generations will be fetched on the next check, unless they were
+        fetched within :py:attr:`min_check_interval` seconds.
+
+        Args:
+            **kwargs (dict):
+                Keyword arguments passed by the signal.
+        """
+        local = self._local
+        local.in_request = True
+
+        if time.time() - getattr(local, 'fetched_at', 0) >= \
+           self.min_check_interval:
+            local.sync_gens = None
+
+    def _on_request_finished(self, **kwargs):
+        """Handle the end of an HTTP request.
+
+        Args:
+            **kwargs (dict):
+                Keyword arguments passed by the signal.
+        """
+        self._local.in_request = False
+
+
+#: The registry batching generation checks for all synchronizers.
+sync_registry = GenerationSynchronizerRegistry(
+    min_check_interval=getattr(settings, 'CACHE_SYNC_MIN_CHECK_INTERVAL', 0))
+
+request_started.connect(sync_registry._on_request_started,
+                        dispatch_uid='djblets-sync-registry-request-started')
+request_finished.connect(sync_registry._on_request_finished,
+                         dispatch_uid='djblets-sync-registry-request-finished')
 
 
 class GenerationSynchronizer(object):
@@ -29,6 +215,13 @@ class GenerationSynchronizer(object):
     then call :py:meth:`refresh` to refresh the instance's counter from the
     cache.
 
+    Generation checks for all synchronizers are batched by
+    :py:data:`sync_registry`. See :py:class:`GenerationSynchronizerRegistry`.
+
+    If :setting:`CACHE_SYNC_SHARED_MEMORY_PATH` is set, generations are also
+    mirrored into memory shared by all processes on the host, which avoids
+    most cache requests for checks. See :py:mod:`djblets.cache.shared_memory`.
+
     Attributes:
         sync_gen (int):
             The synchronization generation number last fetched or set by
@@ -53,13 +246,18 @@ class GenerationSynchronizer(object):
                 reduces changes of colliding with keys from other services.
                 This is enabled by default.
         """
+        self._stats_family = get_key_family(cache_key)
+
         if normalize_cache_key:
             cache_key = make_cache_key(cache_key)
 
         self.cache_key = cache_key
         self.sync_gen = None
+        self._synced_at = 0
+        self._shared_gens = get_shared_memory_generations()
 
         self._fetch_or_create_sync_gen()
+        sync_registry.register(self)
 
     def is_expired(self):
         """Return whether the current state has expired.
@@ -69,10 +267,22 @@ class GenerationSynchronizer(object):
             ``True`` if the state has expired. ``False`` if this has the
             latest cached generation.
         """
-        sync_gen = self._get_latest_sync_gen()
+        if self._shared_gens is None:
+            sync_gen = sync_registry.get_latest_sync_gen(self)
+        else:
+            sync_gen = self._shared_gens.get_sync_gen(
+                self.cache_key,
+                lambda: sync_registry.get_latest_sync_gen(self))
+
+        expired = (sync_gen is None or
+                   (type(sync_gen) is int and sync_gen != self.sync_gen))
+
+        record_cache_stat(self._stats_family, 'sync_checks')
 
-        return (sync_gen is None or
-                (type(sync_gen) is int and sync_gen != self.sync_gen))
+        if expired:
+            record_cache_stat(self._stats_family, 'sync_expirations')
+
+        return expired
 
     def refresh(self):
         """Refresh the generation ID from cache.
@@ -88,6 +298,10 @@ class GenerationSynchronizer(object):
         re-fetch and store the cache state.
         """
         cache.delete(self.cache_key)
+        self._synced_at = time.time()
+
+        if self._shared_gens is not None:
+            self._shared_gens.clear(self.cache_key)
 
     def mark_updated(self):
         """Mark the synchronized state as having been updated.
@@ -95,6 +309,8 @@ class GenerationSynchronizer(object):
         All other processes will find their state expired, and will need to
         re-update.
         """
+        record_cache_stat(self._stats_family, 'sync_updates')
+
         try:
             self._increment_sync_gen()
         except ValueError:
@@ -103,6 +319,10 @@ class GenerationSynchronizer(object):
     def _increment_sync_gen(self):
         """Increment the synchronization generation ID."""
         self.sync_gen = cache.incr(self.cache_key)
+        self._synced_at = time.time()
+
+        if self._shared_gens is not None:
+            self._shared_gens.set_sync_gen(self.cache_key, self.sync_gen)
 
     def _fetch_or_create_sync_gen(self):
         """Return or create a new synchronization generation ID.
@@ -114,9 +334,14 @@ class GenerationSynchronizer(object):
 
         if cache.add(self.cache_key, sync_gen):
             self.sync_gen = sync_gen
+
+            if self._shared_gens is not None:
+                self._shared_gens.set_sync_gen(self.cache_key, sync_gen)
         else:
             self.sync_gen = self._get_latest_sync_gen()
 
+        self._synced_at = time.time()
+
     def _get_latest_sync_gen(self):
         """Return the latest synchronization generation ID.
 
@@ -1,15 +1,33 @@
 
 
 import inspect
+import random
+import string
+import time
 import zlib
 
+from django.contrib.sites.models import Site
 from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.test.utils import override_settings
 from django.utils.six.moves import cPickle as pickle
 from kgb import SpyAgency
-
-from djblets.cache.backend import (cache_memoize, cache_memoize_iter,
-                                   make_cache_key,
-                                   CACHE_CHUNK_SIZE)
+from mock import patch
+
+from djblets.cache.background import (BackgroundCompletionPool,
+                                      get_background_completion_pool)
+from djblets.cache.backend import (_clear_cache_key_prefix, cache_memoize,
+                                   cache_memoize_iter, cache_memoize_many,
+                                   get_cache_max_value_size,
+                                   invalidate_cache_namespace, make_cache_key,
+                                   make_cache_keys, CACHE_CHUNK_SIZE)
+from djblets.cache.codecs import (NoCompressionCodec, ZlibCodec,
+                                  build_codec_header)
+from djblets.cache.forwarding_backend import ForwardingCacheBackend
+from djblets.cache.local_cache import get_value_size, local_cache
+from djblets.cache.stats import cache_stats
 from djblets.testing.testcases import TestCase
 
 
@@ -18,6 +36,12 @@ class CacheTests(SpyAgency, TestCase):
         super(CacheTests, self).tearDown()
 
         cache.clear()
+        local_cache.clear()
+
+        # Database changes to the Site are rolled back without any signals,
+        # so make sure the next test doesn't see a stale Site or prefix.
+        Site.objects.clear_cache()
+        _clear_cache_key_prefix()
 
     def test_cache_memoize(self):
         """Testing cache_memoize"""
@@ -36,13 +60,300 @@ class CacheTests(SpyAgency, TestCase):
         result = cache_memoize(cacheKey, cacheFunc)
         self.assertEqual(result, testStr)
 
+    def test_cache_memoize_with_local_cache(self):
+        """Testing cache_memoize with use_local_cache=True"""
+        cache_key = 'abc123'
+        data = {'a': 1}
+
+        def cache_func():
+            return data
+
+        self.spy_on(cache_func, call_original=True)
+
+        result = cache_memoize(cache_key, cache_func, use_local_cache=True)
+        self.assertEqual(result, data)
+        self.assertEqual(len(cache_func.spy.calls), 1)
+        self.assertIn(make_cache_key(cache_key), local_cache)
+        self.assertEqual(cache.get(make_cache_key(cache_key)), data)
+
+        # The second call should be served from the local cache without
+        # touching the shared cache.
+        self.spy_on(cache.get)
+
+        result = cache_memoize(cache_key, cache_func, use_local_cache=True)
+        self.assertIs(result, data)
+        self.assertEqual(len(cache_func.spy.calls), 1)
+        self.assertFalse(cache.get.spy.called)
+
+    def test_cache_memoize_with_local_cache_expiration(self):
+        """Testing cache_memoize with use_local_cache=True caps
+        local_expiration to expiration
+        """
+        self.spy_on(local_cache.set)
+
+        cache_memoize('abc123', lambda: 'Test 123',
+                      expiration=10,
+                      use_local_cache=True,
+                      local_expiration=60)
+
+        self.assertEqual(local_cache.set.spy.last_call.args[2], 10)
+
+    def test_cache_memoize_with_local_cache_and_force_overwrite(self):
+        """Testing cache_memoize with use_local_cache=True and
+        force_overwrite=True invalidates the local caches
+        """
+        local_key = make_cache_key('abc123')
+
+        cache_memoize('abc123', lambda: 'Test 123', use_local_cache=True)
+        self.assertEqual(local_cache.get(local_key), 'Test 123')
+
+        self.spy_on(local_cache.invalidate)
+
+        result = cache_memoize('abc123', lambda: 'Test 456',
+                               force_overwrite=True,
+                               use_local_cache=True)
+        self.assertEqual(result, 'Test 456')
+        self.assertEqual(len(local_cache.invalidate.spy.calls), 1)
+        self.assertEqual(local_cache.get(local_key), 'Test 456')
+        self.assertEqual(cache.get(local_key), 'Test 456')
+
+    def test_cache_memoize_with_local_cache_and_stats(self):
+        """Testing cache_memoize with use_local_cache=True and cache
+        statistics only measures the value once
+        """
+        data = {'a': 1}
+        self.spy_on(get_value_size)
+        self.spy_on(local_cache.set)
+
+        with override_settings(CACHE_STATS_ENABLED=True):
+            cache_stats.reset()
+            cache_memoize('abc123', lambda: data, use_local_cache=True)
+
+        cache_stats.reset()
+
+        self.assertEqual(len(get_value_size.spy.calls), 1)
+        self.assertEqual(local_cache.set.spy.last_call.kwargs['size'],
+                         len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+
+    def test_cache_memoize_with_stampede_protection(self):
+        """Testing cache_memoize with stampede_protection=True acquires and
+        releases the lease
+        """
+        cache_key = 'abc123'
+        lease_key = make_cache_key('%s:lease' % cache_key)
+        lease_states = []
+
+        def cache_func():
+            now = time.time()
+            lease_states.append(lease_key in cache)
+
+            with patch('time.time', return_value=now + 29):
+                lease_states.append(lease_key in cache)
+
+            with patch('time.time', return_value=now + 31):
+                lease_states.append(lease_key in cache)
+
+            return 'Test 123'
+
+        result = cache_memoize(cache_key, cache_func,
+                               stampede_protection=True)
+        self.assertEqual(result, 'Test 123')
+
+        # The lease was held for 30 seconds while computing the result, and
+        # released afterward.
+        self.assertEqual(lease_states, [True, True, False])
+        self.assertNotIn(lease_key, cache)
+
+    def test_cache_memoize_with_stampede_protection_waits(self):
+        """Testing cache_memoize with stampede_protection=True waits for
+        the lease holder's result
+        """
+        cache_key = 'abc123'
+        cache.add(make_cache_key('%s:lease' % cache_key), 1)
+
+        def _sleep(seconds):
+            cache.set(make_cache_key(cache_key), 'Other 123')
+
+        def cache_func():
+            return 'Test 123'
+
+        self.spy_on(cache_func, call_original=True)
+
+        with patch('time.sleep', side_effect=_sleep):
+            result = cache_memoize(cache_key, cache_func,
+                                   stampede_protection=True)
+
+        self.assertEqual(result, 'Other 123')
+        self.assertFalse(cache_func.spy.called)
+
+    def test_cache_memoize_with_stampede_protection_wait_timeout(self):
+        """Testing cache_memoize with stampede_protection=True computes the
+        value when the lease holder takes too long
+        """
+        cache_key = 'abc123'
+        lease_key = make_cache_key('%s:lease' % cache_key)
+        cache.add(lease_key, 1)
+
+        result = cache_memoize(cache_key, lambda: 'Test 123',
+                               stampede_protection=True,
+                               lease_wait_time=0)
+
+        self.assertEqual(result, 'Test 123')
+        self.assertEqual(cache.get(make_cache_key(cache_key)), 'Test 123')
+
+        # The lease belongs to the other process, and must be left alone.
+        self.assertIn(lease_key, cache)
+
+    def test_cache_memoize_with_soft_expiration_stale(self):
+        """Testing cache_memoize with soft_expiration returns stale data while
+        another process refreshes it
+        """
+        cache_key = 'abc123'
+
+        cache_memoize(cache_key, lambda: 'Old 123', soft_expiration=60)
+        cache.add(make_cache_key('%s:lease' % cache_key), 1)
+
+        with patch('time.time', return_value=time.time() + 120):
+            result = cache_memoize(cache_key, lambda: 'New 123',
+                                   soft_expiration=60)
+
+        self.assertEqual(result, 'Old 123')
+
+    def test_cache_memoize_with_soft_expiration_refresh(self):
+        """Testing cache_memoize with soft_expiration refreshes stale data"""
+        cache_key = 'abc123'
+
+        cache_memoize(cache_key, lambda: 'Old 123', soft_expiration=60)
+
+        result = cache_memoize(cache_key, lambda: 'New 123',
+                               soft_expiration=60)
+        self.assertEqual(result, 'Old 123')
+
+        with patch('time.time', return_value=time.time() + 120):
+            result = cache_memoize(cache_key, lambda: 'New 123',
+                                   soft_expiration=60)
+
+        self.assertEqual(result, 'New 123')
+        self.assertEqual(cache.get(make_cache_key(cache_key)), 'New 123')
+        self.assertNotIn(make_cache_key('%s:lease' % cache_key), cache)
+
+    def test_cache_memoize_with_early_refresh(self):
+        """Testing cache_memoize with early_refresh_beta refreshes data
+        before it expires
+        """
+        cache_key = 'abc123'
+
+        cache_memoize(cache_key, lambda: 'Old 123', early_refresh_beta=1.0)
+        cache.set(make_cache_key('%s:meta' % cache_key),
+                  (time.time() + 10, 5.0))
+
+        # With a random value of 0, the refresh time is never moved earlier.
+        with patch('random.random', return_value=0.0):
+            result = cache_memoize(cache_key, lambda: 'New 123',
+                                   early_refresh_beta=1.0)
+
+        self.assertEqual(result, 'Old 123')
+
+        # With a random value close to 1, the refresh time is moved far
+        # enough back to trigger a refresh.
+        with patch('random.random', return_value=0.999):
+            result = cache_memoize(cache_key, lambda: 'New 123',
+                                   early_refresh_beta=1.0)
+
+        self.assertEqual(result, 'New 123')
+
+    def test_cache_memoize_iter_with_soft_expiration_refresh(self):
+        """Testing cache_memoize_iter with soft_expiration refreshes stale
+        data
+        """
+        cache_key = 'abc123'
+
+        result = list(cache_memoize_iter(cache_key, lambda: ['a', 'b'],
+                                         soft_expiration=60))
+        self.assertEqual(result, ['a', 'b'])
+
+        result = list(cache_memoize_iter(cache_key, lambda: ['c', 'd'],
+                                         soft_expiration=60))
+        self.assertEqual(result, ['a', 'b'])
+
+        with patch('time.time', return_value=time.time() + 120):
+            result = list(cache_memoize_iter(cache_key, lambda: ['c', 'd'],
+                                             soft_expiration=60))
+
+        self.assertEqual(result, ['c', 'd'])
+        self.assertNotIn(make_cache_key('%s:lease' % cache_key), cache)
+
+        result = list(cache_memoize_iter(cache_key, lambda: ['e', 'f'],
+                                         soft_expiration=60))
+        self.assertEqual(result, ['c', 'd'])
+
+    def test_cache_memoize_many(self):
+        """Testing cache_memoize_many"""
+        cache.set(make_cache_key('key1'), 'cached1')
+
+        def cache_func():
+            return 'computed2'
+
+        self.spy_on(cache_func, call_original=True)
+        self.spy_on(cache.get_many)
+        self.spy_on(cache.set_many)
+
+        result = cache_memoize_many({
+            'key1': lambda: 'computed1',
+            'key2': cache_func,
+        })
+
+        self.assertEqual(result, {
+            'key1': 'cached1',
+            'key2': 'computed2',
+        })
+        self.assertEqual(len(cache_func.spy.calls), 1)
+        self.assertEqual(len(cache.get_many.spy.calls), 1)
+        self.assertEqual(len(cache.set_many.spy.calls), 1)
+        self.assertEqual(cache.set_many.spy.last_call.args[0],
+                         {make_cache_key('key2'): 'computed2'})
+
+        # The computed value should be shared with cache_memoize.
+        self.assertEqual(cache_memoize('key2', lambda: 'new2'), 'computed2')
+
+    def test_cache_memoize_many_all_cached(self):
+        """Testing cache_memoize_many with all keys cached"""
+        cache.set(make_cache_key('key1'), 'cached1')
+        self.spy_on(cache.set_many)
+
+        result = cache_memoize_many({
+            'key1': lambda: 'computed1',
+        })
+
+        self.assertEqual(result, {'key1': 'cached1'})
+        self.assertFalse(cache.set_many.spy.called)
+
+    def test_cache_memoize_many_with_max_workers(self):
+        """Testing cache_memoize_many with max_workers"""
+        keys_to_callables = dict(
+            ('key%d' % i, lambda i=i: 'value%d' % i)
+            for i in range(10)
+        )
+
+        result = cache_memoize_many(keys_to_callables, max_workers=4)
+
+        self.assertEqual(result, dict(
+            ('key%d' % i, 'value%d' % i)
+            for i in range(10)
+        ))
+        self.assertEqual(cache.get(make_cache_key('key9')), 'value9')
+
+    @override_settings(CACHE_MAX_VALUE_SIZE=CACHE_CHUNK_SIZE)
     def test_cache_memoize_large_files_uncompressed(self):
         """Testing cache_memoize with large files without compression"""
         cache_key = 'abc123'
 
-        # This takes into account the size of the pickle data, and will
-        # get us to exactly 2 chunks of data in cache.
-        data, pickled_data = self._build_test_chunk_data(num_chunks=2)
+        # This takes into account the size of the pickle data and codec
+        # header, and will get us to exactly 2 chunks of data in cache.
+        header = build_codec_header(NoCompressionCodec())
+        data, pickled_data = self._build_test_chunk_data(
+            num_chunks=2,
+            header_len=len(header))
 
         def cache_func():
             return data
@@ -64,7 +375,7 @@ class CacheTests(SpyAgency, TestCase):
 
         # Verify the contents of the stored data.
         stored_data = b''.join(cache.get(cache_key_0) + cache.get(cache_key_1))
-        self.assertEqual(stored_data, pickled_data)
+        self.assertEqual(stored_data, header + pickled_data)
 
         # Try fetching the data we stored.
         cache_func.spy.reset_calls()
@@ -74,6 +385,7 @@ class CacheTests(SpyAgency, TestCase):
         self.assertEqual(result, data)
         self.assertFalse(cache_func.spy.called)
 
+    @override_settings(CACHE_MAX_VALUE_SIZE=CACHE_CHUNK_SIZE)
     def test_cache_memoize_large_files_uncompressed_off_by_one(self):
         """Testing cache_memoize with large files without compression and
         one byte larger than an even chunk size."""
@@ -108,7 +420,9 @@ class CacheTests(SpyAgency, TestCase):
         stored_data = b''.join(cache.get(cache_key_0) +
                                cache.get(cache_key_1) +
                                cache.get(cache_key_2))
-        self.assertEqual(stored_data, pickled_data)
+        self.assertEqual(stored_data,
+                         build_codec_header(NoCompressionCodec()) +
+                         pickled_data)
 
         # Try fetching the data we stored.
         cache_func.spy.reset_calls()
@@ -133,16 +447,16 @@ class CacheTests(SpyAgency, TestCase):
                                compress_large_data=True)
         self.assertTrue(cache_func.spy.called)
 
-        cache_key_0 = make_cache_key('%s-0' % cache_key)
-
+        # The compressed data fits in a single chunk, so it should be stored
+        # directly in the main key.
         self.assertTrue(make_cache_key(cache_key) in cache)
-        self.assertTrue(cache_key_0 in cache)
-        self.assertFalse(make_cache_key('%s-1' % cache_key) in cache)
-        self.assertFalse(make_cache_key('%s-2' % cache_key) in cache)
+        self.assertFalse(make_cache_key('%s-0' % cache_key) in cache)
 
         # Verify the contents of the stored data.
-        stored_data = cache.get(cache_key_0)[0]
-        self.assertEqual(stored_data, zlib.compress(pickled_data))
+        stored_data = cache.get(make_cache_key(cache_key))[0]
+        self.assertEqual(stored_data,
+                         build_codec_header(ZlibCodec()) +
+                         zlib.compress(pickled_data))
 
         # Try fetching the data we stored.
         cache_func.spy.reset_calls()
@@ -224,12 +538,18 @@ class CacheTests(SpyAgency, TestCase):
         self.assertEqual(result, data)
         self.assertTrue(cache_func.spy.called)
 
+    @override_settings(CACHE_MAX_VALUE_SIZE=CACHE_CHUNK_SIZE)
     def test_cache_memoize_iter_uncompressed(self):
         """Testing cache_memoize_iter without compression"""
         cache_key = 'abc123'
         data_yielded = []
 
-        data1, pickled_data_1 = self._build_test_chunk_data(num_chunks=2)
+        # This takes into account the size of the pickle data and codec
+        # header, and will get us to exactly 4 chunks of data in cache.
+        header = build_codec_header(NoCompressionCodec())
+        data1, pickled_data_1 = self._build_test_chunk_data(
+            num_chunks=2,
+            header_len=len(header))
         data2, pickled_data_2 = self._build_test_chunk_data(num_chunks=2)
 
         def cache_func():
@@ -276,7 +596,8 @@ class CacheTests(SpyAgency, TestCase):
                                cache.get(cache_key_2) +
                                cache.get(cache_key_3))
         self.assertEqual(cache.get(cache_key_main), '4')
-        self.assertEqual(stored_data, pickled_data_1 + pickled_data_2)
+        self.assertEqual(stored_data,
+                         header + pickled_data_1 + pickled_data_2)
 
         # Try fetching the data we stored.
         cache_func.spy.reset_calls()
@@ -330,16 +651,16 @@ class CacheTests(SpyAgency, TestCase):
 
         self.assertTrue(cache_func.spy.called)
 
+        # The compressed data fits in a single chunk, so it should be stored
+        # directly in the main key.
         cache_key_main = make_cache_key(cache_key)
-        cache_key_0 = make_cache_key('%s-0' % cache_key)
 
         self.assertTrue(cache_key_main in cache)
-        self.assertTrue(cache_key_0 in cache)
-        self.assertFalse(make_cache_key('%s-1' % cache_key) in cache)
+        self.assertFalse(make_cache_key('%s-0' % cache_key) in cache)
 
         # Verify the contents of the stored data.
-        self.assertEqual(cache.get(cache_key_main), '1')
-        self.assertEqual(cache.get(cache_key_0)[0],
+        self.assertEqual(cache.get(cache_key_main)[0],
+                         build_codec_header(ZlibCodec()) +
                          zlib.compress(pickled_data_1 + pickled_data_2))
 
         # Try fetching the data we stored.
@@ -358,15 +679,611 @@ class CacheTests(SpyAgency, TestCase):
         self.assertEqual(data_yielded, [])
         self.assertFalse(cache_func.spy.called)
 
-    def _build_test_chunk_data(self, num_chunks):
+    def test_cache_memoize_iter_streaming(self):
+        """Testing cache_memoize_iter streams data larger than a fetch window
+        """
+        self._check_cache_memoize_iter_streaming(compress_large_data=False)
+
+    def test_cache_memoize_iter_streaming_compressed(self):
+        """Testing cache_memoize_iter streams compressed data larger than a
+        fetch window
+        """
+        self._check_cache_memoize_iter_streaming(compress_large_data=True)
+
+    def test_cache_memoize_iter_streaming_missing_chunk(self):
+        """Testing cache_memoize_iter with a chunk missing while streaming"""
+        cache_key = 'abc123'
+        data = ['item %d %s' % (i, 'x' * 50) for i in range(20)]
+
+        with override_settings(CACHE_MAX_VALUE_SIZE=100), \
+             patch('djblets.cache.backend.CACHE_FETCH_WINDOW_SIZE', 2):
+            list(cache_memoize_iter(cache_key, lambda: data,
+                                    compress_large_data=False))
+
+            chunk_count = int(cache.get(make_cache_key(cache_key)))
+            self.assertTrue(chunk_count > 4)
+            cache.delete(make_cache_key('%s-%d' % (cache_key,
+                                                   chunk_count - 1)))
+
+            def cache_func():
+                return data
+
+            self.spy_on(cache_func, call_original=True)
+
+            result = list(cache_memoize_iter(cache_key, cache_func,
+                                             compress_large_data=False))
+
+        self.assertEqual(result, data)
+        self.assertTrue(cache_func.spy.called)
+
+        # The data should have been stored again.
+        self.assertEqual(list(cache_memoize_iter(cache_key, lambda: [],
+                                                 compress_large_data=False)),
+                         data)
+
+    def test_cache_memoize_iter_abandoned(self):
+        """Testing cache_memoize_iter doesn't store abandoned items by
+        default
+        """
+        cache_key = 'abc123'
+        result = cache_memoize_iter(cache_key, lambda: ['a', 'b', 'c'])
+
+        self.assertEqual(next(result), 'a')
+        result.close()
+
+        self.assertFalse(make_cache_key(cache_key) in cache)
+
+    def test_cache_memoize_iter_complete_in_background(self):
+        """Testing cache_memoize_iter with complete_in_background stores
+        abandoned items
+        """
+        cache_key = 'abc123'
+        pool = BackgroundCompletionPool(max_workers=1, max_pending=1)
+        self.spy_on(get_background_completion_pool, call_fake=lambda: pool)
+
+        with override_settings(CACHE_STATS_ENABLED=True):
+            cache_stats.reset()
+            result = cache_memoize_iter(cache_key, lambda: ['a', 'b', 'c'],
+                                        complete_in_background=True,
+                                        stampede_protection=True)
+
+            self.assertEqual(next(result), 'a')
+            result.close()
+
+            self.assertTrue(pool.wait(timeout=5))
+
+        self.assertEqual(list(cache_memoize_iter(cache_key, lambda: [])),
+                         ['a', 'b', 'c'])
+
+        # The lease should have been released by the background thread.
+        self.assertFalse(make_cache_key('%s:lease' % cache_key) in cache)
+
+        stats = cache_stats.get_family_stats('abc')
+        self.assertEqual(stats['abandoned'], 1)
+        self.assertEqual(stats['background_completions'], 1)
+        self.assertNotIn('background_rejections', stats)
+        cache_stats.reset()
+
+    def test_cache_memoize_iter_complete_in_background_pool_full(self):
+        """Testing cache_memoize_iter with complete_in_background and too
+        many items being stored in the background
+        """
+        cache_key = 'abc123'
+        pool = BackgroundCompletionPool(max_workers=1, max_pending=0)
+        self.spy_on(get_background_completion_pool, call_fake=lambda: pool)
+
+        with override_settings(CACHE_STATS_ENABLED=True):
+            cache_stats.reset()
+            result = cache_memoize_iter(cache_key, lambda: ['a', 'b', 'c'],
+                                        complete_in_background=True,
+                                        stampede_protection=True)
+
+            self.assertEqual(next(result), 'a')
+            result.close()
+
+        self.assertFalse(make_cache_key(cache_key) in cache)
+        self.assertFalse(make_cache_key('%s:lease' % cache_key) in cache)
+
+        stats = cache_stats.get_family_stats('abc')
+        self.assertEqual(stats['abandoned'], 1)
+        self.assertEqual(stats['background_rejections'], 1)
+        cache_stats.reset()
+
+    def test_cache_memoize_iter_complete_in_background_failure(self):
+        """Testing cache_memoize_iter with complete_in_background and an
+        error computing the remaining items
+        """
+        cache_key = 'abc123'
+        pool = BackgroundCompletionPool(max_workers=1, max_pending=1)
+        self.spy_on(get_background_completion_pool, call_fake=lambda: pool)
+
+        def _gen_items():
+            yield 'a'
+            raise ValueError('Oh no')
+
+        result = cache_memoize_iter(cache_key, _gen_items,
+                                    complete_in_background=True)
+
+        self.assertEqual(next(result), 'a')
+        result.close()
+
+        self.assertTrue(pool.wait(timeout=5))
+        self.assertFalse(make_cache_key(cache_key) in cache)
+
+    def test_cache_memoize_large_files_single_key(self):
+        """Testing cache_memoize with large files stores data in a single key
+        when the backend has no size limit
+        """
+        cache_key = 'abc123'
+        data = 'x' * (CACHE_CHUNK_SIZE * 3)
+
+        result = cache_memoize(cache_key, lambda: data, large_data=True,
+                               compress_large_data=False)
+        self.assertEqual(result, data)
+
+        stored = cache.get(make_cache_key(cache_key))
+        self.assertIsInstance(stored, list)
+        self.assertEqual(stored[0],
+                         build_codec_header(NoCompressionCodec()) +
+                         pickle.dumps(data))
+        self.assertFalse(make_cache_key('%s-0' % cache_key) in cache)
+
+        result = cache_memoize(cache_key, lambda: '', large_data=True,
+                               compress_large_data=False)
+        self.assertEqual(result, data)
+
+    @override_settings(CACHE_MAX_VALUE_SIZE=1000)
+    def test_cache_memoize_iter_with_max_value_size(self):
+        """Testing cache_memoize_iter chunks data using
+        settings.CACHE_MAX_VALUE_SIZE
+        """
+        cache_key = 'abc123'
+        data = ['x' * 1500, 'y' * 1000]
+
+        result = list(cache_memoize_iter(cache_key, lambda: data,
+                                         compress_large_data=False))
+        self.assertEqual(result, data)
+
+        self.assertEqual(cache.get(make_cache_key(cache_key)), '3')
+
+        for i in range(3):
+            chunk = cache.get(make_cache_key('%s-%d' % (cache_key, i)))[0]
+            self.assertTrue(len(chunk) <= 1000)
+
+        result = list(cache_memoize_iter(cache_key, lambda: [],
+                                         compress_large_data=False))
+        self.assertEqual(result, data)
+
+    def test_get_cache_max_value_size(self):
+        """Testing get_cache_max_value_size with known backends"""
+        self.assertIsNone(get_cache_max_value_size(LocMemCache('test', {})))
+        self.assertEqual(
+            get_cache_max_value_size(BaseMemcachedCache(
+                '127.0.0.1:11211', {},
+                library=None,
+                value_not_found_exception=ValueError)),
+            CACHE_CHUNK_SIZE)
+
+    def test_get_cache_max_value_size_with_default_cache(self):
+        """Testing get_cache_max_value_size with the default cache"""
+        # The tests use the default local memory cache. On Django >= 1.7,
+        # this is accessed through a proxy.
+        self.assertIsNone(get_cache_max_value_size(cache))
+        self.assertIsNone(get_cache_max_value_size())
+
+    def test_get_cache_max_value_size_with_unknown_backend(self):
+        """Testing get_cache_max_value_size with unknown backend"""
+        self.assertEqual(get_cache_max_value_size(DummyCache('test', {})),
+                         CACHE_CHUNK_SIZE)
+
+    def test_get_cache_max_value_size_with_forwarding_backend(self):
+        """Testing get_cache_max_value_size with ForwardingCacheBackend"""
+        forwarding_backend = ForwardingCacheBackend()
+        forwarding_backend._backend = LocMemCache('test', {})
+
+        self.assertIsNone(get_cache_max_value_size(forwarding_backend))
+
+    def test_get_cache_max_value_size_with_setting(self):
+        """Testing get_cache_max_value_size with
+        settings.CACHE_MAX_VALUE_SIZE
+        """
+        with override_settings(CACHE_MAX_VALUE_SIZE=4096):
+            self.assertEqual(get_cache_max_value_size(), 4096)
+
+        with override_settings(CACHE_MAX_VALUE_SIZE=None):
+            self.assertIsNone(get_cache_max_value_size(
+                DummyCache('test', {})))
+
+    def _check_cache_memoize_iter_streaming(self, compress_large_data):
+        """Check that cache_memoize_iter streams data from the cache.
+
+        Args:
+            compress_large_data (bool):
+                Whether to compress the data.
+        """
+        cache_key = 'abc123'
+
+        # Use random data, so that it doesn't compress too well.
+        rand = random.Random(0)
+        data = [
+            'item %d %s' % (i, ''.join(rand.choice(string.ascii_letters)
+                                       for j in range(200)))
+            for i in range(50)
+        ]
+
+        with override_settings(CACHE_MAX_VALUE_SIZE=256), \
+             patch('djblets.cache.backend.CACHE_FETCH_WINDOW_SIZE', 2):
+            result = list(cache_memoize_iter(
+                cache_key, lambda: data,
+                compress_large_data=compress_large_data))
+            self.assertEqual(result, data)
+
+            chunk_count = int(cache.get(make_cache_key(cache_key)))
+            self.assertTrue(chunk_count > 4)
+
+            self.spy_on(cache.get_many)
+
+            result = cache_memoize_iter(
+                cache_key, lambda: [],
+                compress_large_data=compress_large_data)
+
+            # Only the first window should be fetched before the first
+            # item is returned.
+            self.assertEqual(next(result), data[0])
+            self.assertEqual(len(cache.get_many.spy.calls), 1)
+
+            self.assertEqual([data[0]] + list(result), data)
+            self.assertEqual(len(cache.get_many.spy.calls),
+                             (chunk_count + 1) // 2)
+
+    def test_cache_memoize_with_negative_result(self):
+        """Testing cache_memoize with cache_negative_results and a result of
+        None
+        """
+        def cache_func():
+            return None
+
+        self.spy_on(cache_func)
+
+        for i in range(2):
+            self.assertIsNone(cache_memoize('abc123', cache_func,
+                                            cache_negative_results=True))
+
+        self.assertEqual(len(cache_func.spy.calls), 1)
+
+    def test_cache_memoize_with_negative_exception(self):
+        """Testing cache_memoize with cache_negative_results and a negative
+        exception
+        """
+        def cache_func():
+            raise KeyError
+
+        self.spy_on(cache_func)
+
+        for i in range(2):
+            self.assertIsNone(cache_memoize('abc123', cache_func,
+                                            cache_negative_results=True,
+                                            negative_exceptions=(KeyError,)))
+
+        self.assertEqual(len(cache_func.spy.calls), 1)
+
+    def test_cache_memoize_with_negative_results_other_exception(self):
+        """Testing cache_memoize with cache_negative_results and an
+        exception not in negative_exceptions
+        """
+        def cache_func():
+            raise ValueError
+
+        self.spy_on(cache_func)
+
+        for i in range(2):
+            with self.assertRaises(ValueError):
+                cache_memoize('abc123', cache_func,
+                              cache_negative_results=True,
+                              negative_exceptions=(KeyError,))
+
+        self.assertEqual(len(cache_func.spy.calls), 2)
+        self.assertNotIn(make_cache_key('abc123'), cache)
+
+    def test_cache_memoize_with_negative_result_expiration(self):
+        """Testing cache_memoize with cache_negative_results uses
+        negative_expiration
+        """
+        now = time.time()
+
+        cache_memoize('abc123', lambda: None,
+                      expiration=1000,
+                      cache_negative_results=True,
+                      negative_expiration=10)
+        self._check_expiration('abc123', now, 10)
+
+        cache_memoize('def456', lambda: None,
+                      expiration=5,
+                      cache_negative_results=True,
+                      negative_expiration=10)
+        self._check_expiration('def456', now, 5)
+
+        cache_memoize('ghi789', lambda: 'Test 123',
+                      expiration=1000,
+                      cache_negative_results=True,
+                      negative_expiration=10)
+        self._check_expiration('ghi789', now, 1000)
+
+    def test_cache_memoize_with_negative_result_and_local_cache(self):
+        """Testing cache_memoize with cache_negative_results and
+        use_local_cache
+        """
+        def cache_func():
+            return None
+
+        self.spy_on(cache_func)
+        self.spy_on(local_cache.set)
+
+        for i in range(2):
+            self.assertIsNone(cache_memoize('abc123', cache_func,
+                                            use_local_cache=True,
+                                            local_expiration=60,
+                                            cache_negative_results=True,
+                                            negative_expiration=10))
+
+        self.assertEqual(len(cache_func.spy.calls), 1)
+        self.assertEqual(local_cache.set.spy.last_call.args[2], 10)
+
+    def test_cache_memoize_with_negative_results_and_large_data(self):
+        """Testing cache_memoize with cache_negative_results and large_data"""
+        with self.assertRaises(ValueError):
+            cache_memoize('abc123', lambda: None,
+                          large_data=True,
+                          cache_negative_results=True)
+
+    def test_cache_memoize_with_namespaces(self):
+        """Testing cache_memoize with namespaces"""
+        def cache_func():
+            return 'Test 123'
+
+        self.spy_on(cache_func)
+
+        for i in range(2):
+            self.assertEqual(cache_memoize('abc123', cache_func,
+                                           namespaces=['user-1']),
+                             'Test 123')
+
+        self.assertEqual(len(cache_func.spy.calls), 1)
+
+    def test_cache_memoize_with_namespaces_single_request(self):
+        """Testing cache_memoize with namespaces fetches the value and
+        generations in a single request
+        """
+        cache_memoize('abc123', lambda: 'Test 123',
+                      namespaces=['user-1', 'user-2'])
+
+        self.spy_on(cache.get_many)
+        self.spy_on(cache.has_key)
+
+        self.assertEqual(cache_memoize('abc123', lambda: 'New 123',
+                                       namespaces=['user-1', 'user-2']),
+                         'Test 123')
+        self.assertEqual(len(cache.get_many.spy.calls), 1)
+        self.assertEqual(len(cache.get_many.spy.last_call.args[0]), 3)
+        self.assertFalse(cache.has_key.called)
+
+    def test_invalidate_cache_namespace(self):
+        """Testing invalidate_cache_namespace"""
+        cache_memoize('abc123', lambda: 'Test 123',
+                      namespaces=['user-1', 'user-2'])
+        cache_memoize('def456', lambda: 'Test 456',
+                      namespaces=['user-1'])
+
+        invalidate_cache_namespace('user-2')
+
+        self.assertEqual(cache_memoize('abc123', lambda: 'New 123',
+                                       namespaces=['user-1', 'user-2']),
+                         'New 123')
+        self.assertEqual(cache_memoize('def456', lambda: 'New 456',
+                                       namespaces=['user-1']),
+                         'Test 456')
+
+        invalidate_cache_namespace('user-1')
+
+        self.assertEqual(cache_memoize('abc123', lambda: 'Newer 123',
+                                       namespaces=['user-1', 'user-2']),
+                         'Newer 123')
+        self.assertEqual(cache_memoize('def456', lambda: 'New 456',
+                                       namespaces=['user-1']),
+                         'New 456')
+
+    def test_invalidate_cache_namespace_without_generation(self):
+        """Testing invalidate_cache_namespace with a namespace that has no
+        generation in the cache
+        """
+        invalidate_cache_namespace('user-1')
+
+        self.assertNotIn(make_cache_key('cache-namespace:user-1'), cache)
+
+    def test_cache_memoize_with_namespaces_evicted_generation(self):
+        """Testing cache_memoize with namespaces after the generation is
+        evicted from the cache
+        """
+        cache_memoize('abc123', lambda: 'Test 123', namespaces=['user-1'])
+        cache.delete(make_cache_key('cache-namespace:user-1'))
+
+        self.assertEqual(cache_memoize('abc123', lambda: 'New 123',
+                                       namespaces=['user-1']),
+                         'New 123')
+
+    def test_cache_memoize_with_namespaces_and_large_data(self):
+        """Testing cache_memoize with namespaces and large_data"""
+        self.assertEqual(cache_memoize('abc123', lambda: 'Test 123',
+                                       large_data=True,
+                                       namespaces=['user-1']),
+                         'Test 123')
+        self.assertEqual(cache_memoize('abc123', lambda: 'New 123',
+                                       large_data=True,
+                                       namespaces=['user-1']),
+                         'Test 123')
+
+        invalidate_cache_namespace('user-1')
+
+        self.assertEqual(cache_memoize('abc123', lambda: 'New 123',
+                                       large_data=True,
+                                       namespaces=['user-1']),
+                         'New 123')
+
+    def test_make_cache_key(self):
+        """Testing make_cache_key"""
+        self.assertEqual(make_cache_key('abc123'), b'example.com:abc123')
+
+    @override_settings(SITE_ROOT='/site/')
+    def test_make_cache_key_with_site_root(self):
+        """Testing make_cache_key with SITE_ROOT"""
+        self.assertEqual(make_cache_key('abc123'),
+                         b'example.com:/site/:abc123')
+
+    def test_make_cache_key_strips_whitespace(self):
+        """Testing make_cache_key strips whitespace and newlines"""
+        self.assertEqual(make_cache_key('a b\tc\r\n123'),
+                         b'example.com:abc123')
+        self.assertEqual(make_cache_key(b'a b\tc\r\n123'),
+                         b'example.com:abc123')
+
+    def test_make_cache_key_with_long_key(self):
+        """Testing make_cache_key with a key over the maximum size"""
+        key = make_cache_key('x' * 500)
+
+        self.assertEqual(len(key), 240)
+        self.assertTrue(key.startswith(b'example.com:xxx'))
+        self.assertNotEqual(make_cache_key('x' * 501), key)
+
+    def test_make_cache_key_remembers_prefix(self):
+        """Testing make_cache_key only looks up the Site once"""
+        self.spy_on(Site.objects.get_current)
+
+        make_cache_key('abc123')
+        make_cache_key('def456')
+        make_cache_keys(['abc123', 'def456'])
+
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 1)
+
+    def test_make_cache_key_after_site_change(self):
+        """Testing make_cache_key after the Site is changed"""
+        self.assertEqual(make_cache_key('abc123'), b'example.com:abc123')
+
+        site = Site.objects.get_current()
+        site.domain = 'example.org'
+        site.save()
+
+        self.assertEqual(make_cache_key('abc123'), b'example.org:abc123')
+
+    def test_make_cache_key_after_site_root_change(self):
+        """Testing make_cache_key after SITE_ROOT is changed"""
+        self.assertEqual(make_cache_key('abc123'), b'example.com:abc123')
+
+        with self.settings(SITE_ROOT='/site/'):
+            self.assertEqual(make_cache_key('abc123'),
+                             b'example.com:/site/:abc123')
+
+        self.assertEqual(make_cache_key('abc123'), b'example.com:abc123')
+
+    def test_make_cache_keys(self):
+        """Testing make_cache_keys"""
+        keys = ['abc123', 'd e f', 'x' * 500]
+
+        self.assertEqual(make_cache_keys(keys),
+                         [make_cache_key(key) for key in keys])
+        self.assertEqual(make_cache_keys([]), [])
+
+    def test_make_cache_key_prefix_cleared_on_site_save(self):
+        """Testing make_cache_key recomputes the prefix after a Site is
+        saved
+        """
+        self.spy_on(Site.objects.get_current)
+
+        make_cache_key('abc123')
+        make_cache_key('abc123')
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 1)
+
+        Site.objects.get_current().save()
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 2)
+
+        make_cache_key('abc123')
+        make_cache_keys(['abc123', 'def456'])
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 3)
+
+    def test_make_cache_key_prefix_cleared_on_site_delete(self):
+        """Testing make_cache_key recomputes the prefix after a Site is
+        deleted
+        """
+        site = Site.objects.create(domain='example.org', name='example.org')
+        self.spy_on(Site.objects.get_current)
+
+        make_cache_key('abc123')
+        make_cache_key('abc123')
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 1)
+
+        site.delete()
+
+        make_cache_key('abc123')
+        make_cache_key('abc123')
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 2)
+
+    def test_make_cache_key_prefix_cleared_on_setting_changed(self):
+        """Testing make_cache_key recomputes the prefix after SITE_ID or
+        SITE_ROOT changes
+        """
+        self.spy_on(Site.objects.get_current)
+
+        make_cache_key('abc123')
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 1)
+
+        # Unrelated settings must not throw away the prefix.
+        with self.settings(DEBUG=True):
+            make_cache_key('abc123')
+
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 1)
+
+        with self.settings(SITE_ROOT='/site/'):
+            make_cache_key('abc123')
+            make_cache_key('abc123')
+
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 2)
+
+        # Leaving the override block restores SITE_ROOT, which clears the
+        # prefix again.
+        make_cache_key('abc123')
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 3)
+
+        with self.settings(SITE_ID=1):
+            make_cache_key('abc123')
+
+        self.assertEqual(len(Site.objects.get_current.spy.calls), 4)
+
+    def _check_expiration(self, key, start_time, expiration):
+        """Check that a cached key expires after the given number of seconds.
+
+        ``start_time`` must be from before the key was stored. The key is
+        checked just before and just after it should expire.
+        """
+        cache_key = make_cache_key(key)
+
+        with patch('time.time', return_value=start_time + expiration - 1):
+            self.assertIn(cache_key, cache)
+
+        with patch('time.time', return_value=start_time + expiration + 1):
+            self.assertNotIn(cache_key, cache)
+
+    def _build_test_chunk_data(self, num_chunks, header_len=0):
         """Build enough test data to fill up the specified number of chunks.
 
         This takes into account the size of the pickle data, and will
         get us to exactly the specified number of chunks of data in the cache.
+        If ``header_len`` is provided, the data will leave room for a codec
+        header of that length.
         """
-        data = 'x' * (CACHE_CHUNK_SIZE * num_chunks - 3 * num_chunks)
+        data = 'x' * (CACHE_CHUNK_SIZE * num_chunks - 3 * num_chunks -
+                      header_len)
         pickled_data = pickle.dumps(data)
 
-        self.assertEqual(len(pickled_data), CACHE_CHUNK_SIZE * num_chunks)
+        self.assertEqual(len(pickled_data),
+                         CACHE_CHUNK_SIZE * num_chunks - header_len)
 
         return data, pickled_data
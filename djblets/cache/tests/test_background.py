@@ -0,0 +1,53 @@
+import threading
+
+from djblets.cache.background import BackgroundCompletionPool
+from djblets.testing.testcases import TestCase
+
+
+class BackgroundCompletionPoolTests(TestCase):
+    """Unit tests for djblets.cache.background.BackgroundCompletionPool."""
+
+    def test_submit(self):
+        """Testing BackgroundCompletionPool.submit"""
+        pool = BackgroundCompletionPool(max_workers=2, max_pending=5)
+        results = []
+
+        for i in range(5):
+            self.assertTrue(pool.submit(lambda i=i: results.append(i)))
+
+        self.assertTrue(pool.wait(timeout=5))
+        self.assertEqual(sorted(results), [0, 1, 2, 3, 4])
+        self.assertEqual(pool.num_pending, 0)
+
+    def test_submit_with_max_pending(self):
+        """Testing BackgroundCompletionPool.submit with max_pending tasks
+        outstanding
+        """
+        pool = BackgroundCompletionPool(max_workers=1, max_pending=2)
+        event = threading.Event()
+
+        self.assertTrue(pool.submit(event.wait))
+        self.assertTrue(pool.submit(event.wait))
+        self.assertFalse(pool.submit(event.wait))
+        self.assertFalse(pool.wait(timeout=0.01))
+
+        event.set()
+
+        self.assertTrue(pool.wait(timeout=5))
+        self.assertTrue(pool.submit(lambda: None))
+        self.assertTrue(pool.wait(timeout=5))
+
+    def test_submit_with_error(self):
+        """Testing BackgroundCompletionPool.submit with a task raising an
+        exception
+        """
+        pool = BackgroundCompletionPool(max_workers=1, max_pending=2)
+        results = []
+
+        def _fail():
+            raise ValueError('Oh no')
+
+        self.assertTrue(pool.submit(_fail))
+        self.assertTrue(pool.submit(lambda: results.append(1)))
+        self.assertTrue(pool.wait(timeout=5))
+        self.assertEqual(results, [1])
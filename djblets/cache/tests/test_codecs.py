@@ -0,0 +1,140 @@
+import zlib
+
+import nose
+from django.core.cache import cache
+from django.test.utils import override_settings
+from django.utils.six.moves import cPickle as pickle
+
+from djblets.cache.backend import cache_memoize, cache_memoize_iter
+from djblets.cache.codecs import (LZ4Codec, NoCompressionCodec, ZlibCodec,
+                                  ZstdCodec, build_codec_header,
+                                  get_cache_codec_registry,
+                                  get_large_data_codec, parse_codec_header)
+from djblets.cache.errors import CacheCodecNotFoundError
+from djblets.testing.testcases import TestCase
+
+
+class CacheCodecTests(TestCase):
+    """Unit tests for djblets.cache.codecs."""
+
+    def tearDown(self):
+        super(CacheCodecTests, self).tearDown()
+
+        cache.clear()
+
+    def test_no_compression_codec(self):
+        """Testing NoCompressionCodec round-trip"""
+        self._check_round_trip(NoCompressionCodec())
+
+    def test_zlib_codec(self):
+        """Testing ZlibCodec round-trip"""
+        codec = ZlibCodec(level=1)
+        self._check_round_trip(codec)
+
+        data = b'x' * 1000
+        self.assertEqual(codec.compress(data), zlib.compress(data, 1))
+
+    def test_lz4_codec(self):
+        """Testing LZ4Codec round-trip"""
+        codec = LZ4Codec()
+
+        if not codec.is_available():
+            raise nose.SkipTest('lz4 is not installed')
+
+        self._check_round_trip(codec)
+
+    def test_zstd_codec(self):
+        """Testing ZstdCodec round-trip"""
+        codec = ZstdCodec()
+
+        if not codec.is_available():
+            raise nose.SkipTest('zstandard is not installed')
+
+        self._check_round_trip(codec)
+
+    def test_parse_codec_header(self):
+        """Testing parse_codec_header"""
+        header = build_codec_header(ZlibCodec())
+        self.assertEqual(header, b'\x00djc\x04zlib')
+
+        codec, header_len = parse_codec_header(header + b'data')
+        self.assertEqual(codec.codec_id, 'zlib')
+        self.assertEqual(header_len, len(header))
+
+    def test_parse_codec_header_without_header(self):
+        """Testing parse_codec_header with data stored without a header"""
+        self.assertEqual(parse_codec_header(pickle.dumps('data')), (None, 0))
+        self.assertEqual(
+            parse_codec_header(zlib.compress(pickle.dumps('data'))),
+            (None, 0))
+
+    def test_parse_codec_header_with_unknown_codec(self):
+        """Testing parse_codec_header with unregistered codec"""
+        with self.assertRaises(CacheCodecNotFoundError):
+            parse_codec_header(b'\x00djc\x03foo')
+
+    def test_get_large_data_codec(self):
+        """Testing get_large_data_codec"""
+        self.assertEqual(get_large_data_codec(True).codec_id, 'zlib')
+        self.assertEqual(get_large_data_codec(False).codec_id, 'none')
+
+    @override_settings(CACHE_LARGE_DATA_CODEC='none')
+    def test_get_large_data_codec_with_setting(self):
+        """Testing get_large_data_codec with settings.CACHE_LARGE_DATA_CODEC
+        """
+        self.assertEqual(get_large_data_codec(True).codec_id, 'none')
+
+    def test_cache_memoize_with_codec_change(self):
+        """Testing cache_memoize loads data stored with a different codec"""
+        data = ['a' * 1000, 'b' * 1000]
+
+        with override_settings(CACHE_LARGE_DATA_CODEC='none'):
+            result = list(cache_memoize_iter('abc123', lambda: data))
+
+        self.assertEqual(result, data)
+
+        result = list(cache_memoize_iter('abc123', lambda: []))
+        self.assertEqual(result, data)
+
+    @override_settings(CACHE_PICKLE_PROTOCOL=pickle.HIGHEST_PROTOCOL)
+    def test_cache_memoize_with_pickle_protocol(self):
+        """Testing cache_memoize with settings.CACHE_PICKLE_PROTOCOL"""
+        data = {'a': [1, 2, 3]}
+
+        result = cache_memoize('abc123', lambda: data, large_data=True)
+        self.assertEqual(result, data)
+
+        result = cache_memoize('abc123', lambda: None, large_data=True)
+        self.assertEqual(result, data)
+
+    def test_registry_defaults(self):
+        """Testing CacheCodecRegistry default codecs"""
+        registry = get_cache_codec_registry()
+
+        self.assertIsInstance(registry.get_codec('none'), NoCompressionCodec)
+        self.assertIsInstance(registry.get_codec('zlib'), ZlibCodec)
+
+    def _check_round_trip(self, codec):
+        """Check that a codec can decode streamed data it encoded.
+
+        Args:
+            codec (djblets.cache.codecs.BaseCacheCodec):
+                The codec to check.
+        """
+        blocks = [b'abc' * 1000, b'', b'def' * 5000]
+
+        compressor = codec.get_compressor()
+        encoded = b''.join(
+            [compressor.compress(block) for block in blocks] +
+            [compressor.flush()])
+
+        self.assertEqual(codec.decompress(encoded), b''.join(blocks))
+
+        # Decode it again in small pieces.
+        decompressor = codec.get_decompressor()
+        decoded = b''.join(
+            [decompressor.decompress(encoded[i:i + 100])
+             for i in range(0, len(encoded), 100)] +
+            [decompressor.flush()])
+
+        self.assertEqual(decoded, b''.join(blocks))
@@ -0,0 +1,122 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.test.utils import override_settings
+from kgb import SpyAgency
+
+from djblets.cache.forwarding_backend import ForwardingCacheBackend
+from djblets.testing.testcases import TestCase
+
+
+def _make_caches(location):
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'forwarded_backend': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': location,
+        },
+    }
+
+
+@override_settings(CACHES=_make_caches('forwarding-tests-1'))
+class ForwardingCacheBackendTests(SpyAgency, TestCase):
+    """Unit tests for djblets.cache.forwarding_backend.ForwardingCacheBackend.
+    """
+
+    def setUp(self):
+        super(ForwardingCacheBackendTests, self).setUp()
+
+        self.forwarding_backend = ForwardingCacheBackend()
+
+    def tearDown(self):
+        super(ForwardingCacheBackendTests, self).tearDown()
+
+        self.forwarding_backend.clear()
+
+    def test_load_on_first_use(self):
+        """Testing ForwardingCacheBackend loads the backend on first use"""
+        self.assertIsNone(self.forwarding_backend._backend)
+
+        self.forwarding_backend.set('key1', 'value1')
+
+        self.assertIsInstance(self.forwarding_backend._backend, LocMemCache)
+        self.assertEqual(self.forwarding_backend.get('key1'), 'value1')
+        self.assertIn('key1', self.forwarding_backend)
+
+    def test_methods_bound(self):
+        """Testing ForwardingCacheBackend binds the backend's methods"""
+        backend = self.forwarding_backend.backend
+
+        for name in ('get', 'set', 'get_many', 'set_many', 'delete', 'add',
+                     'incr'):
+            self.assertEqual(getattr(self.forwarding_backend, name),
+                             getattr(backend, name))
+            self.assertIn(name, self.forwarding_backend.__dict__)
+
+    def test_other_attributes(self):
+        """Testing ForwardingCacheBackend forwards other attributes"""
+        backend = self.forwarding_backend.backend
+
+        self.assertEqual(self.forwarding_backend.default_timeout,
+                         backend.default_timeout)
+
+        with self.assertRaises(AttributeError):
+            self.forwarding_backend.missing_attribute
+
+    def test_reset_backend(self):
+        """Testing ForwardingCacheBackend.reset_backend"""
+        old_backend = self.forwarding_backend.backend
+        self.forwarding_backend.set('key1', 'value1')
+        self.spy_on(old_backend.close)
+
+        with self.settings(CACHES=_make_caches('forwarding-tests-2')):
+            self.forwarding_backend.reset_backend()
+
+        new_backend = self.forwarding_backend.backend
+
+        self.assertIsNot(new_backend, old_backend)
+        self.assertTrue(old_backend.close.called)
+        self.assertEqual(self.forwarding_backend.get, new_backend.get)
+        self.assertIsNone(self.forwarding_backend.get('key1'))
+
+        old_backend.clear()
+
+    def test_reset_backend_before_load(self):
+        """Testing ForwardingCacheBackend.reset_backend before the backend
+        is loaded
+        """
+        self.forwarding_backend.reset_backend()
+
+        self.assertIsNone(self.forwarding_backend._backend)
+
+    def test_forwarded_methods_skip_getattr(self):
+        """Testing ForwardingCacheBackend's forwarded methods don't go
+        through __getattr__
+        """
+        class LookupTrackingBackend(ForwardingCacheBackend):
+            def __getattr__(self, name):
+                lookups.append(name)
+
+                return super(LookupTrackingBackend, self).__getattr__(name)
+
+        lookups = []
+        forwarding_backend = LookupTrackingBackend()
+        backend = forwarding_backend.backend
+
+        # Every method the backend provides is bound on the instance.
+        for name in ForwardingCacheBackend.forwarded_methods:
+            if hasattr(backend, name):
+                self.assertIn(name, forwarding_backend.__dict__)
+
+        forwarding_backend.set('key1', 'value1')
+        self.assertEqual(forwarding_backend.get('key1'), 'value1')
+        self.assertIn('key1', forwarding_backend)
+        forwarding_backend.delete('key1')
+
+        self.assertEqual(lookups, [])
+
+        # Other attributes are still looked up on demand.
+        forwarding_backend.default_timeout
+        self.assertEqual(lookups, ['default_timeout'])
+
+        forwarding_backend.clear()
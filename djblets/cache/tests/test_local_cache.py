@@ -0,0 +1,104 @@
+import time
+
+from django.core.cache import cache
+from kgb import SpyAgency
+from mock import patch
+
+from djblets.cache.local_cache import LocalCache
+from djblets.testing.testcases import TestCase
+
+
+class LocalCacheTests(SpyAgency, TestCase):
+    """Unit tests for djblets.cache.local_cache.LocalCache."""
+
+    def setUp(self):
+        super(LocalCacheTests, self).setUp()
+
+        self.local_cache = LocalCache(max_entries=3,
+                                      max_bytes=1024,
+                                      sync_interval=0)
+
+    def tearDown(self):
+        super(LocalCacheTests, self).tearDown()
+
+        cache.clear()
+
+    def test_get_and_set(self):
+        """Testing LocalCache.get and set"""
+        self.assertTrue(self.local_cache.set('key1', 'value1', 60))
+        self.assertEqual(self.local_cache.get('key1'), 'value1')
+        self.assertIsNone(self.local_cache.get('key2'))
+        self.assertEqual(self.local_cache.get('key2', 'default'), 'default')
+
+    def test_set_with_none_value(self):
+        """Testing LocalCache.set with None value"""
+        sentinel = object()
+
+        self.local_cache.set('key1', None, 60)
+        self.assertIsNone(self.local_cache.get('key1', sentinel))
+        self.assertIn('key1', self.local_cache)
+
+    def test_expiration(self):
+        """Testing LocalCache entry expiration"""
+        now = time.time()
+
+        with patch('time.time', return_value=now):
+            self.local_cache.set('key1', 'value1', 60)
+            self.assertEqual(self.local_cache.get('key1'), 'value1')
+
+        with patch('time.time', return_value=now + 61):
+            self.assertIsNone(self.local_cache.get('key1'))
+
+        self.assertEqual(len(self.local_cache), 0)
+        self.assertEqual(self.local_cache.total_bytes, 0)
+
+    def test_evicts_least_recently_used_for_max_entries(self):
+        """Testing LocalCache evicts least-recently used entries when
+        exceeding max_entries
+        """
+        self.local_cache.set('key1', 'value1', 60)
+        self.local_cache.set('key2', 'value2', 60)
+        self.local_cache.set('key3', 'value3', 60)
+
+        # Mark key1 as recently used, so that key2 is evicted.
+        self.local_cache.get('key1')
+        self.local_cache.set('key4', 'value4', 60)
+
+        self.assertEqual(len(self.local_cache), 3)
+        self.assertIn('key1', self.local_cache)
+        self.assertNotIn('key2', self.local_cache)
+        self.assertIn('key3', self.local_cache)
+        self.assertIn('key4', self.local_cache)
+
+    def test_evicts_for_max_bytes(self):
+        """Testing LocalCache evicts entries when exceeding max_bytes"""
+        self.local_cache.set('key1', 'value1', 60, size=600)
+        self.local_cache.set('key2', 'value2', 60, size=600)
+
+        self.assertNotIn('key1', self.local_cache)
+        self.assertIn('key2', self.local_cache)
+        self.assertEqual(self.local_cache.total_bytes, 600)
+
+    def test_set_too_large(self):
+        """Testing LocalCache.set with value larger than max_bytes"""
+        self.local_cache.set('key1', 'value1', 60)
+        self.assertFalse(self.local_cache.set('key1', 'x' * 2048, 60))
+
+        self.assertNotIn('key1', self.local_cache)
+        self.assertEqual(self.local_cache.total_bytes, 0)
+
+    def test_invalidate(self):
+        """Testing LocalCache.invalidate clears caches in other processes"""
+        other_cache = LocalCache(sync_interval=0)
+        other_cache.set('key1', 'value1', 60)
+        self.assertIn('key1', other_cache)
+
+        self.local_cache.set('key1', 'value1', 60)
+        self.local_cache.invalidate()
+
+        self.assertNotIn('key1', self.local_cache)
+        self.assertNotIn('key1', other_cache)
+
+        # The other cache should be usable again afterward.
+        other_cache.set('key1', 'value2', 60)
+        self.assertEqual(other_cache.get('key1'), 'value2')
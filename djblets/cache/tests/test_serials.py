@@ -0,0 +1,212 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test.utils import override_settings
+from kgb import SpyAgency
+
+from djblets.cache import serials
+from djblets.cache.serials import (generate_ajax_serial,
+                                   generate_locale_serial,
+                                   generate_media_serial,
+                                   write_serials_manifest)
+from djblets.testing.testcases import TestCase
+
+
+class SerialsManifestTests(SpyAgency, TestCase):
+    """Unit tests for the serials manifest in djblets.cache.serials."""
+
+    def setUp(self):
+        super(SerialsManifestTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='djblets-serials-tests.')
+        self.static_root = os.path.join(self.tempdir, 'static')
+        self.templates_dir = os.path.join(self.tempdir, 'templates')
+        self.manifest_path = os.path.join(self.tempdir, 'serials.json')
+
+        self._create_file(os.path.join(self.static_root, 'js', 'a.js'), 1000)
+        self._create_file(os.path.join(self.static_root, 'css', 'b.css'),
+                          2000)
+        self._create_file(os.path.join(self.templates_dir, 'c.html'), 3000)
+
+        self.settings_override = override_settings(
+            STATIC_ROOT=self.static_root,
+            TEMPLATE_DIRS=[self.templates_dir],
+            MEDIA_SERIAL=0,
+            AJAX_SERIAL=0,
+            CACHE_SERIALS_MANIFEST=self.manifest_path)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        super(SerialsManifestTests, self).tearDown()
+
+        self.settings_override.disable()
+        shutil.rmtree(self.tempdir)
+        serials._clear_manifest_cache()
+
+    def test_write_serials_manifest(self):
+        """Testing write_serials_manifest"""
+        manifest = write_serials_manifest()
+
+        self.assertEqual(manifest['media']['serial'], 2000)
+        self.assertEqual(manifest['ajax']['serial'], 3000)
+
+        with open(self.manifest_path, 'r') as fp:
+            self.assertEqual(json.load(fp), manifest)
+
+    def test_write_serials_manifest_without_path(self):
+        """Testing write_serials_manifest without a path"""
+        with self.settings(CACHE_SERIALS_MANIFEST=None):
+            with self.assertRaises(ValueError):
+                write_serials_manifest()
+
+    def test_generate_media_serial_with_manifest(self):
+        """Testing generate_media_serial with a serials manifest"""
+        write_serials_manifest()
+
+        # Make the real serial differ from the manifest.
+        os.utime(os.path.join(self.static_root, 'js', 'a.js'), (4000, 4000))
+
+        spy = self.spy_on(serials._walk_serial)
+        generate_media_serial()
+
+        self.assertEqual(settings.MEDIA_SERIAL, 2000)
+        self.assertFalse(spy.called)
+
+    def test_generate_media_serial_with_stale_manifest(self):
+        """Testing generate_media_serial with a stale serials manifest"""
+        manifest = write_serials_manifest()
+
+        # Make sure the new directory's timestamp is after the manifest's.
+        self._create_file(os.path.join(self.static_root, 'js', 'd', 'e.js'),
+                          4000)
+        os.utime(os.path.join(self.static_root, 'js'),
+                 (manifest['generated'] + 10, manifest['generated'] + 10))
+
+        generate_media_serial()
+
+        self.assertEqual(settings.MEDIA_SERIAL, 4000)
+
+    def test_generate_media_serial_with_old_directories(self):
+        """Testing generate_media_serial with a serials manifest and
+        directories modified before it was generated
+        """
+        manifest = write_serials_manifest()
+
+        for path in (self.static_root,
+                     os.path.join(self.static_root, 'js'),
+                     os.path.join(self.static_root, 'css')):
+            os.utime(path, (manifest['generated'] - 10,
+                            manifest['generated'] - 10))
+
+        spy = self.spy_on(serials._walk_serial)
+        generate_media_serial()
+
+        self.assertEqual(settings.MEDIA_SERIAL, 2000)
+        self.assertFalse(spy.called)
+
+    def test_generate_media_serial_with_other_static_root(self):
+        """Testing generate_media_serial with a serials manifest for a
+        different STATIC_ROOT
+        """
+        write_serials_manifest()
+
+        other_root = os.path.join(self.tempdir, 'other-static')
+        self._create_file(os.path.join(other_root, 'e.js'), 5000)
+
+        with self.settings(STATIC_ROOT=other_root):
+            generate_media_serial()
+
+            self.assertEqual(settings.MEDIA_SERIAL, 5000)
+
+    def test_generate_media_serial_without_manifest(self):
+        """Testing generate_media_serial without a serials manifest"""
+        generate_media_serial()
+
+        self.assertEqual(settings.MEDIA_SERIAL, 2000)
+
+    def test_generate_media_serial_with_invalid_manifest(self):
+        """Testing generate_media_serial with an invalid serials manifest"""
+        with open(self.manifest_path, 'w') as fp:
+            fp.write('{')
+
+        generate_media_serial()
+
+        self.assertEqual(settings.MEDIA_SERIAL, 2000)
+
+    def test_generate_media_serial_ignores_manifest(self):
+        """Testing generate_media_serial ignores a serials manifest within
+        STATIC_ROOT
+        """
+        manifest_path = os.path.join(self.static_root, 'serials.json')
+
+        with self.settings(CACHE_SERIALS_MANIFEST=manifest_path):
+            write_serials_manifest()
+            generate_media_serial()
+
+            self.assertEqual(settings.MEDIA_SERIAL, 2000)
+
+    def test_generate_ajax_serial_with_manifest(self):
+        """Testing generate_ajax_serial with a serials manifest"""
+        write_serials_manifest()
+
+        spy = self.spy_on(serials._walk_serial)
+        generate_ajax_serial()
+
+        self.assertEqual(settings.AJAX_SERIAL, 3000)
+        self.assertFalse(spy.called)
+
+    def test_generate_locale_serial_with_manifest(self):
+        """Testing generate_locale_serial with a serials manifest"""
+        locale_path = os.path.join(self.tempdir, 'locale')
+        self.spy_on(serials._get_locale_path,
+                    call_fake=lambda package: locale_path)
+
+        self._create_file(os.path.join(locale_path, 'en', 'LC_MESSAGES',
+                                       'django.mo'),
+                          6000)
+        write_serials_manifest(locale_packages=['mypackage'])
+
+        self._create_file(os.path.join(locale_path, 'en', 'LC_MESSAGES',
+                                       'djangojs.mo'),
+                          7000)
+
+        self.assertEqual(generate_locale_serial(['mypackage']), 6000)
+        self.assertEqual(generate_locale_serial(['otherpackage']), 7000)
+
+    def test_generate_cache_serials_command(self):
+        """Testing generate-cache-serials management command"""
+        output_path = os.path.join(self.tempdir, 'output.json')
+
+        call_command('generate-cache-serials', output=output_path,
+                     locale_packages=['djblets'], verbosity=0)
+
+        with open(output_path, 'r') as fp:
+            manifest = json.load(fp)
+
+        self.assertEqual(manifest['media']['serial'], 2000)
+        self.assertEqual(manifest['ajax']['serial'], 3000)
+        self.assertEqual(list(manifest['locales']), ['djblets'])
+
+    def _create_file(self, path, mtime):
+        """Create a file with the given timestamp.
+
+        Args:
+            path (unicode):
+                The path to the file.
+
+            mtime (int):
+                The timestamp to set.
+        """
+        dirname = os.path.dirname(path)
+
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        with open(path, 'w') as fp:
+            fp.write('test')
+
+        os.utime(path, (mtime, mtime))
@@ -0,0 +1,172 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.test.utils import override_settings
+from kgb import SpyAgency
+from mock import patch
+from nose import SkipTest
+
+from djblets.cache import shared_memory
+from djblets.cache.shared_memory import SharedMemoryGenerations
+from djblets.cache.synchronizer import GenerationSynchronizer
+from djblets.testing.testcases import TestCase
+
+
+class SharedMemoryGenerationsTests(SpyAgency, TestCase):
+    """Unit tests for djblets.cache.shared_memory.SharedMemoryGenerations."""
+
+    def setUp(self):
+        super(SharedMemoryGenerationsTests, self).setUp()
+
+        if shared_memory.fcntl is None:
+            raise SkipTest('fcntl is not available on this platform')
+
+        self.tempdir = tempfile.mkdtemp(prefix='djblets-shm-tests.')
+        self.path = os.path.join(self.tempdir, 'gens')
+
+    def tearDown(self):
+        super(SharedMemoryGenerationsTests, self).tearDown()
+
+        shutil.rmtree(self.tempdir)
+        shared_memory._instances.clear()
+        cache.clear()
+
+    def test_set_sync_gen(self):
+        """Testing SharedMemoryGenerations.set_sync_gen is seen by other
+        processes
+        """
+        shm1 = SharedMemoryGenerations(self.path, num_slots=16)
+        shm2 = SharedMemoryGenerations(self.path, num_slots=16)
+
+        shm1.set_sync_gen(b'key1', 100)
+
+        self.assertEqual(shm2.get_sync_gen(b'key1', lambda: 1), 100)
+
+    def test_get_sync_gen_check_interval(self):
+        """Testing SharedMemoryGenerations.get_sync_gen only fetches once per
+        check interval
+        """
+        shm = SharedMemoryGenerations(self.path, num_slots=16,
+                                      check_interval=10)
+        calls = []
+
+        def _fetch_sync_gen():
+            calls.append(1)
+            return 100 + len(calls)
+
+        now = time.time()
+
+        with patch('time.time', return_value=now):
+            self.assertEqual(shm.get_sync_gen(b'key1', _fetch_sync_gen), 101)
+            self.assertEqual(shm.get_sync_gen(b'key1', _fetch_sync_gen), 101)
+
+        with patch('time.time', return_value=now + 10):
+            self.assertEqual(shm.get_sync_gen(b'key1', _fetch_sync_gen), 102)
+
+        self.assertEqual(len(calls), 2)
+
+    def test_get_sync_gen_with_missing_gen(self):
+        """Testing SharedMemoryGenerations.get_sync_gen with a generation not
+        in the cache
+        """
+        shm = SharedMemoryGenerations(self.path, num_slots=16)
+
+        self.assertIsNone(shm.get_sync_gen(b'key1', lambda: None))
+        self.assertIsNone(shm.get_sync_gen(b'key1', lambda: 1))
+
+    def test_get_sync_gen_during_claim(self):
+        """Testing SharedMemoryGenerations.get_sync_gen while another process
+        is fetching the generation
+        """
+        shm1 = SharedMemoryGenerations(self.path, num_slots=16,
+                                       check_interval=10)
+        shm2 = SharedMemoryGenerations(self.path, num_slots=16,
+                                       check_interval=10)
+        seen = []
+
+        def _fetch_sync_gen():
+            seen.append(shm2.get_sync_gen(b'key1', lambda: 101))
+            return 101
+
+        # The first fetch for a key doesn't publish a placeholder, so the
+        # other process fetches the generation itself.
+        self.assertEqual(shm1.get_sync_gen(b'key1', _fetch_sync_gen), 101)
+        self.assertEqual(seen, [101])
+
+        # Later checks leave the current generation in place for the other
+        # process while it's fetched.
+        shm1.set_sync_gen(b'key1', 100, checked_at=0)
+
+        self.assertEqual(shm1.get_sync_gen(b'key1', _fetch_sync_gen), 101)
+        self.assertEqual(seen, [101, 100])
+
+    def test_clear(self):
+        """Testing SharedMemoryGenerations.clear"""
+        shm = SharedMemoryGenerations(self.path, num_slots=16,
+                                      check_interval=10)
+        shm.set_sync_gen(b'key1', 100)
+        shm.clear(b'key1')
+
+        self.assertEqual(shm.get_sync_gen(b'key1', lambda: 200), 200)
+
+    def test_full(self):
+        """Testing SharedMemoryGenerations with all slots in use"""
+        shm = SharedMemoryGenerations(self.path, num_slots=1,
+                                      check_interval=10)
+        shm.set_sync_gen(b'key1', 100)
+        shm.set_sync_gen(b'key2', 200)
+
+        self.assertEqual(shm.get_sync_gen(b'key1', lambda: 1), 100)
+        self.assertEqual(shm.get_sync_gen(b'key2', lambda: 300), 300)
+        self.assertEqual(shm.get_sync_gen(b'key2', lambda: 400), 400)
+
+    def test_resize(self):
+        """Testing SharedMemoryGenerations with a file of a different size"""
+        shm1 = SharedMemoryGenerations(self.path, num_slots=16)
+        shm1.set_sync_gen(b'key1', 100)
+
+        shm2 = SharedMemoryGenerations(self.path, num_slots=32)
+        self.assertEqual(shm2.get_sync_gen(b'key1', lambda: 200), 200)
+
+    def test_generation_synchronizer(self):
+        """Testing GenerationSynchronizer with shared memory generations"""
+        with override_settings(CACHE_SYNC_SHARED_MEMORY_PATH=self.path,
+                               CACHE_SYNC_SHARED_MEMORY_CHECK_INTERVAL=10):
+            gen_sync1 = GenerationSynchronizer('test-synchronizer')
+            gen_sync2 = GenerationSynchronizer('test-synchronizer')
+
+        self.assertFalse(gen_sync2.is_expired())
+
+        gen_sync1.mark_updated()
+
+        # The shared cache isn't consulted again within the check interval.
+        self.spy_on(gen_sync2._get_latest_sync_gen)
+        self.assertTrue(gen_sync2.is_expired())
+        self.assertFalse(gen_sync2._get_latest_sync_gen.called)
+
+        gen_sync2.refresh()
+        self.assertFalse(gen_sync2.is_expired())
+
+    def test_generation_synchronizer_other_host(self):
+        """Testing GenerationSynchronizer with shared memory generations and
+        an update from another host
+        """
+        with override_settings(CACHE_SYNC_SHARED_MEMORY_PATH=self.path,
+                               CACHE_SYNC_SHARED_MEMORY_CHECK_INTERVAL=10):
+            gen_sync = GenerationSynchronizer('test-synchronizer')
+
+        now = time.time()
+
+        with patch('time.time', return_value=now):
+            self.assertFalse(gen_sync.is_expired())
+
+        cache.set(gen_sync.cache_key, gen_sync.sync_gen + 1)
+
+        with patch('time.time', return_value=now + 5):
+            self.assertFalse(gen_sync.is_expired())
+
+        with patch('time.time', return_value=now + 10):
+            self.assertTrue(gen_sync.is_expired())
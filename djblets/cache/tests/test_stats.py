@@ -0,0 +1,281 @@
+import random
+import string
+
+from django.core.cache import cache
+from django.test.utils import override_settings
+from kgb import SpyAgency
+from mock import patch
+
+from djblets.cache.backend import cache_memoize, make_cache_key
+from djblets.cache.local_cache import local_cache
+from djblets.cache.signals import cache_stat_recorded
+from djblets.cache.stats import (CacheStats, cache_stats,
+                                 clear_published_cache_stats,
+                                 get_cache_stats, get_key_family,
+                                 get_published_cache_stats,
+                                 merge_cache_stats)
+from djblets.cache.synchronizer import GenerationSynchronizer
+from djblets.testing.testcases import TestCase
+
+
+class CacheStatsTests(SpyAgency, TestCase):
+    """Unit tests for djblets.cache.stats.CacheStats."""
+
+    def tearDown(self):
+        super(CacheStatsTests, self).tearDown()
+
+        cache.clear()
+
+    def test_get_key_family(self):
+        """Testing get_key_family"""
+        self.assertEqual(get_key_family('diff-file-123:abc'), 'diff-file')
+        self.assertEqual(get_key_family('dmarc-record:example.com'),
+                         'dmarc-record')
+        self.assertEqual(get_key_family('siteconfig'), 'siteconfig')
+        self.assertEqual(get_key_family('123'), 'other')
+
+    def test_record(self):
+        """Testing CacheStats.record"""
+        stats = CacheStats(publish_interval=0)
+        stats.record('family1', 'hits')
+        stats.record('family1', 'hits')
+        stats.record('family1', 'recompute_time', 0.5)
+        stats.record('family2', 'misses', 3)
+
+        self.assertEqual(stats.get_family_stats('family1'), {
+            'hits': 2,
+            'recompute_time': 0.5,
+        })
+        self.assertEqual(stats.snapshot(), {
+            'family1': {
+                'hits': 2,
+                'recompute_time': 0.5,
+            },
+            'family2': {
+                'misses': 3,
+            },
+        })
+
+    def test_record_emits_signal(self):
+        """Testing CacheStats.record emits cache_stat_recorded"""
+        received = []
+
+        def _on_stat_recorded(family, stat, value, **kwargs):
+            received.append((family, stat, value))
+
+        cache_stat_recorded.connect(_on_stat_recorded)
+
+        try:
+            CacheStats(publish_interval=0).record('family1', 'misses', 2)
+        finally:
+            cache_stat_recorded.disconnect(_on_stat_recorded)
+
+        self.assertEqual(received, [('family1', 'misses', 2)])
+
+    def test_reset(self):
+        """Testing CacheStats.reset"""
+        stats = CacheStats(publish_interval=0)
+        stats.record('family1', 'hits')
+        stats.reset()
+
+        self.assertEqual(stats.snapshot(), {})
+
+    def test_publish(self):
+        """Testing CacheStats.publish with multiple processes"""
+        stats1 = CacheStats(publish_interval=0, instance_id='host:1')
+        stats1.record('family1', 'hits', 2)
+        stats1.publish()
+
+        stats2 = CacheStats(publish_interval=0, instance_id='host:2')
+        stats2.record('family1', 'hits', 3)
+        stats2.record('family2', 'misses')
+        stats2.publish()
+        stats2.publish()
+
+        self.assertEqual(get_published_cache_stats(), {
+            'family1': {
+                'hits': 5,
+            },
+            'family2': {
+                'misses': 1,
+            },
+        })
+
+        clear_published_cache_stats()
+        self.assertEqual(get_published_cache_stats(), {})
+
+    def test_publish_prunes_expired_instances(self):
+        """Testing CacheStats.publish prunes processes with expired
+        statistics from the index
+        """
+        stats1 = CacheStats(publish_interval=0, instance_id='host:1')
+        stats1.record('family1', 'hits', 2)
+        stats1.publish()
+
+        stats2 = CacheStats(publish_interval=0, instance_id='host:2')
+        stats2.record('family1', 'hits', 3)
+        stats2.publish()
+
+        # Simulate host:1's statistics expiring.
+        cache.delete(make_cache_key('djblets-cache-stats:host:1'))
+        self.assertEqual(get_published_cache_stats(), {
+            'family1': {
+                'hits': 3,
+            },
+        })
+
+        stats3 = CacheStats(publish_interval=0, instance_id='host:3')
+        stats3.publish()
+
+        self.assertEqual(cache.get(make_cache_key('djblets-cache-stats')),
+                         ['host:2', 'host:3'])
+
+    def test_publish_repairs_index(self):
+        """Testing CacheStats.publish re-adds a process dropped from the
+        index by a concurrent publish
+        """
+        stats = CacheStats(publish_interval=0, instance_id='host:1')
+        stats.record('family1', 'hits', 2)
+        stats.publish()
+
+        # Simulate another process overwriting the index with a copy read
+        # before this process added itself.
+        cache.set(make_cache_key('djblets-cache-stats'), ['host:2'])
+        stats.publish()
+
+        self.assertEqual(cache.get(make_cache_key('djblets-cache-stats')),
+                         ['host:1'])
+        self.assertEqual(get_published_cache_stats(), {
+            'family1': {
+                'hits': 2,
+            },
+        })
+
+    def test_publish_interval(self):
+        """Testing CacheStats.record publishes after the publish interval"""
+        stats = CacheStats(publish_interval=60)
+        self.spy_on(stats.publish)
+
+        stats.record('family1', 'hits')
+        self.assertFalse(stats.publish.called)
+
+        with patch('time.time', return_value=stats._next_publish):
+            stats.record('family1', 'hits')
+
+        self.assertEqual(len(stats.publish.spy.calls), 1)
+
+    def test_merge_cache_stats(self):
+        """Testing merge_cache_stats"""
+        self.assertEqual(
+            merge_cache_stats([
+                {'family1': {'hits': 1, 'bytes_stored': 10}},
+                {'family1': {'hits': 2}, 'family2': {'misses': 1}},
+            ]),
+            {
+                'family1': {'hits': 3, 'bytes_stored': 10},
+                'family2': {'misses': 1},
+            })
+
+
+class CacheStatsRecordingTests(TestCase):
+    """Unit tests for recording statistics in the cache functions."""
+
+    def setUp(self):
+        super(CacheStatsRecordingTests, self).setUp()
+
+        cache_stats.reset()
+
+    def tearDown(self):
+        super(CacheStatsRecordingTests, self).tearDown()
+
+        cache.clear()
+        local_cache.clear()
+        cache_stats.reset()
+
+    def test_cache_memoize_disabled(self):
+        """Testing cache_memoize doesn't record statistics by default"""
+        cache_memoize('abc123', lambda: 'Test 123')
+
+        self.assertEqual(get_cache_stats(), {})
+
+    @override_settings(CACHE_STATS_ENABLED=True)
+    def test_cache_memoize(self):
+        """Testing cache_memoize records statistics"""
+        for i in range(3):
+            cache_memoize('test-123', lambda: 'Test 123')
+
+        stats = cache_stats.get_family_stats('test')
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertGreater(stats['bytes_stored'], 0)
+        self.assertIn('recompute_time', stats)
+
+    @override_settings(CACHE_STATS_ENABLED=True)
+    def test_cache_memoize_with_stats_family(self):
+        """Testing cache_memoize records statistics with stats_family"""
+        cache_memoize('test-123', lambda: 'Test 123', stats_family='custom')
+
+        self.assertEqual(list(get_cache_stats()), ['custom'])
+
+    @override_settings(CACHE_STATS_ENABLED=True)
+    def test_cache_memoize_with_local_cache(self):
+        """Testing cache_memoize records local cache hits"""
+        for i in range(2):
+            cache_memoize('test-123', lambda: 'Test 123',
+                          use_local_cache=True)
+
+        stats = cache_stats.get_family_stats('test')
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    @override_settings(CACHE_STATS_ENABLED=True,
+                       CACHE_MAX_VALUE_SIZE=1024)
+    def test_cache_memoize_large_data(self):
+        """Testing cache_memoize with large_data records statistics"""
+        rand = random.Random(0)
+        data = ''.join(rand.choice(string.ascii_letters)
+                       for i in range(4096))
+
+        for i in range(2):
+            self.assertEqual(cache_memoize('test-123', lambda: data,
+                                           large_data=True),
+                             data)
+
+        stats = cache_stats.get_family_stats('test')
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertGreater(stats['bytes_stored'], 2048)
+        self.assertGreater(stats['chunks_stored'], 1)
+        self.assertEqual(stats['chunks_read'], stats['chunks_stored'])
+
+    @override_settings(CACHE_STATS_ENABLED=True,
+                       CACHE_MAX_VALUE_SIZE=1024)
+    def test_cache_memoize_large_data_missing_chunk(self):
+        """Testing cache_memoize with large_data records missing chunks"""
+        rand = random.Random(0)
+        data = ''.join(rand.choice(string.ascii_letters)
+                       for i in range(4096))
+
+        cache_memoize('test-123', lambda: data, large_data=True)
+        cache.delete(make_cache_key('test-123-0'))
+        cache_memoize('test-123', lambda: data, large_data=True)
+
+        stats = cache_stats.get_family_stats('test')
+        self.assertEqual(stats['missing_chunks'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    @override_settings(CACHE_STATS_ENABLED=True)
+    def test_generation_synchronizer(self):
+        """Testing GenerationSynchronizer records statistics"""
+        gen_sync = GenerationSynchronizer('test-sync-gen')
+        gen_sync.is_expired()
+
+        GenerationSynchronizer('test-sync-gen').mark_updated()
+        gen_sync.is_expired()
+
+        self.assertEqual(cache_stats.get_family_stats('test-sync-gen'), {
+            'sync_checks': 2,
+            'sync_expirations': 1,
+            'sync_updates': 1,
+        })
@@ -1,8 +1,12 @@
 
 
+import time
+
 from django.core.cache import cache
+from kgb import SpyAgency
+from mock import patch
 
-from djblets.cache.synchronizer import GenerationSynchronizer
+from djblets.cache.synchronizer import GenerationSynchronizer, sync_registry
 from djblets.testing.testcases import TestCase
 
 
@@ -48,3 +52,112 @@ class GenerationSynchronizerTests(TestCase):
         self.assertEqual(self.gen_sync.sync_gen, sync_gen + 1)
         self.assertEqual(cache.get(self.gen_sync.cache_key),
                          self.gen_sync.sync_gen)
+
+
+class GenerationSynchronizerRegistryTests(SpyAgency, TestCase):
+    """Unit tests for djblets.cache.synchronizer.
+    GenerationSynchronizerRegistry.
+    """
+
+    def setUp(self):
+        super(GenerationSynchronizerRegistryTests, self).setUp()
+
+        self.gen_syncs = [
+            GenerationSynchronizer('test-synchronizer-%d' % i)
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        super(GenerationSynchronizerRegistryTests, self).tearDown()
+
+        sync_registry._on_request_finished()
+        sync_registry.reset()
+        sync_registry.min_check_interval = 0
+        cache.clear()
+
+    def test_register(self):
+        """Testing GenerationSynchronizer registers with the registry"""
+        gen_sync = GenerationSynchronizer('test-synchronizer')
+        self.assertIn(gen_sync, sync_registry._synchronizers)
+
+        sync_registry.unregister(gen_sync)
+        self.assertNotIn(gen_sync, sync_registry._synchronizers)
+
+    def test_is_expired_in_request(self):
+        """Testing GenerationSynchronizer.is_expired in a request fetches all
+        generations at once
+        """
+        for gen_sync in self.gen_syncs:
+            self.spy_on(gen_sync._get_latest_sync_gen)
+
+        self.spy_on(cache.get_many)
+        cache.set(self.gen_syncs[1].cache_key, self.gen_syncs[1].sync_gen + 1)
+
+        sync_registry._on_request_started()
+
+        self.assertFalse(self.gen_syncs[0].is_expired())
+        self.assertTrue(self.gen_syncs[1].is_expired())
+        self.assertFalse(self.gen_syncs[2].is_expired())
+
+        self.assertEqual(len(cache.get_many.spy.calls), 1)
+
+        for gen_sync in self.gen_syncs:
+            self.assertFalse(gen_sync._get_latest_sync_gen.called)
+
+    def test_is_expired_in_new_request(self):
+        """Testing GenerationSynchronizer.is_expired fetches generations
+        again in a new request
+        """
+        sync_registry._on_request_started()
+        self.assertFalse(self.gen_syncs[0].is_expired())
+        sync_registry._on_request_finished()
+
+        cache.set(self.gen_syncs[0].cache_key, self.gen_syncs[0].sync_gen + 1)
+
+        sync_registry._on_request_started()
+        self.assertTrue(self.gen_syncs[0].is_expired())
+
+    def test_is_expired_after_own_update(self):
+        """Testing GenerationSynchronizer.is_expired in a request after the
+        synchronizer updates its own generation
+        """
+        sync_registry._on_request_started()
+        self.assertFalse(self.gen_syncs[0].is_expired())
+
+        self.gen_syncs[0].mark_updated()
+        self.assertFalse(self.gen_syncs[0].is_expired())
+
+        self.gen_syncs[0].clear()
+        self.assertTrue(self.gen_syncs[0].is_expired())
+
+    def test_is_expired_outside_request(self):
+        """Testing GenerationSynchronizer.is_expired outside a request
+        fetches the generation directly
+        """
+        self.spy_on(cache.get_many)
+
+        self.assertFalse(self.gen_syncs[0].is_expired())
+        cache.set(self.gen_syncs[0].cache_key, self.gen_syncs[0].sync_gen + 1)
+        self.assertTrue(self.gen_syncs[0].is_expired())
+
+        self.assertFalse(cache.get_many.called)
+
+    def test_is_expired_with_min_check_interval(self):
+        """Testing GenerationSynchronizer.is_expired with
+        min_check_interval
+        """
+        sync_registry.min_check_interval = 10
+        now = time.time()
+
+        with patch('time.time', return_value=now):
+            self.assertFalse(self.gen_syncs[0].is_expired())
+
+        cache.set(self.gen_syncs[0].cache_key, self.gen_syncs[0].sync_gen + 1)
+
+        with patch('time.time', return_value=now + 5):
+            sync_registry._on_request_started()
+            self.assertFalse(self.gen_syncs[0].is_expired())
+            sync_registry._on_request_finished()
+
+        with patch('time.time', return_value=now + 10):
+            self.assertTrue(self.gen_syncs[0].is_expired())
@@ -0,0 +1,228 @@
+import threading
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.six.moves import cStringIO as StringIO
+from django.utils.translation import get_language
+from kgb import SpyAgency
+
+from djblets.cache import warmup
+from djblets.cache.errors import (CacheWarmerConflictError,
+                                  CacheWarmerNotFoundError)
+from djblets.cache.warmup import (CacheWarmer, FunctionCacheWarmer,
+                                  JavaScriptCatalogCacheWarmer,
+                                  get_cache_warmer_registry, warm_caches)
+from djblets.extensions import manager as extensions_manager
+from djblets.testing.testcases import TestCase
+
+
+class CacheWarmupTests(SpyAgency, TestCase):
+    """Unit tests for djblets.cache.warmup."""
+
+    def setUp(self):
+        super(CacheWarmupTests, self).setUp()
+
+        self.registry = get_cache_warmer_registry()
+        self.registered = []
+
+    def tearDown(self):
+        super(CacheWarmupTests, self).tearDown()
+
+        for warmer in self.registered:
+            self.registry.unregister(warmer)
+
+    def test_register_conflict(self):
+        """Testing CacheWarmerRegistry.register with a duplicate ID"""
+        self._register('warmer1', lambda: None)
+
+        with self.assertRaises(CacheWarmerConflictError):
+            self.registry.register(FunctionCacheWarmer('warmer1',
+                                                       lambda: None))
+
+    def test_get_warmer_not_found(self):
+        """Testing CacheWarmerRegistry.get_warmer with an unknown ID"""
+        with self.assertRaises(CacheWarmerNotFoundError):
+            self.registry.get_warmer('unknown')
+
+    def test_warm_caches(self):
+        """Testing warm_caches"""
+        calls = []
+        warmer1 = self._register('warmer1', lambda: calls.append(1))
+        warmer2 = self._register('warmer2', lambda: calls.append(2))
+
+        results = warm_caches()
+
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual([result.warmer for result in results],
+                         [warmer1, warmer2])
+        self.assertTrue(all(result.succeeded for result in results))
+
+    def test_warm_caches_with_warmer_ids(self):
+        """Testing warm_caches with warmer_ids"""
+        calls = []
+        self._register('warmer1', lambda: calls.append(1))
+        self._register('warmer2', lambda: calls.append(2))
+
+        warm_caches(warmer_ids=['warmer2'])
+
+        self.assertEqual(calls, [2])
+
+    def test_warm_caches_with_error(self):
+        """Testing warm_caches with a failing warmer"""
+        calls = []
+
+        def _fail():
+            raise ValueError('Oh no')
+
+        self._register('warmer1', _fail)
+        self._register('warmer2', lambda: calls.append(2))
+
+        results = warm_caches()
+
+        self.assertEqual(calls, [2])
+        self.assertFalse(results[0].succeeded)
+        self.assertIsInstance(results[0].error, ValueError)
+        self.assertTrue(results[1].succeeded)
+
+    def test_warm_caches_with_max_workers(self):
+        """Testing warm_caches runs warmers concurrently up to max_workers"""
+        lock = threading.Lock()
+        state = {
+            'running': 0,
+            'max_running': 0,
+        }
+        barrier = threading.Event()
+
+        def _warm():
+            with lock:
+                state['running'] += 1
+                state['max_running'] = max(state['max_running'],
+                                           state['running'])
+
+                if state['max_running'] == 2:
+                    barrier.set()
+
+            barrier.wait(5)
+
+            with lock:
+                state['running'] -= 1
+
+        for i in range(4):
+            self._register('warmer%d' % i, _warm)
+
+        warm_caches(max_workers=2)
+
+        self.assertEqual(state['max_running'], 2)
+
+    def test_cache_warmer_not_implemented(self):
+        """Testing CacheWarmer.warm without an implementation"""
+        class MyWarmer(CacheWarmer):
+            warmer_id = 'my-warmer'
+
+        warmer = MyWarmer()
+        self.registry.register(warmer)
+        self.registered.append(warmer)
+
+        results = warm_caches(warmer_ids=['my-warmer'])
+
+        self.assertIsInstance(results[0].error, NotImplementedError)
+
+    def test_javascript_catalog_warmer(self):
+        """Testing JavaScriptCatalogCacheWarmer"""
+        languages = []
+
+        def _cached_javascript_catalog(request, domain, packages):
+            languages.append((get_language(), domain, packages))
+
+        self.spy_on(warmup.cached_javascript_catalog,
+                    call_fake=_cached_javascript_catalog)
+
+        warmer = JavaScriptCatalogCacheWarmer(packages=['djblets'],
+                                              languages=['en', 'fr'])
+        self.registry.register(warmer)
+        self.registered.append(warmer)
+
+        results = warm_caches(warmer_ids=['jsi18n'])
+
+        self.assertTrue(results[0].succeeded)
+        self.assertEqual(languages, [
+            ('en', 'djangojs', ['djblets']),
+            ('fr', 'djangojs', ['djblets']),
+        ])
+
+    def test_command_loads_extensions(self):
+        """Testing warm-caches management command loads extensions"""
+        class DummyExtensionManager(object):
+            loaded = False
+
+            def load(self):
+                self.loaded = True
+
+        manager = DummyExtensionManager()
+        self.spy_on(extensions_manager.get_extension_managers,
+                    call_fake=lambda: [manager])
+
+        call_command('warm-caches', list=True, stdout=StringIO())
+
+        self.assertTrue(manager.loaded)
+
+    def test_command(self):
+        """Testing warm-caches management command"""
+        calls = []
+        self._register('warmer1', lambda: calls.append(1))
+
+        stdout = StringIO()
+        call_command('warm-caches', stdout=stdout)
+
+        self.assertEqual(calls, [1])
+        self.assertIn('warmer1: done in', stdout.getvalue())
+
+    def test_command_with_error(self):
+        """Testing warm-caches management command with a failing warmer"""
+        def _fail():
+            raise ValueError('Oh no')
+
+        self._register('warmer1', _fail)
+
+        stdout = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('warm-caches', stdout=stdout)
+
+        self.assertIn('warmer1: failed after', stdout.getvalue())
+        self.assertIn('Oh no', stdout.getvalue())
+
+    def test_command_list(self):
+        """Testing warm-caches management command with --list"""
+        calls = []
+        self._register('warmer1', lambda: calls.append(1),
+                       description='Test warmer')
+
+        stdout = StringIO()
+        call_command('warm-caches', list=True, stdout=stdout)
+
+        self.assertEqual(calls, [])
+        self.assertIn('warmer1: Test warmer', stdout.getvalue())
+
+    def _register(self, warmer_id, func, description=None):
+        """Register a warmer for the test.
+
+        Args:
+            warmer_id (unicode):
+                The ID of the warmer.
+
+            func (callable):
+                The function to call.
+
+            description (unicode, optional):
+                The description of the warmer.
+
+        Returns:
+            djblets.cache.warmup.FunctionCacheWarmer:
+            The registered warmer.
+        """
+        warmer = FunctionCacheWarmer(warmer_id, func, description)
+        self.registry.register(warmer)
+        self.registered.append(warmer)
+
+        return warmer
@@ -0,0 +1,335 @@
+"""Warming up caches before serving requests.
+
+After a deploy or a restart of the cache server, the first requests pay for
+rebuilding everything they need. Cache warmers let applications and
+extensions rebuild the most important cached data ahead of time, for
+instance before putting a server back into rotation.
+
+Warmers are registered in the registry returned by
+:py:func:`get_cache_warmer_registry` (or, for extensions, through
+:py:class:`~djblets.extensions.hooks.CacheWarmerHook`), and are run by
+:py:func:`warm_caches` or the ``warm-caches`` management command:
+
+.. code-block:: python
+
+   from djblets.cache.warmup import (FunctionCacheWarmer,
+                                     get_cache_warmer_registry)
+
+
+   get_cache_warmer_registry().register(FunctionCacheWarmer(
+       warmer_id='my-feeds',
+       func=render_my_feeds,
+       description='Rendered news feeds'))
+
+:py:class:`JavaScriptCatalogCacheWarmer` can be registered to warm the
+catalogs served by
+:py:func:`~djblets.util.views.cached_javascript_catalog`.
+
+Only data in the shared cache can be warmed this way. State that each
+process keeps for itself, such as the current site configuration and the
+list of enabled extensions, is loaded by each process when it starts.
+"""
+
+
+import logging
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest
+from django.utils.translation import override, ugettext_lazy as _
+
+from djblets.cache.errors import (CacheWarmerConflictError,
+                                  CacheWarmerNotFoundError)
+from djblets.registries.registry import (ALREADY_REGISTERED,
+                                         ATTRIBUTE_REGISTERED, DEFAULT_ERRORS,
+                                         NOT_REGISTERED, OrderedRegistry)
+from djblets.util.views import cached_javascript_catalog
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The default number of warmers to run at once.
+DEFAULT_WARM_CACHES_MAX_WORKERS = 4
+
+
+CACHE_WARMER_DEFAULT_ERRORS = DEFAULT_ERRORS.copy()
+CACHE_WARMER_DEFAULT_ERRORS.update({
+    ALREADY_REGISTERED: _(
+        'Could not register cache warmer %(item)s: This warmer is already '
+        'registered.'
+    ),
+    ATTRIBUTE_REGISTERED: _(
+        'Could not register cache warmer %(item)s: Another warmer '
+        '(%(duplicate)s) is already registered with the same ID.'
+    ),
+    NOT_REGISTERED: _(
+        'Unknown cache warmer "%(attr_value)s": This warmer is not '
+        'registered.'
+    ),
+})
+
+
+_registry = None
+
+
+class CacheWarmer(object):
+    """Base class for a cache warmer.
+
+    Subclasses must set :py:attr:`warmer_id` and implement :py:meth:`warm`.
+    """
+
+    #: The unique ID of the warmer.
+    warmer_id = None
+
+    #: A description of what the warmer caches.
+    description = None
+
+    def warm(self):
+        """Populate the cache.
+
+        This is called on a thread in a pool, alongside other warmers.
+
+        Raises:
+            Exception:
+                The cache couldn't be populated. The error will be reported,
+                and other warmers will continue to run.
+        """
+        raise NotImplementedError('%s must implement warm()'
+                                  % type(self).__name__)
+
+    def __repr__(self):
+        return '<%s: %s>' % (type(self).__name__, self.warmer_id)
+
+
+class FunctionCacheWarmer(CacheWarmer):
+    """A cache warmer that calls a function."""
+
+    def __init__(self, warmer_id, func, description=None):
+        """Initialize the warmer.
+
+        Args:
+            warmer_id (unicode):
+                The unique ID of the warmer.
+
+            func (callable):
+                The function populating the cache. It takes no arguments.
+
+            description (unicode, optional):
+                A description of what the warmer caches.
+        """
+        self.warmer_id = warmer_id
+        self.func = func
+        self.description = description
+
+    def warm(self):
+        """Populate the cache by calling the function."""
+        self.func()
+
+
+class JavaScriptCatalogCacheWarmer(CacheWarmer):
+    """A cache warmer for JavaScript translation catalogs.
+
+    This caches the catalogs served by
+    :py:func:`~djblets.util.views.cached_javascript_catalog` for each
+    language, so the first page views don't have to build them.
+    """
+
+    description = _('JavaScript translation catalogs')
+
+    def __init__(self, packages, domain='djangojs', languages=None,
+                 warmer_id='jsi18n'):
+        """Initialize the warmer.
+
+        Args:
+            packages (list of unicode):
+                The packages passed to the view.
+
+            domain (unicode, optional):
+                The translation domain passed to the view.
+
+            languages (list of unicode, optional):
+                The language codes to cache catalogs for. This defaults to
+                :django:setting:`LANGUAGE_CODE`.
+
+            warmer_id (unicode, optional):
+                The unique ID of the warmer. This must be set if more than
+                one of these warmers is registered.
+        """
+        self.warmer_id = warmer_id
+        self.packages = packages
+        self.domain = domain
+        self.languages = languages
+
+    def warm(self):
+        """Populate the cache with the catalog for each language."""
+        request = HttpRequest()
+
+        for language in self.languages or [settings.LANGUAGE_CODE]:
+            with override(language):
+                cached_javascript_catalog(request, self.domain,
+                                          self.packages)
+
+
+class CacheWarmerRegistry(OrderedRegistry):
+    """A registry for cache warmers.
+
+    Warmers are run in the order they were registered, up to the concurrency
+    limit.
+    """
+
+    lookup_attrs = ('warmer_id',)
+    default_errors = CACHE_WARMER_DEFAULT_ERRORS
+    already_registered_error_class = CacheWarmerConflictError
+    lookup_error_class = CacheWarmerNotFoundError
+
+    def get_warmer(self, warmer_id):
+        """Return the warmer with the given ID.
+
+        Args:
+            warmer_id (unicode):
+                The ID of the warmer.
+
+        Returns:
+            CacheWarmer:
+            The warmer.
+
+        Raises:
+            djblets.cache.errors.CacheWarmerNotFoundError:
+                The warmer was not registered.
+        """
+        return self.get('warmer_id', warmer_id)
+
+
+class CacheWarmupResult(object):
+    """The result of running a cache warmer.
+
+    Attributes:
+        warmer (CacheWarmer):
+            The warmer that was run.
+
+        elapsed (float):
+            The number of seconds the warmer took to run.
+
+        error (Exception):
+            The error raised by the warmer, or ``None`` if it succeeded.
+    """
+
+    def __init__(self, warmer, elapsed, error=None):
+        """Initialize the result.
+
+        Args:
+            warmer (CacheWarmer):
+                The warmer that was run.
+
+            elapsed (float):
+                The number of seconds the warmer took to run.
+
+            error (Exception, optional):
+                The error raised by the warmer, if any.
+        """
+        self.warmer = warmer
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def succeeded(self):
+        """Whether the warmer ran successfully."""
+        return self.error is None
+
+
+def get_cache_warmer_registry():
+    """Return the global cache warmer registry.
+
+    The first time this is called, a :py:class:`CacheWarmerRegistry` will be
+    instantiated and cached for future calls.
+
+    Returns:
+        CacheWarmerRegistry:
+        The cache warmer registry.
+    """
+    global _registry
+
+    if _registry is None:
+        _registry = CacheWarmerRegistry()
+
+    return _registry
+
+
+def warm_caches(warmer_ids=None, max_workers=DEFAULT_WARM_CACHES_MAX_WORKERS,
+                on_result=None):
+    """Run cache warmers.
+
+    Each warmer runs on a thread in a pool, with at most ``max_workers``
+    running at once. Errors in a warmer are logged and reported in its
+    result, and don't stop other warmers from running.
+
+    Args:
+        warmer_ids (list of unicode, optional):
+            The IDs of the warmers to run. This defaults to all registered
+            warmers.
+
+        max_workers (int, optional):
+            The maximum number of warmers to run at once.
+
+        on_result (callable, optional):
+            A function called with each :py:class:`CacheWarmupResult` as
+            soon as the warmer finishes. This is called from the pool's
+            threads.
+
+    Returns:
+        list of CacheWarmupResult:
+        The results, in the same order as the warmers.
+
+    Raises:
+        djblets.cache.errors.CacheWarmerNotFoundError:
+            One of the warmers in ``warmer_ids`` was not registered.
+    """
+    registry = get_cache_warmer_registry()
+
+    if warmer_ids is None:
+        warmers = list(registry)
+    else:
+        warmers = [
+            registry.get_warmer(warmer_id)
+            for warmer_id in warmer_ids
+        ]
+
+    if not warmers:
+        return []
+
+    def _run_warmer(warmer):
+        start_time = time.time()
+        error = None
+
+        try:
+            warmer.warm()
+        except Exception as e:
+            logger.exception('Cache warmer %s failed: %s',
+                             warmer.warmer_id, e)
+            error = e
+        finally:
+            # The warmer may have opened database connections for this
+            # thread, which would otherwise be left open.
+            for connection in connections.all():
+                if not connection.allow_thread_sharing:
+                    connection.close()
+
+        result = CacheWarmupResult(warmer=warmer,
+                                   elapsed=time.time() - start_time,
+                                   error=error)
+
+        if on_result is not None:
+            on_result(result)
+
+        return result
+
+    pool = ThreadPool(max(1, min(max_workers, len(warmers))))
+
+    try:
+        return pool.map(_run_warmer, warmers, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
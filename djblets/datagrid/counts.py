@@ -0,0 +1,451 @@
+"""Strategies for counting the rows in a datagrid.
+
+Page-based pagination needs the total number of rows to show the page links,
+and by default, that's computed for every page view with a ``COUNT(*)``
+query. On large tables, that can be the slowest part of rendering a
+datagrid. A datagrid can set :py:attr:`DataGrid.count_strategy
+<djblets.datagrid.grids.DataGrid.count_strategy>` to one of these strategies
+to count rows differently:
+
+* :py:class:`ExactCountStrategy` counts the rows on each page view. This is
+  the default.
+
+* :py:class:`CachedCountStrategy` caches the count of each query until the
+  queried model changes (or the count expires).
+
+* :py:class:`EstimatedCountStrategy` uses the database's estimate of the
+  number of rows, once there are enough rows that counting is slow.
+
+* :py:class:`NoCountStrategy` doesn't count at all. Only links to the
+  first, previous and next pages are shown.
+
+For example:
+
+.. code-block:: python
+
+   class MyDataGrid(DataGrid):
+       def __init__(self, *args, **kwargs):
+           super(MyDataGrid, self).__init__(*args, **kwargs)
+
+           self.count_strategy = CachedCountStrategy(expiration=10 * 60)
+"""
+
+
+import hashlib
+import logging
+import re
+import time
+
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.models.signals import post_delete, post_save
+from django.utils.encoding import force_bytes
+
+from djblets.cache.backend import cache_memoize, make_cache_key
+
+
+logger = logging.getLogger(__name__)
+
+
+class CountStrategy(object):
+    """Base class for a strategy for counting rows in a datagrid."""
+
+    def get_count(self, queryset):
+        """Return the number of rows in a queryset.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            int:
+            The number of rows, or ``None`` if the rows should not be
+            counted.
+        """
+        raise NotImplementedError('%s must implement get_count()'
+                                  % type(self).__name__)
+
+    def is_approximate(self, count):
+        """Return whether a count returned by this strategy is an estimate.
+
+        Args:
+            count (int):
+                The count returned by :py:meth:`get_count`.
+
+        Returns:
+            bool:
+            ``True`` if the count may not be exact.
+        """
+        return False
+
+
+class ExactCountStrategy(CountStrategy):
+    """A strategy that counts the rows on every page view."""
+
+    def get_count(self, queryset):
+        """Return the number of rows in a queryset.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            int:
+            The number of rows.
+        """
+        try:
+            return queryset.count()
+        except (AttributeError, TypeError):
+            # This is a list, or something else that can't count itself.
+            return len(queryset)
+
+
+class CachedCountStrategy(CountStrategy):
+    """A strategy that caches counts.
+
+    Counts are cached for each distinct query (its SQL and parameters), along
+    with a generation number for the queried model. Saving or deleting an
+    instance of the model moves to a new generation, so old counts are no
+    longer used.
+
+    Saves and deletes are tracked through
+    :py:data:`~django.db.models.signals.post_save` and
+    :py:data:`~django.db.models.signals.post_delete` handlers. These are
+    connected for the models passed as ``models`` when the strategy is
+    constructed, and for any other model when its count is first cached.
+    Signals are per-process, so the strategy should be constructed when
+    the datagrid's module is loaded (for instance, as a module-level
+    constant) in every process that changes those models.
+
+    Changes that don't emit these signals (such as
+    :py:meth:`QuerySet.update`, changes to other models that the query
+    filters on, or changes made in processes where the handlers aren't
+    connected) must call :py:func:`invalidate_cached_counts`, or the old
+    count will be used until it expires.
+    """
+
+    def __init__(self, expiration=5 * 60, count_strategy=None, models=()):
+        """Initialize the strategy.
+
+        Args:
+            expiration (int, optional):
+                The number of seconds to cache counts for.
+
+            count_strategy (CountStrategy, optional):
+                The strategy used to compute counts that aren't cached.
+                Defaults to :py:class:`ExactCountStrategy`.
+
+            models (list of type, optional):
+                The models whose saves and deletes should invalidate cached
+                counts. Handlers for these are connected immediately.
+        """
+        self.expiration = expiration
+        self.count_strategy = count_strategy or ExactCountStrategy()
+
+        for model in models:
+            _connect_invalidation_signals(model)
+
+    def get_count(self, queryset):
+        """Return the number of rows in a queryset.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            int:
+            The number of rows.
+        """
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except AttributeError:
+            # This isn't a standard QuerySet, so there's no way to key it.
+            return self.count_strategy.get_count(queryset)
+
+        model = queryset.model
+        _connect_invalidation_signals(model)
+
+        signature = hashlib.md5(force_bytes('%s:%r' % (sql, params)))
+        key = 'datagrid-count:%s:%s:%s' % (_get_model_label(model),
+                                           _get_generation(model),
+                                           signature.hexdigest())
+
+        def _get_count():
+            count = self.count_strategy.get_count(queryset)
+
+            # Some cache backends store integers without their type, so
+            # whether the count is approximate is stored alongside it.
+            return count, self.count_strategy.is_approximate(count)
+
+        count, approximate = cache_memoize(key, _get_count,
+                                           expiration=self.expiration)
+
+        if approximate:
+            count = _EstimatedCount(count)
+
+        return count
+
+    def is_approximate(self, count):
+        """Return whether a count returned by this strategy is an estimate.
+
+        Args:
+            count (int):
+                The count returned by :py:meth:`get_count`.
+
+        Returns:
+            bool:
+            ``True`` if the wrapped strategy's count may not be exact.
+        """
+        return isinstance(count, _EstimatedCount)
+
+
+class _EstimatedCount(int):
+    """A row count that was estimated by the database.
+
+    This lets :py:meth:`CountStrategy.is_approximate` tell estimates apart
+    from exact counts.
+    """
+
+
+class EstimatedCountStrategy(CountStrategy):
+    """A strategy that uses the database's estimate of the number of rows.
+
+    The estimate comes from the table statistics for queries on a whole
+    table on PostgreSQL, and from ``EXPLAIN`` otherwise. Estimates are only
+    available on MySQL and PostgreSQL. If there's no estimate, or the
+    estimate is below the threshold, the rows are counted instead.
+
+    Estimates may be off in either direction, so the last page may be
+    partially filled or empty.
+    """
+
+    def __init__(self, threshold=10000):
+        """Initialize the strategy.
+
+        Args:
+            threshold (int, optional):
+                The estimated number of rows at which the estimate is used
+                instead of counting.
+        """
+        self.threshold = threshold
+
+    def get_count(self, queryset):
+        """Return the number of rows in a queryset.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            int:
+            The number of rows, or the estimate if at least the threshold.
+        """
+        try:
+            estimate = self.get_estimate(queryset)
+        except DatabaseError as e:
+            logger.exception('Unable to estimate the row count for %r: %s',
+                             queryset.model, e)
+            estimate = None
+
+        if estimate is not None and estimate >= self.threshold:
+            return _EstimatedCount(estimate)
+
+        return ExactCountStrategy().get_count(queryset)
+
+    def is_approximate(self, count):
+        """Return whether a count returned by this strategy is an estimate.
+
+        Args:
+            count (int):
+                The count returned by :py:meth:`get_count`.
+
+        Returns:
+            bool:
+            ``True`` if the count is the database's estimate.
+        """
+        return isinstance(count, _EstimatedCount)
+
+    def get_estimate(self, queryset):
+        """Return the database's estimate of the number of rows.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            int:
+            The estimated number of rows, or ``None`` if the database can't
+            estimate it.
+
+        Raises:
+            django.db.DatabaseError:
+                The database failed to compute the estimate.
+        """
+        query = getattr(queryset, 'query', None)
+
+        if query is None:
+            return None
+
+        connection = connections[queryset.db]
+        vendor = connection.vendor
+
+        if vendor not in ('mysql', 'postgresql'):
+            return None
+
+        cursor = connection.cursor()
+
+        try:
+            if vendor == 'postgresql' and not query.where:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+
+                if row is None or row[0] < 0:
+                    return None
+
+                return int(row[0])
+
+            sql, params = query.sql_with_params()
+            cursor.execute('EXPLAIN %s' % sql, params)
+
+            if vendor == 'postgresql':
+                # The first line describes the top of the plan, such as:
+                #
+                #     HashAggregate  (cost=1.10..2.20 rows=110 width=8)
+                m = re.search(r'\brows=(\d+)', cursor.fetchone()[0])
+
+                if m:
+                    return int(m.group(1))
+            else:
+                columns = [column[0] for column in cursor.description]
+                row = cursor.fetchone()
+
+                if row is not None and 'rows' in columns:
+                    return int(row[columns.index('rows')])
+        finally:
+            cursor.close()
+
+        return None
+
+
+class NoCountStrategy(CountStrategy):
+    """A strategy that doesn't count rows.
+
+    The paginator only links to the first, previous and next pages. Whether
+    there's a next page is determined by fetching one row beyond the page.
+    """
+
+    def get_count(self, queryset):
+        """Return no count for the queryset.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            None:
+            The rows are never counted.
+        """
+        return None
+
+
+def invalidate_cached_counts(model):
+    """Invalidate the counts cached by :py:class:`CachedCountStrategy`.
+
+    This should be called after changing instances of a model in a way that
+    doesn't emit :py:data:`~django.db.models.signals.post_save` or
+    :py:data:`~django.db.models.signals.post_delete`.
+
+    Args:
+        model (type):
+            The model whose cached counts should be invalidated.
+    """
+    try:
+        cache.incr(_get_generation_key(model))
+    except ValueError:
+        # There's no generation in the cache. A new one will be created
+        # the next time it's needed.
+        pass
+
+
+def _get_model_label(model):
+    """Return the label identifying a model in cache keys.
+
+    Args:
+        model (type):
+            The model.
+
+    Returns:
+        unicode:
+        The model's label.
+    """
+    return '%s.%s' % (model._meta.app_label, model._meta.model_name)
+
+
+def _get_generation_key(model):
+    """Return the cache key for a model's count generation.
+
+    Args:
+        model (type):
+            The model.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('datagrid-count-generation:%s'
+                          % _get_model_label(model))
+
+
+def _get_generation(model):
+    """Return the current count generation for a model.
+
+    Args:
+        model (type):
+            The model.
+
+    Returns:
+        int:
+        The generation.
+    """
+    key = _get_generation_key(model)
+    generation = cache.get(key)
+
+    if generation is None:
+        # Start from the current time, so that a generation that was
+        # evicted from the cache can't be reused.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+
+    return generation
+
+
+def _on_instance_changed(sender, **kwargs):
+    """Invalidate cached counts when an instance is saved or deleted.
+
+    Args:
+        sender (type):
+            The model that was changed.
+
+        **kwargs (dict):
+            Additional keyword arguments from the signal.
+    """
+    invalidate_cached_counts(sender)
+
+
+def _connect_invalidation_signals(model):
+    """Invalidate a model's cached counts when its instances change.
+
+    This can be called any number of times for a model.
+
+    Args:
+        model (type):
+            The model.
+    """
+    dispatch_uid = 'djblets-datagrid-counts-%s' % _get_model_label(model)
+
+    post_save.connect(_on_instance_changed, sender=model,
+                      dispatch_uid=dispatch_uid)
+    post_delete.connect(_on_instance_changed, sender=model,
+                        dispatch_uid=dispatch_uid)
@@ -44,30 +44,48 @@ There are two main types of datagrids:
   of the data in a given field. This is useful for lists of users, for
   example.
 
+Either can instead paginate using the sort keys of the rows, by setting
+:py:attr:`DataGrid.use_keyset_pagination`. This is much faster for large
+tables, at the cost of only being able to move between neighboring pages.
+
 All datagrids are meant to be subclassed.
 """
 
 
 
+import base64
+import binascii
+import csv
+import hashlib
+import itertools
+import json
 import logging
+import numbers
 import re
 import string
 import traceback
 
 import pytz
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
-from django.core.paginator import InvalidPage, QuerySetPaginator
-from django.http import Http404, HttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, QuerySetPaginator)
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import ManyToManyField, Q
+from django.db.models.fields import FieldDoesNotExist
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render_to_response
 from django.template.context import RequestContext, Context
-from django.template.defaultfilters import date, timesince
+from django.template.defaultfilters import date, slugify, timesince
 from django.template.loader import render_to_string, get_template
 from django.utils import six
 from django.utils.cache import patch_cache_control
-from django.utils.html import escape
+from django.utils.html import conditional_escape, escape, escapejs
+from django.utils.encoding import force_bytes, force_text
 from django.utils.safestring import mark_safe
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language, ugettext_lazy as _
 import collections
 
 try:
@@ -83,6 +101,19 @@ except ImportError:
     # Django < 1.8
     template_engines = None
 
+try:
+    # Django >= 1.10
+    from django.db.models import prefetch_related_objects
+except ImportError:
+    # Django < 1.10
+    from django.db.models.query import \
+        prefetch_related_objects as _prefetch_related_objects
+
+    def prefetch_related_objects(model_instances, *related_lookups):
+        _prefetch_related_objects(model_instances, related_lookups)
+
+from djblets.cache.backend import make_cache_keys
+from djblets.datagrid.counts import ExactCountStrategy
 from djblets.db.query import chainable_select_related_queryset
 from djblets.util.decorators import cached_property
 from djblets.util.http import get_url_params_except
@@ -94,6 +125,153 @@ logger = logging.getLogger(__name__)
 # Registration of all datagrid classes to columns.
 _column_registry = {}
 
+# Rendered in place of the rows when streaming the list view.
+_ROWS_MARKER = mark_safe('<!-- datagrid-rows -->')
+
+
+class CellRenderer(object):
+    """Renders cells without going through the template engine.
+
+    Rendering a cell through a Django template means building a
+    :py:class:`~django.template.Context` and walking the template's nodes for
+    every unique cell, which dominates the time spent rendering large
+    datagrids. A cell renderer instead fills in precompiled format strings
+    that produce the same markup as a cell template.
+
+    A column uses a renderer by setting :py:attr:`Column.cell_renderer`. The
+    renderer is only used when the column would otherwise render using
+    :py:attr:`template_name`. Columns or datagrids with custom cell templates
+    still render through those templates.
+
+    This renderer produces the same markup as :file:`datagrid/cell.html`.
+
+    Attributes:
+        template_name (unicode):
+            The name of the template whose markup this produces.
+
+        cell_format (unicode):
+            The format string for the cell. This takes ``attrs`` (the
+            attributes on the ``<td>``) and ``content``.
+
+        link_format (unicode):
+            The format string for the content of a cell with a URL. This takes
+            ``url`` and ``data``.
+
+        data_format (unicode):
+            The format string for the content of a cell without a URL. This
+            takes ``data``.
+    """
+
+    template_name = 'datagrid/cell.html'
+
+    cell_format = '<td%(attrs)s>\n\n%(content)s\n\n</td>\n'
+    link_format = ' <a href="%(url)s"><div>%(data)s</div></a>'
+    data_format = ' %(data)s'
+
+    def render(self, state, css_class, url, data):
+        """Render a cell.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+            css_class (unicode):
+                The CSS class or classes for the cell.
+
+            url (unicode):
+                The URL the cell links to, if any.
+
+            data (unicode):
+                The rendered data for the cell. This has already been
+                escaped.
+
+        Returns:
+            unicode:
+            The rendered cell as HTML.
+        """
+        if url:
+            content = self.link_format % {
+                'url': conditional_escape(url),
+                'data': data,
+            }
+        else:
+            content = self.data_format % {
+                'data': data,
+            }
+
+        return self.cell_format % {
+            'attrs': self.render_attrs(state, css_class, url),
+            'content': content,
+        }
+
+    def render_attrs(self, state, css_class, url):
+        """Render the attributes for the cell's ``<td>``.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+            css_class (unicode):
+                The CSS class or classes for the cell.
+
+            url (unicode):
+                The URL the cell links to, if any.
+
+        Returns:
+            unicode:
+            The attributes, each with a leading space.
+        """
+        attrs = []
+
+        if css_class:
+            attrs.append(' class="%s"' % conditional_escape(css_class))
+
+        if state.last:
+            attrs.append(' colspan="2"')
+
+        if url and state.cell_clickable:
+            attrs.append(' onclick="javascript:window.location = \'%s\'; '
+                         'return false;"'
+                         % escapejs(url))
+
+        return ''.join(attrs)
+
+
+class NoLinkCellRenderer(CellRenderer):
+    """Renders cells that don't link anywhere.
+
+    This produces the same markup as :file:`datagrid/cell_no_link.html`.
+    """
+
+    template_name = 'datagrid/cell_no_link.html'
+
+    cell_format = '<td%(attrs)s>\n%(content)s\n</td>\n'
+    data_format = '%(data)s'
+
+    def render(self, state, css_class, url, data):
+        """Render a cell.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+            css_class (unicode):
+                The CSS class or classes for the cell.
+
+            url (unicode):
+                The URL for the row's object. This is ignored.
+
+            data (unicode):
+                The rendered data for the cell. This has already been
+                escaped.
+
+        Returns:
+            unicode:
+            The rendered cell as HTML.
+        """
+        return super(NoLinkCellRenderer, self).render(state, css_class,
+                                                      None, data)
+
 
 class Column(object):
     """A column in a datagrid.
@@ -116,8 +294,20 @@ class Column(object):
         cell_template (unicode):
             The path to a template. If this is not None, this will override
             the default cell_template for the DataGrid the column is in.
+
+        cell_renderer (CellRenderer):
+            A renderer used to render cells without the template engine.
+            This is only used if the template it mirrors is the one the cell
+            would otherwise be rendered with. The default is ``None``.
+
+        exportable (bool):
+            Whether the column is included when exporting the datagrid's
+            data. The default is ``True``.
     """
 
+    cell_renderer = None
+    exportable = True
+
     #: Descending sort order for columns.
     SORT_DESCENDING = 0
 
@@ -130,7 +320,9 @@ class Column(object):
                  image_height=None, image_alt="", shrink=False, expand=False,
                  sortable=False,
                  default_sort_dir=SORT_DESCENDING, link=False,
-                 link_func=None, cell_clickable=False, css_class=""):
+                 link_func=None, cell_clickable=False, css_class="",
+                 query_fields=None, select_related=None,
+                 prefetch_related=None):
         """Initialize the column.
 
         When initializing a column as part of a :py:class:`DataGrid` subclass,
@@ -209,6 +401,21 @@ class Column(object):
 
             css_class (unicode):
                 The CSS class or classes to define on the cell.
+
+            query_fields (list of unicode):
+                The fields on the model that the column uses to render its
+                cells. Fields on related models can be listed using ``__``
+                lookups. If every active column lists its fields, the
+                datagrid will only load those fields from the database.
+
+            select_related (list of unicode):
+                The relations the column uses to render its cells, which
+                will be loaded in the same query as the objects.
+
+            prefetch_related (list of unicode):
+                The multi-valued relations the column uses to render its
+                cells, which will be loaded in one query per relation for
+                all the objects on the page.
         """
         assert not (image_class and image_url)
 
@@ -233,6 +440,9 @@ class Column(object):
             link_func or
             (lambda state, x, y: state.datagrid.link_to_object(state, x, y)))
         self.css_class = css_class
+        self.query_fields = query_fields
+        self.select_related = select_related or []
+        self.prefetch_related = prefetch_related or []
 
         self.cell_template = None
 
@@ -274,6 +484,52 @@ class Column(object):
         """
         return self.db_field
 
+    def get_query_fields(self, state):
+        """Return the fields on the model used to render the column's cells.
+
+        By default, this uses the provided query_fields.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+        Returns:
+            list of unicode:
+            The fields used by the column, or ``None`` if the column may use
+            any of the fields.
+        """
+        return self.query_fields
+
+    def get_select_related(self, state):
+        """Return the relations to load along with the objects.
+
+        By default, this uses the provided select_related.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+        Returns:
+            list of unicode:
+            The relations to pass to :py:meth:`QuerySet.select_related`.
+        """
+        return self.select_related
+
+    def get_prefetch_related(self, state):
+        """Return the multi-valued relations to prefetch for the objects.
+
+        By default, this uses the provided prefetch_related.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+        Returns:
+            list of unicode:
+            The relations to pass to :py:meth:`QuerySet.prefetch_related`.
+        """
+        return self.prefetch_related
+
     def get_toggle_url(self, state):
         """Return a URL to toggle this column's visibility.
 
@@ -367,9 +623,12 @@ class Column(object):
             # this.
             del(sort_list[2:])
 
+            # Cursors for keyset pagination are only valid for the sort
+            # order they were created with.
             url_params = get_url_params_except(
                 datagrid.request.GET,
-                "sort", "datagrid-id", "gridonly", "columns")
+                "sort", "datagrid-id", "gridonly", "columns", "after",
+                "before")
             if url_params:
                 url_params = url_params + '&'
 
@@ -478,21 +737,30 @@ class Column(object):
         key = "%s:%s:%s:%s" % (state.last, rendered_data, url, css_class)
 
         if key not in state.cell_render_cache:
-            ctx = Context(render_context)
-            ctx.update({
-                'column': self,
-                'column_state': state,
-                'css_class': css_class,
-                'url': url,
-                'data': mark_safe(rendered_data)
-            })
+            renderer = self.cell_renderer
+
+            if (renderer is not None and
+                renderer.template_name == (self.cell_template or
+                                           state.datagrid.cell_template)):
+                state.cell_render_cache[key] = mark_safe(
+                    renderer.render(state, css_class, url,
+                                    mark_safe(rendered_data)))
+            else:
+                ctx = Context(render_context)
+                ctx.update({
+                    'column': self,
+                    'column_state': state,
+                    'css_class': css_class,
+                    'url': url,
+                    'data': mark_safe(rendered_data)
+                })
 
-            template = self.cell_template_obj
+                template = self.cell_template_obj
 
-            if template is None:
-                template = state.datagrid.cell_template_obj
+                if template is None:
+                    template = state.datagrid.cell_template_obj
 
-            state.cell_render_cache[key] = mark_safe(template.render(ctx))
+                state.cell_render_cache[key] = mark_safe(template.render(ctx))
 
         return state.cell_render_cache[key]
 
@@ -534,6 +802,68 @@ class Column(object):
 
             return escape(value)
 
+    def get_export_value(self, state, obj):
+        """Return the value of the column for an object when exporting.
+
+        Unlike :py:meth:`render_data`, this returns the raw value, which
+        will be converted to text or JSON by the export. By default, this
+        returns the value of the field named by ``field_name``.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+            obj (object):
+                The object being exported.
+
+        Returns:
+            object:
+            The value to export.
+        """
+        id_field = '%s_id' % self.field_name
+
+        # Look for this directly so that we don't end up fetching the
+        # data for the object.
+        if id_field in obj.__dict__:
+            pk = obj.__dict__[id_field]
+
+            if pk in state.data_cache:
+                return state.data_cache[pk]
+
+            return getattr(obj, self.field_name)
+        else:
+            # Follow . separators like in the django template library
+            value = obj
+
+            for field_name in self.field_name.split('.'):
+                if field_name:
+                    value = getattr(value, field_name)
+
+                    if six.callable(value):
+                        value = value()
+
+            return value
+
+    def get_cache_variant(self, state):
+        """Return what the column's cells depend on besides the object.
+
+        When :py:attr:`DataGrid.cache_rows` is set, rendered rows are cached
+        for each version of an object. A column whose cells also depend on
+        the request (such as the user viewing the datagrid) must return a
+        string identifying those bits here, so that each variant is cached
+        separately.
+
+        Args:
+            state (StatefulColumn):
+                The state for the DataGrid instance.
+
+        Returns:
+            unicode:
+            A string identifying the variant of the cells, or ``None`` if the
+            cells can't be cached at all. The default is an empty string.
+        """
+        return ''
+
     def augment_queryset(self, state, queryset):
         """Augment a queryset with new queries.
 
@@ -694,6 +1024,7 @@ class CheckboxColumn(Column):
         self.show_checkbox_header = show_checkbox_header
         self.checkbox_name = checkbox_name
         self.cell_template = 'datagrid/cell_no_link.html'
+        self.exportable = False
 
     def render_data(self, state, obj):
         if self.is_selectable(state, obj):
@@ -754,664 +1085,2208 @@ class DateTimeSinceColumn(Column):
     def render_data(self, state, obj):
         return _("%s ago") % timesince(getattr(obj, self.field_name))
 
+    def get_cache_variant(self, state):
+        # The cells change as time passes, not just when the object does.
+        return None
 
-class DataGrid(object):
-    """A paginated table of data based on queries from a database.
 
-    A datagriad represents a list of objects, sorted and organized by
-    columns. The sort order and column lists can be customized. allowing
-    users to view this data however they prefer.
+class DataGridPaginator(QuerySetPaginator):
+    """A paginator that counts rows using a count strategy.
 
-    This is meant to be subclassed for specific uses. The subclasses are
-    responsible for defining one or more column types. It can also set
-    one or more of the following optional variables:
+    This works like Django's paginator, but gets the number of rows from a
+    :py:class:`~djblets.datagrid.counts.CountStrategy`. If the strategy
+    doesn't count the rows, pages are fetched with one extra row to find out
+    whether there's a next page, and :py:attr:`num_pages` is ``None``.
 
     Attributes:
-        title (unicode):
-            The title of the grid.
+        count_strategy (djblets.datagrid.counts.CountStrategy):
+            The strategy used to count the rows.
+    """
 
-        profile_sort_field (unicode):
-            The variable name in the user profile where the sort order can be
-            loaded and saved.
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count_strategy=None):
+        """Initialize the paginator.
 
-        profile_columns_field (unicode):
-            The variable name in the user profile where the columns list can be
-            loaded and saved.
+        Args:
+            object_list (QuerySet):
+                The queryset to paginate.
 
-        paginate_by (int):
-            The number of items to show on each page of the grid. The default
-            is 50.
+            per_page (int):
+                The maximum number of objects on a page.
 
-        paginate_orphans (int):
-            If this number of objects or fewer are on the last page, it will be
-            rolled into the previous page. The default is 3.
+            orphans (int, optional):
+                The number of objects on the last page that will be rolled
+                into the previous page.
 
-        page (int):
-            The page to display. If this is not specified, the ``?page=``
-            variable passed in the URL will be used, or 1 if that is not
-            specified.
+            allow_empty_first_page (bool, optional):
+                Whether the first page can be empty.
 
-        listview_template (unicode):
-            The template used to render the list view. The default is
-            :file:`datagrid/listview.html`.
+            count_strategy (djblets.datagrid.counts.CountStrategy, optional):
+                The strategy used to count the rows. Defaults to
+                :py:class:`~djblets.datagrid.counts.ExactCountStrategy`.
+        """
+        super(DataGridPaginator, self).__init__(object_list, per_page,
+                                                orphans,
+                                                allow_empty_first_page)
+        self.count_strategy = count_strategy or ExactCountStrategy()
 
-        column_header_template (unicode):
-            The template used to render each column header. The default is
-            :file:`datagrid/column_header.html`.
+    @cached_property
+    def count(self):
+        """The number of rows, or ``None`` if they're not counted."""
+        return self.count_strategy.get_count(self.object_list)
 
-        cell_template (unicode):
-            The template used to render a cell of data. The default is
-            :file:`datagrid/cell.html`.
+    @cached_property
+    def count_is_approximate(self):
+        """Whether :py:attr:`count` is an estimate."""
+        return (self.count is not None and
+                self.count_strategy.is_approximate(self.count))
 
-        optimize_sorts (bool):
-            Whether or not to optimize queries when using multiple sorts. This
-            can offer a speed improvement, but may need to be turned off for
-            more advanced querysets (such as when using ``extra()``).
-            The default is ``True``.
-    """
+    @property
+    def num_pages(self):
+        """The number of pages, or ``None`` if the rows aren't counted."""
+        if self.count is None:
+            return None
 
-    _columns = None
+        return super(DataGridPaginator, self).num_pages
 
-    @classmethod
-    def add_column(cls, column):
-        """Add a new column for this datagrid.
+    def validate_number(self, number):
+        """Return a validated page number.
 
-        This can be used to add columns to a DataGrid subclass after
-        the subclass has already been defined.
+        Args:
+            number (int or unicode):
+                The 1-based page number.
 
-        The column added must have a unique ID already set.
+        Returns:
+            int:
+            The page number.
 
-        Args:
-            column (Column):
-                The column to add.
+        Raises:
+            django.core.paginator.InvalidPage:
+                The page number is not valid.
         """
-        cls._populate_columns()
-
-        if not column.id:
-            raise KeyError(
-                'Custom datagrid columns must have a unique id attribute.')
+        if self.count is not None:
+            return super(DataGridPaginator, self).validate_number(number)
 
-        if column.id in _column_registry[cls]:
-            raise KeyError('"%s" is already a registered column for %s'
-                           % (column.id, cls.__name__))
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
 
-        _column_registry[cls][column.id] = column
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
 
-    @classmethod
-    def remove_column(cls, column):
-        """Remove a column from this datagrid.
+        return number
 
-        This can be used to remove columns previously added through
-        :py:meth:`add_column`.
+    def page(self, number):
+        """Return a page of results.
 
         Args:
-            column (Column):
-                The column to remove.
+            number (int or unicode):
+                The 1-based page number.
+
+        Returns:
+            django.core.paginator.Page:
+            The page of results.
+
+        Raises:
+            django.core.paginator.InvalidPage:
+                The page number is not valid.
         """
-        cls._populate_columns()
+        if self.count is not None and not self.count_is_approximate:
+            return super(DataGridPaginator, self).page(number)
 
-        try:
-            del _column_registry[cls][column.id]
-        except KeyError:
-            raise KeyError('"%s" is not a registered column for %s'
-                           % (column.id, cls.__name__))
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
 
-    @classmethod
-    def get_column(cls, column_id):
-        """Return the column with the given ID.
+        if self.count is not None:
+            # The count is an estimate, so it can't be used to cut the page
+            # short.
+            return Page(self.object_list[bottom:top], number, self)
 
-        If not found, this will return None.
+        object_list = list(self.object_list[bottom:top + 1])
 
-        Args:
-            column_id (int):
-                The index of the column to return.
+        return UncountedPage(object_list[:self.per_page], number, self,
+                             has_next=len(object_list) > self.per_page)
 
-        Returns:
-            Column: The resulting column at the given index.
-        """
-        cls._populate_columns()
 
-        return _column_registry[cls].get(column_id)
+class UncountedPage(Page):
+    """A page of results from a paginator that doesn't count rows.
 
-    @classmethod
-    def get_columns(cls):
-        """Return the list of registered columns for this datagrid.
+    The objects on the page have already been fetched.
+    """
 
-        Returns:
-            list of Column: The list of columns registered on this datagrid.
-        """
-        cls._populate_columns()
+    def __init__(self, object_list, number, paginator, has_next):
+        """Initialize the page.
 
-        return six.itervalues(_column_registry[cls])
+        Args:
+            object_list (list):
+                The objects on the page.
 
-    @classmethod
-    def _populate_columns(cls):
-        """Populate the default list of columns for the datagrid.
+            number (int):
+                The 1-based page number.
 
-        The default list contains all columns added in the class definition.
+            paginator (DataGridPaginator):
+                The paginator that built the page.
+
+            has_next (bool):
+                Whether there's a page after this one.
         """
-        if cls not in _column_registry:
-            _column_registry[cls] = {}
+        super(UncountedPage, self).__init__(object_list, number, paginator)
 
-            for key in dir(cls):
-                column = getattr(cls, key)
+        self._has_next = has_next
 
-                if isinstance(column, Column):
-                    column.id = key
+    def has_next(self):
+        """Return whether there's a page after this one."""
+        return self._has_next
 
-                    if not column.field_name:
-                        column.field_name = column.id
+    def next_page_number(self):
+        """Return the number of the next page."""
+        return self.number + 1
 
-                    if not column.db_field:
-                        column.db_field = column.field_name
+    def previous_page_number(self):
+        """Return the number of the previous page."""
+        return self.number - 1
 
-                    cls.add_column(column)
+    def end_index(self):
+        """Return the 1-based index of the last object on the page."""
+        return self.start_index() + len(self.object_list) - 1
 
-    def __init__(self, request, queryset=None, title="", extra_context={},
-                 optimize_sorts=True, model=None):
-        """Initialize the datagrid.
 
-        Args:
-            request (HttpRequest):
-                The HTTP request from the client.
+class KeysetPage(object):
+    """A page of results from a :py:class:`KeysetPaginator`.
 
-            queryset (QuerySet):
-                A QuerySet returning the objects to render in the grid.
+    This provides the parts of Django's :py:class:`~django.core.paginator.Page`
+    used by datagrids. Pages aren't numbered. Instead, they provide cursors
+    for fetching the pages before and after them.
 
-            title (unicode):
-                The displayed title of the datagrid.
+    Attributes:
+        object_list (QuerySet):
+            The objects on the page, in sorted order.
 
-            extra_context (dict):
-                Extra context variables to render on the datagrid template.
+        paginator (KeysetPaginator):
+            The paginator that built the page.
 
-            optimize_sorts (bool):
-                If ``True``, sorting will be optimized, reducing the
-                complexity of the queries. This is the default.
+        next_cursor (unicode):
+            The cursor for the next page, or ``None`` if this is the last
+            page.
 
-            model (Model):
-                The model for the objects in the datagrid. Defaults to the
-                model associated with ``queryset``.
+        previous_cursor (unicode):
+            The cursor for the previous page, or ``None`` if this is the first
+            page.
+    """
+
+    number = None
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        """Initialize the page.
+
+        Args:
+            object_list (QuerySet):
+                The objects on the page, in sorted order.
+
+            paginator (KeysetPaginator):
+                The paginator that built the page.
+
+            next_cursor (unicode, optional):
+                The cursor for the next page, if there is one.
+
+            previous_cursor (unicode, optional):
+                The cursor for the previous page, if there is one.
         """
-        self.request = request
-        self.queryset = queryset
-        self.rows = []
-        self.columns = []
-        self.column_map = {}
-        self.id_list = []
-        self.paginator = None
-        self.page = None
-        self.sort_list = None
-        self.state_loaded = False
-        self.page_num = 0
-        self.id = None
-        self.extra_context = dict(extra_context)
-        self.optimize_sorts = optimize_sorts
-        self.special_query_args = []
-        self._model = model
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
 
-        if not hasattr(request, "datagrid_count"):
-            request.datagrid_count = 0
+    def has_next(self):
+        """Return whether there's a page after this one."""
+        return self.next_cursor is not None
 
-        self.id = "datagrid-%s" % request.datagrid_count
-        request.datagrid_count += 1
+    def has_previous(self):
+        """Return whether there's a page before this one."""
+        return self.previous_cursor is not None
 
-        # Customizable variables
-        self.title = title
-        self.profile_sort_field = None
-        self.profile_columns_field = None
-        self.paginate_by = 50
-        self.paginate_orphans = 3
-        self.listview_template = 'datagrid/listview.html'
-        self.column_header_template = 'datagrid/column_header.html'
-        self.cell_template = 'datagrid/cell.html'
-        self.paginator_template = 'datagrid/paginator.html'
+    def has_other_pages(self):
+        """Return whether there's a page before or after this one."""
+        return self.has_next() or self.has_previous()
 
-    @cached_property
-    def cell_template_obj(self):
-        """The rendered template used for cells on this datagrid.
+    def __len__(self):
+        return len(self.object_list)
 
-        This will only be generated once, and reused for all cells.
+    def __repr__(self):
+        return '<KeysetPage>'
+
+
+class KeysetPaginator(object):
+    """A paginator that navigates using the sort keys of rows.
+
+    Django's paginators compute the number of results and fetch pages using
+    ``OFFSET``, both of which require the database to go through every row
+    leading up to the page. On large tables, that makes later pages very
+    slow.
+
+    This paginator instead remembers the sort keys (the values of the fields
+    being sorted on, and the primary key) of the first and last rows of each
+    page, encoded in a cursor. The next page is then fetched by asking for
+    the rows sorting after the last row's keys, which the database can look
+    up in an index. There's no count of results or pages, so pages can only
+    be reached from the first page, the last page, or a neighboring page.
+
+    The sort keys come from the queryset's ordering, with the primary key
+    added to break ties. Each field can be sorted in either direction. The
+    fields must be model fields, lookups across relations or annotations.
+    Fields that may be ``NULL`` (including lookups across nullable
+    relations) can't be used, as ``NULL`` can't be compared to a sort key,
+    and databases differ in how they sort it.
+
+    Attributes:
+        object_list (QuerySet):
+            The queryset being paginated.
+
+        per_page (int):
+            The maximum number of objects on a page.
+
+        sort_fields (list of tuple):
+            The fields used for the sort keys, as a list of tuples of the
+            field name and whether it's sorted in descending order.
+    """
+
+    #: Counts are never computed. These are here for compatibility.
+    count = None
+    num_pages = None
+
+    def __init__(self, object_list, per_page):
+        """Initialize the paginator.
+
+        Args:
+            object_list (QuerySet):
+                The queryset to paginate. Its ordering determines the sort
+                keys.
+
+            per_page (int):
+                The maximum number of objects on a page.
+
+        Raises:
+            ValueError:
+                The queryset isn't a QuerySet, or is sorted in a way that
+                can't be used for sort keys.
         """
-        obj = get_template(self.cell_template)
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.sort_fields = self._get_sort_fields(object_list)
 
-        if not obj:
-            logger.error("Unable to load template '%s' for datagrid "
-                         "cell. This may be an installation issue.",
-                         self.cell_template,
-                         request=self.request)
+    def page(self, after=None, before=None, last=False):
+        """Return a page of results.
 
-        return obj
+        With no arguments, this returns the first page.
 
-    @cached_property
-    def column_header_template_obj(self):
-        """The rendered template used for column headers on this datagrid.
+        Args:
+            after (unicode, optional):
+                The cursor of the row just before the page to return.
 
-        This will only be generated once, and reused for all headers.
+            before (unicode, optional):
+                The cursor of the row just after the page to return.
+
+            last (bool, optional):
+                Whether to return the last page.
+
+        Returns:
+            KeysetPage:
+            The page of results.
+
+        Raises:
+            django.core.paginator.InvalidPage:
+                The cursor was not valid for this paginator.
         """
-        obj = get_template(self.column_header_template)
+        if after is not None and before is not None:
+            raise InvalidPage('Only one of "after" and "before" can be used.')
+
+        backward = before is not None or last
+        queryset = self.object_list
+
+        if after is not None:
+            queryset = queryset.filter(
+                self._build_filter(self.decode_cursor(after), backward=False))
+        elif before is not None:
+            queryset = queryset.filter(
+                self._build_filter(self.decode_cursor(before), backward=True))
+
+        # Only the sort keys are fetched here, which the database can often
+        # get directly from an index. The extra row tells us whether there's
+        # anything beyond this page.
+        rows = list(
+            queryset
+            .order_by(*self._get_ordering(backward))
+            .values_list(*[name for name, descending in self.sort_fields])
+            [:self.per_page + 1])
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backward:
+            rows.reverse()
+            has_next = before is not None
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = after is not None
 
-        if not obj:
-            logger.error("Unable to load template '%s' for datagrid "
-                         "column headers. This may be an installation "
-                         "issue.",
-                         self.column_header_template,
-                         request=self.request)
+        next_cursor = None
+        previous_cursor = None
 
-        return obj
+        if rows:
+            if has_next:
+                next_cursor = self.encode_cursor(rows[-1])
 
-    @property
-    def all_columns(self):
-        """All columns in the datagrid, sorted by label."""
-        return [
-            self.get_stateful_column(column)
-            for column in sorted(self.get_columns(),
-                                 key=lambda x: x.detailed_label)
-        ]
+            if has_previous:
+                previous_cursor = self.encode_cursor(rows[0])
 
-    @property
-    def model(self):
-        """The model representing the objects shown in the grid."""
-        if self._model is None:
-            return self.queryset.model
+        object_list = (
+            self.object_list
+            .filter(pk__in=[row[-1] for row in rows])
+            .order_by(*self._get_ordering(backward=False)))
 
-        return self._model
+        return KeysetPage(object_list, self,
+                          next_cursor=next_cursor,
+                          previous_cursor=previous_cursor)
 
-    def get_stateful_column(self, column):
-        """Return a StatefulColumn for the given Column instance.
+    def encode_cursor(self, values):
+        """Return a cursor for a row's sort keys.
 
-        If one has already been created, it will be returned.
+        Args:
+            values (list):
+                The values of the row's sort fields, ending with the
+                primary key.
+
+        Returns:
+            unicode:
+            A URL-safe cursor.
+        """
+        data = json.dumps(list(values), default=self._serialize_value,
+                          separators=(',', ':'))
+
+        return (base64.urlsafe_b64encode(data.encode('utf-8'))
+                .decode('ascii')
+                .rstrip('='))
+
+    def decode_cursor(self, cursor):
+        """Return the sort keys from a cursor.
 
         Args:
-            column (Column):
-                The column associated with the stateful column.
+            cursor (unicode):
+                A cursor returned by :py:meth:`encode_cursor`.
 
         Returns:
-            StatefulColumn: The column state associated with the column.
+            list:
+            The values of the sort fields, ending with the primary key.
+            Values that aren't JSON types are returned as strings, which
+            the database fields will convert back when filtering.
+
+        Raises:
+            django.core.paginator.InvalidPage:
+                The cursor was not valid for this paginator.
         """
-        if column not in self.column_map:
-            self.column_map[column] = StatefulColumn(self, column)
+        try:
+            cursor = cursor.encode('ascii')
+            data = base64.urlsafe_b64decode(cursor + b'=' * (-len(cursor) % 4))
+            values = json.loads(data.decode('utf-8'))
+        except (binascii.Error, TypeError, ValueError):
+            raise InvalidPage('The page cursor is not valid.')
 
-        return self.column_map[column]
+        if (not isinstance(values, list) or
+            len(values) != len(self.sort_fields) or
+            None in values):
+            raise InvalidPage('The page cursor is not valid.')
 
-    def load_state(self, render_context=None):
-        """Load the state of the datagrid.
+        return values
 
-        This will retrieve the user-specified or previously stored
-        sorting order and columns list, as well as any state a subclass
-        may need.
+    def _get_sort_fields(self, queryset):
+        """Return the fields used for the sort keys.
 
         Args:
-            render_context (Context):
-                Common template variable context to render on the datagrid.
+            queryset (QuerySet):
+                The queryset being paginated.
+
+        Returns:
+            list of tuple:
+            The sort fields, as tuples of the field name and whether it's
+            sorted in descending order.
+
+        Raises:
+            ValueError:
+                The queryset can't be paginated by sort keys.
         """
-        if self.state_loaded:
-            return
+        if not hasattr(queryset, 'query') or not hasattr(queryset,
+                                                        'values_list'):
+            raise ValueError('Keyset pagination requires a QuerySet.')
 
-        profile_sort_list = None
-        profile_columns_list = None
-        profile = None
-        profile_dirty = False
+        meta = queryset.model._meta
+        pk_names = ('pk', meta.pk.name, meta.pk.attname)
+        ordering = list(queryset.query.order_by)
 
-        # Get the saved settings for this grid in the profile. These will
-        # work as defaults and allow us to determine if we need to save
-        # the profile.
-        if self.request.user.is_authenticated():
-            profile = self.get_user_profile()
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(meta.ordering)
 
-            if profile:
-                if self.profile_sort_field:
-                    profile_sort_list = \
-                        getattr(profile, self.profile_sort_field, None)
+        sort_fields = []
 
-                if self.profile_columns_field:
-                    profile_columns_list = \
-                        getattr(profile, self.profile_columns_field, None)
+        for item in ordering:
+            if (not isinstance(item, six.string_types) or
+                item == '?' or
+                '.' in item):
+                raise ValueError('Keyset pagination cannot sort by %r.'
+                                 % (item,))
 
-        # Figure out the columns we're going to display
-        # We're also going to calculate the column widths based on the
-        # shrink and expand values.
-        colnames_str = self.request.GET.get('columns', profile_columns_list)
+            if item.startswith('-'):
+                name = item[1:]
+                descending = True
+            else:
+                name = item
+                descending = False
 
-        if colnames_str:
-            colnames = colnames_str.split(',')
-        else:
-            colnames = self.default_columns
-            colnames_str = ",".join(colnames)
+            if name in pk_names:
+                # The primary key is unique, so nothing after it matters.
+                sort_fields.append(('pk', descending))
 
-        expand_columns = []
-        normal_columns = []
+                return sort_fields
 
-        for colname in colnames:
-            column_def = self.get_column(colname)
+            if self._is_nullable(queryset, name):
+                raise ValueError('Keyset pagination cannot sort by %r, '
+                                 'which may be NULL.'
+                                 % name)
 
-            if not column_def:
-                # The user specified a column that doesn't exist. Skip it.
-                continue
+            sort_fields.append((name, descending))
 
-            column = self.get_stateful_column(column_def)
-            self.columns.append(column)
-            column.active = True
+        sort_fields.append(('pk', False))
 
-            if column.expand:
-                # This column is requesting all remaining space. Save it for
-                # later so we can tell how much to give it. Each expanded
-                # column will count as two normal columns when calculating
-                # the normal sized columns.
-                expand_columns.append(column)
-            elif column.shrink:
-                # Make this as small as possible.
-                column.width = 0
-            else:
-                # We'll divide the column widths equally after we've built
-                # up the lists of expanded and normal sized columns.
-                normal_columns.append(column)
+        return sort_fields
 
-        self.columns[-1].last = True
+    def _is_nullable(self, queryset, name):
+        """Return whether a sort field may be NULL.
 
-        # Try to figure out the column widths for each column.
-        # We'll start with the normal sized columns.
-        total_pct = 100
+        Args:
+            queryset (QuerySet):
+                The queryset being paginated.
 
-        # Each expanded column counts as two normal columns.
-        normal_column_width = total_pct / (len(self.columns) +
-                                           len(expand_columns))
+            name (unicode):
+                The name of the field, lookup across relations, or
+                annotation.
 
-        for column in normal_columns:
-            column.width = normal_column_width
-            total_pct -= normal_column_width
+        Returns:
+            bool:
+            ``True`` if the field, or any relation leading to it, is
+            nullable.
 
-        if len(expand_columns) > 0:
-            expanded_column_width = total_pct / len(expand_columns)
-        else:
-            expanded_column_width = 0
+        Raises:
+            ValueError:
+                The name isn't a field, lookup or annotation that can be
+                sorted by.
+        """
+        query = queryset.query
 
-        for column in expand_columns:
-            column.width = expanded_column_width
+        if (name in getattr(query, 'annotations', {}) or
+            name in getattr(query, 'aggregates', {})):
+            # Annotations don't have fields to check. They're trusted not
+            # to be NULL.
+            return False
 
-        # Now get the sorting order for the columns.
-        sort_str = self.request.GET.get('sort', profile_sort_list)
+        model = queryset.model
+        parts = name.split('__')
 
-        if sort_str:
-            self.sort_list = [
-                sort_column
-                for sort_column in sort_str.split(',')
-                if sort_column
-            ]
-        else:
-            self.sort_list = self.default_sort
-            sort_str = ",".join(self.sort_list)
+        for i, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise ValueError('Keyset pagination cannot sort by %r.'
+                                 % name)
+
+            if field.null:
+                return True
+
+            if i < len(parts) - 1:
+                if isinstance(field, ManyToManyField):
+                    raise ValueError('Keyset pagination cannot sort by %r.'
+                                     % name)
+
+                if hasattr(field, 'remote_field'):
+                    # Django >= 1.9
+                    remote_field = field.remote_field
+                    model = remote_field and remote_field.model
+                else:
+                    # Django < 1.9
+                    model = field.rel and field.rel.to
 
-        # A subclass might have some work to do for loading and saving
-        # as well.
-        if self.load_extra_state(profile):
-            profile_dirty = True
+                if model is None:
+                    raise ValueError('Keyset pagination cannot sort by %r.'
+                                     % name)
 
-        # Now that we have all that, figure out if we need to save new
-        # settings back to the profile.
-        if profile:
-            if (self.profile_columns_field and
-                    colnames_str != profile_columns_list):
-                setattr(profile, self.profile_columns_field, colnames_str)
-                profile_dirty = True
+        return False
+
+    def _get_ordering(self, backward):
+        """Return the ordering for the sort fields.
+
+        Args:
+            backward (bool):
+                Whether to reverse the ordering.
+
+        Returns:
+            list of unicode:
+            The arguments for :py:meth:`QuerySet.order_by`.
+        """
+        return [
+            '%s%s' % (('-' if descending != backward else ''), name)
+            for name, descending in self.sort_fields
+        ]
+
+    def _build_filter(self, values, backward):
+        """Return a filter for rows sorting after (or before) sort keys.
+
+        For sort fields ``a``, ``b`` and ``pk``, rows after the keys are those
+        where ``a`` sorts after the key, or ``a`` is equal and ``b`` sorts
+        after the key, or both are equal and ``pk`` sorts after the key.
+
+        Args:
+            values (list):
+                The decoded sort keys.
+
+            backward (bool):
+                Whether to match rows sorting before the keys.
+
+        Returns:
+            django.db.models.Q:
+            The filter.
+        """
+        result = None
+        equal = {}
+
+        for (name, descending), value in zip(self.sort_fields, values):
+            if descending != backward:
+                lookup = '%s__lt' % name
+            else:
+                lookup = '%s__gt' % name
+
+            q = Q(**dict(equal, **{lookup: value}))
+
+            if result is None:
+                result = q
+            else:
+                result |= q
+
+            equal[name] = value
+
+        return result
+
+    @staticmethod
+    def _serialize_value(value):
+        """Return a JSON-compatible version of a sort key.
+
+        Args:
+            value (object):
+                The value of a sort field.
+
+        Returns:
+            unicode:
+            The value as a string.
+        """
+        if hasattr(value, 'isoformat'):
+            # This keeps microseconds, unlike DjangoJSONEncoder.
+            return value.isoformat()
+
+        return six.text_type(value)
+
+
+class DataGrid(object):
+    """A paginated table of data based on queries from a database.
+
+    A datagriad represents a list of objects, sorted and organized by
+    columns. The sort order and column lists can be customized. allowing
+    users to view this data however they prefer.
+
+    This is meant to be subclassed for specific uses. The subclasses are
+    responsible for defining one or more column types. It can also set
+    one or more of the following optional variables:
+
+    Attributes:
+        title (unicode):
+            The title of the grid.
+
+        profile_sort_field (unicode):
+            The variable name in the user profile where the sort order can be
+            loaded and saved.
+
+        profile_columns_field (unicode):
+            The variable name in the user profile where the columns list can be
+            loaded and saved.
+
+        paginate_by (int):
+            The number of items to show on each page of the grid. The default
+            is 50.
+
+        paginate_orphans (int):
+            If this number of objects or fewer are on the last page, it will be
+            rolled into the previous page. The default is 3.
+
+        count_strategy (djblets.datagrid.counts.CountStrategy):
+            The strategy used to count the rows for page-based pagination.
+            See :py:mod:`djblets.datagrid.counts` for the available
+            strategies. The default is ``None``, which counts the rows on
+            every page view.
+
+        use_keyset_pagination (bool):
+            Whether to paginate using the sort keys of the rows, through
+            :py:class:`KeysetPaginator`, instead of page numbers. This avoids
+            counting the results and skipping past earlier rows, which are
+            slow on large tables, but only allows moving to the first, last,
+            previous and next pages. Pages are selected by the ``?after=`` and
+            ``?before=`` variables in the URL. The default is ``False``.
+
+        cache_rows (bool):
+            Whether to cache rendered rows across requests. Rows are cached
+            for each version of an object (see
+            :py:meth:`get_row_cache_version`), the active columns, and the
+            variants of the columns' cells (see
+            :py:meth:`Column.get_cache_variant`). All the rows on a page are
+            fetched from the cache at once, and only the rows that aren't
+            cached are rendered. The default is ``False``.
+
+        row_cache_version_field (unicode):
+            The name of the field on objects that changes whenever they
+            change, such as a last-updated timestamp. This is used by the
+            default implementation of :py:meth:`get_row_cache_version`.
+            The default is ``None``.
+
+        row_cache_expiration (int):
+            The number of seconds to cache rendered rows for. The default is
+            one day.
+
+        query_fields (list of unicode):
+            The fields on the model that are always loaded when the active
+            columns list the fields they use (see
+            :py:meth:`Column.get_query_fields`). This should include any
+            fields used by the objects' ``get_absolute_url``. The default is
+            an empty list.
+
+        log_lazy_queries (bool):
+            Whether to log columns that run queries for each row they
+            render, which usually means they use fields or relations that
+            they don't list. The default is the value of
+            ``settings.DEBUG``.
+
+        use_streaming (bool):
+            Whether :py:meth:`render_listview_to_response` streams the list
+            view through :py:meth:`iter_listview`, rather than rendering it
+            all at once. The default is ``False``.
+
+        streaming_batch_size (int):
+            The number of rows fetched and rendered at a time when streaming.
+            The default is 100.
+
+        allow_export (bool):
+            Whether the data in the grid can be exported as CSV or JSON lines
+            by passing ``?export=csv`` or ``?export=json`` to
+            :py:meth:`render_to_response`. The export contains every row
+            (not just the current page) for the active columns, in the
+            current sort order. The default is ``False``.
+
+        page (int):
+            The page to display. If this is not specified, the ``?page=``
+            variable passed in the URL will be used, or 1 if that is not
+            specified.
+
+        listview_template (unicode):
+            The template used to render the list view. The default is
+            :file:`datagrid/listview.html`.
+
+        column_header_template (unicode):
+            The template used to render each column header. The default is
+            :file:`datagrid/column_header.html`.
+
+        cell_template (unicode):
+            The template used to render a cell of data. The default is
+            :file:`datagrid/cell.html`.
+
+        rows_template (unicode):
+            The template used to render the rows of the grid. The default is
+            :file:`datagrid/rows.html`.
+
+        optimize_sorts (bool):
+            Whether or not to optimize queries when using multiple sorts. This
+            can offer a speed improvement, but may need to be turned off for
+            more advanced querysets (such as when using ``extra()``).
+            The default is ``True``.
+    """
+
+    _columns = None
+
+    @classmethod
+    def add_column(cls, column):
+        """Add a new column for this datagrid.
+
+        This can be used to add columns to a DataGrid subclass after
+        the subclass has already been defined.
+
+        The column added must have a unique ID already set.
+
+        Args:
+            column (Column):
+                The column to add.
+        """
+        cls._populate_columns()
+
+        if not column.id:
+            raise KeyError(
+                'Custom datagrid columns must have a unique id attribute.')
+
+        if column.id in _column_registry[cls]:
+            raise KeyError('"%s" is already a registered column for %s'
+                           % (column.id, cls.__name__))
+
+        _column_registry[cls][column.id] = column
+
+    @classmethod
+    def remove_column(cls, column):
+        """Remove a column from this datagrid.
+
+        This can be used to remove columns previously added through
+        :py:meth:`add_column`.
+
+        Args:
+            column (Column):
+                The column to remove.
+        """
+        cls._populate_columns()
+
+        try:
+            del _column_registry[cls][column.id]
+        except KeyError:
+            raise KeyError('"%s" is not a registered column for %s'
+                           % (column.id, cls.__name__))
+
+    @classmethod
+    def get_column(cls, column_id):
+        """Return the column with the given ID.
+
+        If not found, this will return None.
+
+        Args:
+            column_id (int):
+                The index of the column to return.
+
+        Returns:
+            Column: The resulting column at the given index.
+        """
+        cls._populate_columns()
+
+        return _column_registry[cls].get(column_id)
+
+    @classmethod
+    def get_columns(cls):
+        """Return the list of registered columns for this datagrid.
+
+        Returns:
+            list of Column: The list of columns registered on this datagrid.
+        """
+        cls._populate_columns()
+
+        return six.itervalues(_column_registry[cls])
+
+    @classmethod
+    def _populate_columns(cls):
+        """Populate the default list of columns for the datagrid.
+
+        The default list contains all columns added in the class definition.
+        """
+        if cls not in _column_registry:
+            _column_registry[cls] = {}
+
+            for key in dir(cls):
+                column = getattr(cls, key)
+
+                if isinstance(column, Column):
+                    column.id = key
+
+                    if not column.field_name:
+                        column.field_name = column.id
+
+                    if not column.db_field:
+                        column.db_field = column.field_name
+
+                    cls.add_column(column)
+
+    def __init__(self, request, queryset=None, title="", extra_context={},
+                 optimize_sorts=True, model=None):
+        """Initialize the datagrid.
+
+        Args:
+            request (HttpRequest):
+                The HTTP request from the client.
+
+            queryset (QuerySet):
+                A QuerySet returning the objects to render in the grid.
+
+            title (unicode):
+                The displayed title of the datagrid.
+
+            extra_context (dict):
+                Extra context variables to render on the datagrid template.
+
+            optimize_sorts (bool):
+                If ``True``, sorting will be optimized, reducing the
+                complexity of the queries. This is the default.
+
+            model (Model):
+                The model for the objects in the datagrid. Defaults to the
+                model associated with ``queryset``.
+        """
+        self.request = request
+        self.queryset = queryset
+        self.rows = []
+        self.columns = []
+        self.column_map = {}
+        self.id_list = []
+        self.paginator = None
+        self.page = None
+        self.sort_list = None
+        self.state_loaded = False
+        self.page_num = 0
+        self.id = None
+        self.extra_context = dict(extra_context)
+        self.optimize_sorts = optimize_sorts
+        self.special_query_args = []
+        self._model = model
+        self._defer_rows = False
+        self._exporting = False
+        self._save_profile = True
+
+        if not hasattr(request, "datagrid_count"):
+            request.datagrid_count = 0
+
+        self.id = "datagrid-%s" % request.datagrid_count
+        request.datagrid_count += 1
+
+        # Customizable variables
+        self.title = title
+        self.profile_sort_field = None
+        self.profile_columns_field = None
+        self.paginate_by = 50
+        self.paginate_orphans = 3
+        self.count_strategy = None
+        self.use_keyset_pagination = False
+        self.cache_rows = False
+        self.row_cache_version_field = None
+        self.row_cache_expiration = 60 * 60 * 24
+        self.query_fields = []
+        self.log_lazy_queries = settings.DEBUG
+        self.use_streaming = False
+        self.streaming_batch_size = 100
+        self.allow_export = False
+        self.listview_template = 'datagrid/listview.html'
+        self.column_header_template = 'datagrid/column_header.html'
+        self.cell_template = 'datagrid/cell.html'
+        self.rows_template = 'datagrid/rows.html'
+        self.paginator_template = 'datagrid/paginator.html'
+
+    @cached_property
+    def cell_template_obj(self):
+        """The rendered template used for cells on this datagrid.
+
+        This will only be generated once, and reused for all cells.
+        """
+        obj = get_template(self.cell_template)
+
+        if not obj:
+            logger.error("Unable to load template '%s' for datagrid "
+                         "cell. This may be an installation issue.",
+                         self.cell_template,
+                         request=self.request)
+
+        return obj
+
+    @cached_property
+    def column_header_template_obj(self):
+        """The rendered template used for column headers on this datagrid.
+
+        This will only be generated once, and reused for all headers.
+        """
+        obj = get_template(self.column_header_template)
+
+        if not obj:
+            logger.error("Unable to load template '%s' for datagrid "
+                         "column headers. This may be an installation "
+                         "issue.",
+                         self.column_header_template,
+                         request=self.request)
+
+        return obj
+
+    @property
+    def all_columns(self):
+        """All columns in the datagrid, sorted by label."""
+        return [
+            self.get_stateful_column(column)
+            for column in sorted(self.get_columns(),
+                                 key=lambda x: x.detailed_label)
+        ]
+
+    @property
+    def model(self):
+        """The model representing the objects shown in the grid."""
+        if self._model is None:
+            return self.queryset.model
+
+        return self._model
+
+    def get_stateful_column(self, column):
+        """Return a StatefulColumn for the given Column instance.
+
+        If one has already been created, it will be returned.
+
+        Args:
+            column (Column):
+                The column associated with the stateful column.
+
+        Returns:
+            StatefulColumn: The column state associated with the column.
+        """
+        if column not in self.column_map:
+            self.column_map[column] = StatefulColumn(self, column)
+
+        return self.column_map[column]
+
+    def load_state(self, render_context=None):
+        """Load the state of the datagrid.
+
+        This will retrieve the user-specified or previously stored
+        sorting order and columns list, as well as any state a subclass
+        may need.
+
+        Args:
+            render_context (Context):
+                Common template variable context to render on the datagrid.
+        """
+        if self.state_loaded:
+            return
+
+        profile_sort_list = None
+        profile_columns_list = None
+        profile = None
+        profile_dirty = False
+
+        # Get the saved settings for this grid in the profile. These will
+        # work as defaults and allow us to determine if we need to save
+        # the profile.
+        if self.request.user.is_authenticated():
+            profile = self.get_user_profile()
+
+            if profile:
+                if self.profile_sort_field:
+                    profile_sort_list = \
+                        getattr(profile, self.profile_sort_field, None)
+
+                if self.profile_columns_field:
+                    profile_columns_list = \
+                        getattr(profile, self.profile_columns_field, None)
+
+        # Figure out the columns we're going to display
+        # We're also going to calculate the column widths based on the
+        # shrink and expand values.
+        colnames_str = self.request.GET.get('columns', profile_columns_list)
+
+        if colnames_str:
+            colnames = colnames_str.split(',')
+        else:
+            colnames = self.default_columns
+            colnames_str = ",".join(colnames)
+
+        def _get_column_defs(colnames):
+            # The user may have specified columns that don't exist. Skip
+            # them.
+            column_defs = [self.get_column(colname) for colname in colnames]
+
+            return [column_def for column_def in column_defs if column_def]
+
+        column_defs = _get_column_defs(colnames)
+
+        if not column_defs and colnames != self.default_columns:
+            # None of them existed, so fall back on the default columns.
+            colnames = self.default_columns
+            colnames_str = ",".join(colnames)
+            column_defs = _get_column_defs(colnames)
+
+        expand_columns = []
+        normal_columns = []
+
+        for column_def in column_defs:
+            column = self.get_stateful_column(column_def)
+            self.columns.append(column)
+            column.active = True
+
+            if column.expand:
+                # This column is requesting all remaining space. Save it for
+                # later so we can tell how much to give it. Each expanded
+                # column will count as two normal columns when calculating
+                # the normal sized columns.
+                expand_columns.append(column)
+            elif column.shrink:
+                # Make this as small as possible.
+                column.width = 0
+            else:
+                # We'll divide the column widths equally after we've built
+                # up the lists of expanded and normal sized columns.
+                normal_columns.append(column)
+
+        if self.columns:
+            self.columns[-1].last = True
+
+        # Try to figure out the column widths for each column.
+        # We'll start with the normal sized columns.
+        total_pct = 100
+
+        # Each expanded column counts as two normal columns.
+        normal_column_width = total_pct / max(len(self.columns) +
+                                              len(expand_columns), 1)
+
+        for column in normal_columns:
+            column.width = normal_column_width
+            total_pct -= normal_column_width
+
+        if len(expand_columns) > 0:
+            expanded_column_width = total_pct / len(expand_columns)
+        else:
+            expanded_column_width = 0
+
+        for column in expand_columns:
+            column.width = expanded_column_width
+
+        # Now get the sorting order for the columns.
+        sort_str = self.request.GET.get('sort', profile_sort_list)
+
+        if sort_str:
+            self.sort_list = [
+                sort_column
+                for sort_column in sort_str.split(',')
+                if sort_column
+            ]
+        else:
+            self.sort_list = self.default_sort
+            sort_str = ",".join(self.sort_list)
+
+        # A subclass might have some work to do for loading and saving
+        # as well.
+        if self.load_extra_state(profile):
+            profile_dirty = True
+
+        # Now that we have all that, figure out if we need to save new
+        # settings back to the profile.
+        if profile:
+            if (self.profile_columns_field and
+                    colnames_str != profile_columns_list):
+                setattr(profile, self.profile_columns_field, colnames_str)
+                profile_dirty = True
+
+            if self.profile_sort_field and sort_str != profile_sort_list:
+                setattr(profile, self.profile_sort_field, sort_str)
+                profile_dirty = True
+
+            if profile_dirty and self._save_profile:
+                profile.save()
+
+        self.state_loaded = True
+
+        # Fetch the list of objects and have it ready.
+        self.precompute_objects(render_context)
+
+    def get_user_profile(self):
+        """Return the object, if any, to use for the user profile state.
+
+        Returns:
+            The object, if any, used to store and retrieve persistent
+            profile state for the datagrid.
+        """
+        if hasattr(self.request.user, 'get_profile'):
+            try:
+                return self.request.user.get_profile()
+            except ObjectDoesNotExist:
+                pass
+            except SiteProfileNotAvailable:
+                pass
+
+        return None
+
+    def load_extra_state(self, profile):
+        """Load any extra state needed for this grid.
+
+        This is used by subclasses that may have additional data to load
+        and save.
+
+        Args:
+            profile (Model):
+                The profile model instance to load from, if any.
+
+        Returns:
+            bool:
+                Subclasses must return ``True`` if any profile-stored
+                state has changed, or ``False`` otherwise.
+        """
+        return False
+
+    def precompute_objects(self, render_context=None):
+        """Pre-compute all objects used to render the datagrid.
+
+        This builds the queryset and stores the list of objects for use in
+        rendering the datagrid. It takes into consideration sorting,
+        the current page, and augmented queries from columns.
+
+        Args:
+            render_context (Context):
+                The common template variable context to render on the datagrid,
+                provided in the constructor.
+        """
+        if self._exporting:
+            # The objects will be fetched by iter_export().
+            return
+
+        query, sort_list, use_select_related = self._build_queryset()
+
+        if use_select_related:
+            # Relations can't be followed through deferred fields, so load
+            # all the fields. This must happen before paginating, as some
+            # pages are fetched by the paginator.
+            query = query.defer(None).select_related(depth=1)
+
+        self.paginator = self.build_paginator(query)
+
+        page_num = self.request.GET.get('page', 1)
+        is_keyset = isinstance(self.paginator, KeysetPaginator)
+
+        try:
+            if is_keyset:
+                self.page = self.paginator.page(
+                    after=self.request.GET.get('after') or None,
+                    before=self.request.GET.get('before') or None,
+                    last=(page_num == 'last'))
+            else:
+                # Accept either "last" or a valid page number. Without a
+                # count, the last page isn't known, so start at the first.
+                if page_num == "last":
+                    page_num = self.paginator.num_pages or 1
+
+                self.page = self.paginator.page(page_num)
+        except InvalidPage:
+            raise Http404
+
+        self.id_list = []
+
+        # Keyset pages are already limited to the page's IDs, and uncounted
+        # pages have already been fetched, so there's nothing to gain from
+        # fetching the IDs separately. Streamed pages are fetched in sorted
+        # order as they're rendered.
+        if (self.optimize_sorts and
+            len(sort_list) > 0 and
+            not self._defer_rows and
+            not isinstance(self.page, (KeysetPage, UncountedPage))):
+            # This can be slow when sorting by multiple columns. If we
+            # have multiple items in the sort list, we'll request just the
+            # IDs and then fetch the actual details from that.
+            if hasattr(self.page.object_list, 'values_list'):
+                # This is a standard QuerySet.
+                self.id_list = list(self.page.object_list.values_list(
+                    'pk', flat=True))
+            else:
+                # This is something more custom. Perhaps a Haystack
+                # SearchQuerySet. It must have a 'pk' or it won't work.
+                self.id_list = [int(obj.pk) for obj in self.page.object_list]
+
+            # Make sure to unset the order. We can't meaningfully order these
+            # results in the query, as what we really want is to keep it in
+            # the order specified in id_list, and we certainly don't want
+            # the database to do any special ordering (possibly slowing things
+            # down). We'll set the order properly in a minute.
+            self.page.object_list = self.post_process_queryset(
+                self.model.objects.filter(pk__in=self.id_list).order_by())
+
+            if use_select_related:
+                self.page.object_list = \
+                    self.page.object_list.defer(None).select_related(depth=1)
+
+        if self._defer_rows:
+            # The caller (such as iter_listview()) will fetch the rows.
+            self.rows = []
+            return
+
+        if self.id_list:
+            # The database will give us the items in a more or less random
+            # order, since it doesn't know to keep it in the order provided by
+            # the ID list. This will place the results back in the order we
+            # expect.
+            index = dict([(id, pos) for (pos, id) in enumerate(self.id_list)])
+            object_list = [None] * len(self.id_list)
+
+            for obj in list(self.page.object_list):
+                object_list[index[obj.pk]] = obj
+        else:
+            # Grab the whole list at once. We know it won't be too large,
+            # and it will prevent one query per row.
+            object_list = list(self.page.object_list)
+
+        if render_context is None:
+            render_context = self._build_render_context()
+
+        self.rows = self._render_rows(object_list, render_context)
+
+    def _build_queryset(self):
+        """Build the sorted and augmented queryset for all rows of the grid.
+
+        Returns:
+            tuple:
+            A 3-tuple containing:
+
+            1. The queryset (:py:class:`~django.db.models.query.QuerySet`).
+            2. The list of fields being sorted by (:py:class:`list`).
+            3. Whether relations need to be selected for sorting
+               (:py:class:`bool`).
+        """
+        query = self.queryset
+        use_select_related = False
+
+        # Generate the actual list of fields we'll be sorting by
+        sort_list = []
+        for sort_item in self.sort_list:
+            if sort_item[0] == "-":
+                base_sort_item = sort_item[1:]
+                prefix = "-"
+            else:
+                base_sort_item = sort_item
+                prefix = ""
+
+            if sort_item:
+                column = self.get_column(base_sort_item)
+                if not column:
+                    logger.warning('Skipping non-existing sort column "%s" '
+                                   'for user "%s".',
+                                   base_sort_item, self.request.user.username)
+                    continue
+
+                stateful_column = self.get_stateful_column(column)
+
+                if stateful_column:
+                    try:
+                        sort_field = stateful_column.get_sort_field()
+                    except Exception as e:
+                        logger.exception('Error when calling get_sort_field '
+                                         'for DataGrid Column %r: %s',
+                                         column, e)
+                        sort_field = ''
+
+                    sort_list.append(prefix + sort_field)
+
+                    # Lookups spanning tables require that we query from those
+                    # tables. In order to keep things simple, we'll just use
+                    # select_related so that we don't have to figure out the
+                    # table relationships. We only do this if we have a lookup
+                    # spanning tables.
+                    if '.' in sort_field:
+                        use_select_related = True
+
+        if sort_list:
+            query = query.order_by(*sort_list)
+
+        query = self.post_process_queryset(query)
+
+        if hasattr(query, 'distinct'):
+            query = query.distinct()
+
+        return query, sort_list, use_select_related
+
+    def _render_rows(self, object_list, render_context):
+        """Render the rows for a list of objects.
+
+        Args:
+            object_list (list):
+                The objects to render. Entries may be ``None``, in which
+                case they're skipped.
+
+            render_context (dict):
+                The common template variable context to render on the
+                datagrid.
+
+        Returns:
+            list of dict:
+            The rows, each containing the ``object`` and its rendered
+            ``cells``.
+        """
+        row_cache_keys = {}
+        cached_rows = {}
+
+        if self.cache_rows:
+            row_cache_keys = self._get_row_cache_keys(object_list)
+
+            if row_cache_keys:
+                try:
+                    cached_rows = cache.get_many(
+                        list(six.itervalues(row_cache_keys)))
+                except Exception as e:
+                    logger.warning('Failed to fetch cached rows for DataGrid '
+                                   '%r: %s',
+                                   self, e,
+                                   request=self.request)
+
+        # Cached rows have already been rendered, so only the objects on the
+        # other rows need their related data collected.
+        uncached_objects = [
+            obj
+            for obj in object_list
+            if (obj is not None and
+                row_cache_keys.get(obj.pk) not in cached_rows)
+        ]
+
+        for column in self.columns:
+            column.collect_objects(uncached_objects)
+
+        rows = []
+        rows_to_cache = {}
+
+        if self.log_lazy_queries:
+            # This pulls in the test framework, so it's only imported when
+            # it's needed, rather than on every page load.
+            from django.test.utils import CaptureQueriesContext
+
+            lazy_queries = CaptureQueriesContext(
+                connections[getattr(self.queryset, 'db', DEFAULT_DB_ALIAS)])
+            lazy_queries.__enter__()
+            column_query_counts = dict(
+                (column.id, 0)
+                for column in self.columns
+            )
+            num_rendered = 0
+        else:
+            lazy_queries = None
+
+        try:
+            for obj in object_list:
+                if obj is None:
+                    continue
+
+                cache_key = row_cache_keys.get(obj.pk)
+
+                if cache_key in cached_rows:
+                    rows.append({
+                        'object': obj,
+                        'cells': cached_rows[cache_key],
+                    })
+                    continue
+
+                if hasattr(obj, 'get_absolute_url'):
+                    obj_url = obj.get_absolute_url()
+                else:
+                    obj_url = None
+
+                render_context['_datagrid_object_url'] = obj_url
+
+                if lazy_queries is None:
+                    cells = [column.render_cell(obj, render_context)
+                             for column in self.columns]
+                else:
+                    cells = []
+                    num_rendered += 1
+
+                    for column in self.columns:
+                        num_queries = len(lazy_queries)
+                        cells.append(column.render_cell(obj, render_context))
+                        column_query_counts[column.id] += \
+                            len(lazy_queries) - num_queries
+
+                if cache_key is not None:
+                    rows_to_cache[cache_key] = cells
+
+                rows.append({
+                    'object': obj,
+                    'cells': cells,
+                })
+        except Exception as e:
+            logger.exception('Error when calling render_cell for DataGrid '
+                             'Column %r: %s',
+                             column, e)
+            rows_to_cache = {}
+
+        if lazy_queries is not None:
+            lazy_queries.__exit__(None, None, None)
+
+            for column in self.columns:
+                num_queries = column_query_counts[column.id]
+
+                if num_rendered > 1 and num_queries >= num_rendered:
+                    logger.warning('DataGrid Column "%s" ran %d queries to '
+                                   'render %d rows. It may need to list the '
+                                   'fields or relations it uses.',
+                                   column.id, num_queries, num_rendered,
+                                   request=self.request)
+
+        if rows_to_cache:
+            try:
+                cache.set_many(rows_to_cache, self.row_cache_expiration)
+            except Exception as e:
+                logger.warning('Failed to cache rows for DataGrid %r: %s',
+                               self, e,
+                               request=self.request)
+
+        return rows
+
+    def get_row_cache_version(self, obj):
+        """Return the version of an object used for caching its row.
+
+        When :py:attr:`cache_rows` is set, a row is rendered again whenever
+        this changes. By default, this returns the value of
+        :py:attr:`row_cache_version_field`. Subclasses can override this to
+        compute a version some other way.
+
+        Args:
+            obj (object):
+                The object being rendered for the row.
+
+        Returns:
+            object:
+            The version of the object, or ``None`` if the row shouldn't be
+            cached.
+        """
+        if self.row_cache_version_field:
+            return getattr(obj, self.row_cache_version_field, None)
+
+        return None
+
+    def _get_row_cache_keys(self, object_list):
+        """Return the cache keys for rows that can be cached.
+
+        Args:
+            object_list (list):
+                The objects being rendered on the datagrid.
+
+        Returns:
+            dict:
+            A dictionary mapping the primary keys of objects to the cache
+            keys for their rows. Objects without a version are left out.
+        """
+        variants = [get_language() or '']
+
+        for column in self.columns:
+            try:
+                variant = column.get_cache_variant()
+            except Exception as e:
+                logger.exception('Error when calling get_cache_variant for '
+                                 'DataGrid Column %r: %s',
+                                 column, e)
+                variant = None
+
+            if variant is None:
+                # This column can't be cached, so no row can be.
+                return {}
+
+            variants.append('%s=%s' % (column.id, variant))
+
+        columns_digest = hashlib.md5(
+            force_bytes('\n'.join(variants))).hexdigest()
+        grid_label = '%s.%s' % (type(self).__module__, type(self).__name__)
+        pks = []
+        base_keys = []
+
+        for obj in object_list:
+            if obj is None:
+                continue
+
+            version = self.get_row_cache_version(obj)
+
+            if version is not None:
+                pks.append(obj.pk)
+                base_keys.append('datagrid-row:%s:%s:%s:%s'
+                                 % (grid_label, columns_digest, obj.pk,
+                                    version))
+
+        return dict(zip(pks, make_cache_keys(base_keys)))
+
+    def post_process_queryset(self, queryset):
+        """Add column-specific data to the queryset.
+
+        Individual columns can define additional joins and extra info to add on
+        to the queryset. This handles adding all of those.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset to augment.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The resulting augmented QuerySet.
+        """
+        queryset = chainable_select_related_queryset(queryset)
+
+        for column in self.columns:
+            try:
+                queryset = column.augment_queryset(queryset)
+            except Exception as e:
+                logger.exception('Error when calling augment_queryset for '
+                                 'DataGrid Column %r: %s',
+                                 column, e)
+
+        return self._apply_query_plan(queryset)
+
+    def _apply_query_plan(self, queryset):
+        """Load the fields and relations used by the active columns.
+
+        The relations listed by the columns are merged into one call to
+        :py:meth:`QuerySet.select_related` and one to
+        :py:meth:`QuerySet.prefetch_related`. If every column lists the
+        fields it uses, only those fields (along with :py:attr:`query_fields`)
+        are loaded.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset to load objects from.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The queryset loading only what the columns need.
+        """
+        fields = set(['pk'])
+        fields.update(self.query_fields)
+        select_related = set()
+        prefetch_related = set()
+        restrict_fields = True
+
+        if self.row_cache_version_field:
+            fields.add(self.row_cache_version_field)
+
+        for column in self.columns:
+            try:
+                column_fields = column.get_query_fields()
+                select_related.update(column.get_select_related() or [])
+                prefetch_related.update(column.get_prefetch_related() or [])
+            except Exception as e:
+                logger.exception('Error when building the query plan for '
+                                 'DataGrid Column %r: %s',
+                                 column, e)
+                column_fields = None
+
+            if column_fields is None:
+                restrict_fields = False
+            else:
+                fields.update(column_fields)
+
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(prefetch_related))
+
+        if restrict_fields and hasattr(queryset, 'only'):
+            # Relations can't be followed through deferred fields, so each
+            # step of a selected relation has to be loaded.
+            for relation in select_related:
+                parts = relation.split('__')
+
+                for i in range(1, len(parts) + 1):
+                    fields.add('__'.join(parts[:i]))
+
+            queryset = queryset.only(*sorted(fields))
+
+        return queryset
+
+    def render_listview(self, render_context=None):
+        """Render the standard list view of the grid.
+
+        This can be called from templates.
+
+        Args:
+            render_context (Context):
+                The common template variable context to render on the datagrid,
+                provided in the constructor.
+
+        Returns:
+            unicode: The rendered HTML for the datagrid page.
+        """
+        try:
+            if render_context is None:
+                render_context = self._build_render_context()
+
+            self.load_state(render_context)
+
+            context = {
+                'datagrid': self,
+            }
+
+            context.update(self.extra_context)
+            context.update(render_context)
+
+            return mark_safe(render_to_string(self.listview_template,
+                                              Context(context)))
+        except Exception:
+            trace = traceback.format_exc()
+            logger.exception('Failed to render datagrid:\n%s',
+                             trace,
+                             request=self.request)
+            return mark_safe('<pre>%s</pre>' % trace)
+
+    def iter_listview(self, render_context=None):
+        """Render the standard list view of the grid in pieces.
+
+        This returns an iterator that yields the list view up to the first
+        row, then the rows in batches of :py:attr:`streaming_batch_size` as
+        they're fetched from the database and rendered, then the rest of the
+        list view, including the paginator. Only one batch of rows is held in
+        memory at a time.
+
+        The state of the datagrid is loaded before this returns, so errors
+        in the request (such as an invalid page) are raised immediately.
+
+        If the list view template doesn't render its rows using the
+        ``datagrid_rows_marker`` variable, the list view is rendered all at
+        once instead.
+
+        Args:
+            render_context (Context):
+                The common template variable context to render on the datagrid,
+                provided in the constructor.
+
+        Returns:
+            iterator:
+            An iterator yielding the rendered HTML for each piece of the
+            datagrid page.
+
+        Raises:
+            django.http.Http404:
+                The requested page does not exist.
+        """
+        if render_context is None:
+            render_context = self._build_render_context()
+
+        if self.state_loaded:
+            # The rows have already been rendered.
+            batches = iter([self.rows] if self.rows else [])
+        else:
+            self._defer_rows = True
+
+            try:
+                self.load_state(render_context)
+            finally:
+                self._defer_rows = False
+
+            batches = self._iter_row_batches(render_context)
+
+        return self._iter_listview(render_context, batches)
+
+    def _iter_listview(self, render_context, batches):
+        """Render the list view of the grid in pieces.
+
+        Args:
+            render_context (dict):
+                The common template variable context to render on the
+                datagrid.
+
+            batches (iterator):
+                An iterator yielding batches of rendered rows.
+
+        Yields:
+            unicode:
+            The rendered HTML for each piece of the datagrid page.
+        """
+        try:
+            context = {
+                'datagrid': self,
+                'datagrid_rows_marker': _ROWS_MARKER,
+            }
+            context.update(self.extra_context)
+            context.update(render_context)
+
+            listview = render_to_string(self.listview_template,
+                                        Context(context))
+
+            if _ROWS_MARKER in listview:
+                header, footer = listview.split(_ROWS_MARKER, 1)
+                first_batch = next(batches, [])
+            else:
+                header = None
+                first_batch = []
+
+            if first_batch:
+                yield mark_safe(header)
+
+                start_index = 0
+
+                for rows in itertools.chain([first_batch], batches):
+                    yield self._render_rows_template(rows, start_index)
+                    start_index += len(rows)
+
+                yield mark_safe(footer)
+            else:
+                # Either there are no rows, or the template can't render
+                # them in batches. Either way, render it all at once.
+                self.rows = list(itertools.chain.from_iterable(batches))
+
+                yield self.render_listview(render_context)
+        except Exception:
+            trace = traceback.format_exc()
+            logger.exception('Failed to render datagrid:\n%s',
+                             trace,
+                             request=self.request)
+            yield mark_safe('<pre>%s</pre>' % trace)
+
+    def _iter_row_batches(self, render_context):
+        """Fetch and render the rows on the page in batches.
+
+        Args:
+            render_context (dict):
+                The common template variable context to render on the
+                datagrid.
+
+        Yields:
+            list of dict:
+            Each batch of rendered rows.
+        """
+        for batch in self._iter_object_batches(self.page.object_list):
+            yield self._render_rows(batch, render_context)
+
+    def _iter_object_batches(self, object_list):
+        """Fetch objects in batches of :py:attr:`streaming_batch_size`.
+
+        Querysets are fetched using :py:meth:`QuerySet.iterator`, so model
+        instances aren't all cached on the queryset. Most database drivers
+        (including psycopg2 and MySQLdb) still read the full result set
+        into memory when the query runs, as Django uses client-side
+        cursors.
+
+        Args:
+            object_list (object):
+                A queryset-compatible object, or a list of objects.
+
+        Yields:
+            list:
+            Each batch of objects.
+        """
+        prefetch_lookups = ()
+
+        if hasattr(object_list, 'iterator'):
+            # QuerySet.iterator() skips prefetching, so it's done for each
+            # batch instead.
+            prefetch_lookups = getattr(object_list,
+                                       '_prefetch_related_lookups', ())
+            objects = object_list.iterator()
+        else:
+            objects = iter(object_list)
+
+        while True:
+            batch = list(itertools.islice(objects, self.streaming_batch_size))
+
+            if not batch:
+                break
+
+            if prefetch_lookups:
+                prefetch_related_objects(batch, *prefetch_lookups)
+
+            yield batch
+
+    def _render_rows_template(self, rows, start_index):
+        """Render a batch of rows using the rows template.
+
+        Args:
+            rows (list of dict):
+                The rendered rows.
+
+            start_index (int):
+                The 0-based index of the first row in the page.
+
+        Returns:
+            django.utils.safestring.SafeText:
+            The rendered HTML for the rows.
+        """
+        return mark_safe(render_to_string(
+            self.rows_template,
+            Context({
+                'datagrid': self,
+                'rows': rows,
+                'start_index': start_index,
+            })))
+
+    def iter_export(self, export_format):
+        """Export the data in the grid.
+
+        This returns an iterator that yields every row in the grid (not just
+        the current page) for the active columns that are
+        :py:attr:`Column.exportable`, in the current sort order. The values
+        come from :py:meth:`Column.get_export_value`, and no templates are
+        rendered. Model instances are created and exported in batches of
+        :py:attr:`streaming_batch_size`, though most database drivers still
+        read the full result set into memory when the query runs.
+
+        CSV values that begin with ``=``, ``+``, ``-``, ``@``, a tab or a
+        carriage return (other than numbers) are prefixed with ``'``, so that
+        spreadsheets don't evaluate them as formulas.
+
+        The state of the datagrid is loaded before this returns. Changes to
+        the sort order or columns in the request are not saved to the user's
+        profile.
+
+        Args:
+            export_format (unicode):
+                The format to export. This is either ``csv``, for CSV with a
+                header row of column labels, or ``json``, for one JSON object
+                per line mapping column IDs to values.
+
+        Returns:
+            iterator:
+            An iterator yielding the exported data in pieces.
+
+        Raises:
+            ValueError:
+                The export format is not supported.
+        """
+        if export_format == 'csv':
+            iter_func = self._iter_export_csv
+        elif export_format == 'json':
+            iter_func = self._iter_export_json
+        else:
+            raise ValueError('"%s" is not a supported export format.'
+                             % export_format)
+
+        self._exporting = True
+        self._save_profile = False
+
+        try:
+            self.load_state()
+        finally:
+            self._exporting = False
+            self._save_profile = True
+
+        columns = [
+            column
+            for column in self.columns
+            if column.exportable
+        ]
+        query = self._build_queryset()[0]
+
+        return iter_func(columns, self._iter_export_values(columns, query))
+
+    def render_export_to_response(self, export_format):
+        """Export the data in the grid to a response.
+
+        The data is streamed as it's exported. See :py:meth:`iter_export`.
+
+        Args:
+            export_format (unicode):
+                The format to export. This is either ``csv`` or ``json``.
+
+        Returns:
+            django.http.StreamingHttpResponse:
+            The HTTP response to send to the client.
+
+        Raises:
+            django.http.Http404:
+                The export format is not supported.
+        """
+        try:
+            content = self.iter_export(export_format)
+        except ValueError:
+            raise Http404
+
+        if export_format == 'csv':
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            content_type = 'application/x-ndjson; charset=utf-8'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename="%s.%s"'
+            % (slugify(self.title) or 'datagrid', export_format))
+        patch_cache_control(response, no_cache=True, no_store=True, max_age=0,
+                            must_revalidate=True)
+
+        return response
 
-            if self.profile_sort_field and sort_str != profile_sort_list:
-                setattr(profile, self.profile_sort_field, sort_str)
-                profile_dirty = True
+    def _iter_export_values(self, columns, query):
+        """Return the values to export for each object.
 
-            if profile_dirty:
-                profile.save()
+        Args:
+            columns (list of StatefulColumn):
+                The columns being exported.
 
-        self.state_loaded = True
+            query (django.db.models.query.QuerySet):
+                The queryset for all rows of the grid.
 
-        # Fetch the list of objects and have it ready.
-        self.precompute_objects(render_context)
+        Yields:
+            list:
+            Each batch of exported rows, as lists of values in column order.
+        """
+        for batch in self._iter_object_batches(query):
+            yield self._get_export_values(columns, batch)
 
-    def get_user_profile(self):
-        """Return the object, if any, to use for the user profile state.
+    def _get_export_values(self, columns, object_list):
+        """Return the values to export for a list of objects.
+
+        Args:
+            columns (list of StatefulColumn):
+                The columns being exported.
+
+            object_list (list):
+                The objects being exported.
 
         Returns:
-            The object, if any, used to store and retrieve persistent
-            profile state for the datagrid.
+            list of list:
+            The exported rows, as lists of values in column order.
         """
-        if hasattr(self.request.user, 'get_profile'):
-            try:
-                return self.request.user.get_profile()
-            except ObjectDoesNotExist:
-                pass
-            except SiteProfileNotAvailable:
-                pass
+        for column in columns:
+            column.collect_objects(object_list)
 
-        return None
+        rows = []
 
-    def load_extra_state(self, profile):
-        """Load any extra state needed for this grid.
+        for obj in object_list:
+            values = []
 
-        This is used by subclasses that may have additional data to load
-        and save.
+            for column in columns:
+                try:
+                    value = column.get_export_value(obj)
+                except Exception as e:
+                    logger.exception('Error when calling get_export_value '
+                                     'for DataGrid Column %r: %s',
+                                     column, e)
+                    value = None
 
-        Args:
-            profile (Model):
-                The profile model instance to load from, if any.
+                values.append(value)
 
-        Returns:
-            bool:
-                Subclasses must return ``True`` if any profile-stored
-                state has changed, or ``False`` otherwise.
-        """
-        return False
+            rows.append(values)
 
-    def precompute_objects(self, render_context=None):
-        """Pre-compute all objects used to render the datagrid.
+        return rows
 
-        This builds the queryset and stores the list of objects for use in
-        rendering the datagrid. It takes into consideration sorting,
-        the current page, and augmented queries from columns.
+    def _iter_export_csv(self, columns, batches):
+        """Export rows as CSV.
 
         Args:
-            render_context (Context):
-                The common template variable context to render on the datagrid,
-                provided in the constructor.
+            columns (list of StatefulColumn):
+                The columns being exported.
+
+            batches (iterator):
+                An iterator yielding batches of exported rows.
+
+        Yields:
+            unicode:
+            The CSV for the header row, then for each batch of rows.
         """
-        query = self.queryset
-        use_select_related = False
+        writer = csv.writer(_CSVBuffer())
+
+        def _format_row(values):
+            row = []
+
+            for value in values:
+                if value is None:
+                    value = ''
+                elif hasattr(value, 'isoformat'):
+                    value = value.isoformat()
+                elif isinstance(value, numbers.Number):
+                    value = force_text(value)
+                else:
+                    value = force_text(value)
 
-        # Generate the actual list of fields we'll be sorting by
-        sort_list = []
-        for sort_item in self.sort_list:
-            if sort_item[0] == "-":
-                base_sort_item = sort_item[1:]
-                prefix = "-"
-            else:
-                base_sort_item = sort_item
-                prefix = ""
+                    # Spreadsheets evaluate text starting with these as
+                    # formulas, which could run commands or leak data.
+                    if value.startswith(_CSV_FORMULA_PREFIXES):
+                        value = "'%s" % value
 
-            if sort_item:
-                column = self.get_column(base_sort_item)
-                if not column:
-                    logger.warning('Skipping non-existing sort column "%s" '
-                                   'for user "%s".',
-                                   base_sort_item, self.request.user.username)
-                    continue
+                if six.PY2:
+                    value = value.encode('utf-8')
 
-                stateful_column = self.get_stateful_column(column)
+                row.append(value)
 
-                if stateful_column:
-                    try:
-                        sort_field = stateful_column.get_sort_field()
-                    except Exception as e:
-                        logger.exception('Error when calling get_sort_field '
-                                         'for DataGrid Column %r: %s',
-                                         column, e)
-                        sort_field = ''
+            return writer.writerow(row)
 
-                    sort_list.append(prefix + sort_field)
+        yield _format_row([
+            column.detailed_label or column.id
+            for column in columns
+        ])
 
-                    # Lookups spanning tables require that we query from those
-                    # tables. In order to keep things simple, we'll just use
-                    # select_related so that we don't have to figure out the
-                    # table relationships. We only do this if we have a lookup
-                    # spanning tables.
-                    if '.' in sort_field:
-                        use_select_related = True
+        for rows in batches:
+            yield ''.join(
+                _format_row(values)
+                for values in rows
+            )
 
-        if sort_list:
-            query = query.order_by(*sort_list)
+    def _iter_export_json(self, columns, batches):
+        """Export rows as JSON lines.
 
-        query = self.post_process_queryset(query)
+        Args:
+            columns (list of StatefulColumn):
+                The columns being exported.
 
-        if hasattr(query, 'distinct'):
-            query = query.distinct()
+            batches (iterator):
+                An iterator yielding batches of exported rows.
 
-        self.paginator = self.build_paginator(query)
+        Yields:
+            unicode:
+            The JSON lines for each batch of rows.
+        """
+        encoder = _ExportJSONEncoder()
+        column_ids = [column.id for column in columns]
 
-        page_num = self.request.GET.get('page', 1)
+        for rows in batches:
+            yield ''.join(
+                '%s\n' % encoder.encode(
+                    collections.OrderedDict(zip(column_ids, values)))
+                for values in rows
+            )
 
-        # Accept either "last" or a valid page number.
-        if page_num == "last":
-            page_num = self.paginator.num_pages
+    def get_rows_data(self, rows_format='html', render_context=None):
+        """Return the rows on the current page, without the rest of the grid.
 
-        try:
-            self.page = self.paginator.page(page_num)
-        except InvalidPage:
-            raise Http404
+        This is used to load more rows or refresh them in place without
+        rendering the whole datagrid page. The page is selected the same way
+        as for the list view, using ``?page=``, or ``?after=`` and
+        ``?before=`` with keyset pagination. Changes to the sort order or
+        columns in the request are not saved to the user's profile.
 
-        self.id_list = []
+        Args:
+            rows_format (unicode, optional):
+                Either ``html``, to return the rows rendered using
+                :py:attr:`rows_template`, or ``data``, to return the values
+                of the :py:attr:`Column.exportable` columns from
+                :py:meth:`Column.get_export_value`. Cells aren't rendered
+                for ``data``.
+
+            render_context (Context, optional):
+                The common template variable context to render on the datagrid,
+                provided in the constructor.
 
-        if self.optimize_sorts and len(sort_list) > 0:
-            # This can be slow when sorting by multiple columns. If we
-            # have multiple items in the sort list, we'll request just the
-            # IDs and then fetch the actual details from that.
-            if hasattr(self.page.object_list, 'values_list'):
-                # This is a standard QuerySet.
-                self.id_list = list(self.page.object_list.values_list(
-                    'pk', flat=True))
-            else:
-                # This is something more custom. Perhaps a Haystack
-                # SearchQuerySet. It must have a 'pk' or it won't work.
-                self.id_list = [int(obj.pk) for obj in self.page.object_list]
+        Returns:
+            dict:
+            A dictionary containing:
 
-            # Make sure to unset the order. We can't meaningfully order these
-            # results in the query, as what we really want is to keep it in
-            # the order specified in id_list, and we certainly don't want
-            # the database to do any special ordering (possibly slowing things
-            # down). We'll set the order properly in a minute.
-            self.page.object_list = self.post_process_queryset(
-                self.model.objects.filter(pk__in=self.id_list).order_by())
+            ``ids`` (:py:class:`list`):
+                The primary keys of the objects on the rows.
 
-        if use_select_related:
-            self.page.object_list = \
-                self.page.object_list.select_related(depth=1)
+            ``html`` (:py:class:`unicode`):
+                The rendered rows, for ``html``.
 
-        if self.id_list:
-            # The database will give us the items in a more or less random
-            # order, since it doesn't know to keep it in the order provided by
-            # the ID list. This will place the results back in the order we
-            # expect.
-            index = dict([(id, pos) for (pos, id) in enumerate(self.id_list)])
-            object_list = [None] * len(self.id_list)
+            ``rows`` (:py:class:`list` of :py:class:`dict`):
+                The values of each row, keyed by column ID, for ``data``.
 
-            for obj in list(self.page.object_list):
-                object_list[index[obj.pk]] = obj
-        else:
-            # Grab the whole list at once. We know it won't be too large,
-            # and it will prevent one query per row.
-            object_list = list(self.page.object_list)
+            ``page`` (:py:class:`int`):
+                The page number, or ``None`` with keyset pagination.
 
-        for column in self.columns:
-            column.collect_objects(object_list)
+            ``pages`` (:py:class:`int`):
+                The number of pages, or ``None`` if unknown.
 
-        if render_context is None:
-            render_context = self._build_render_context()
+            ``total`` (:py:class:`int`):
+                The number of rows, or ``None`` if unknown.
 
-        try:
-            self.rows = []
+            ``next`` and ``previous``:
+                The page numbers (or keyset cursors) of the neighboring
+                pages, or ``None`` if there's no such page.
 
-            for obj in object_list:
-                if obj is None:
-                    continue
+        Raises:
+            ValueError:
+                The rows format is not supported.
 
-                if hasattr(obj, 'get_absolute_url'):
-                    obj_url = obj.get_absolute_url()
-                else:
-                    obj_url = None
+            django.http.Http404:
+                The requested page does not exist.
+        """
+        if rows_format not in ('html', 'data'):
+            raise ValueError('"%s" is not a supported rows format.'
+                             % rows_format)
 
-                render_context['_datagrid_object_url'] = obj_url
+        self._save_profile = False
+        self._defer_rows = (rows_format == 'data')
 
-                self.rows.append({
-                    'object': obj,
-                    'cells': [column.render_cell(obj, render_context)
-                              for column in self.columns]
-                })
-        except Exception as e:
-            logger.exception('Error when calling render_cell for DataGrid '
-                             'Column %r: %s',
-                             column, e)
+        try:
+            self.load_state(render_context)
+        finally:
+            self._save_profile = True
+            self._defer_rows = False
 
-    def post_process_queryset(self, queryset):
-        """Add column-specific data to the queryset.
+        page = self.page
 
-        Individual columns can define additional joins and extra info to add on
-        to the queryset. This handles adding all of those.
+        if isinstance(page, KeysetPage):
+            next_page = page.next_cursor
+            previous_page = page.previous_cursor
+            start_index = 0
+        else:
+            if page.has_next():
+                next_page = page.next_page_number()
+            else:
+                next_page = None
 
-        Args:
-            queryset (django.db.models.query.QuerySet):
-                The queryset to augment.
+            if page.has_previous():
+                previous_page = page.previous_page_number()
+            else:
+                previous_page = None
 
-        Returns:
-            django.db.models.query.QuerySet:
-            The resulting augmented QuerySet.
-        """
-        queryset = chainable_select_related_queryset(queryset)
+            start_index = max(page.start_index() - 1, 0)
 
-        for column in self.columns:
-            try:
-                queryset = column.augment_queryset(queryset)
-            except Exception as e:
-                logger.exception('Error when calling augment_queryset for '
-                                 'DataGrid Column %r: %s',
-                                 column, e)
+        data = {
+            'page': page.number,
+            'pages': self.paginator.num_pages,
+            'total': self.paginator.count,
+            'next': next_page,
+            'previous': previous_page,
+        }
 
-        return queryset
+        if rows_format == 'html':
+            data['ids'] = [row['object'].pk for row in self.rows]
+            data['html'] = self._render_rows_template(self.rows, start_index)
+        else:
+            object_list = list(page.object_list)
+            columns = [
+                column
+                for column in self.columns
+                if column.exportable
+            ]
+            column_ids = [column.id for column in columns]
 
-    def render_listview(self, render_context=None):
-        """Render the standard list view of the grid.
+            data['ids'] = [obj.pk for obj in object_list]
+            data['rows'] = [
+                collections.OrderedDict(zip(column_ids, values))
+                for values in self._get_export_values(columns, object_list)
+            ]
 
-        This can be called from templates.
+        return data
+
+    def render_rows_to_response(self, rows_format='html',
+                                render_context=None):
+        """Render the rows on the current page to a JSON response.
+
+        The result will not be cached by the browser. See
+        :py:meth:`get_rows_data` for the contents.
 
         Args:
-            render_context (Context):
+            rows_format (unicode, optional):
+                Either ``html`` or ``data``.
+
+            render_context (Context, optional):
                 The common template variable context to render on the datagrid,
                 provided in the constructor.
 
         Returns:
-            unicode: The rendered HTML for the datagrid page.
+            django.http.HttpResponse:
+            The HTTP response to send to the client.
+
+        Raises:
+            django.http.Http404:
+                The rows format is not supported, or the requested page does
+                not exist.
         """
         try:
-            if render_context is None:
-                render_context = self._build_render_context()
-
-            self.load_state(render_context)
-
-            context = {
-                'datagrid': self,
-            }
+            data = self.get_rows_data(rows_format, render_context)
+        except ValueError:
+            raise Http404
 
-            context.update(self.extra_context)
-            context.update(render_context)
+        response = HttpResponse(_ExportJSONEncoder().encode(data),
+                                content_type='application/json')
+        patch_cache_control(response, no_cache=True, no_store=True, max_age=0,
+                            must_revalidate=True)
 
-            return mark_safe(render_to_string(self.listview_template,
-                                              Context(context)))
-        except Exception:
-            trace = traceback.format_exc()
-            logger.exception('Failed to render datagrid:\n%s',
-                             trace,
-                             request=self.request)
-            return mark_safe('<pre>%s</pre>' % trace)
+        return response
 
     def render_listview_to_response(self, request=None, render_context=None):
         """Render the listview to a response.
 
-        The rendered result will not be cached by the browser.
+        The rendered result will not be cached by the browser. If
+        :py:attr:`use_streaming` is set, the list view is streamed through
+        :py:meth:`iter_listview`.
 
         Args:
             request (HttpRequest):
@@ -1424,8 +3299,13 @@ class DataGrid(object):
         Returns:
             HttpResponse: The HTTP response to send to the client.
         """
-        response = HttpResponse(
-            six.text_type(self.render_listview(render_context)))
+        if self.use_streaming:
+            response = StreamingHttpResponse(
+                self.iter_listview(render_context))
+        else:
+            response = HttpResponse(
+                six.text_type(self.render_listview(render_context)))
+
         patch_cache_control(response, no_cache=True, no_store=True, max_age=0,
                             must_revalidate=True)
         return response
@@ -1437,6 +3317,14 @@ class DataGrid(object):
         the datagrid as a part of it. This is the primary function a view
         will be using to render the page.
 
+        If the request contains ``?gridonly=1`` and this grid's
+        ``?datagrid-id=``, only the list view is rendered. With
+        ``?rowsonly=html`` or ``?rowsonly=data`` instead, only the rows are
+        returned as JSON (see :py:meth:`get_rows_data`). With
+        :py:attr:`allow_export` set, ``?export=csv`` or ``?export=json``
+        along with this grid's ``?datagrid-id=`` exports the data in the
+        grid (see :py:meth:`iter_export`).
+
         Args:
             template_name (unicode):
                 The template for the page.
@@ -1447,12 +3335,29 @@ class DataGrid(object):
         Returns:
             HttpResponse: The HTTP response to send to the client.
         """
+        is_this_grid = self.request.GET.get('datagrid-id', None) == self.id
+        export_format = self.request.GET.get('export')
+
+        if export_format and is_this_grid and self.allow_export:
+            return self.render_export_to_response(export_format)
+
         render_context = self._build_render_context()
-        self.load_state(render_context)
+        rows_format = self.request.GET.get('rowsonly')
+
+        # If the caller is requesting just the rows of this grid, return
+        # them.
+        if rows_format and is_this_grid:
+            return self.render_rows_to_response(rows_format, render_context)
+
+        grid_only = self.request.GET.get('gridonly', False) and is_this_grid
+
+        if not (grid_only and self.use_streaming):
+            # Streamed grids load their state in iter_listview(), so that
+            # rows can be fetched as they're rendered.
+            self.load_state(render_context)
 
         # If the caller is requesting just this particular grid, return it.
-        if self.request.GET.get('gridonly', False) and \
-           self.request.GET.get('datagrid-id', None) == self.id:
+        if grid_only:
             return self.render_listview_to_response(
                 render_context=render_context)
 
@@ -1479,27 +3384,60 @@ class DataGrid(object):
         """
         extra_query = get_url_params_except(self.request.GET,
                                             'page', 'gridonly',
+                                            'after', 'before',
                                             *self.special_query_args)
 
-        page_nums = list(range(max(1, self.page.number - adjacent_pages),
-                          min(self.paginator.num_pages,
-                              self.page.number + adjacent_pages)
-                          + 1))
-
         if extra_query:
             extra_query += '&'
 
+        if isinstance(self.page, KeysetPage):
+            context = {
+                'keyset': True,
+                'is_paginated': self.page.has_other_pages(),
+                'hits': None,
+                'results_per_page': self.paginate_by,
+                'page': None,
+                'pages': None,
+                'page_numbers': [],
+                'has_next': self.page.has_next(),
+                'has_previous': self.page.has_previous(),
+                'show_first': self.page.has_previous(),
+                'show_last': self.page.has_next(),
+                'extra_query': extra_query,
+                'next': self.page.next_cursor,
+                'previous': self.page.previous_cursor,
+            }
+            context.update(self.extra_context)
+
+            return mark_safe(render_to_string(self.paginator_template,
+                                              Context(context)))
+
+        num_pages = self.paginator.num_pages
+
+        if num_pages is None:
+            # The rows weren't counted, so only the neighboring pages are
+            # known.
+            page_nums = [self.page.number]
+        else:
+            page_nums = list(range(max(1, self.page.number - adjacent_pages),
+                              min(num_pages,
+                                  self.page.number + adjacent_pages)
+                              + 1))
+
         context = {
             'is_paginated': self.page.has_other_pages(),
             'hits': self.paginator.count,
+            'count_is_approximate': getattr(self.paginator,
+                                            'count_is_approximate', False),
             'results_per_page': self.paginate_by,
             'page': self.page.number,
-            'pages': self.paginator.num_pages,
+            'pages': num_pages,
             'page_numbers': page_nums,
             'has_next': self.page.has_next(),
             'has_previous': self.page.has_previous(),
             'show_first': 1 not in page_nums,
-            'show_last': self.paginator.num_pages not in page_nums,
+            'show_last': (num_pages is not None and
+                          num_pages not in page_nums),
             'extra_query': extra_query,
         }
 
@@ -1528,11 +3466,26 @@ class DataGrid(object):
             queryset (object):
                 A queryset-compatible object.
 
+        By default, this returns a :py:class:`DataGridPaginator` using
+        :py:attr:`count_strategy`. If :py:attr:`use_keyset_pagination` is
+        set, this will return a :py:class:`KeysetPaginator` instead, unless
+        the queryset's ordering can't be used for sort keys.
+
         Returns:
             A populated paginator object.
         """
-        return QuerySetPaginator(queryset, self.paginate_by,
-                                 self.paginate_orphans)
+        if self.use_keyset_pagination:
+            try:
+                return KeysetPaginator(queryset, self.paginate_by)
+            except ValueError as e:
+                logger.warning('Falling back to page numbers for DataGrid '
+                               '%r: %s',
+                               self, e,
+                               request=self.request)
+
+        return DataGridPaginator(queryset, self.paginate_by,
+                                 self.paginate_orphans,
+                                 count_strategy=self.count_strategy)
 
     def _build_render_context(self):
         """Build a dictionary containing RequestContext contents.
@@ -1596,6 +3549,32 @@ class DataGrid(object):
         return value.get_absolute_url()
 
 
+_CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _CSVBuffer(object):
+    """A file-like object returning what's written to it.
+
+    This lets :py:func:`csv.writer` format rows without buffering them.
+    """
+
+    def write(self, value):
+        return value
+
+
+class _ExportJSONEncoder(DjangoJSONEncoder):
+    """Encodes exported values as JSON.
+
+    Values that can't be represented in JSON are exported as text.
+    """
+
+    def default(self, obj):
+        try:
+            return super(_ExportJSONEncoder, self).default(obj)
+        except TypeError:
+            return force_text(obj)
+
+
 class AlphanumericDataGrid(DataGrid):
     """A DataGrid subclass for an alphanumerically-paginated datagrid.
 
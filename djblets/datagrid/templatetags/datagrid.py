@@ -43,16 +43,38 @@ def paginator(context, adjacent_pages=3):
     warnings.warn('djblets.datagrid.templatetags datagrid is deprecated,'
                   ' Use DataGrid.render_paginator', DeprecationWarning)
 
-    page_nums = list(range(max(1, context['page'] - adjacent_pages),
-                      min(context['pages'], context['page'] + adjacent_pages)
-                      + 1))
-
     extra_query = context.get('extra_query', None)
     if extra_query:
         extra_query += '&'
 
+    if context.get('keyset'):
+        # Keyset pagination has no page numbers, only cursors for the
+        # neighboring pages.
+        return {
+            'keyset': True,
+            'is_paginated': context['has_next'] or context['has_previous'],
+            'results_per_page': context['results_per_page'],
+            'next': context['next'],
+            'previous': context['previous'],
+            'has_next': context['has_next'],
+            'has_previous': context['has_previous'],
+            'show_first': context['has_previous'],
+            'show_last': context['has_next'],
+            'extra_query': extra_query,
+        }
+
+    if context['pages'] is None:
+        # The rows weren't counted, so only the neighboring pages are known.
+        page_nums = [context['page']]
+    else:
+        page_nums = list(range(max(1, context['page'] - adjacent_pages),
+                          min(context['pages'],
+                              context['page'] + adjacent_pages)
+                          + 1))
+
     return {
         'hits': context['hits'],
+        'count_is_approximate': context.get('count_is_approximate', False),
         'results_per_page': context['results_per_page'],
         'page': context['page'],
         'pages': context['pages'],
@@ -62,6 +84,7 @@ def paginator(context, adjacent_pages=3):
         'has_next': context['has_next'],
         'has_previous': context['has_previous'],
         'show_first': 1 not in page_nums,
-        'show_last': context['pages'] not in page_nums,
+        'show_last': (context['pages'] is not None and
+                      context['pages'] not in page_nums),
         'extra_query': extra_query,
     }
@@ -25,16 +25,27 @@
 
 
 
+import json
+import logging
 from datetime import datetime, timedelta
 
 from django.conf import settings
+from django.contrib.admin.models import LogEntry
 from django.contrib.auth.models import Group, User
+from django.core.cache import cache
 from django.core.exceptions import FieldError
-from django.http import HttpRequest
+from django.core.paginator import QuerySetPaginator
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404, HttpRequest, StreamingHttpResponse
 from django.test.client import RequestFactory
 from kgb import SpyAgency
 
-from djblets.datagrid.grids import (Column, DataGrid, DateTimeSinceColumn,
+from djblets.datagrid.counts import (CachedCountStrategy, CountStrategy,
+                                     EstimatedCountStrategy, NoCountStrategy,
+                                     invalidate_cached_counts)
+from djblets.datagrid.grids import (CellRenderer, Column, DataGrid,
+                                    DataGridPaginator, DateTimeSinceColumn,
+                                    KeysetPaginator, NoLinkCellRenderer,
                                     StatefulColumn)
 from djblets.testing.testcases import TestCase
 from djblets.util.dates import get_tz_aware_utcnow
@@ -81,6 +92,65 @@ class ColumnsTest(TestCase):
         self.assertEqual(column.render_data(state, obj), "1\xa0week ago")
 
 
+class CellRendererTests(TestCase):
+    """Unit tests for djblets.datagrid.grids.CellRenderer."""
+
+    def setUp(self):
+        super(CellRendererTests, self).setUp()
+
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+        self.datagrid = GroupDataGrid(self.request)
+        self.obj = Group(name='<Group & "1">')
+
+    def test_render(self):
+        """Testing CellRenderer produces the markup of datagrid/cell.html"""
+        self._check_renderer(CellRenderer())
+
+    def test_render_no_link(self):
+        """Testing NoLinkCellRenderer produces the markup of
+        datagrid/cell_no_link.html
+        """
+        self._check_renderer(NoLinkCellRenderer(),
+                             cell_template='datagrid/cell_no_link.html')
+
+    def test_render_with_custom_template(self):
+        """Testing CellRenderer with a custom cell template"""
+        column = Column(field_name='name')
+        column.cell_template = 'datagrid/cell_no_link.html'
+        column.cell_renderer = CellRenderer()
+        state = StatefulColumn(self.datagrid, column)
+
+        self.assertEqual(column.render_cell(state, self.obj, {}),
+                         '<td>\n&lt;Group &amp; &quot;1&quot;&gt;\n</td>\n')
+
+    def _check_renderer(self, renderer, cell_template=None):
+        for css_class in ('', 'a<b'):
+            for url in (None, '/groups/?a=1&b="2"'):
+                for last in (False, True):
+                    for cell_clickable in (False, True):
+                        expected = self._render_cell(
+                            None, cell_template, css_class, url, last,
+                            cell_clickable)
+                        result = self._render_cell(
+                            renderer, cell_template, css_class, url, last,
+                            cell_clickable)
+
+                        self.assertEqual(result, expected)
+
+    def _render_cell(self, renderer, cell_template, css_class, url, last,
+                     cell_clickable):
+        column = Column(field_name='name', css_class=css_class)
+        column.cell_template = cell_template
+        column.cell_renderer = renderer
+        column.cell_clickable = cell_clickable
+        state = StatefulColumn(self.datagrid, column)
+        state.last = last
+
+        return column.render_cell(state, self.obj,
+                                  {'_datagrid_object_url': url})
+
+
 class DataGridTest(TestCase):
     def setUp(self):
         self.old_auth_profile_module = getattr(settings, "AUTH_PROFILE_MODULE",
@@ -192,6 +262,835 @@ class DataGridTest(TestCase):
             })
 
 
+class CountStrategyTests(SpyAgency, TestCase):
+    """Unit tests for djblets.datagrid.counts."""
+
+    def setUp(self):
+        super(CountStrategyTests, self).setUp()
+
+        cache.clear()
+        populate_groups()
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+        self.datagrid = GroupDataGrid(self.request)
+        self.datagrid.paginate_by = 10
+
+    def test_cached_count(self):
+        """Testing CachedCountStrategy"""
+        class CountingStrategy(CountStrategy):
+            def get_count(self, queryset):
+                self.num_counts += 1
+
+                return queryset.count()
+
+        counting_strategy = CountingStrategy()
+        counting_strategy.num_counts = 0
+        strategy = CachedCountStrategy(count_strategy=counting_strategy)
+
+        self.assertEqual(strategy.get_count(Group.objects.all()), 99)
+        self.assertEqual(strategy.get_count(Group.objects.all()), 99)
+        self.assertEqual(counting_strategy.num_counts, 1)
+
+        # A different query has its own count.
+        self.assertEqual(
+            strategy.get_count(Group.objects.filter(name__lt='Group 10')),
+            9)
+        self.assertEqual(counting_strategy.num_counts, 2)
+
+        # Saving an instance invalidates the counts.
+        Group.objects.create(name='Group 100')
+        self.assertEqual(strategy.get_count(Group.objects.all()), 100)
+        self.assertEqual(counting_strategy.num_counts, 3)
+
+        # So does invalidating them explicitly.
+        Group.objects.filter(name='Group 100').update(name='Group 00')
+        invalidate_cached_counts(Group)
+        self.assertEqual(strategy.get_count(Group.objects.all()), 100)
+        self.assertEqual(counting_strategy.num_counts, 4)
+
+    def test_cached_count_in_datagrid(self):
+        """Testing DataGrid with CachedCountStrategy"""
+        self.datagrid.count_strategy = CachedCountStrategy()
+        self.datagrid.load_state()
+
+        self.assertEqual(self.datagrid.paginator.count, 99)
+
+        datagrid = GroupDataGrid(self.request)
+        datagrid.paginate_by = 10
+        datagrid.count_strategy = CachedCountStrategy()
+
+        with self.assertNumQueries(1):
+            datagrid.load_state()
+
+        self.assertEqual(datagrid.paginator.count, 99)
+        self.assertEqual(len(datagrid.rows), 10)
+
+    def test_cached_count_with_models(self):
+        """Testing CachedCountStrategy connects invalidation handlers for
+        models when constructed
+        """
+        dispatch_uid = 'djblets-datagrid-counts-auth.group'
+        post_save.disconnect(sender=Group, dispatch_uid=dispatch_uid)
+        post_delete.disconnect(sender=Group, dispatch_uid=dispatch_uid)
+
+        self.spy_on(invalidate_cached_counts)
+        CachedCountStrategy(models=[Group])
+
+        Group.objects.create(name='Group 100')
+        self.assertTrue(invalidate_cached_counts.called)
+
+    def test_cached_estimated_count(self):
+        """Testing CachedCountStrategy with EstimatedCountStrategy keeps
+        estimates approximate
+        """
+        self.spy_on(EstimatedCountStrategy.get_estimate,
+                    call_fake=lambda *args: 100000)
+        strategy = CachedCountStrategy(
+            count_strategy=EstimatedCountStrategy(threshold=1000))
+
+        for i in range(2):
+            count = strategy.get_count(Group.objects.all())
+
+            self.assertEqual(count, 100000)
+            self.assertTrue(strategy.is_approximate(count))
+
+    def test_estimated_count(self):
+        """Testing EstimatedCountStrategy with an estimate above the
+        threshold
+        """
+        self.spy_on(EstimatedCountStrategy.get_estimate,
+                    call_fake=lambda *args: 100000)
+        self.datagrid.count_strategy = EstimatedCountStrategy(threshold=1000)
+        self.request.GET['page'] = '3'
+        self.datagrid.load_state()
+
+        self.assertEqual(self.datagrid.paginator.count, 100000)
+        self.assertTrue(self.datagrid.paginator.count_is_approximate)
+        self.assertEqual(self.datagrid.rows[0]['object'].name, 'Group 21')
+        self.assertIn('about 10000 pages', self.datagrid.render_paginator())
+
+    def test_estimated_count_below_threshold(self):
+        """Testing EstimatedCountStrategy with an estimate below the
+        threshold
+        """
+        self.spy_on(EstimatedCountStrategy.get_estimate,
+                    call_fake=lambda *args: 500)
+        self.datagrid.count_strategy = EstimatedCountStrategy(threshold=1000)
+        self.datagrid.load_state()
+
+        self.assertEqual(self.datagrid.paginator.count, 99)
+        self.assertFalse(self.datagrid.paginator.count_is_approximate)
+        self.assertNotIn('about', self.datagrid.render_paginator())
+
+    def test_estimated_count_unsupported_database(self):
+        """Testing EstimatedCountStrategy.get_estimate with a database
+        without estimates
+        """
+        strategy = EstimatedCountStrategy(threshold=1)
+        count = strategy.get_count(Group.objects.all())
+
+        self.assertIsNone(strategy.get_estimate(Group.objects.all()))
+        self.assertEqual(count, 99)
+
+        # The count is exact, even though it's above the threshold.
+        self.assertFalse(strategy.is_approximate(count))
+
+    def test_no_count(self):
+        """Testing DataGrid with NoCountStrategy"""
+        self.datagrid.count_strategy = NoCountStrategy()
+        self.request.GET['sort'] = 'name'
+        self.request.GET['page'] = '2'
+
+        with self.assertNumQueries(1):
+            self.datagrid.load_state()
+
+        self.assertIsInstance(self.datagrid.paginator, DataGridPaginator)
+        self.assertIsNone(self.datagrid.paginator.count)
+        self.assertIsNone(self.datagrid.paginator.num_pages)
+        self.assertEqual([row['object'].name for row in self.datagrid.rows],
+                         ['Group %02d' % i for i in range(11, 21)])
+        self.assertTrue(self.datagrid.page.has_next())
+        self.assertTrue(self.datagrid.page.has_previous())
+
+        html = self.datagrid.render_paginator()
+        self.assertIn('page=1"', html)
+        self.assertIn('page=3"', html)
+        self.assertNotIn('pages', html)
+
+    def test_no_count_last_page(self):
+        """Testing DataGrid with NoCountStrategy on the last page"""
+        self.datagrid.count_strategy = NoCountStrategy()
+        self.request.GET['page'] = '10'
+        self.datagrid.load_state()
+
+        self.assertEqual(len(self.datagrid.rows), 9)
+        self.assertFalse(self.datagrid.page.has_next())
+
+    def test_no_count_page_last(self):
+        """Testing DataGrid with NoCountStrategy and page=last"""
+        self.datagrid.count_strategy = NoCountStrategy()
+        self.request.GET['page'] = 'last'
+        self.datagrid.load_state()
+
+        self.assertEqual(self.datagrid.page.number, 1)
+        self.assertEqual(len(self.datagrid.rows), 10)
+        self.assertTrue(self.datagrid.page.has_next())
+
+
+class RowCacheTests(SpyAgency, TestCase):
+    """Unit tests for caching rendered rows in datagrids."""
+
+    def setUp(self):
+        super(RowCacheTests, self).setUp()
+
+        cache.clear()
+        populate_groups()
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+
+    def test_cache_rows(self):
+        """Testing DataGrid.cache_rows"""
+        rows = self._load_rows()
+
+        self.spy_on(Column.render_cell)
+
+        with self.assertNumQueries(2):
+            cached_rows = self._load_rows()
+
+        self.assertFalse(Column.render_cell.called)
+        self.assertEqual(cached_rows, rows)
+
+    def test_cache_rows_with_changed_object(self):
+        """Testing DataGrid.cache_rows with a changed object"""
+        self._load_rows()
+        Group.objects.filter(name='Group 02').update(name='Group 02b')
+
+        self.spy_on(Column.render_cell)
+        rows = self._load_rows()
+
+        # Only the two cells of the changed row are rendered again.
+        self.assertEqual(len(Column.render_cell.calls), 2)
+        self.assertIn('Group 02b', rows[1]['cells'][1])
+
+    def test_cache_rows_with_different_columns(self):
+        """Testing DataGrid.cache_rows with different active columns"""
+        self._load_rows()
+        self.request.GET['columns'] = 'name'
+
+        self.spy_on(Column.render_cell)
+        self._load_rows()
+
+        self.assertEqual(len(Column.render_cell.calls), 10)
+
+    def test_cache_rows_with_uncacheable_column(self):
+        """Testing DataGrid.cache_rows with a column that can't be cached"""
+        self.spy_on(Column.get_cache_variant, call_fake=lambda *args: None)
+        self._load_rows()
+
+        self.spy_on(Column.render_cell)
+        self._load_rows()
+
+        self.assertEqual(len(Column.render_cell.calls), 20)
+
+    def _load_rows(self):
+        datagrid = GroupDataGrid(self.request)
+        datagrid.paginate_by = 10
+        datagrid.cache_rows = True
+        datagrid.row_cache_version_field = 'name'
+        datagrid.load_state()
+
+        return [
+            {
+                'object': row['object'].pk,
+                'cells': row['cells'],
+            }
+            for row in datagrid.rows
+        ]
+
+
+class QueryPlanTests(SpyAgency, TestCase):
+    """Unit tests for loading the fields and relations used by columns."""
+
+    def setUp(self):
+        super(QueryPlanTests, self).setUp()
+
+        populate_groups()
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+
+    def test_post_process_queryset(self):
+        """Testing DataGrid.post_process_queryset with columns listing the
+        fields and relations they use
+        """
+        class TestDataGrid(DataGrid):
+            col1 = Column(query_fields=['name'],
+                          select_related=['foo__bar'])
+            col2 = Column(query_fields=[],
+                          prefetch_related=['permissions'])
+
+        grid = self._build_grid(TestDataGrid, ['col1', 'col2'])
+        grid.columns = [
+            grid.get_stateful_column(grid.get_column(name))
+            for name in grid.default_columns
+        ]
+        queryset = grid.post_process_queryset(grid.queryset)
+
+        self.assertEqual(queryset.query.select_related,
+                         {'foo': {'bar': {}}})
+        self.assertEqual(list(queryset._prefetch_related_lookups),
+                         ['permissions'])
+        self.assertEqual(queryset.query.deferred_loading,
+                         (set(['id', 'name', 'foo', 'foo__bar']), False))
+
+    def test_post_process_queryset_with_unlisted_fields(self):
+        """Testing DataGrid.post_process_queryset with a column that doesn't
+        list its fields
+        """
+        class TestDataGrid(DataGrid):
+            col1 = Column(query_fields=['name'])
+            col2 = Column()
+
+        grid = self._build_grid(TestDataGrid, ['col1', 'col2'])
+        grid.columns = [
+            grid.get_stateful_column(grid.get_column(name))
+            for name in grid.default_columns
+        ]
+        queryset = grid.post_process_queryset(grid.queryset)
+
+        self.assertEqual(queryset.query.deferred_loading, (set(), True))
+
+    def test_load_state(self):
+        """Testing DataGrid.load_state with columns listing the fields they
+        use
+        """
+        class TestDataGrid(DataGrid):
+            objid = Column(field_name='id', query_fields=[])
+            name = Column(query_fields=['name'])
+
+        grid = self._build_grid(TestDataGrid, ['objid', 'name'])
+
+        with self.assertNumQueries(2):
+            grid.load_state()
+
+        self.assertEqual(len(grid.rows), 10)
+        self.assertIn('Group 01', grid.rows[0]['cells'][1])
+
+    def test_log_lazy_queries(self):
+        """Testing DataGrid.log_lazy_queries with a column running queries
+        for each row
+        """
+        class PermissionsColumn(Column):
+            def render_data(self, state, obj):
+                return '%s' % obj.permissions.count()
+
+        class TestDataGrid(DataGrid):
+            name = Column(query_fields=['name'])
+            perms = PermissionsColumn(query_fields=[])
+
+        logger = logging.getLogger('djblets.datagrid.grids')
+        self.spy_on(logger.warning)
+
+        grid = self._build_grid(TestDataGrid, ['name', 'perms'])
+        grid.log_lazy_queries = True
+        grid.load_state()
+
+        self.assertEqual(len(logger.warning.calls), 1)
+        self.assertEqual(logger.warning.last_call.args[1:],
+                         ('perms', 10, 10))
+
+    def _build_grid(self, grid_cls, column_ids):
+        grid = grid_cls(self.request, queryset=Group.objects.all())
+        grid.default_columns = column_ids
+        grid.default_sort = []
+        grid.paginate_by = 10
+
+        return grid
+
+
+class StreamingTests(TestCase):
+    """Unit tests for streaming the list view of datagrids."""
+
+    def setUp(self):
+        super(StreamingTests, self).setUp()
+
+        populate_groups()
+
+    def test_iter_listview(self):
+        """Testing DataGrid.iter_listview"""
+        datagrid = self._build_datagrid()
+        datagrid.streaming_batch_size = 3
+        chunks = list(datagrid.iter_listview())
+
+        # The header, 4 batches of rows, and the footer.
+        self.assertEqual(len(chunks), 6)
+        self.assertIn('Group 01', chunks[1])
+        self.assertIn('Group 10', chunks[4])
+        self.assertIn('class="paginator"', chunks[5])
+        self.assertEqual(''.join(chunks),
+                         self._build_datagrid().render_listview())
+
+    def test_iter_listview_without_rows(self):
+        """Testing DataGrid.iter_listview without any rows"""
+        Group.objects.all().delete()
+
+        chunks = list(self._build_datagrid().iter_listview())
+
+        self.assertEqual(len(chunks), 1)
+        self.assertIn('datagrid-empty', chunks[0])
+
+    def test_iter_listview_with_invalid_page(self):
+        """Testing DataGrid.iter_listview with an invalid page"""
+        datagrid = self._build_datagrid()
+        datagrid.request.GET['page'] = '100'
+
+        self.assertRaises(Http404, datagrid.iter_listview)
+
+    def test_render_listview_to_response(self):
+        """Testing DataGrid.render_listview_to_response with
+        DataGrid.use_streaming
+        """
+        datagrid = self._build_datagrid()
+        datagrid.use_streaming = True
+        response = datagrid.render_listview_to_response()
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertIn(b'Group 01', b''.join(response.streaming_content))
+
+    def _build_datagrid(self):
+        request = HttpRequest()
+        request.user = User(username='testuser')
+
+        datagrid = GroupDataGrid(request)
+        datagrid.paginate_by = 10
+
+        return datagrid
+
+
+class ExportTests(TestCase):
+    """Unit tests for exporting the data in datagrids."""
+
+    def setUp(self):
+        super(ExportTests, self).setUp()
+
+        populate_groups()
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+        self.request.GET['columns'] = 'name'
+        self.request.GET['sort'] = '-name'
+        self.datagrid = GroupDataGrid(self.request)
+        self.datagrid.paginate_by = 10
+        self.datagrid.streaming_batch_size = 25
+
+    def test_iter_export_csv(self):
+        """Testing DataGrid.iter_export with CSV"""
+        chunks = list(self.datagrid.iter_export('csv'))
+
+        # The header and 4 batches of rows.
+        self.assertEqual(len(chunks), 5)
+
+        lines = ''.join(chunks).splitlines()
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(lines[0], 'Group Name')
+        self.assertEqual(lines[1], 'Group 99')
+        self.assertEqual(lines[-1], 'Group 01')
+
+    def test_iter_export_csv_with_formulas(self):
+        """Testing DataGrid.iter_export with CSV and values that look like
+        formulas
+        """
+        values = {
+            'Group 01': '=1+1',
+            'Group 02': '+1',
+            'Group 03': '-1',
+            'Group 04': '@SUM(A1)',
+            'Group 05': '\t=1+1',
+            'Group 06': '\r=1+1',
+            'Group 07': -1,
+        }
+
+        class ExportColumn(Column):
+            def get_export_value(self, state, obj):
+                return values.get(obj.name, obj.name)
+
+        class TestDataGrid(GroupDataGrid):
+            exported = ExportColumn('Exported')
+
+        self.request.GET['columns'] = 'exported'
+        self.request.GET['sort'] = 'name'
+        datagrid = TestDataGrid(self.request)
+        # Rows end with \r\n. Values containing \r on their own are quoted.
+        lines = ''.join(datagrid.iter_export('csv')).split('\r\n')
+
+        self.assertEqual(lines[1:9],
+                         ["'=1+1", "'+1", "'-1", "'@SUM(A1)", "'\t=1+1",
+                          '"\'\r=1+1"', '-1', 'Group 08'])
+
+    def test_iter_export_json(self):
+        """Testing DataGrid.iter_export with JSON lines"""
+        lines = ''.join(self.datagrid.iter_export('json')).splitlines()
+
+        self.assertEqual(len(lines), 99)
+        self.assertEqual(json.loads(lines[0]), {'name': 'Group 99'})
+
+    def test_iter_export_with_export_value(self):
+        """Testing DataGrid.iter_export with Column.get_export_value"""
+        class ExportColumn(Column):
+            def get_export_value(self, state, obj):
+                return [obj.name, obj.pk is not None]
+
+        class TestDataGrid(GroupDataGrid):
+            exported = ExportColumn('Exported')
+
+        self.request.GET['columns'] = 'name,exported'
+        datagrid = TestDataGrid(self.request)
+        lines = ''.join(datagrid.iter_export('json')).splitlines()
+
+        self.assertEqual(json.loads(lines[0]), {
+            'name': 'Group 99',
+            'exported': ['Group 99', True],
+        })
+
+    def test_iter_export_with_invalid_columns(self):
+        """Testing DataGrid.iter_export with no valid columns falls back on
+        the default columns
+        """
+        self.request.GET['columns'] = 'invalid1,invalid2'
+        lines = ''.join(self.datagrid.iter_export('csv')).splitlines()
+
+        self.assertEqual(lines[0], 'ID,Group Name')
+        self.assertEqual(len(lines), 100)
+
+    def test_iter_export_does_not_save_profile(self):
+        """Testing DataGrid.iter_export doesn't save changes to the profile"""
+        save_profile = []
+
+        class TestDataGrid(GroupDataGrid):
+            def load_state(self, *args, **kwargs):
+                save_profile.append(self._save_profile)
+
+                return super(TestDataGrid, self).load_state(*args, **kwargs)
+
+        datagrid = TestDataGrid(self.request)
+        list(datagrid.iter_export('csv'))
+
+        self.assertEqual(save_profile, [False])
+        self.assertTrue(datagrid._save_profile)
+
+    def test_iter_export_with_invalid_format(self):
+        """Testing DataGrid.iter_export with an unsupported format"""
+        self.assertRaises(ValueError, self.datagrid.iter_export, 'xml')
+
+    def test_render_to_response(self):
+        """Testing DataGrid.render_to_response with ?export="""
+        self.request.GET['export'] = 'csv'
+        self.request.GET['datagrid-id'] = self.datagrid.id
+        self.datagrid.allow_export = True
+        response = self.datagrid.render_to_response('datagrid/datagrid.html')
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="all-groups.csv"')
+        self.assertEqual(b''.join(response.streaming_content).count(b'\n'),
+                         100)
+
+    def test_render_to_response_with_other_datagrid_id(self):
+        """Testing DataGrid.render_to_response with ?export= for another
+        datagrid
+        """
+        self.request.GET['export'] = 'csv'
+        self.request.GET['datagrid-id'] = 'other-datagrid'
+        self.datagrid.allow_export = True
+        response = self.datagrid.render_to_response('datagrid/listview.html')
+
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+        self.assertIn(b'datagrid-wrapper', response.content)
+
+    def test_render_to_response_without_allow_export(self):
+        """Testing DataGrid.render_to_response with ?export= and exports
+        disabled
+        """
+        self.request.GET['export'] = 'csv'
+        self.request.GET['gridonly'] = '1'
+        self.request.GET['datagrid-id'] = self.datagrid.id
+        response = self.datagrid.render_to_response('datagrid/datagrid.html')
+
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+        self.assertIn(b'datagrid-wrapper', response.content)
+
+
+class RowsDataTests(TestCase):
+    """Unit tests for loading only the rows of datagrids."""
+
+    def setUp(self):
+        super(RowsDataTests, self).setUp()
+
+        populate_groups()
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+        self.request.GET['sort'] = 'name'
+        self.request.GET['page'] = '2'
+        self.datagrid = GroupDataGrid(self.request)
+        self.datagrid.paginate_by = 10
+
+    def test_get_rows_data_html(self):
+        """Testing DataGrid.get_rows_data with HTML rows"""
+        data = self.datagrid.get_rows_data('html')
+
+        self.assertEqual(len(data['ids']), 10)
+        self.assertEqual(data['page'], 2)
+        self.assertEqual(data['pages'], 10)
+        self.assertEqual(data['total'], 99)
+        self.assertEqual(data['next'], 3)
+        self.assertEqual(data['previous'], 1)
+        self.assertIn('Group 11', data['html'])
+        self.assertIn('Group 20', data['html'])
+        self.assertNotIn('Group 21', data['html'])
+        self.assertNotIn('datagrid-headers', data['html'])
+
+        # The first row is the 11th in the grid.
+        self.assertTrue(data['html'].lstrip().startswith('<tr class="odd"'))
+
+    def test_get_rows_data_data(self):
+        """Testing DataGrid.get_rows_data with row data"""
+        with self.assertNumQueries(2):
+            data = self.datagrid.get_rows_data('data')
+
+        self.assertNotIn('html', data)
+        self.assertEqual(
+            data['rows'],
+            [
+                {
+                    'objid': pk,
+                    'name': 'Group %02d' % i,
+                }
+                for i, pk in zip(range(11, 21), data['ids'])
+            ])
+
+    def test_get_rows_data_with_keyset_pagination(self):
+        """Testing DataGrid.get_rows_data with keyset pagination"""
+        self.datagrid.use_keyset_pagination = True
+        data = self.datagrid.get_rows_data('data')
+
+        self.assertIsNone(data['page'])
+        self.assertIsNone(data['total'])
+        self.assertEqual(data['rows'][0]['name'], 'Group 01')
+        self.assertEqual(data['next'], self.datagrid.page.next_cursor)
+        self.assertIsNone(data['previous'])
+
+    def test_get_rows_data_with_invalid_format(self):
+        """Testing DataGrid.get_rows_data with an unsupported format"""
+        self.assertRaises(ValueError, self.datagrid.get_rows_data, 'xml')
+
+    def test_render_to_response(self):
+        """Testing DataGrid.render_to_response with ?rowsonly="""
+        self.request.GET['rowsonly'] = 'data'
+        self.request.GET['datagrid-id'] = self.datagrid.id
+        response = self.datagrid.render_to_response('datagrid/datagrid.html')
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(len(data['rows']), 10)
+        self.assertEqual(data['rows'][0]['name'], 'Group 11')
+
+
+class KeysetPaginationTests(SpyAgency, TestCase):
+    """Unit tests for keyset pagination in datagrids."""
+
+    def setUp(self):
+        super(KeysetPaginationTests, self).setUp()
+
+        populate_groups()
+        self.request = HttpRequest()
+        self.request.user = User(username='testuser')
+        self.datagrid = GroupDataGrid(self.request)
+        self.datagrid.paginate_by = 10
+        self.datagrid.use_keyset_pagination = True
+
+    def test_first_page(self):
+        """Testing DataGrid with keyset pagination on the first page"""
+        self.request.GET['sort'] = 'name'
+        self.datagrid.load_state()
+
+        self.assertIsInstance(self.datagrid.paginator, KeysetPaginator)
+        self.assertEqual(self._get_names(),
+                         ['Group %02d' % i for i in range(1, 11)])
+        self.assertTrue(self.datagrid.page.has_next())
+        self.assertFalse(self.datagrid.page.has_previous())
+
+        html = self.datagrid.render_paginator()
+        self.assertIn('after=%s' % self.datagrid.page.next_cursor, html)
+        self.assertIn('page=last', html)
+        self.assertNotIn('before=', html)
+
+    def test_next_and_previous_pages(self):
+        """Testing DataGrid with keyset pagination using after= and
+        before=
+        """
+        self.request.GET['sort'] = '-name'
+        self.datagrid.load_state()
+        self.request.GET['after'] = self.datagrid.page.next_cursor
+
+        datagrid = GroupDataGrid(self.request)
+        datagrid.paginate_by = 10
+        datagrid.use_keyset_pagination = True
+        datagrid.load_state()
+
+        self.assertEqual([row['object'].name for row in datagrid.rows],
+                         ['Group %02d' % i for i in range(89, 79, -1)])
+        self.assertTrue(datagrid.page.has_next())
+        self.assertTrue(datagrid.page.has_previous())
+
+        del self.request.GET['after']
+        self.request.GET['before'] = datagrid.page.previous_cursor
+        self.datagrid.load_state()
+
+        self.assertEqual(self._get_names(),
+                         ['Group %02d' % i for i in range(99, 89, -1)])
+        self.assertTrue(self.datagrid.page.has_next())
+        self.assertFalse(self.datagrid.page.has_previous())
+
+    def test_last_page(self):
+        """Testing DataGrid with keyset pagination on the last page"""
+        self.request.GET['sort'] = 'name'
+        self.request.GET['page'] = 'last'
+        self.datagrid.load_state()
+
+        self.assertEqual(self._get_names(),
+                         ['Group %02d' % i for i in range(90, 100)])
+        self.assertFalse(self.datagrid.page.has_next())
+        self.assertTrue(self.datagrid.page.has_previous())
+
+    def test_invalid_cursor(self):
+        """Testing DataGrid with keyset pagination and an invalid cursor"""
+        self.request.GET['sort'] = 'name'
+        self.request.GET['after'] = 'abc!'
+
+        with self.assertRaises(Http404):
+            self.datagrid.load_state()
+
+    def test_unsupported_ordering(self):
+        """Testing DataGrid with keyset pagination and an unsupported
+        ordering
+        """
+        self.datagrid.queryset = Group.objects.order_by('?')
+        self.datagrid.load_state()
+
+        self.assertIsInstance(self.datagrid.paginator, QuerySetPaginator)
+        self.assertEqual(len(self.datagrid.rows), 10)
+
+    def test_nullable_ordering(self):
+        """Testing DataGrid with keyset pagination and a nullable sort field
+        """
+        user = User.objects.create(username='test-user')
+
+        for i in range(3):
+            LogEntry.objects.create(user=user, action_flag=1,
+                                    object_repr='Object %d' % i)
+
+        class LogEntryDataGrid(DataGrid):
+            object_repr = Column('Object', sortable=True)
+
+        queryset = LogEntry.objects.order_by('object_id')
+        datagrid = LogEntryDataGrid(self.request, queryset=queryset)
+        datagrid.use_keyset_pagination = True
+        datagrid.default_columns = ['object_repr']
+        datagrid.default_sort = []
+
+        logger = logging.getLogger('djblets.datagrid.grids')
+        self.spy_on(logger.warning)
+
+        paginator = datagrid.build_paginator(queryset)
+        self.assertIsInstance(paginator, DataGridPaginator)
+        self.assertEqual(len(logger.warning.calls), 1)
+
+        datagrid.load_state()
+
+        self.assertIsInstance(datagrid.paginator, DataGridPaginator)
+        self.assertEqual(len(datagrid.rows), 3)
+
+    def test_paginator_nullable_sort_fields(self):
+        """Testing KeysetPaginator with nullable sort fields"""
+        with self.assertRaises(ValueError):
+            KeysetPaginator(LogEntry.objects.order_by('object_id'), 10)
+
+        # content_type is a nullable relation, so anything across it may
+        # be NULL as well.
+        with self.assertRaises(ValueError):
+            KeysetPaginator(
+                LogEntry.objects.order_by('-content_type__model'), 10)
+
+        paginator = KeysetPaginator(
+            LogEntry.objects.order_by('user__username'), 10)
+
+        self.assertEqual(paginator.sort_fields,
+                         [('user__username', False), ('pk', False)])
+
+    def test_paginator_multiple_sorts(self):
+        """Testing KeysetPaginator with mixed sort directions and duplicate
+        sort values
+        """
+        for i in range(25):
+            User.objects.create(username='user%02d' % i,
+                                first_name='Name %d' % (i % 3))
+
+        queryset = User.objects.order_by('-first_name', 'last_name')
+        expected = list(queryset.order_by('-first_name', 'last_name', 'pk')
+                        .values_list('pk', flat=True))
+        paginator = KeysetPaginator(queryset, 7)
+
+        self.assertEqual(paginator.sort_fields,
+                         [('first_name', True), ('last_name', False),
+                          ('pk', False)])
+
+        # Walk forward through every page.
+        page = paginator.page()
+        pks = []
+
+        while True:
+            pks += [user.pk for user in page.object_list]
+
+            if not page.has_next():
+                break
+
+            page = paginator.page(after=page.next_cursor)
+
+        self.assertEqual(pks, expected)
+
+        # Then walk backward from the last page.
+        page = paginator.page(last=True)
+        pks = []
+
+        while True:
+            pks = [user.pk for user in page.object_list] + pks
+
+            if not page.has_previous():
+                break
+
+            page = paginator.page(before=page.previous_cursor)
+
+        self.assertEqual(pks, expected)
+
+    def test_paginator_queries(self):
+        """Testing KeysetPaginator doesn't count results"""
+        paginator = KeysetPaginator(Group.objects.order_by('name'), 10)
+
+        with self.assertNumQueries(2):
+            page = paginator.page(after=paginator.encode_cursor(
+                ['Group 50', 50]))
+            self.assertEqual(page.object_list[0].name, 'Group 51')
+
+    def _get_names(self):
+        """Return the names of the groups in the datagrid's rows.
+
+        Returns:
+            list of unicode:
+            The group names.
+        """
+        return [row['object'].name for row in self.datagrid.rows]
+
+
 class SandboxColumn(Column):
     def setup_state(self, state):
         raise Exception
@@ -9,6 +9,7 @@ a utility mixin, :py:class:`AppliesToURLMixin`.
 
 It also provides some built-in hooks for applications and extensions to use:
 
+* :py:class:`CacheWarmerHook`
 * :py:class:`DataGridColumnsHook`
 * :py:class:`SignalHook`
 * :py:class:`TemplateHook`
@@ -25,6 +26,8 @@ from django.template import RequestContext
 from django.template.loader import render_to_string
 from django.utils import six
 
+from djblets.cache.warmup import get_cache_warmer_registry
+
 
 logger = logging.getLogger(__name__)
 
@@ -553,3 +556,30 @@ class BaseRegistryHook(ExtensionHook):
     def shutdown(self):
         """Shut down the registry hook and unregister the item."""
         self.registry.unregister(self.item)
+
+
+@six.add_metaclass(ExtensionHookPoint)
+class CacheWarmerHook(BaseRegistryHook):
+    """Registers a cache warmer.
+
+    The warmer will be run by :py:func:`djblets.cache.warmup.warm_caches`
+    and the ``warm-caches`` management command while the extension is
+    enabled.
+
+    Example:
+        .. code-block:: python
+
+           from djblets.cache.warmup import FunctionCacheWarmer
+
+
+           class MyExtension(Extension):
+               def initialize(self):
+                   CacheWarmerHook(self, FunctionCacheWarmer(
+                       warmer_id='my-extension-feeds',
+                       func=render_feeds))
+    """
+
+    @property
+    def registry(self):
+        """The cache warmer registry."""
+        return get_cache_warmer_registry()
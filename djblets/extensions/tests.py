@@ -53,12 +53,15 @@ except ImportError:
     # Django >= 1.9
     get_templatetags_modules = None
 
+from djblets.cache.warmup import (FunctionCacheWarmer,
+                                  get_cache_warmer_registry)
 from djblets.datagrid.grids import Column, DataGrid
 from djblets.extensions.extension import Extension, ExtensionInfo
 from djblets.extensions.forms import SettingsForm
-from djblets.extensions.hooks import (DataGridColumnsHook, ExtensionHook,
-                                      ExtensionHookPoint, BaseRegistryHook,
-                                      SignalHook, TemplateHook, URLHook)
+from djblets.extensions.hooks import (CacheWarmerHook, DataGridColumnsHook,
+                                      ExtensionHook, ExtensionHookPoint,
+                                      BaseRegistryHook, SignalHook,
+                                      TemplateHook, URLHook)
 from djblets.extensions.manager import (ExtensionManager, SettingListWrapper,
                                         get_extension_managers)
 from djblets.extensions.settings import Settings
@@ -1828,6 +1831,29 @@ class BaseRegistryHookTests(ExtensionTestsMixin, TestCase):
         self.assertEqual(list(self.registry), [])
 
 
+class CacheWarmerHookTests(ExtensionTestsMixin, TestCase):
+    """Unit tests for djblets.extensions.hooks.CacheWarmerHook."""
+
+    def setUp(self):
+        super(CacheWarmerHookTests, self).setUp()
+
+        class TestExtension(Extension):
+            pass
+
+        self.extension = self.setup_extension(TestExtension)
+
+    def test_register(self):
+        """Testing CacheWarmerHook registers and unregisters the warmer"""
+        registry = get_cache_warmer_registry()
+        warmer = FunctionCacheWarmer('test-warmer', lambda: None)
+        CacheWarmerHook(self.extension, warmer)
+
+        self.assertIn(warmer, registry)
+
+        self.extension.shutdown()
+        self.assertNotIn(warmer, registry)
+
+
 class ViewTests(SpyAgency, ExtensionTestsMixin, TestCase):
     """Unit tests for djblets.extensions.views."""
 
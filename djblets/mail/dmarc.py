@@ -179,6 +179,7 @@ def _fetch_dmarc_record(hostname, use_cache, cache_expiration):
     the string contents of the record.
 
     The contents can be cached, preventing the need for subsequent DNS queries.
+    Missing records are cached for a shorter period of time.
 
     This is used internally by :py:func:`get_dmarc_record`.
 
@@ -195,26 +196,39 @@ def _fetch_dmarc_record(hostname, use_cache, cache_expiration):
     Returns:
         DmarcRecord:
         The DMARC record. If it could not be found, or DNS lookup failed,
-        ``None`` will be returned instead.
+        ``None`` will be returned instead. Failures to reach the DNS servers
+        are not cached.
     """
     def _fetch_record():
         try:
             return dns_resolver.query('_dmarc.%s' % hostname,
                                       'TXT')[0].to_text()
-        except (IndexError, dns_resolver.NXDOMAIN, dns_resolver.NoAnswer,
-                dns_resolver.NoNameservers):
+        except (IndexError, dns_resolver.NXDOMAIN, dns_resolver.NoAnswer):
+            # There's no record for this hostname. This is remembered as a
+            # negative result.
             raise ValueError
 
     try:
         if use_cache:
+            # Hostnames without a DMARC record are common, so remember
+            # those for a short while to avoid repeated DNS queries.
             record_str = cache_memoize(
                 'dmarc-record-%s' % hostname,
                 lambda: _fetch_record(),
-                expiration=cache_expiration)
+                expiration=cache_expiration,
+                cache_negative_results=True,
+                negative_exceptions=(ValueError,))
         else:
             record_str = _fetch_record()
     except ValueError:
         record_str = None
+    except (dns_resolver.NoNameservers, dns_resolver.Timeout) as e:
+        # The DNS servers failed or couldn't be reached. This is likely
+        # temporary, so these aren't negative exceptions and the failure
+        # isn't cached. The next lookup will try again.
+        logger.warning('Unable to look up the DMARC record for "%s": %s',
+                       hostname, e)
+        record_str = None
 
     if record_str:
         return DmarcRecord.parse(hostname, record_str)
@@ -237,6 +237,34 @@ class DmarcTests(DmarcDnsTestsMixin, TestCase):
 
         self.assertEqual(len(dns_resolver.query.spy.calls), 1)
 
+    def test_get_dmarc_record_with_cache_and_no_record(self):
+        """Testing get_dmarc_record with use_cache=True and no DMARC record
+        in DNS
+        """
+        self.assertIsNone(get_dmarc_record('example.com', use_cache=True))
+        self.assertEqual(len(dns_resolver.query.spy.calls), 1)
+
+        self.assertIsNone(get_dmarc_record('example.com', use_cache=True))
+        self.assertEqual(len(dns_resolver.query.spy.calls), 1)
+
+    def test_get_dmarc_record_with_cache_and_dns_failure(self):
+        """Testing get_dmarc_record with use_cache=True and DNS servers
+        failing
+        """
+        def _fail_query(qname, rdtype, *args, **kwargs):
+            raise dns_resolver.NoNameservers
+
+        self._dmarc_spy_agency.unspy(dns_resolver.query)
+        self._dmarc_spy_agency.spy_on(dns_resolver.query,
+                                      call_fake=_fail_query)
+
+        self.assertIsNone(get_dmarc_record('example.com', use_cache=True))
+        self.assertEqual(len(dns_resolver.query.spy.calls), 1)
+
+        # The failure isn't cached, so DNS is queried again.
+        self.assertIsNone(get_dmarc_record('example.com', use_cache=True))
+        self.assertEqual(len(dns_resolver.query.spy.calls), 2)
+
     def test_is_email_allowed_by_dmarc_with_domain_policy_none(self):
         """Testing is_email_allowed_by_dmarc with domain policy=none"""
         self.dmarc_txt_records['_dmarc.example.com'] = 'v=DMARC1; p=none;'
@@ -0,0 +1,611 @@
+"""A cache backend emulating memcached, for tests and benchmarks.
+
+:py:class:`MemcachedSimulatorCache` stores data in-process, like Django's
+local memory cache, but follows memcached's rules where they affect how
+:py:mod:`djblets.cache.backend` behaves:
+
+* Items larger than the maximum item size (1MB, by default) are rejected,
+  and any existing item for the key is removed.
+* Once the stored items exceed the memory limit (64MB, by default), the
+  least recently used items are evicted. This can evict individual chunks
+  of large data.
+* ``add``, ``incr`` and ``decr`` are atomic.
+* Each request can be given an artificial latency, with batch operations
+  (``get_many``, ``set_many`` and ``delete_many``) costing a single
+  request.
+
+Memory is accounted by item size, rather than by memcached's slab classes.
+
+To use it, configure a cache with:
+
+.. code-block:: python
+
+   CACHES = {
+       'default': {
+           'BACKEND': 'djblets.testing.cache.MemcachedSimulatorCache',
+           'LOCATION': 'my-simulator',
+           'OPTIONS': {
+               'MAX_ITEM_SIZE': 1024 * 1024,
+               'MAX_MEMORY': 64 * 1024 * 1024,
+               'LATENCY': 0.001,
+           },
+       },
+   }
+
+Instances with the same ``LOCATION`` share their data.
+"""
+
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.utils import six
+from django.utils.six.moves import cPickle as pickle
+
+
+#: The default maximum size of an item, in bytes.
+DEFAULT_MAX_ITEM_SIZE = 1024 * 1024
+
+#: The default maximum size of all items, in bytes.
+DEFAULT_MAX_MEMORY = 64 * 1024 * 1024
+
+#: The approximate number of bytes used by memcached for each item, in
+#: addition to its key and value.
+ITEM_OVERHEAD = 50
+
+# The space left for the key and item overhead when computing the maximum
+# value size. This matches what's left by djblets.cache.backend's default
+# chunk size for memcached.
+_VALUE_SIZE_MARGIN = 1024
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _SimulatorStore(object):
+    """The data shared by all simulators with the same location."""
+
+    def __init__(self):
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_used = 0
+        self.stats = {}
+
+    def reset_stats(self):
+        """Reset the statistics."""
+        self.stats = {
+            'cmd_get': 0,
+            'cmd_set': 0,
+            'get_hits': 0,
+            'get_misses': 0,
+            'evictions': 0,
+            'rejected_sets': 0,
+        }
+
+
+class MemcachedSimulatorCache(BaseCache):
+    """An in-process cache backend emulating memcached.
+
+    Attributes:
+        latency (float):
+            The number of seconds each request takes.
+
+        max_item_size (int):
+            The maximum size of an item, in bytes, including the key and
+            memcached's overhead.
+
+        max_memory (int):
+            The maximum size of all items, in bytes.
+
+        max_value_size (int):
+            The maximum size of a value that
+            :py:mod:`djblets.cache.backend` should store.
+    """
+
+    def __init__(self, location, params):
+        """Initialize the backend.
+
+        Args:
+            location (unicode):
+                The name of the simulated server.
+
+            params (dict):
+                The cache parameters. ``OPTIONS`` may contain
+                ``MAX_ITEM_SIZE``, ``MAX_MEMORY`` and ``LATENCY``.
+        """
+        super(MemcachedSimulatorCache, self).__init__(params)
+
+        options = params.get('OPTIONS', {})
+        self.max_item_size = options.get('MAX_ITEM_SIZE',
+                                         DEFAULT_MAX_ITEM_SIZE)
+        self.max_memory = options.get('MAX_MEMORY', DEFAULT_MAX_MEMORY)
+        self.latency = options.get('LATENCY', 0)
+        self.max_value_size = self.max_item_size - _VALUE_SIZE_MARGIN
+
+        with _stores_lock:
+            try:
+                self._store = _stores[location]
+            except KeyError:
+                self._store = _SimulatorStore()
+                self._store.reset_stats()
+                _stores[location] = self._store
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store a value, if the key isn't already in the cache.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            value (object):
+                The value to store.
+
+            timeout (int, optional):
+                The expiration time, in seconds.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            bool:
+            ``True`` if the value was stored.
+        """
+        key = self._make_key(key, version)
+        self._wait()
+
+        with self._store.lock:
+            if self._get_item(key) is not None:
+                return False
+
+            return self._set_item(key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        """Return a value from the cache.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            default (object, optional):
+                The value to return if the key isn't in the cache.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            object:
+            The value, or ``default``.
+        """
+        key = self._make_key(key, version)
+        self._wait()
+
+        with self._store.lock:
+            return self._get_value(key, default)
+
+    def get_many(self, keys, version=None):
+        """Return several values from the cache in one request.
+
+        Args:
+            keys (list of unicode):
+                The cache keys.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            dict:
+            A dictionary mapping each key found in the cache to its value.
+        """
+        made_keys = [
+            (key, self._make_key(key, version))
+            for key in keys
+        ]
+        self._wait()
+        missing = object()
+        result = {}
+
+        with self._store.lock:
+            for key, made_key in made_keys:
+                value = self._get_value(made_key, missing)
+
+                if value is not missing:
+                    result[key] = value
+
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store a value in the cache.
+
+        Values that are too large are not stored, and any existing value
+        for the key is removed.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            value (object):
+                The value to store.
+
+            timeout (int, optional):
+                The expiration time, in seconds.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            bool:
+            ``True`` if the value was stored.
+        """
+        key = self._make_key(key, version)
+        self._wait()
+
+        with self._store.lock:
+            return self._set_item(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store several values in the cache in one request.
+
+        Args:
+            data (dict):
+                A dictionary mapping cache keys to values.
+
+            timeout (int, optional):
+                The expiration time, in seconds.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            list of unicode:
+            The keys that could not be stored.
+        """
+        made_items = [
+            (key, self._make_key(key, version), value)
+            for key, value in six.iteritems(data)
+        ]
+        self._wait()
+        failed = []
+
+        with self._store.lock:
+            for key, made_key, value in made_items:
+                if not self._set_item(made_key, value, timeout):
+                    failed.append(key)
+
+        return failed
+
+    def delete(self, key, version=None):
+        """Delete a value from the cache.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            version (int, optional):
+                The key version.
+        """
+        key = self._make_key(key, version)
+        self._wait()
+
+        with self._store.lock:
+            self._delete_item(key)
+
+    def delete_many(self, keys, version=None):
+        """Delete several values from the cache in one request.
+
+        Args:
+            keys (list of unicode):
+                The cache keys.
+
+            version (int, optional):
+                The key version.
+        """
+        made_keys = [
+            self._make_key(key, version)
+            for key in keys
+        ]
+        self._wait()
+
+        with self._store.lock:
+            for key in made_keys:
+                self._delete_item(key)
+
+    def has_key(self, key, version=None):
+        """Return whether a key is in the cache.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            bool:
+            ``True`` if the key is in the cache.
+        """
+        key = self._make_key(key, version)
+        self._wait()
+
+        with self._store.lock:
+            return self._get_item(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically increment a value in the cache.
+
+        As with memcached, decrementing a value below 0 results in 0.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            delta (int, optional):
+                The amount to increment by.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            int:
+            The new value.
+
+        Raises:
+            ValueError:
+                The key is not in the cache, or its value is not an integer.
+        """
+        key = self._make_key(key, version)
+        self._wait()
+
+        with self._store.lock:
+            item = self._get_item(key)
+
+            if item is None:
+                raise ValueError("Key '%s' not found" % key)
+
+            value = self._load_value(item)
+
+            if (not isinstance(value, six.integer_types) or
+                isinstance(value, bool)):
+                raise ValueError('Value for key %s is not an integer' % key)
+
+            value = max(value + delta, 0)
+            size = len(key) + len('%d' % value) + ITEM_OVERHEAD
+            self._store.memory_used += size - item[1]
+            item[0] = value
+            item[1] = size
+
+            return value
+
+    def decr(self, key, delta=1, version=None):
+        """Atomically decrement a value in the cache.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            delta (int, optional):
+                The amount to decrement by.
+
+            version (int, optional):
+                The key version.
+
+        Returns:
+            int:
+            The new value.
+
+        Raises:
+            ValueError:
+                The key is not in the cache, or its value is not an integer.
+        """
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        """Remove all values from the cache."""
+        self._wait()
+
+        with self._store.lock:
+            self._store.items.clear()
+            self._store.memory_used = 0
+
+    def get_stats(self):
+        """Return statistics on the simulated server.
+
+        Returns:
+            dict:
+            The statistics. This contains ``cmd_get``, ``cmd_set``,
+            ``get_hits``, ``get_misses``, ``evictions`` and
+            ``rejected_sets`` (sets of items that were too large), along
+            with ``curr_items`` and ``bytes`` for the items currently
+            stored.
+        """
+        with self._store.lock:
+            stats = dict(self._store.stats,
+                         curr_items=len(self._store.items),
+                         bytes=self._store.memory_used)
+
+        return stats
+
+    def reset_stats(self):
+        """Reset the statistics on the simulated server."""
+        with self._store.lock:
+            self._store.reset_stats()
+
+    def _make_key(self, key, version):
+        """Return a full cache key.
+
+        Args:
+            key (unicode):
+                The cache key.
+
+            version (int):
+                The key version.
+
+        Returns:
+            unicode:
+            The full cache key.
+        """
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        return key
+
+    def _wait(self):
+        """Wait for the simulated request latency."""
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _get_item(self, key):
+        """Return the item for a key, if not expired.
+
+        The item becomes the most recently used. The lock must be held.
+
+        Args:
+            key (unicode):
+                The full cache key.
+
+        Returns:
+            list:
+            The item, containing the stored value, its size and its expiry
+            time, or ``None`` if it's not in the cache.
+        """
+        items = self._store.items
+        item = items.get(key)
+
+        if item is None:
+            return None
+
+        expiry = item[2]
+
+        if expiry is not None and expiry <= time.time():
+            self._delete_item(key)
+            return None
+
+        # Move the item to the end of the LRU.
+        del items[key]
+        items[key] = item
+
+        return item
+
+    def _get_value(self, key, default):
+        """Return the value for a key, and record the lookup.
+
+        The lock must be held.
+
+        Args:
+            key (unicode):
+                The full cache key.
+
+            default (object):
+                The value to return if the key isn't in the cache.
+
+        Returns:
+            object:
+            The value, or ``default``.
+        """
+        stats = self._store.stats
+        stats['cmd_get'] += 1
+        item = self._get_item(key)
+
+        if item is None:
+            stats['get_misses'] += 1
+            return default
+
+        stats['get_hits'] += 1
+
+        return self._load_value(item)
+
+    def _load_value(self, item):
+        """Return the value stored in an item.
+
+        Args:
+            item (list):
+                The item.
+
+        Returns:
+            object:
+            The value.
+        """
+        value = item[0]
+
+        if isinstance(value, bytes):
+            return pickle.loads(value)
+
+        return value
+
+    def _set_item(self, key, value, timeout):
+        """Store an item, evicting others if needed.
+
+        The lock must be held.
+
+        Args:
+            key (unicode):
+                The full cache key.
+
+            value (object):
+                The value to store.
+
+            timeout (int):
+                The expiration time, in seconds.
+
+        Returns:
+            bool:
+            ``True`` if the value was stored.
+        """
+        store = self._store
+        store.stats['cmd_set'] += 1
+
+        # Like memcached, integers are stored as-is so they can be
+        # incremented, and other values are serialized.
+        if (isinstance(value, six.integer_types) and
+            not isinstance(value, bool)):
+            stored = value
+            value_size = len('%d' % value)
+        else:
+            stored = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            value_size = len(stored)
+
+        size = len(key) + value_size + ITEM_OVERHEAD
+        self._delete_item(key)
+
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if timeout is None:
+            expiry = None
+        elif timeout <= 0:
+            # Django's memcached backends expire these immediately.
+            return True
+        else:
+            expiry = time.time() + timeout
+
+        if size > self.max_item_size or size > self.max_memory:
+            store.stats['rejected_sets'] += 1
+            return False
+
+        items = store.items
+
+        while store.memory_used + size > self.max_memory:
+            evicted_key, evicted_item = items.popitem(last=False)
+            store.memory_used -= evicted_item[1]
+            store.stats['evictions'] += 1
+
+        items[key] = [stored, size, expiry]
+        store.memory_used += size
+
+        return True
+
+    def _delete_item(self, key):
+        """Delete an item.
+
+        The lock must be held.
+
+        Args:
+            key (unicode):
+                The full cache key.
+        """
+        item = self._store.items.pop(key, None)
+
+        if item is not None:
+            self._store.memory_used -= item[1]
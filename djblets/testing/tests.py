@@ -0,0 +1,217 @@
+import random
+import string
+import threading
+
+from mock import patch
+
+from djblets.cache.backend import cache_memoize, get_cache_max_value_size
+from djblets.testing.cache import MemcachedSimulatorCache
+from djblets.testing.testcases import TestCase
+
+
+class MemcachedSimulatorCacheTests(TestCase):
+    """Unit tests for djblets.testing.cache.MemcachedSimulatorCache."""
+
+    def setUp(self):
+        super(MemcachedSimulatorCacheTests, self).setUp()
+
+        self.cache = self._create_cache()
+
+    def tearDown(self):
+        super(MemcachedSimulatorCacheTests, self).tearDown()
+
+        self.cache.clear()
+
+    def test_get_set(self):
+        """Testing MemcachedSimulatorCache.get and set"""
+        value = ['a', 'b']
+        self.assertTrue(self.cache.set('key1', value))
+        value.append('c')
+
+        self.assertEqual(self.cache.get('key1'), ['a', 'b'])
+        self.assertIsNone(self.cache.get('key2'))
+        self.assertEqual(self._create_cache().get('key1'), ['a', 'b'])
+
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['get_hits'], 2)
+        self.assertEqual(stats['get_misses'], 1)
+        self.assertEqual(stats['curr_items'], 1)
+
+    def test_set_too_large(self):
+        """Testing MemcachedSimulatorCache.set with an item larger than the
+        maximum item size
+        """
+        self.cache.set('key1', 'value')
+
+        self.assertFalse(self.cache.set('key1', 'x' * 2048))
+        self.assertNotIn('key1', self.cache)
+        self.assertEqual(self.cache.get_stats()['rejected_sets'], 1)
+
+    def test_eviction(self):
+        """Testing MemcachedSimulatorCache evicts the least recently used
+        items
+        """
+        cache = self._create_cache(MAX_MEMORY=500)
+        data = 'x' * 100
+
+        cache.set('key1', data)
+        cache.set('key2', data)
+        cache.set('key3', data)
+        cache.get('key1')
+        cache.set('key4', data)
+
+        self.assertEqual(sorted(cache.get_many(['key1', 'key2', 'key3',
+                                                'key4'])),
+                         ['key1', 'key3', 'key4'])
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        self.assertLessEqual(cache.get_stats()['bytes'], 500)
+
+    def test_expiration(self):
+        """Testing MemcachedSimulatorCache with expired items"""
+        with patch('time.time', return_value=1000):
+            self.cache.set('key1', 'value', 10)
+
+        with patch('time.time', return_value=1009):
+            self.assertEqual(self.cache.get('key1'), 'value')
+
+        with patch('time.time', return_value=1010):
+            self.assertIsNone(self.cache.get('key1'))
+
+        self.assertEqual(self.cache.get_stats()['bytes'], 0)
+
+    def test_add(self):
+        """Testing MemcachedSimulatorCache.add is atomic"""
+        results = []
+
+        def _add(i):
+            results.append(self.cache.add('key1', i))
+
+        threads = [
+            threading.Thread(target=_add, args=(i,))
+            for i in range(10)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 1)
+
+    def test_incr(self):
+        """Testing MemcachedSimulatorCache.incr is atomic"""
+        self.cache.set('key1', 0)
+
+        def _incr():
+            for i in range(100):
+                self.cache.incr('key1')
+
+        threads = [
+            threading.Thread(target=_incr)
+            for i in range(5)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.cache.get('key1'), 500)
+        self.assertEqual(self.cache.decr('key1', 1000), 0)
+
+    def test_incr_invalid(self):
+        """Testing MemcachedSimulatorCache.incr with a missing or non-integer
+        value
+        """
+        self.cache.set('key1', 'value')
+
+        with self.assertRaises(ValueError):
+            self.cache.incr('key1')
+
+        with self.assertRaises(ValueError):
+            self.cache.incr('key2')
+
+    def test_latency(self):
+        """Testing MemcachedSimulatorCache with latency"""
+        cache = self._create_cache(LATENCY=0.5)
+
+        with patch('time.sleep') as sleep:
+            cache.set_many({
+                'key1': 'value1',
+                'key2': 'value2',
+            })
+            cache.get_many(['key1', 'key2'])
+            cache.get('key1')
+
+        self.assertEqual(sleep.call_count, 3)
+        sleep.assert_called_with(0.5)
+
+    def test_cache_memoize_large_data(self):
+        """Testing cache_memoize with large data and
+        MemcachedSimulatorCache
+        """
+        cache = self._create_cache(MAX_ITEM_SIZE=4096)
+        rand = random.Random(0)
+        data = ''.join(rand.choice(string.ascii_letters)
+                       for i in range(20000))
+        calls = []
+
+        def _lookup():
+            calls.append(1)
+            return data
+
+        with patch('djblets.cache.backend.cache', cache):
+            self.assertEqual(get_cache_max_value_size(cache), 3072)
+
+            for i in range(2):
+                self.assertEqual(
+                    cache_memoize('key1', _lookup, large_data=True,
+                                  compress_large_data=False),
+                    data)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get_stats()['rejected_sets'], 0)
+        self.assertGreater(cache.get_stats()['curr_items'], 5)
+
+    def test_cache_memoize_large_data_evicted(self):
+        """Testing cache_memoize with large data and chunks evicted from
+        MemcachedSimulatorCache
+        """
+        cache = self._create_cache(MAX_ITEM_SIZE=4096, MAX_MEMORY=12000)
+        rand = random.Random(0)
+        data = ''.join(rand.choice(string.ascii_letters)
+                       for i in range(20000))
+        calls = []
+
+        def _lookup():
+            calls.append(1)
+            return data
+
+        with patch('djblets.cache.backend.cache', cache):
+            for i in range(2):
+                self.assertEqual(
+                    cache_memoize('key1', _lookup, large_data=True,
+                                  compress_large_data=False),
+                    data)
+
+        self.assertEqual(len(calls), 2)
+        self.assertGreater(cache.get_stats()['evictions'], 0)
+
+    def _create_cache(self, **options):
+        """Return a simulator for the tests.
+
+        Args:
+            **options (dict):
+                Options for the simulator.
+
+        Returns:
+            djblets.testing.cache.MemcachedSimulatorCache:
+            The simulator.
+        """
+        options.setdefault('MAX_ITEM_SIZE', 1024)
+
+        return MemcachedSimulatorCache('test-simulator-%s' % id(self), {
+            'OPTIONS': options,
+        })